@@ -11,7 +11,7 @@ import os
 sys.path.insert(0, os.path.dirname(os.path.dirname(__file__)))
 
 from app.db.database import Base
-from app.db.models import User, Conversation, Report
+from app.db.models import User, Conversation, Report, UsageRecord
 from app.config import settings
 
 # this is the Alembic Config object, which provides
@@ -0,0 +1,47 @@
+"""Add usage_records table for LLM token usage accounting
+
+Revision ID: 002
+Revises: 001
+Create Date: 2026-10-19
+
+"""
+from alembic import op
+import sqlalchemy as sa
+from sqlalchemy.dialects import postgresql
+
+# revision identifiers, used by Alembic.
+revision = '002'
+down_revision = '001'
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    op.create_table(
+        'usage_records',
+        sa.Column('id', postgresql.UUID(as_uuid=True), primary_key=True),
+        sa.Column('user_id', postgresql.UUID(as_uuid=True), nullable=True),
+        sa.Column('session_id', sa.String(length=64), nullable=True),
+        sa.Column('provider', sa.String(length=50), nullable=False),
+        sa.Column('model', sa.String(length=255), nullable=False),
+        sa.Column('operation', sa.String(length=50), nullable=False),
+        sa.Column('language', sa.String(length=50), nullable=True),
+        sa.Column('scenario', sa.String(length=100), nullable=True),
+        sa.Column('bucket_start', sa.DateTime(), nullable=False),
+        sa.Column('calls', sa.Integer(), nullable=False, server_default='0'),
+        sa.Column('prompt_tokens', sa.Integer(), nullable=False, server_default='0'),
+        sa.Column('completion_tokens', sa.Integer(), nullable=False, server_default='0'),
+        sa.Column('cached_tokens', sa.Integer(), nullable=False, server_default='0'),
+        sa.Column('latency_ms', sa.Integer(), nullable=False, server_default='0'),
+        sa.Column('cost_usd', sa.Numeric(precision=12, scale=6), nullable=False, server_default='0'),
+        sa.ForeignKeyConstraint(['user_id'], ['users.id'], ondelete='CASCADE'),
+        sa.PrimaryKeyConstraint('id')
+    )
+    op.create_index(op.f('ix_usage_records_bucket_start'), 'usage_records', ['bucket_start'], unique=False)
+    op.create_index('ix_usage_records_user_id_bucket_start', 'usage_records', ['user_id', 'bucket_start'], unique=False)
+
+
+def downgrade() -> None:
+    op.drop_index('ix_usage_records_user_id_bucket_start', table_name='usage_records')
+    op.drop_index(op.f('ix_usage_records_bucket_start'), table_name='usage_records')
+    op.drop_table('usage_records')
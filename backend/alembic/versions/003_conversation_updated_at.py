@@ -0,0 +1,34 @@
+"""Add conversations.updated_at for ETags on history endpoints
+
+Revision ID: 003
+Revises: 002
+Create Date: 2026-10-19
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+# revision identifiers, used by Alembic.
+revision = '003'
+down_revision = '002'
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    op.add_column('conversations', sa.Column('updated_at', sa.DateTime(), nullable=True))
+    op.execute('UPDATE conversations SET updated_at = created_at')
+    op.alter_column('conversations', 'updated_at', nullable=False)
+    # Version lookups for a user's history list are served from the index alone
+    op.create_index(
+        'ix_conversations_user_id_created_at',
+        'conversations',
+        ['user_id', 'created_at'],
+        unique=False,
+        postgresql_include=['id', 'updated_at']
+    )
+
+
+def downgrade() -> None:
+    op.drop_index('ix_conversations_user_id_created_at', table_name='conversations')
+    op.drop_column('conversations', 'updated_at')
@@ -0,0 +1,59 @@
+"""Add the month-partitioned conversation_archive table
+
+Cold conversations and their reports are moved here, compressed, by the
+archive job, keeping the hot conversations and reports tables small.
+
+The hot tables themselves stay unpartitioned: on a partitioned table every
+unique index must include created_at, which would drop the global
+uniqueness of session_id that the chat upsert (ON CONFLICT (session_id))
+and reports.conversation_id's foreign key rely on.
+
+Partitions (conversation_archive_YYYY_MM) are created on demand by the
+archive job.
+
+Revision ID: 004
+Revises: 003
+Create Date: 2026-10-19
+
+"""
+from alembic import op
+import sqlalchemy as sa
+from sqlalchemy.dialects import postgresql
+
+# revision identifiers, used by Alembic.
+revision = '004'
+down_revision = '003'
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    op.create_table(
+        'conversation_archive',
+        sa.Column('id', postgresql.UUID(as_uuid=True), nullable=False),
+        sa.Column('created_at', sa.DateTime(), nullable=False),
+        sa.Column('session_id', postgresql.UUID(as_uuid=True), nullable=False),
+        sa.Column('user_id', postgresql.UUID(as_uuid=True), nullable=True),
+        sa.Column('language', sa.String(length=50), nullable=False),
+        sa.Column('scenario', sa.String(length=100), nullable=False),
+        sa.Column('updated_at', sa.DateTime(), nullable=False),
+        sa.Column('archived_at', sa.DateTime(), nullable=False),
+        sa.Column('has_report', sa.Boolean(), nullable=False, server_default=sa.false()),
+        sa.Column('payload', sa.LargeBinary(), nullable=False),
+        sa.ForeignKeyConstraint(['user_id'], ['users.id'], ondelete='CASCADE'),
+        sa.PrimaryKeyConstraint('id', 'created_at'),
+        postgresql_partition_by='RANGE (created_at)'
+    )
+    op.create_index(
+        op.f('ix_conversation_archive_session_id'), 'conversation_archive', ['session_id'], unique=False
+    )
+    op.create_index(
+        'ix_conversation_archive_user_id_created_at', 'conversation_archive', ['user_id', 'created_at'], unique=False
+    )
+
+
+def downgrade() -> None:
+    # Dropping the parent drops its partitions; archived rows are lost
+    op.drop_index('ix_conversation_archive_user_id_created_at', table_name='conversation_archive')
+    op.drop_index(op.f('ix_conversation_archive_session_id'), table_name='conversation_archive')
+    op.drop_table('conversation_archive')
@@ -0,0 +1,70 @@
+"""Add conversations.search_vector for full-text search of history
+
+Documents are tokenized in Python (CJK text as character bigrams, see
+app.core.text_search) and stored with the 'simple' configuration, so the
+backfill runs through the same code as the application.
+
+Revision ID: 005
+Revises: 004
+Create Date: 2026-10-19
+
+"""
+from alembic import op
+import sqlalchemy as sa
+from sqlalchemy.dialects import postgresql
+
+from app.core.text_search import message_texts, report_texts, search_document
+
+# revision identifiers, used by Alembic.
+revision = '005'
+down_revision = '004'
+branch_labels = None
+depends_on = None
+
+BATCH_SIZE = 500
+
+
+def upgrade() -> None:
+    # Lets user_id (a btree type) share the GIN index with the tsvector
+    op.execute('CREATE EXTENSION IF NOT EXISTS btree_gin')
+    op.add_column('conversations', sa.Column('search_vector', postgresql.TSVECTOR(), nullable=True))
+
+    connection = op.get_bind()
+    select_batch = sa.text(
+        "SELECT c.id, c.messages, r.report_data FROM conversations c "
+        "LEFT JOIN reports r ON r.conversation_id = c.id "
+        "WHERE c.id > :after ORDER BY c.id LIMIT :limit"
+    )
+    update_row = sa.text(
+        "UPDATE conversations SET search_vector = "
+        "setweight(to_tsvector('simple', :messages), 'A') || "
+        "setweight(to_tsvector('simple', :report), 'B') "
+        "WHERE id = :id"
+    )
+    after = '00000000-0000-0000-0000-000000000000'
+    while True:
+        rows = connection.execute(select_batch, {"after": after, "limit": BATCH_SIZE}).all()
+        if not rows:
+            break
+        connection.execute(update_row, [
+            {
+                "id": row.id,
+                "messages": search_document(message_texts(row.messages)),
+                "report": search_document(report_texts(row.report_data)),
+            }
+            for row in rows
+        ])
+        after = rows[-1].id
+
+    op.create_index(
+        'ix_conversations_user_id_search_vector',
+        'conversations',
+        ['user_id', 'search_vector'],
+        unique=False,
+        postgresql_using='gin'
+    )
+
+
+def downgrade() -> None:
+    op.drop_index('ix_conversations_user_id_search_vector', table_name='conversations')
+    op.drop_column('conversations', 'search_vector')
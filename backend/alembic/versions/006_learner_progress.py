@@ -0,0 +1,54 @@
+"""Add learner-progress aggregate tables
+
+progress_aggregates holds weekly per-user counters updated by each report
+save; learner_terms is the set of terms each learner has used. Existing
+reports are counted with `python -m app.services.progress backfill`.
+
+Revision ID: 006
+Revises: 005
+Create Date: 2026-10-19
+
+"""
+from alembic import op
+import sqlalchemy as sa
+from sqlalchemy.dialects import postgresql
+
+# revision identifiers, used by Alembic.
+revision = '006'
+down_revision = '005'
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    op.create_table(
+        'progress_aggregates',
+        sa.Column('user_id', postgresql.UUID(as_uuid=True), nullable=False),
+        sa.Column('week_start', sa.Date(), nullable=False),
+        sa.Column('language', sa.String(length=50), nullable=False),
+        sa.Column('dimension', sa.String(length=20), nullable=False),
+        sa.Column('key', sa.String(length=100), nullable=False),
+        sa.Column('reports', sa.Integer(), nullable=False, server_default='0'),
+        sa.Column('turns', sa.Integer(), nullable=False, server_default='0'),
+        sa.Column('words', sa.Integer(), nullable=False, server_default='0'),
+        sa.Column('grammar_errors', sa.Integer(), nullable=False, server_default='0'),
+        sa.Column('vocabulary_issues', sa.Integer(), nullable=False, server_default='0'),
+        sa.Column('naturalness_issues', sa.Integer(), nullable=False, server_default='0'),
+        sa.Column('new_terms', sa.Integer(), nullable=False, server_default='0'),
+        sa.ForeignKeyConstraint(['user_id'], ['users.id'], ondelete='CASCADE'),
+        sa.PrimaryKeyConstraint('user_id', 'week_start', 'language', 'dimension', 'key')
+    )
+    op.create_table(
+        'learner_terms',
+        sa.Column('user_id', postgresql.UUID(as_uuid=True), nullable=False),
+        sa.Column('language', sa.String(length=50), nullable=False),
+        sa.Column('term', sa.String(length=100), nullable=False),
+        sa.Column('first_seen', sa.Date(), nullable=False),
+        sa.ForeignKeyConstraint(['user_id'], ['users.id'], ondelete='CASCADE'),
+        sa.PrimaryKeyConstraint('user_id', 'language', 'term')
+    )
+
+
+def downgrade() -> None:
+    op.drop_table('learner_terms')
+    op.drop_table('progress_aggregates')
@@ -0,0 +1,48 @@
+"""Add background account deletion
+
+users.deletion_requested_at blocks sign-in once deletion is requested;
+account_deletions tracks the batched deletion and outlives the user row.
+
+Revision ID: 007
+Revises: 006
+Create Date: 2026-10-19
+
+"""
+from alembic import op
+import sqlalchemy as sa
+from sqlalchemy.dialects import postgresql
+
+# revision identifiers, used by Alembic.
+revision = '007'
+down_revision = '006'
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    op.add_column('users', sa.Column('deletion_requested_at', sa.DateTime(), nullable=True))
+    op.create_table(
+        'account_deletions',
+        sa.Column('user_id', postgresql.UUID(as_uuid=True), nullable=False),
+        sa.Column('status', sa.String(length=20), nullable=False, server_default='pending'),
+        sa.Column('total_conversations', sa.Integer(), nullable=False, server_default='0'),
+        sa.Column('deleted_conversations', sa.Integer(), nullable=False, server_default='0'),
+        sa.Column('requested_at', sa.DateTime(), nullable=False),
+        sa.Column('started_at', sa.DateTime(), nullable=True),
+        sa.Column('updated_at', sa.DateTime(), nullable=False),
+        sa.Column('finished_at', sa.DateTime(), nullable=True),
+        sa.Column('error', sa.Text(), nullable=True),
+        sa.PrimaryKeyConstraint('user_id')
+    )
+    op.create_index(
+        'ix_account_deletions_status_requested_at',
+        'account_deletions',
+        ['status', 'requested_at'],
+        unique=False
+    )
+
+
+def downgrade() -> None:
+    op.drop_index('ix_account_deletions_status_requested_at', table_name='account_deletions')
+    op.drop_table('account_deletions')
+    op.drop_column('users', 'deletion_requested_at')
@@ -0,0 +1,94 @@
+"""
+Account data API endpoints: export and deletion
+"""
+from datetime import datetime
+from typing import Optional
+from uuid import UUID
+
+from fastapi import APIRouter, Depends, HTTPException, status
+from fastapi.responses import StreamingResponse
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from ..crud.account import get_account_deletion, request_account_deletion
+from ..db.database import bind_user, get_db, unit_of_work
+from ..db.models import User
+from ..dependencies.auth import get_token_user_id, require_current_user
+from ..models.schemas import AccountDeletionStatus
+from ..services.deletion import account_deletion_job
+from ..services.export import export_stream
+
+router = APIRouter(tags=["Account"])
+
+NDJSON_MEDIA_TYPE = "application/x-ndjson"
+
+
+@router.get("/account/export")
+async def export_account_data(
+    compress: bool = False,
+    current_user: User = Depends(require_current_user)
+):
+    """
+    Download everything stored for the authenticated user
+
+    Streams NDJSON: an `account` line, one `conversation` line per
+    conversation (messages and report included, archived ones too) and a
+    closing `summary` line. Memory use does not depend on history size.
+
+    - **compress**: Send a gzip file instead of plain NDJSON
+    """
+    filename = f"linguaecho-export-{datetime.utcnow():%Y%m%d}.ndjson"
+    if compress:
+        filename += ".gz"
+    return StreamingResponse(
+        export_stream(current_user, compress=compress),
+        media_type="application/gzip" if compress else NDJSON_MEDIA_TYPE,
+        headers={
+            "Content-Disposition": f'attachment; filename="{filename}"',
+            "Cache-Control": "no-store",
+        },
+    )
+
+
+@router.delete("/account", response_model=AccountDeletionStatus, status_code=status.HTTP_202_ACCEPTED)
+async def delete_account(
+    current_user: User = Depends(require_current_user),
+    db: AsyncSession = Depends(get_db)
+):
+    """
+    Delete the authenticated user's account and all their data
+
+    Sign-in stops working at once; conversations, reports and other rows
+    are deleted in the background. Export first (GET /api/account/export)
+    to keep a copy. Follow progress with GET /api/account/deletion.
+    """
+    async with unit_of_work(db):
+        deletion = await request_account_deletion(db, current_user.id)
+    account_deletion_job.wake()
+    return deletion
+
+
+@router.get("/account/deletion", response_model=AccountDeletionStatus)
+async def get_account_deletion_status(
+    user_id: Optional[UUID] = Depends(get_token_user_id),
+    db: AsyncSession = Depends(get_db)
+):
+    """
+    Progress of the authenticated user's account deletion
+
+    Answers with the token the deletion was requested with, including
+    after the account itself is gone.
+    """
+    if user_id is None:
+        raise HTTPException(
+            status_code=status.HTTP_401_UNAUTHORIZED,
+            detail="Not authenticated",
+            headers={"WWW-Authenticate": "Bearer"},
+        )
+    bind_user(db, user_id)
+    deletion = await get_account_deletion(db, user_id)
+    if deletion is None:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="Account deletion was not requested"
+        )
+    return deletion
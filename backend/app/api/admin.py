@@ -0,0 +1,150 @@
+"""
+Admin API endpoints for diagnosing live workers
+"""
+from datetime import datetime, timedelta
+from enum import Enum
+from typing import Optional
+from fastapi import APIRouter, Depends, HTTPException, Query, status
+from fastapi.responses import PlainTextResponse
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from ..config import settings
+from ..core.profiling import profiler
+from ..crud.usage import get_usage_by_scenario
+from ..db.database import get_db
+from ..db.dialect import IS_SQLITE
+from ..services import analytics
+from ..services.usage import usage_tracker
+from ..dependencies.auth import require_admin
+from ..models.schemas import ProfileArmRequest
+
+router = APIRouter(tags=["Admin"], dependencies=[Depends(require_admin)])
+
+COLLAPSED_MEDIA_TYPE = "text/plain; charset=utf-8"
+
+
+class ProfileKind(str, Enum):
+    """Which profile to return"""
+    CPU = "cpu"
+    MEMORY = "memory"
+
+
+def require_profiling():
+    """Hide profiling endpoints unless PROFILING_ENABLED is set"""
+    if not settings.PROFILING_ENABLED:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Not Found")
+
+
+def _collapsed(result: dict, kind: ProfileKind) -> PlainTextResponse:
+    """Return one profile from a capture result as collapsed stacks"""
+    if kind.value not in result:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="Memory was not captured for this profile"
+        )
+    return PlainTextResponse(
+        result[kind.value],
+        media_type=COLLAPSED_MEDIA_TYPE,
+        headers={"X-Profile-Samples": str(result["samples"]), "X-Profile-Duration": str(result["duration_s"])}
+    )
+
+
+@router.post("/profile", dependencies=[Depends(require_profiling)])
+async def capture_profile(
+    seconds: float = Query(10.0, gt=0),
+    kind: ProfileKind = ProfileKind.CPU,
+    interval_ms: float = Query(5.0, ge=1.0, le=100.0)
+):
+    """
+    Profile this worker's event loop for a number of seconds
+
+    - **seconds**: Capture duration (capped at PROFILING_MAX_SECONDS)
+    - **kind**: `cpu` for sampled stacks, `memory` for a tracemalloc diff
+
+    Returns collapsed stacks for flamegraph.pl or speedscope
+    """
+    try:
+        result = await profiler.capture_for(
+            min(seconds, settings.PROFILING_MAX_SECONDS),
+            memory=kind == ProfileKind.MEMORY,
+            interval=interval_ms / 1000
+        )
+    except RuntimeError as e:
+        raise HTTPException(status_code=status.HTTP_409_CONFLICT, detail=str(e))
+
+    return _collapsed(result, kind)
+
+
+@router.post("/profile/arm", status_code=status.HTTP_202_ACCEPTED, dependencies=[Depends(require_profiling)])
+async def arm_profile(request: ProfileArmRequest):
+    """
+    Profile the next K requests to a route on this worker
+
+    Collect the result from GET /api/admin/profile/result once they finish
+    """
+    try:
+        profiler.arm(request.route, request.requests, request.memory, request.interval_ms / 1000)
+    except RuntimeError as e:
+        raise HTTPException(status_code=status.HTTP_409_CONFLICT, detail=str(e))
+
+    return {"route": request.route, "requests": request.requests}
+
+
+@router.get("/profile/result", dependencies=[Depends(require_profiling)])
+async def get_profile_result(kind: ProfileKind = ProfileKind.CPU):
+    """
+    Get the most recent profile captured on this worker
+
+    Returns 409 while a route-armed capture is still waiting for requests
+    """
+    if profiler.armed is not None:
+        raise HTTPException(
+            status_code=status.HTTP_409_CONFLICT,
+            detail=f"Capture still running, {profiler.armed.remaining} requests remaining"
+        )
+    if profiler.last_result is None:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="No profile captured")
+
+    return _collapsed(profiler.last_result, kind)
+
+
+@router.get("/usage/scenarios")
+async def get_scenario_usage(
+    days: int = Query(7, ge=1, le=90),
+    db: AsyncSession = Depends(get_db)
+):
+    """
+    Token usage per scenario and operation over the last N days
+
+    Includes prompt/completion tokens per turn, to guide prompt optimizations
+    """
+    # Include this worker's unflushed usage
+    await usage_tracker.flush()
+    since = datetime.utcnow() - timedelta(days=days)
+    return {"since": since, "scenarios": await get_usage_by_scenario(db, since)}
+
+
+@router.get("/analytics/cohorts")
+async def get_cohort_analytics(
+    language: Optional[str] = Query(None, max_length=50),
+    since_days: Optional[int] = Query(None, ge=1, le=3650),
+    refresh: bool = False
+):
+    """
+    Learning metrics across all learners
+
+    Error-type frequency and per-report rates by scenario and language, and
+    errors by session number (the improvement curve). Cached for
+    ANALYTICS_CACHE_TTL seconds unless **refresh** is set.
+    """
+    if IS_SQLITE:
+        raise HTTPException(
+            status_code=status.HTTP_501_NOT_IMPLEMENTED,
+            detail="Cohort analytics requires PostgreSQL"
+        )
+    if not analytics.AVAILABLE:
+        raise HTTPException(
+            status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+            detail="Cohort analytics requires numpy"
+        )
+    return await analytics.cohort_analytics.get(language, since_days, refresh)
@@ -4,7 +4,7 @@ Authentication API endpoints
 from fastapi import APIRouter, Depends, HTTPException, status
 from sqlalchemy.ext.asyncio import AsyncSession
 
-from ..db.database import get_db
+from ..db.database import get_db, unit_of_work, bind_user
 from ..models.schemas import UserRegister, UserLogin, Token, UserResponse
 from ..crud.user import create_user, get_user_by_email, authenticate_user
 from ..core.security import create_access_token
@@ -36,7 +36,10 @@ async def register(
         )
 
     # Create new user
-    user = await create_user(db, user_data.email, user_data.password)
+    async with unit_of_work(db):
+        user = await create_user(db, user_data.email, user_data.password)
+        # The new account is read from the primary until replicas catch up
+        bind_user(db, user.id)
 
     # Generate access token
     access_token = create_access_token(data={"sub": str(user.id)})
@@ -1,29 +1,75 @@
 """
 API endpoints for chat and report generation
 """
-import json
+import logging
 from fastapi import APIRouter, HTTPException, Depends
 from fastapi.responses import StreamingResponse
 from sqlalchemy.ext.asyncio import AsyncSession
 from typing import Optional
 from uuid import UUID
 
-from app.models.schemas import ChatRequest, ChatResponse, ReportRequest, ReportResponse
+from app.models.schemas import ChatRequest, ChatResponse, ReportRequest, ReportResponse, Report
 from app.services.llm_service import llm_service
-from ..db.database import get_db
+from app.services.usage import UsageContext
+from ..core.metrics import track_stream
+from ..core.serialization import sse_event
+from ..core.tracing import tracer, current_span
+from ..db.database import get_db, unit_of_work, bind_user
 from ..db.models import User
 from ..dependencies.auth import get_current_user
+from ..dependencies.rate_limit import limit_chat, limit_report
+from ..dependencies.usage import enforce_usage_quota
 from ..crud.conversation import (
-    create_conversation,
-    get_conversation_by_session_id,
-    update_conversation_messages,
-    create_report
+    create_report,
+    get_conversation_version,
+    save_conversation_messages
 )
 
 router = APIRouter()
+logger = logging.getLogger(__name__)
 
 
-@router.post("/chat", response_model=ChatResponse)
+def _error_status(error: Exception) -> int:
+    """HTTP status for an LLM error: pass provider rate limits through as 429"""
+    if getattr(error, "status_code", None) == 429:
+        return 429
+    return 500
+
+
+def _usage_context(request, current_user: Optional[User]) -> UsageContext:
+    """Usage accounting context for a chat or report request"""
+    return UsageContext(
+        user_id=current_user.id if current_user else None,
+        session_id=request.session_id,
+        language=request.language.value,
+        scenario=request.scenario.value
+    )
+
+
+async def _save_turn(db: AsyncSession, current_user: User, request: ChatRequest, reply: str) -> None:
+    """Stage the conversation with the new turn appended (one upsert, no SELECT)"""
+    messages = [msg.model_dump() for msg in request.history]
+    messages.append({"role": "user", "content": request.message})
+    messages.append({"role": "assistant", "content": reply})
+
+    conversation_id = await save_conversation_messages(
+        db,
+        session_id=UUID(request.session_id),
+        user_id=current_user.id,
+        language=request.language.value,
+        scenario=request.scenario.value,
+        messages=messages
+    )
+    if conversation_id is None:
+        logger.warning("Session belongs to another user or is archived, not saved", extra={
+            "session_id": request.session_id
+        })
+
+
+@router.post(
+    "/chat", response_model=ChatResponse,
+    dependencies=[Depends(limit_chat), Depends(enforce_usage_quota)]
+)
 async def chat(
     request: ChatRequest,
     current_user: Optional[User] = Depends(get_current_user),
@@ -47,34 +93,14 @@ async def chat(
             language=request.language,
             scenario=request.scenario,
             user_message=request.message,
-            history=request.history
+            history=request.history,
+            usage=_usage_context(request, current_user)
         )
 
         # If user is authenticated, save to database
         if current_user:
-            session_id = UUID(request.session_id)
-
-            # Check if conversation exists
-            existing_conv = await get_conversation_by_session_id(db, session_id)
-
-            # Build updated messages
-            updated_messages = [msg.model_dump() for msg in request.history]
-            updated_messages.append({"role": "user", "content": request.message})
-            updated_messages.append({"role": "assistant", "content": reply})
-
-            if existing_conv:
-                # Update existing conversation
-                await update_conversation_messages(db, existing_conv, updated_messages)
-            else:
-                # Create new conversation
-                await create_conversation(
-                    db=db,
-                    session_id=session_id,
-                    user_id=current_user.id,
-                    language=request.language.value,
-                    scenario=request.scenario.value,
-                    messages=updated_messages
-                )
+            async with unit_of_work(db):
+                await _save_turn(db, current_user, request, reply)
 
         return ChatResponse(
             reply=reply,
@@ -82,14 +108,16 @@ async def chat(
         )
 
     except Exception as e:
-        raise HTTPException(status_code=500, detail=f"Error generating response: {str(e)}")
+        raise HTTPException(status_code=_error_status(e), detail=f"Error generating response: {str(e)}")
 
 
-@router.post("/chat/stream")
+@router.post(
+    "/chat/stream",
+    dependencies=[Depends(limit_chat), Depends(enforce_usage_quota)]
+)
 async def chat_stream(
     request: ChatRequest,
-    current_user: Optional[User] = Depends(get_current_user),
-    db: AsyncSession = Depends(get_db)
+    current_user: Optional[User] = Depends(get_current_user)
 ):
     """
     Handle conversation turn with streaming response (Server-Sent Events)
@@ -103,80 +131,73 @@ async def chat_stream(
     Returns:
         StreamingResponse with SSE format containing AI response chunks
     """
+    # The generator runs after this handler returns, so the request span
+    # is passed in explicitly as the parent of the stream span
+    parent_span = current_span()
+
     async def generate():
         """Generator function for SSE streaming"""
-        try:
-            full_response = []
-
-            # Stream response from LLM
-            async for chunk in llm_service.get_conversation_response_stream(
-                language=request.language,
-                scenario=request.scenario,
-                user_message=request.message,
-                history=request.history
-            ):
-                full_response.append(chunk)
-
-                # Send SSE formatted data
-                # Format: data: {JSON}\n\n
-                sse_data = json.dumps({
-                    "type": "chunk",
-                    "content": chunk,
+        with tracer.span("chat_stream.generate", parent=parent_span, attributes={
+            "chat.history_length": len(request.history),
+            "user.authenticated": current_user is not None
+        }) as span:
+            try:
+                full_response = []
+
+                # Stream response from LLM
+                async for chunk in llm_service.get_conversation_response_stream(
+                    language=request.language,
+                    scenario=request.scenario,
+                    user_message=request.message,
+                    history=request.history,
+                    usage=_usage_context(request, current_user)
+                ):
+                    full_response.append(chunk)
+
+                    # Send SSE formatted data
+                    # Format: data: {JSON}\n\n
+                    yield sse_event({
+                        "type": "chunk",
+                        "content": chunk,
+                        "session_id": request.session_id
+                    })
+
+                complete_response = "".join(full_response)
+
+                # If user is authenticated, save to database
+                if current_user:
+                    try:
+                        # The request's session is closed once the handler
+                        # returns, so the stream saves with its own
+                        async with unit_of_work() as session:
+                            bind_user(session, current_user.id)
+                            await _save_turn(session, current_user, request, complete_response)
+                    except Exception as db_error:
+                        # Log database error but don't fail the stream
+                        logger.error("Database save error", extra={
+                            "session_id": request.session_id,
+                            "error": str(db_error)
+                        })
+                        span.set_attribute("db.save_error", str(db_error))
+
+                # Send completion event with full response
+                yield sse_event({
+                    "type": "done",
+                    "content": complete_response,
                     "session_id": request.session_id
-                }, ensure_ascii=False)
-                yield f"data: {sse_data}\n\n"
-
-            complete_response = "".join(full_response)
-
-            # If user is authenticated, save to database
-            if current_user:
-                try:
-                    session_id = UUID(request.session_id)
-
-                    # Check if conversation exists
-                    existing_conv = await get_conversation_by_session_id(db, session_id)
-
-                    # Build updated messages
-                    updated_messages = [msg.model_dump() for msg in request.history]
-                    updated_messages.append({"role": "user", "content": request.message})
-                    updated_messages.append({"role": "assistant", "content": complete_response})
-
-                    if existing_conv:
-                        # Update existing conversation
-                        await update_conversation_messages(db, existing_conv, updated_messages)
-                    else:
-                        # Create new conversation
-                        await create_conversation(
-                            db=db,
-                            session_id=session_id,
-                            user_id=current_user.id,
-                            language=request.language.value,
-                            scenario=request.scenario.value,
-                            messages=updated_messages
-                        )
-                except Exception as db_error:
-                    # Log database error but don't fail the stream
-                    print(f"Database save error: {db_error}")
-
-            # Send completion event with full response
-            complete_data = json.dumps({
-                "type": "done",
-                "content": complete_response,
-                "session_id": request.session_id
-            }, ensure_ascii=False)
-            yield f"data: {complete_data}\n\n"
-
-        except Exception as e:
-            # Send error event
-            error_data = json.dumps({
-                "type": "error",
-                "error": str(e),
-                "session_id": request.session_id
-            }, ensure_ascii=False)
-            yield f"data: {error_data}\n\n"
+                })
+
+            except Exception as e:
+                span.record_error(e)
+                # Send error event
+                yield sse_event({
+                    "type": "error",
+                    "error": str(e),
+                    "session_id": request.session_id
+                })
 
     return StreamingResponse(
-        generate(),
+        track_stream(generate(), "/api/chat/stream"),
         media_type="text/event-stream",
         headers={
             "Cache-Control": "no-cache",
@@ -186,7 +207,43 @@ async def chat_stream(
     )
 
 
-@router.post("/report/generate", response_model=ReportResponse)
+async def _save_report(
+    db: Optional[AsyncSession],
+    current_user: User,
+    session_id_str: str,
+    report: Report
+) -> None:
+    """
+    Save a generated report for the user's conversation, if it exists
+
+    Pass db=None from stream bodies to use a session of their own.
+    """
+    try:
+        session_id = UUID(session_id_str)
+        async with unit_of_work(db) as session:
+            bind_user(session, current_user.id)
+            # Only the id and owner are needed, not the message blobs
+            version = await get_conversation_version(session, session_id)
+
+            if version and version[1] == current_user.id:
+                # Save or update report
+                await create_report(
+                    db=session,
+                    conversation_id=version[0],
+                    report_data=report.model_dump()
+                )
+    except Exception as db_error:
+        # Log database error but don't fail the report generation
+        logger.error("Database save error", extra={
+            "session_id": session_id_str,
+            "error": str(db_error)
+        })
+
+
+@router.post(
+    "/report/generate", response_model=ReportResponse,
+    dependencies=[Depends(limit_report), Depends(enforce_usage_quota)]
+)
 async def generate_report(
     request: ReportRequest,
     current_user: Optional[User] = Depends(get_current_user),
@@ -209,27 +266,97 @@ async def generate_report(
         report = await llm_service.generate_report(
             language=request.language,
             scenario=request.scenario,
-            conversation=request.conversation
+            conversation=request.conversation,
+            usage=_usage_context(request, current_user)
         )
 
         # If user is authenticated, save report to database
         if current_user:
-            try:
-                session_id = UUID(request.session_id)
-                conversation = await get_conversation_by_session_id(db, session_id)
-
-                if conversation and conversation.user_id == current_user.id:
-                    # Save or update report
-                    await create_report(
-                        db=db,
-                        conversation_id=conversation.id,
-                        report_data=report.model_dump()
-                    )
-            except Exception as db_error:
-                # Log database error but don't fail the report generation
-                print(f"Database save error: {db_error}")
+            await _save_report(db, current_user, request.session_id, report)
 
         return ReportResponse(report=report)
 
     except Exception as e:
-        raise HTTPException(status_code=500, detail=f"Error generating report: {str(e)}")
+        raise HTTPException(status_code=_error_status(e), detail=f"Error generating report: {str(e)}")
+
+
+@router.post(
+    "/report/generate/stream",
+    dependencies=[Depends(limit_report), Depends(enforce_usage_quota)]
+)
+async def generate_report_stream(
+    request: ReportRequest,
+    current_user: Optional[User] = Depends(get_current_user)
+):
+    """
+    Generate feedback report with streaming sections (Server-Sent Events)
+
+    Each report section (overview, grammar_errors, ...) is sent as soon as
+    the LLM finishes writing it, followed by a completion event with the
+    full report. If authenticated, the report is saved to the database.
+
+    Args:
+        request: ReportRequest with session_id, language, scenario, and full conversation
+
+    Returns:
+        StreamingResponse with SSE format containing report sections
+    """
+    # The generator runs after this handler returns, so the request span
+    # is passed in explicitly as the parent of the stream span
+    parent_span = current_span()
+
+    async def generate():
+        """Generator function for SSE streaming"""
+        with tracer.span("report_stream.generate", parent=parent_span, attributes={
+            "report.conversation_length": len(request.conversation),
+            "user.authenticated": current_user is not None
+        }) as span:
+            try:
+                report = None
+
+                async for name, value in llm_service.generate_report_stream(
+                    language=request.language,
+                    scenario=request.scenario,
+                    conversation=request.conversation,
+                    usage=_usage_context(request, current_user)
+                ):
+                    if name == "report":
+                        report = value
+                        continue
+
+                    yield sse_event({
+                        "type": "section",
+                        "section": name,
+                        "content": value,
+                        "session_id": request.session_id
+                    })
+
+                # If user is authenticated, save report to database
+                if current_user:
+                    await _save_report(None, current_user, request.session_id, report)
+
+                # Send completion event with full report
+                yield sse_event({
+                    "type": "done",
+                    "report": report.model_dump(),
+                    "session_id": request.session_id
+                })
+
+            except Exception as e:
+                span.record_error(e)
+                # Send error event
+                yield sse_event({
+                    "type": "error",
+                    "error": str(e),
+                    "session_id": request.session_id
+                })
+
+    return StreamingResponse(
+        track_stream(generate(), "/api/report/generate/stream"),
+        media_type="text/event-stream",
+        headers={
+            "Cache-Control": "no-cache",
+            "Connection": "keep-alive",
+            "X-Accel-Buffering": "no",  # Disable nginx buffering for proxies
+        }
+    )
@@ -1,30 +1,31 @@
 """
 Conversation history and data migration API endpoints
 """
-from fastapi import APIRouter, Depends, HTTPException, status
+import logging
+from fastapi import APIRouter, Depends, HTTPException, Request, status
 from sqlalchemy.ext.asyncio import AsyncSession
 from typing import List
 from uuid import UUID, uuid4
 
-from ..db.database import get_db
-from ..models.schemas import (
-    ConversationListItem,
-    ConversationDetail,
-    MigrateDataRequest,
-    Message,
-    Report as ReportSchema
-)
+from ..core.http_cache import cache_headers, make_etag, not_modified
+from ..core.serialization import FastJSONResponse
+from ..db.database import get_db, unit_of_work
+from ..models.schemas import BulkDeleteRequest, BulkDeleteResponse, ConversationDetail, MigrateDataRequest
+from ..models.serializers import conversation_detail
 from ..crud.conversation import (
     get_user_conversations,
     get_conversation_by_session_id,
-    delete_conversation,
-    create_conversation,
-    create_report
+    get_conversation_version,
+    get_user_conversation_versions,
+    get_existing_session_ids,
+    delete_user_conversations,
+    create_conversation
 )
 from ..dependencies.auth import require_current_user
 from ..db.models import User
 
 router = APIRouter(tags=["Conversations"])
+logger = logging.getLogger(__name__)
 
 
 @router.post("/migrate", status_code=status.HTTP_200_OK)
@@ -42,40 +43,39 @@ async def migrate_local_storage_data(
     """
     migrated_count = 0
 
+    # Parse session ids up front so existing ones are found in one query
+    parsed = []
     for conv_data in data.conversations:
         try:
-            session_id = UUID(conv_data.get("session_id", str(uuid4())))
-
-            # Check if conversation already exists
-            existing = await get_conversation_by_session_id(db, session_id)
-            if existing:
+            parsed.append((UUID(conv_data.get("session_id", str(uuid4()))), conv_data))
+        except (ValueError, TypeError, AttributeError) as e:
+            # Skip malformed entries and continue with the others
+            logger.warning("Error migrating conversation", extra={
+                "session_id": conv_data.get("session_id"),
+                "error": str(e)
+            })
+
+    async with unit_of_work(db):
+        existing = await get_existing_session_ids(db, [session_id for session_id, _ in parsed])
+
+        for session_id, conv_data in parsed:
+            if session_id in existing:
                 continue  # Skip duplicates
+            existing.add(session_id)
 
-            # Create conversation
-            conversation = await create_conversation(
+            # Create conversation, with its report if there is one
+            await create_conversation(
                 db=db,
                 session_id=session_id,
                 user_id=current_user.id,
                 language=conv_data.get("language", "english"),
                 scenario=conv_data.get("scenario", "casual_chat"),
-                messages=conv_data.get("messages", [])
+                messages=conv_data.get("messages", []),
+                report_data=conv_data.get("report") or None
             )
 
-            # If there's a report, create it
-            if "report" in conv_data and conv_data["report"]:
-                await create_report(
-                    db=db,
-                    conversation_id=conversation.id,
-                    report_data=conv_data["report"]
-                )
-
             migrated_count += 1
 
-        except Exception as e:
-            # Log error but continue with other conversations
-            print(f"Error migrating conversation: {e}")
-            continue
-
     return {
         "message": f"Successfully migrated {migrated_count} conversations",
         "migrated_count": migrated_count
@@ -84,89 +84,80 @@ async def migrate_local_storage_data(
 
 @router.get("/conversations", response_model=List[ConversationDetail])
 async def get_conversations(
+    http_request: Request,
     current_user: User = Depends(require_current_user),
     db: AsyncSession = Depends(get_db),
-    limit: int = 50
+    limit: int = 50,
+    include_archived: bool = True
 ):
     """
     Get all conversations for the authenticated user
 
     - **limit**: Maximum number of conversations to return (default 50)
+    - **include_archived**: Include archived (older, read-only) conversations (default true)
 
-    Returns full conversation details including messages and reports
+    Returns full conversation details including messages and reports.
+    Send the previous ETag as If-None-Match to get 304 when nothing changed.
     """
-    conversations = await get_user_conversations(db, current_user.id, limit)
-
-    # Transform to response model with full details
-    result = []
-    for conv in conversations:
-        # Parse messages from JSONB
-        messages = [Message(**msg) for msg in conv.messages] if conv.messages else []
-
-        # Parse report from relationship
-        report = None
-        if conv.report:
-            report_data = conv.report.report_data
-            report = ReportSchema(
-                overview=report_data.get('overview', {}),
-                grammar_errors=report_data.get('grammar_errors', []),
-                vocabulary_issues=report_data.get('vocabulary_issues', []),
-                naturalness=report_data.get('naturalness', []),
-                positive_feedback=report_data.get('positive_feedback', [])
-            )
-
-        result.append(ConversationDetail(
-            id=conv.id,
-            session_id=conv.session_id,
-            language=conv.language,
-            scenario=conv.scenario,
-            messages=messages,
-            created_at=conv.created_at,
-            report=report
-        ))
-
-    return result
+    # Versions come from index-only scans; messages are loaded only on a miss
+    versions = await get_user_conversation_versions(db, current_user.id, limit, include_archived)
+    etag = make_etag([limit, include_archived, *(part for version in versions for part in version)])
+    cached = not_modified(http_request, etag)
+    if cached is not None:
+        return cached
+
+    conversations = await get_user_conversations(db, current_user.id, limit, include_archived)
+
+    # Stored rows are already in response shape; skip re-validating them
+    return FastJSONResponse(
+        [conversation_detail(conv) for conv in conversations],
+        headers=cache_headers(etag)
+    )
 
 
 @router.get("/conversations/{session_id}", response_model=ConversationDetail)
 async def get_conversation(
     session_id: UUID,
+    http_request: Request,
     current_user: User = Depends(require_current_user),
     db: AsyncSession = Depends(get_db)
 ):
     """
     Get detailed conversation by session ID
 
-    Returns conversation with all messages and report (if exists)
+    Returns conversation with all messages and report (if exists).
+    Send the previous ETag as If-None-Match to get 304 when nothing changed.
     """
-    conversation = await get_conversation_by_session_id(db, session_id)
+    version = await get_conversation_version(db, session_id, include_archived=True)
 
-    if not conversation:
+    if not version:
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND,
             detail="Conversation not found"
         )
 
+    conversation_id, user_id, updated_at = version
+
     # Verify ownership
-    if conversation.user_id != current_user.id:
+    if user_id != current_user.id:
         raise HTTPException(
             status_code=status.HTTP_403_FORBIDDEN,
             detail="Not authorized to access this conversation"
         )
 
-    # Convert messages to Message objects
-    messages = [Message(**msg) for msg in conversation.messages]
-
-    # Build response
-    return ConversationDetail(
-        id=conversation.id,
-        session_id=conversation.session_id,
-        language=conversation.language,
-        scenario=conversation.scenario,
-        messages=messages,
-        created_at=conversation.created_at,
-        report=conversation.report.report_data if conversation.report else None
-    )
+    etag = make_etag([conversation_id, updated_at])
+    cached = not_modified(http_request, etag)
+    if cached is not None:
+        return cached
+
+    conversation = await get_conversation_by_session_id(db, session_id)
+    if not conversation:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="Conversation not found"
+        )
+
+    return FastJSONResponse(conversation_detail(conversation), headers=cache_headers(etag))
 
 
 @router.delete("/conversations/{conversation_id}", status_code=status.HTTP_204_NO_CONTENT)
@@ -178,36 +169,39 @@ async def delete_conversation_endpoint(
     """
     Delete a conversation (and its report)
 
-    Only the owner can delete their conversation
+    Only the owner can delete their conversation; anyone else gets 404
     """
-    # Get conversation to verify ownership
-    from sqlalchemy import select
-    from ..db.models import Conversation
+    # The ownership check is part of the delete statement
+    async with unit_of_work(db):
+        deleted = await delete_user_conversations(db, current_user.id, [conversation_id])
 
-    result = await db.execute(
-        select(Conversation).where(Conversation.id == conversation_id)
-    )
-    conversation = result.scalar_one_or_none()
-
-    if not conversation:
+    if not deleted:
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND,
             detail="Conversation not found"
         )
 
-    if conversation.user_id != current_user.id:
-        raise HTTPException(
-            status_code=status.HTTP_403_FORBIDDEN,
-            detail="Not authorized to delete this conversation"
-        )
+    return None
 
-    # Delete conversation
-    success = await delete_conversation(db, conversation_id)
 
-    if not success:
-        raise HTTPException(
-            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
-            detail="Failed to delete conversation"
-        )
+@router.post("/conversations/delete", response_model=BulkDeleteResponse)
+async def delete_conversations_endpoint(
+    data: BulkDeleteRequest,
+    current_user: User = Depends(require_current_user),
+    db: AsyncSession = Depends(get_db)
+):
+    """
+    Delete many conversations (and their reports) in one statement
 
-    return None
+    Their reports are taken out of /api/progress in the same transaction.
+
+    - **conversation_ids**: Up to 500 ids; ids that are not yours are reported as not found
+    """
+    async with unit_of_work(db):
+        deleted = await delete_user_conversations(db, current_user.id, data.conversation_ids)
+
+    requested = list(dict.fromkeys(data.conversation_ids))
+    return {
+        "deleted": [i for i in requested if i in deleted],
+        "not_found": [i for i in requested if i not in deleted],
+    }
@@ -0,0 +1,33 @@
+"""
+Learner progress API endpoints
+"""
+from typing import Optional
+
+from fastapi import APIRouter, Depends, Query
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from ..crud.progress import get_user_progress
+from ..db.database import get_db
+from ..db.models import User
+from ..dependencies.auth import require_current_user
+from ..services.progress import summarize_progress
+
+router = APIRouter(tags=["Progress"])
+
+
+@router.get("/progress")
+async def get_my_progress(
+    weeks: int = Query(12, ge=1, le=104, description="Length of the weekly series"),
+    language: Optional[str] = Query(None, max_length=50),
+    current_user: User = Depends(require_current_user),
+    db: AsyncSession = Depends(get_db)
+):
+    """
+    Get the authenticated user's learning trends from their reports
+
+    Weekly counts of reports, turns, words and findings; totals per
+    scenario; grammar errors by type; and vocabulary breadth (distinct
+    terms used). Answered from precomputed aggregates in one query.
+    """
+    rows = await get_user_progress(db, current_user.id, language)
+    return summarize_progress(rows, weeks)
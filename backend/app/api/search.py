@@ -0,0 +1,66 @@
+"""
+Conversation search API endpoints
+"""
+from fastapi import APIRouter, Depends, HTTPException, Query, status
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from ..core.text_search import build_tsquery, make_snippet, query_terms
+from ..crud.search import search_user_conversations
+from ..db.database import get_db
+from ..db.dialect import IS_SQLITE
+from ..db.models import User
+from ..dependencies.auth import require_current_user
+from ..models.schemas import ConversationSearchResponse
+
+router = APIRouter(tags=["Search"])
+
+
+@router.get("/search/conversations", response_model=ConversationSearchResponse)
+async def search_conversations(
+    q: str = Query(..., min_length=1, max_length=200, description="Words or phrases; all must match"),
+    limit: int = Query(20, ge=1, le=50),
+    offset: int = Query(0, ge=0, le=1000),
+    current_user: User = Depends(require_current_user),
+    db: AsyncSession = Depends(get_db)
+):
+    """
+    Search the authenticated user's conversations and report findings
+
+    - **q**: Search text; Japanese and Chinese need no spaces (ラーメン, 点菜)
+    - **limit** / **offset**: Paging
+
+    Results carry a snippet of the first matching message, not the
+    transcript. Archived conversations are not searched.
+    """
+    if IS_SQLITE:
+        raise HTTPException(
+            status_code=status.HTTP_501_NOT_IMPLEMENTED,
+            detail="Conversation search requires PostgreSQL"
+        )
+    tsquery = build_tsquery(q)
+    if tsquery is None:
+        return {"query": q, "results": [], "limit": limit, "offset": offset, "has_more": False}
+
+    # One extra row tells whether there is another page
+    rows = await search_user_conversations(
+        db, current_user.id, tsquery, query_terms(q)[0], limit=limit + 1, offset=offset
+    )
+    results = [
+        {
+            "id": conversation_id,
+            "session_id": session_id,
+            "language": language,
+            "scenario": scenario,
+            "created_at": created_at,
+            "rank": round(float(rank), 6),
+            "snippet": make_snippet(matched_message, q),
+        }
+        for conversation_id, session_id, language, scenario, created_at, rank, matched_message in rows[:limit]
+    ]
+    return {
+        "query": q,
+        "results": results,
+        "limit": limit,
+        "offset": offset,
+        "has_more": len(rows) > limit,
+    }
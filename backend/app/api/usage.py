@@ -0,0 +1,32 @@
+"""
+Token usage API endpoints
+"""
+from datetime import datetime
+from fastapi import APIRouter, Depends
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from ..db.database import get_db
+from ..db.models import User
+from ..dependencies.auth import require_current_user
+from ..services.usage import usage_tracker
+
+router = APIRouter(tags=["Usage"])
+
+
+@router.get("/usage")
+async def get_my_usage(
+    current_user: User = Depends(require_current_user),
+    db: AsyncSession = Depends(get_db)
+):
+    """
+    Get today's token usage and remaining quota for the authenticated user
+
+    Quotas reset at midnight UTC; `daily_quota` is null when unlimited
+    """
+    daily = await usage_tracker.ensure_warm(db, current_user.id)
+    return {
+        "date": daily.day.date().isoformat(),
+        "tokens_used": daily.tokens,
+        "daily_quota": usage_tracker.daily_token_quota or None,
+        "remaining": usage_tracker.remaining_tokens(current_user.id)
+    }
@@ -0,0 +1,170 @@
+"""
+Conditional GET and response compression
+
+ETags are built from row versions (id + updated_at), so a matching
+If-None-Match can be answered with 304 from a cheap version query before
+any message blobs are loaded. ETags are weak because the same JSON may be
+sent gzip- or brotli-encoded.
+
+CompressionMiddleware compresses complete JSON bodies above a size
+threshold. Streamed bodies (SSE, NDJSON) pass through untouched so chunks
+are not held back by the compressor.
+"""
+import gzip
+import hashlib
+from typing import Iterable, Optional
+
+from fastapi import Request, Response
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+# Every page load revalidates; the user's data never sits in shared caches
+CACHE_HEADERS = {"Cache-Control": "private, no-cache", "Vary": "Authorization"}
+
+_COMPRESSIBLE_TYPES = (b"application/json",)
+
+
+def make_etag(parts: Iterable[object]) -> str:
+    """Weak ETag from a sequence of version parts"""
+    digest = hashlib.blake2b(digest_size=16)
+    for part in parts:
+        digest.update(str(part).encode("utf-8"))
+        digest.update(b"\x00")
+    return f'W/"{digest.hexdigest()}"'
+
+
+def etag_matches(if_none_match: Optional[str], etag: str) -> bool:
+    """Weak comparison of an If-None-Match header against an ETag"""
+    if not if_none_match:
+        return False
+    if if_none_match.strip() == "*":
+        return True
+    opaque = etag.removeprefix("W/")
+    return any(
+        candidate.strip().removeprefix("W/") == opaque
+        for candidate in if_none_match.split(",")
+    )
+
+
+def not_modified(request: Request, etag: str) -> Optional[Response]:
+    """A 304 response if the client already has this version, else None"""
+    if etag_matches(request.headers.get("if-none-match"), etag):
+        return Response(status_code=304, headers={"ETag": etag, **CACHE_HEADERS})
+    return None
+
+
+def cache_headers(etag: str) -> dict:
+    """Headers for a 200 response carrying a cacheable representation"""
+    return {"ETag": etag, **CACHE_HEADERS}
+
+
+def _choose_encoding(accept_encoding: str) -> Optional[str]:
+    """
+    Best supported coding for an Accept-Encoding header, None for identity
+
+    The highest q-value wins (brotli on a tie); q=0 refuses a coding and
+    "*" covers codings that are not listed.
+    """
+    qualities = {}
+    for value in accept_encoding.lower().split(","):
+        coding, _, params = value.partition(";")
+        coding = coding.strip()
+        if not coding:
+            continue
+        quality = 1.0
+        for param in params.split(";"):
+            name, _, number = param.partition("=")
+            if name.strip() == "q":
+                try:
+                    quality = float(number)
+                except ValueError:
+                    quality = 0.0
+        qualities[coding] = quality
+
+    supported = ("br", "gzip") if brotli is not None else ("gzip",)
+    wildcard = qualities.get("*", 0.0)
+    quality, coding = max(
+        ((qualities.get(coding, wildcard), coding) for coding in supported), key=lambda pair: pair[0]
+    )
+    return coding if quality > 0 else None
+
+
+class CompressionMiddleware:
+    """
+    Compress complete JSON response bodies of at least `minimum_size` bytes
+
+    Args:
+        app: ASGI app
+        minimum_size: Smaller bodies are sent as-is
+        gzip_level: gzip compression level (brotli uses quality 4)
+    """
+
+    def __init__(self, app, minimum_size: int = 1024, gzip_level: int = 6):
+        self.app = app
+        self.minimum_size = minimum_size
+        self.gzip_level = gzip_level
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        accept_encoding = ""
+        for name, value in scope["headers"]:
+            if name == b"accept-encoding":
+                accept_encoding = value.decode("latin-1")
+                break
+        encoding = _choose_encoding(accept_encoding)
+        if encoding is None:
+            await self.app(scope, receive, send)
+            return
+
+        start_message = None
+        passthrough = False
+
+        async def send_wrapper(message):
+            nonlocal start_message, passthrough
+            if message["type"] == "http.response.start":
+                headers = dict(message.get("headers", []))
+                content_type = headers.get(b"content-type", b"")
+                if b"content-encoding" in headers or not content_type.startswith(_COMPRESSIBLE_TYPES):
+                    passthrough = True
+                    await send(message)
+                else:
+                    start_message = message
+                return
+
+            if passthrough:
+                await send(message)
+                return
+
+            body = message.get("body", b"")
+            if message.get("more_body", False) or len(body) < self.minimum_size:
+                # Streamed or small: send unchanged
+                passthrough = True
+                await send(start_message)
+                await send(message)
+                return
+
+            if encoding == "br":
+                compressed = brotli.compress(body, quality=4)
+            else:
+                compressed = gzip.compress(body, compresslevel=self.gzip_level, mtime=0)
+
+            headers = [
+                (name, value) for name, value in start_message.get("headers", [])
+                if name not in (b"content-length", b"vary")
+            ]
+            vary = dict(start_message.get("headers", [])).get(b"vary")
+            headers += [
+                (b"content-encoding", encoding.encode()),
+                (b"content-length", str(len(compressed)).encode()),
+                (b"vary", vary + b", Accept-Encoding" if vary else b"Accept-Encoding"),
+            ]
+            await send({**start_message, "headers": headers})
+            await send({"type": "http.response.body", "body": compressed})
+
+        await self.app(scope, receive, send_wrapper)
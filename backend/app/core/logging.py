@@ -0,0 +1,189 @@
+"""
+Structured JSON logging with a non-blocking queue handler
+
+Log calls only enqueue the record; formatting and writing to stdout happen
+on a listener thread. Each line carries the request id (and trace id when
+tracing is on), long fields are truncated, and noisy messages can be sampled.
+"""
+import atexit
+import copy
+import json
+import logging
+import queue
+import random
+import sys
+import time
+import uuid
+from contextvars import ContextVar
+from logging.handlers import QueueHandler, QueueListener
+from typing import Dict, Optional
+
+from ..config import settings
+from .tracing import current_span
+
+request_id_var: ContextVar[Optional[str]] = ContextVar("request_id", default=None)
+
+# Attributes every LogRecord has; anything else was passed through `extra`
+_RECORD_ATTRS = set(vars(logging.LogRecord("", 0, "", 0, "", (), None))) | {"message", "asctime"}
+_CONTEXT_ATTRS = {"request_id", "trace_id", "sample_key", "sample_rate"}
+
+
+def truncate(value, limit: Optional[int] = None):
+    """Cap a string at `limit` characters, noting how much was cut"""
+    limit = limit or settings.LOG_MAX_FIELD_CHARS
+    if isinstance(value, str) and len(value) > limit:
+        return f"{value[:limit]}...[{len(value) - limit} more chars]"
+    return value
+
+
+def parse_sampling(spec: str) -> Dict[str, float]:
+    """Parse "key=rate,key=rate" into a dict of sample rates"""
+    rates = {}
+    for item in spec.split(","):
+        if "=" in item:
+            key, rate = item.split("=", 1)
+            rates[key.strip()] = float(rate)
+    return rates
+
+
+class SamplingFilter(logging.Filter):
+    """
+    Keep only a fraction of noisy records
+
+    Rates are looked up by the record's `sample_key` extra, falling back
+    to the logger name. Kept records carry their sample rate so counts
+    can be reweighted downstream.
+    """
+
+    def __init__(self, rates: Dict[str, float]):
+        super().__init__()
+        self.rates = rates
+
+    def filter(self, record: logging.LogRecord) -> bool:
+        if not self.rates:
+            return True
+        rate = self.rates.get(getattr(record, "sample_key", None) or record.name)
+        if rate is None:
+            return True
+        if random.random() >= rate:
+            return False
+        record.sample_rate = rate
+        return True
+
+
+class ContextQueueHandler(QueueHandler):
+    """Queue handler that captures request context before handing off"""
+
+    def prepare(self, record: logging.LogRecord) -> logging.LogRecord:
+        record = copy.copy(record)
+        # Context variables are not visible on the listener thread, so read them here
+        record.request_id = request_id_var.get()
+        if "trace_id" not in record.__dict__:
+            record.trace_id = current_span().trace_id
+        record.msg = truncate(record.getMessage())
+        record.args = None
+        if record.exc_info:
+            record.exc_text = logging.Formatter().formatException(record.exc_info)
+            record.exc_info = None
+        return record
+
+
+class JSONFormatter(logging.Formatter):
+    """Format records as one JSON object per line"""
+
+    def format(self, record: logging.LogRecord) -> str:
+        data = {
+            "ts": time.strftime("%Y-%m-%dT%H:%M:%S", time.gmtime(record.created)) + f".{int(record.msecs):03d}Z",
+            "level": record.levelname,
+            "logger": record.name,
+            "msg": truncate(record.getMessage()),
+        }
+        for key in ("request_id", "trace_id", "sample_rate"):
+            value = getattr(record, key, None)
+            if value is not None:
+                data[key] = value
+        for key, value in record.__dict__.items():
+            if key not in _RECORD_ATTRS and key not in _CONTEXT_ATTRS:
+                data[key] = truncate(value) if isinstance(value, str) else value
+        if record.exc_info and not record.exc_text:
+            record.exc_text = self.formatException(record.exc_info)
+        if record.exc_text:
+            data["exc"] = truncate(record.exc_text)
+        return json.dumps(data, ensure_ascii=False, default=str)
+
+
+class TextFormatter(logging.Formatter):
+    """Human-readable format for local development"""
+
+    def __init__(self):
+        super().__init__("%(asctime)s %(levelname)s [%(request_id)s] %(name)s: %(message)s")
+
+    def format(self, record: logging.LogRecord) -> str:
+        extras = {
+            key: value for key, value in record.__dict__.items()
+            if key not in _RECORD_ATTRS and key not in _CONTEXT_ATTRS
+        }
+        if not hasattr(record, "request_id"):
+            record.request_id = None
+        line = super().format(record)
+        if extras:
+            line += " " + " ".join(f"{key}={truncate(str(value))}" for key, value in extras.items())
+        return line
+
+
+_listener: Optional[QueueListener] = None
+
+
+def setup_logging() -> None:
+    """Route the app's loggers through a background JSON writer (idempotent)"""
+    global _listener
+    if _listener is not None:
+        return
+
+    output = logging.StreamHandler(sys.stdout)
+    output.setFormatter(JSONFormatter() if settings.LOG_FORMAT == "json" else TextFormatter())
+
+    log_queue: queue.SimpleQueue = queue.SimpleQueue()
+    handler = ContextQueueHandler(log_queue)
+    handler.addFilter(SamplingFilter(parse_sampling(settings.LOG_SAMPLING)))
+
+    app_logger = logging.getLogger("app")
+    app_logger.setLevel(settings.LOG_LEVEL.upper())
+    app_logger.addHandler(handler)
+    app_logger.propagate = False
+
+    _listener = QueueListener(log_queue, output, respect_handler_level=True)
+    _listener.start()
+    atexit.register(_listener.stop)
+
+
+class RequestIdMiddleware:
+    """ASGI middleware assigning a request id to each HTTP request"""
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        request_id = None
+        for key, value in scope.get("headers", ()):
+            if key == b"x-request-id":
+                request_id = value.decode("latin-1")[:64]
+                break
+        request_id = request_id or uuid.uuid4().hex
+
+        async def send_wrapper(message):
+            if message["type"] == "http.response.start":
+                headers = list(message.get("headers", []))
+                headers.append((b"x-request-id", request_id.encode("latin-1")))
+                message["headers"] = headers
+            await send(message)
+
+        token = request_id_var.set(request_id)
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            request_id_var.reset(token)
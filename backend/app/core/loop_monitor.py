@@ -0,0 +1,180 @@
+"""
+Event-loop lag monitor with optional load shedding
+
+A heartbeat task measures how late the loop wakes up; a watchdog thread
+notices stalls while they are still happening and logs a stack sample of
+the loop thread. When lag stays high, new low-priority requests can be
+rejected with 503 before the stalls spread to open SSE streams.
+"""
+import asyncio
+import logging
+import sys
+import threading
+import time
+import traceback
+from typing import Optional
+
+from ..config import settings
+from .metrics import registry, Gauge, Histogram, Counter
+
+logger = logging.getLogger(__name__)
+
+EVENT_LOOP_LAG = registry.register(Gauge(
+    "event_loop_lag_seconds", "Most recent event-loop lag"
+))
+EVENT_LOOP_LAG_HISTOGRAM = registry.register(Histogram(
+    "event_loop_lag_distribution_seconds", "Distribution of event-loop lag",
+    buckets=(0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0)
+))
+LOAD_SHED_REQUESTS = registry.register(Counter(
+    "load_shed_requests", "Requests rejected while the event loop was saturated", ["route"]
+))
+
+
+class LoopMonitor:
+    """Measures event-loop lag and samples stacks during stalls"""
+
+    def __init__(
+        self,
+        interval: float = 0.1,
+        warn_threshold: float = 0.2,
+        shed_threshold: float = 0.25,
+        smoothing: float = 0.3,
+        min_log_interval: float = 10.0
+    ):
+        self.interval = interval
+        self.warn_threshold = warn_threshold
+        self.shed_threshold = shed_threshold
+        self.smoothing = smoothing
+        self.min_log_interval = min_log_interval
+
+        self.lag = 0.0
+        self.smoothed_lag = 0.0
+        self._last_beat = time.monotonic()
+        self._loop_thread_id: Optional[int] = None
+        self._task: Optional[asyncio.Task] = None
+        self._watchdog: Optional[threading.Thread] = None
+        self._stopped = threading.Event()
+        self._last_stack_log = 0.0
+        self._stall_logged = False
+
+    @property
+    def saturated(self) -> bool:
+        """True while smoothed lag (or an ongoing stall) exceeds the shed threshold"""
+        if self._task is None:
+            return False
+        return max(self.smoothed_lag, self.current_stall()) > self.shed_threshold
+
+    def current_stall(self) -> float:
+        """How far the current heartbeat is overdue"""
+        return max(0.0, time.monotonic() - self._last_beat - self.interval)
+
+    def record(self, lag: float) -> None:
+        """Record one heartbeat's lag"""
+        self.lag = lag
+        self.smoothed_lag += self.smoothing * (lag - self.smoothed_lag)
+        EVENT_LOOP_LAG.set(lag)
+        EVENT_LOOP_LAG_HISTOGRAM.observe(lag)
+        if lag > self.warn_threshold:
+            logger.warning("Event loop lag", extra={
+                "sample_key": "loop.lag",
+                "lag_ms": round(lag * 1000, 1)
+            })
+
+    async def _heartbeat(self) -> None:
+        while True:
+            start = time.monotonic()
+            await asyncio.sleep(self.interval)
+            now = time.monotonic()
+            self._last_beat = now
+            self._stall_logged = False
+            self.record(max(0.0, now - start - self.interval))
+
+    def _watch(self) -> None:
+        while not self._stopped.wait(self.interval):
+            stall = self.current_stall()
+            if stall > self.warn_threshold and not self._stall_logged:
+                self._stall_logged = True
+                now = time.monotonic()
+                if now - self._last_stack_log >= self.min_log_interval:
+                    self._last_stack_log = now
+                    self._log_stack(stall)
+
+    def _log_stack(self, stall: float) -> None:
+        """Log where the loop thread is stuck right now"""
+        frame = sys._current_frames().get(self._loop_thread_id)
+        if frame is None:
+            return
+        stack = "".join(traceback.format_stack(frame))
+        logger.warning("Event loop stalled", extra={
+            "stall_ms": round(stall * 1000, 1),
+            "stack": stack
+        })
+
+    def start(self) -> None:
+        """Start the heartbeat task and watchdog thread (call from the loop)"""
+        if self._task is not None:
+            return
+        self._loop_thread_id = threading.get_ident()
+        self._last_beat = time.monotonic()
+        self._stopped.clear()
+        self._task = asyncio.get_running_loop().create_task(self._heartbeat())
+        self._watchdog = threading.Thread(target=self._watch, name="loop-watchdog", daemon=True)
+        self._watchdog.start()
+
+    async def stop(self) -> None:
+        """Stop monitoring"""
+        self._stopped.set()
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+
+loop_monitor = LoopMonitor(
+    interval=settings.LOOP_MONITOR_INTERVAL_MS / 1000,
+    warn_threshold=settings.LOOP_LAG_WARN_MS / 1000,
+    shed_threshold=settings.LOAD_SHED_LAG_MS / 1000,
+)
+
+
+class LoadSheddingMiddleware:
+    """
+    Reject new low-priority requests with 503 while the loop is saturated
+
+    Only paths starting with one of LOAD_SHED_PATHS are shed, so chat
+    turns and open streams keep being served.
+    """
+
+    def __init__(self, app, monitor: LoopMonitor = loop_monitor):
+        self.app = app
+        self.monitor = monitor
+        self.prefixes = tuple(p for p in settings.LOAD_SHED_PATHS if p)
+        self.retry_after = str(settings.LOAD_SHED_RETRY_AFTER).encode()
+
+    async def __call__(self, scope, receive, send):
+        if (
+            scope["type"] == "http"
+            and scope["path"].startswith(self.prefixes)
+            and self.monitor.saturated
+        ):
+            prefix = next(p for p in self.prefixes if scope["path"].startswith(p))
+            LOAD_SHED_REQUESTS.labels(prefix).inc()
+            await send({
+                "type": "http.response.start",
+                "status": 503,
+                "headers": [
+                    (b"content-type", b"application/json"),
+                    (b"retry-after", self.retry_after),
+                ],
+            })
+            await send({
+                "type": "http.response.body",
+                "body": b'{"detail":"Server is busy, please retry shortly"}',
+            })
+            return
+
+        await self.app(scope, receive, send)
@@ -0,0 +1,440 @@
+"""
+Prometheus-style metrics for HTTP, LLM and database hot paths
+
+A small in-process registry rendered in the Prometheus text format at
+/metrics. Label children are cached per label tuple and histograms use a
+fixed bucket list, so observing a value allocates nothing. Everything is
+a no-op when METRICS_ENABLED is false.
+"""
+import time
+from bisect import bisect_left
+from contextlib import contextmanager
+from typing import Dict, Iterable, List, Sequence, Tuple
+
+from ..config import settings
+
+# Bucket presets (upper bounds)
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0)
+DB_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 5.0)
+TOKEN_BUCKETS = (16, 32, 64, 128, 256, 512, 1024, 2048, 4096, 8192, 16384)
+RATE_BUCKETS = (5, 10, 20, 40, 60, 80, 100, 150, 200, 300, 500)
+
+
+def _format_labels(names: Sequence[str], values: Sequence[str], extra: str = "") -> str:
+    pairs = [f'{name}="{_escape(value)}"' for name, value in zip(names, values)]
+    if extra:
+        pairs.append(extra)
+    return "{" + ",".join(pairs) + "}" if pairs else ""
+
+
+def _escape(value: str) -> str:
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+class _Metric:
+    """Base class for labelled metrics"""
+    type_name = ""
+
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = ()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._children: Dict[Tuple[str, ...], object] = {}
+        if not self.labelnames:
+            self._children[()] = self._new_child()
+
+    def _new_child(self):
+        raise NotImplementedError
+
+    def labels(self, *values: str):
+        """Get the child for a label combination (cached)"""
+        child = self._children.get(values)
+        if child is None:
+            child = self._children[values] = self._new_child()
+        return child
+
+    @property
+    def family_name(self) -> str:
+        """Name on the HELP/TYPE lines, matching the sample names"""
+        return self.name
+
+    def _samples(self) -> Iterable[str]:
+        raise NotImplementedError
+
+    def render(self) -> List[str]:
+        lines = [f"# HELP {self.family_name} {self.documentation}", f"# TYPE {self.family_name} {self.type_name}"]
+        lines.extend(self._samples())
+        return lines
+
+
+class _CounterChild:
+    __slots__ = ("value",)
+
+    def __init__(self):
+        self.value = 0.0
+
+    def inc(self, amount: float = 1.0) -> None:
+        if registry.enabled:
+            self.value += amount
+
+
+class Counter(_Metric):
+    """Monotonically increasing counter"""
+    type_name = "counter"
+
+    def _new_child(self):
+        return _CounterChild()
+
+    def inc(self, amount: float = 1.0) -> None:
+        self._children[()].inc(amount)
+
+    @property
+    def family_name(self) -> str:
+        return f"{self.name}_total"
+
+    def _samples(self):
+        for values, child in self._children.items():
+            yield f"{self.family_name}{_format_labels(self.labelnames, values)} {child.value}"
+
+
+class _GaugeChild:
+    __slots__ = ("value",)
+
+    def __init__(self):
+        self.value = 0.0
+
+    def set(self, value: float) -> None:
+        if registry.enabled:
+            self.value = value
+
+    def inc(self, amount: float = 1.0) -> None:
+        if registry.enabled:
+            self.value += amount
+
+    def dec(self, amount: float = 1.0) -> None:
+        if registry.enabled:
+            self.value -= amount
+
+    @contextmanager
+    def track_inprogress(self):
+        """Increment while the block runs"""
+        self.inc()
+        try:
+            yield
+        finally:
+            self.dec()
+
+
+class Gauge(_Metric):
+    """Value that can go up and down"""
+    type_name = "gauge"
+
+    def _new_child(self):
+        return _GaugeChild()
+
+    def set(self, value: float) -> None:
+        self._children[()].set(value)
+
+    def _samples(self):
+        for values, child in self._children.items():
+            yield f"{self.name}{_format_labels(self.labelnames, values)} {child.value}"
+
+
+class _HistogramChild:
+    __slots__ = ("bounds", "counts", "sum", "count")
+
+    def __init__(self, bounds: Tuple[float, ...]):
+        self.bounds = bounds
+        self.counts = [0] * (len(bounds) + 1)
+        self.sum = 0.0
+        self.count = 0
+
+    def observe(self, value: float) -> None:
+        if registry.enabled:
+            self.counts[bisect_left(self.bounds, value)] += 1
+            self.sum += value
+            self.count += 1
+
+    @contextmanager
+    def time(self):
+        """Observe the duration of the block in seconds"""
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(time.perf_counter() - start)
+
+
+class Histogram(_Metric):
+    """Distribution of observed values in fixed buckets"""
+    type_name = "histogram"
+
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = (),
+                 buckets: Sequence[float] = LATENCY_BUCKETS):
+        self.buckets = tuple(sorted(buckets))
+        super().__init__(name, documentation, labelnames)
+
+    def _new_child(self):
+        return _HistogramChild(self.buckets)
+
+    def observe(self, value: float) -> None:
+        self._children[()].observe(value)
+
+    def _samples(self):
+        for values, child in self._children.items():
+            cumulative = 0
+            for bound, count in zip(self.buckets + (float("inf"),), child.counts):
+                cumulative += count
+                le = 'le="+Inf"' if bound == float("inf") else f'le="{float(bound)!r}"'
+                yield f"{self.name}_bucket{_format_labels(self.labelnames, values, le)} {cumulative}"
+            yield f"{self.name}_sum{_format_labels(self.labelnames, values)} {child.sum}"
+            yield f"{self.name}_count{_format_labels(self.labelnames, values)} {child.count}"
+
+
+class Registry:
+    """Collection of metrics rendered together"""
+
+    def __init__(self, enabled: bool = True):
+        self.enabled = enabled
+        self._metrics: List[_Metric] = []
+        self._collectors = []
+
+    def register(self, metric: _Metric) -> _Metric:
+        self._metrics.append(metric)
+        return metric
+
+    def add_collector(self, collector) -> None:
+        """Register a callable run before each render to refresh gauges"""
+        self._collectors.append(collector)
+
+    def render(self) -> str:
+        for collector in self._collectors:
+            collector()
+        lines = []
+        for metric in self._metrics:
+            lines.extend(metric.render())
+        return "\n".join(lines) + "\n"
+
+
+registry = Registry(enabled=settings.METRICS_ENABLED)
+
+# HTTP
+HTTP_REQUEST_DURATION = registry.register(Histogram(
+    "http_request_duration_seconds", "HTTP request latency by route",
+    ["method", "route", "status"]
+))
+SSE_STREAMS_IN_FLIGHT = registry.register(Gauge(
+    "sse_streams_in_flight", "Server-sent event streams currently open", ["route"]
+))
+
+# LLM
+LLM_REQUEST_DURATION = registry.register(Histogram(
+    "llm_request_duration_seconds", "Total LLM call duration",
+    ["provider", "model", "operation"]
+))
+LLM_TIME_TO_FIRST_TOKEN = registry.register(Histogram(
+    "llm_time_to_first_token_seconds", "Time until the first streamed token",
+    ["provider", "model", "operation"]
+))
+LLM_TOKENS_PER_SECOND = registry.register(Histogram(
+    "llm_tokens_per_second", "Completion tokens per second after the first token",
+    ["provider", "model"], buckets=RATE_BUCKETS
+))
+LLM_PROMPT_TOKENS = registry.register(Histogram(
+    "llm_prompt_tokens", "Prompt tokens per LLM call",
+    ["provider", "model", "operation"], buckets=TOKEN_BUCKETS
+))
+LLM_COMPLETION_TOKENS = registry.register(Histogram(
+    "llm_completion_tokens", "Completion tokens per LLM call",
+    ["provider", "model", "operation"], buckets=TOKEN_BUCKETS
+))
+LLM_ERRORS = registry.register(Counter(
+    "llm_errors", "Failed LLM calls", ["provider", "model", "operation"]
+))
+REPORT_GENERATION_DURATION = registry.register(Histogram(
+    "report_generation_duration_seconds", "End-to-end report generation time", ["language"]
+))
+
+# Database
+DB_QUERY_DURATION = registry.register(Histogram(
+    "db_query_duration_seconds", "Database statement execution time", buckets=DB_BUCKETS
+))
+DB_POOL_CHECKOUT_WAIT = registry.register(Histogram(
+    "db_pool_checkout_wait_seconds", "Time waiting for a pooled connection", buckets=DB_BUCKETS
+))
+DB_POOL_CONNECTIONS = registry.register(Gauge(
+    "db_pool_connections", "Pooled connections by state", ["pool", "state"]
+))
+DB_POOL_UTILIZATION = registry.register(Gauge(
+    "db_pool_utilization", "Checked-out connections as a fraction of pool size plus overflow", ["pool"]
+))
+DB_POOL_CHECKOUT_TIMEOUTS = registry.register(Counter(
+    "db_pool_checkout_timeouts", "Checkouts that gave up after DB_POOL_TIMEOUT"
+))
+
+# Caches
+CACHE_REQUESTS = registry.register(Counter(
+    "cache_requests", "Cache lookups by cache and result (hit/miss)", ["cache", "result"]
+))
+
+
+class LLMCallTimer:
+    """
+    Record timing and token usage for one LLM call
+
+    Callers mark the first token and pass the provider's usage metadata;
+    the completion token count falls back to the number of streamed chunks.
+    """
+    __slots__ = ("provider", "model", "operation", "start", "first_token_at", "chunks", "usage")
+
+    def __init__(self, provider: str, model: str, operation: str):
+        self.provider = provider
+        self.model = model
+        self.operation = operation
+        self.start = time.perf_counter()
+        self.first_token_at = None
+        self.chunks = 0
+        self.usage = None
+
+    def chunk(self) -> None:
+        """Mark a streamed content chunk"""
+        if self.first_token_at is None:
+            self.first_token_at = time.perf_counter()
+            LLM_TIME_TO_FIRST_TOKEN.labels(self.provider, self.model, self.operation).observe(
+                self.first_token_at - self.start
+            )
+        self.chunks += 1
+
+    def finish(self, usage: dict = None, error: bool = False) -> None:
+        """Record the call once it has completed or failed"""
+        if not registry.enabled:
+            return
+        end = time.perf_counter()
+        labels = (self.provider, self.model, self.operation)
+        LLM_REQUEST_DURATION.labels(*labels).observe(end - self.start)
+        if error:
+            LLM_ERRORS.labels(*labels).inc()
+            return
+
+        usage = usage or self.usage or {}
+        completion_tokens = usage.get("output_tokens") or self.chunks
+        if usage.get("input_tokens"):
+            LLM_PROMPT_TOKENS.labels(*labels).observe(usage["input_tokens"])
+            cache_read = (usage.get("input_token_details") or {}).get("cache_read")
+            if cache_read is not None:
+                CACHE_REQUESTS.labels("llm_prompt", "hit" if cache_read else "miss").inc()
+        if completion_tokens:
+            LLM_COMPLETION_TOKENS.labels(*labels).observe(completion_tokens)
+        if self.first_token_at is not None and end > self.first_token_at and completion_tokens > 1:
+            LLM_TOKENS_PER_SECOND.labels(self.provider, self.model).observe(
+                (completion_tokens - 1) / (end - self.first_token_at)
+            )
+
+
+async def track_stream(stream, route: str):
+    """Wrap an SSE body iterator so it counts as in flight while open"""
+    with SSE_STREAMS_IN_FLIGHT.labels(route).track_inprogress():
+        async for event in stream:
+            yield event
+
+
+def instrument_engine(engine) -> None:
+    """Time every statement executed on an SQLAlchemy engine"""
+    if not registry.enabled:
+        return
+
+    from sqlalchemy import event
+
+    sync_engine = getattr(engine, "sync_engine", engine)
+    query_duration = DB_QUERY_DURATION.labels()
+
+    @event.listens_for(sync_engine, "before_cursor_execute")
+    def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+        conn.info.setdefault("query_start", []).append(time.perf_counter())
+
+    @event.listens_for(sync_engine, "after_cursor_execute")
+    def _after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+        query_duration.observe(time.perf_counter() - conn.info["query_start"].pop())
+
+
+class MetricsMiddleware:
+    """ASGI middleware recording request latency per route template"""
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or not registry.enabled:
+            await self.app(scope, receive, send)
+            return
+
+        start = time.perf_counter()
+        status = 500
+
+        async def send_wrapper(message):
+            nonlocal status
+            if message["type"] == "http.response.start":
+                status = message["status"]
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            # The router stores the matched route in the scope
+            route = scope.get("route")
+            path = getattr(route, "path", None) or "unmatched"
+            HTTP_REQUEST_DURATION.labels(scope["method"], path, str(status)).observe(
+                time.perf_counter() - start
+            )
+
+
+def instrument_pool_class(pool_class):
+    """Subclass a pool class to time connection checkouts"""
+    if not registry.enabled:
+        return pool_class
+
+    checkout_wait = DB_POOL_CHECKOUT_WAIT.labels()
+    checkout_timeouts = DB_POOL_CHECKOUT_TIMEOUTS.labels()
+
+    from sqlalchemy.exc import TimeoutError as PoolTimeoutError
+
+    class InstrumentedPool(pool_class):
+        def _do_get(self):
+            start = time.perf_counter()
+            try:
+                return super()._do_get()
+            except PoolTimeoutError:
+                checkout_timeouts.inc()
+                raise
+            finally:
+                checkout_wait.observe(time.perf_counter() - start)
+
+    InstrumentedPool.__name__ = f"Instrumented{pool_class.__name__}"
+    return InstrumentedPool
+
+
+def instrument_pool(pool, name: str = "primary") -> None:
+    """Publish a QueuePool's connection counts each time metrics are rendered"""
+    if not registry.enabled or not hasattr(pool, "checkedout"):
+        return
+
+    checked_out = DB_POOL_CONNECTIONS.labels(name, "checked_out")
+    checked_in = DB_POOL_CONNECTIONS.labels(name, "checked_in")
+    overflow = DB_POOL_CONNECTIONS.labels(name, "overflow")
+    capacity = DB_POOL_CONNECTIONS.labels(name, "capacity")
+    utilization = DB_POOL_UTILIZATION.labels(name)
+
+    def collect():
+        limit = pool.size() + max(pool._max_overflow, 0)
+        checked_out.set(pool.checkedout())
+        checked_in.set(pool.checkedin())
+        overflow.set(max(pool.overflow(), 0))
+        capacity.set(limit)
+        utilization.set(pool.checkedout() / limit if limit else 0.0)
+
+    registry.add_collector(collect)
+
+
+def render_metrics() -> str:
+    """Render all metrics in the Prometheus text exposition format"""
+    return registry.render()
@@ -0,0 +1,240 @@
+"""
+On-demand CPU and memory profiling for a running worker
+
+CPU profiles are sampled from a background thread via sys._current_frames
+and memory profiles are tracemalloc snapshot diffs. Both are returned as
+collapsed stacks ("frame;frame;frame count"), which flamegraph.pl and
+speedscope read directly. Nothing runs unless a capture is in progress.
+"""
+import asyncio
+import os
+import sys
+import threading
+import time
+import tracemalloc
+from collections import Counter
+from typing import Callable, Dict, Optional
+
+# Paths shortened in frame labels
+_PATH_PREFIXES = sorted(
+    {p for p in sys.path if p} | {os.path.dirname(os.path.dirname(os.path.dirname(__file__)))},
+    key=len, reverse=True
+)
+
+
+def _short_path(path: str) -> str:
+    for prefix in _PATH_PREFIXES:
+        if path.startswith(prefix):
+            return path[len(prefix):].lstrip(os.sep)
+    return path
+
+
+def _collapse(counts: Dict[tuple, int]) -> str:
+    """Render stack counts in the collapsed stack format"""
+    return "\n".join(
+        f"{';'.join(stack)} {count}"
+        for stack, count in sorted(counts.items(), key=lambda item: -item[1])
+    ) + "\n"
+
+
+class SamplingProfiler:
+    """
+    Sample one thread's Python stack at a fixed interval
+
+    Args:
+        thread_id: Thread to sample (the event loop thread)
+        interval: Seconds between samples
+        should_sample: Optional check run before each sample, e.g. only
+            while a matching request is in flight
+    """
+
+    def __init__(self, thread_id: int, interval: float = 0.005,
+                 should_sample: Optional[Callable[[], bool]] = None):
+        self.thread_id = thread_id
+        self.interval = interval
+        self.should_sample = should_sample
+        self.counts: Counter = Counter()
+        self.samples = 0
+        self._labels: Dict[object, str] = {}
+        self._stopped = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+
+    def _label(self, code) -> str:
+        label = self._labels.get(code)
+        if label is None:
+            label = self._labels[code] = f"{code.co_name} ({_short_path(code.co_filename)}:{code.co_firstlineno})"
+        return label
+
+    def _run(self) -> None:
+        while not self._stopped.wait(self.interval):
+            if self.should_sample is not None and not self.should_sample():
+                continue
+            frame = sys._current_frames().get(self.thread_id)
+            stack = []
+            while frame is not None:
+                stack.append(self._label(frame.f_code))
+                frame = frame.f_back
+            if stack:
+                self.counts[tuple(reversed(stack))] += 1
+                self.samples += 1
+
+    def start(self) -> None:
+        self._thread = threading.Thread(target=self._run, name="cpu-profiler", daemon=True)
+        self._thread.start()
+
+    def stop(self) -> str:
+        """Stop sampling and return the collapsed stacks"""
+        self._stopped.set()
+        if self._thread is not None:
+            self._thread.join()
+        return _collapse(self.counts)
+
+
+class MemoryCapture:
+    """Record allocations made between start() and stop() with tracemalloc"""
+
+    def __init__(self, frames: int = 25):
+        self.frames = frames
+        self._started_here = False
+        self._before = None
+
+    def start(self) -> None:
+        if not tracemalloc.is_tracing():
+            tracemalloc.start(self.frames)
+            self._started_here = True
+        self._before = tracemalloc.take_snapshot()
+
+    def stop(self) -> str:
+        """Return allocations still held since start(), as collapsed stacks weighted by bytes"""
+        after = tracemalloc.take_snapshot()
+        if self._started_here:
+            tracemalloc.stop()
+
+        exclude = [tracemalloc.Filter(False, tracemalloc.__file__)]
+        stats = after.filter_traces(exclude).compare_to(self._before.filter_traces(exclude), "traceback")
+
+        counts: Counter = Counter()
+        for stat in stats:
+            if stat.size_diff <= 0:
+                continue
+            # Frames are ordered oldest first, as the collapsed format expects
+            stack = tuple(f"{_short_path(frame.filename)}:{frame.lineno}" for frame in stat.traceback)
+            counts[stack] += stat.size_diff
+        return _collapse(counts)
+
+
+class ProfileCapture:
+    """A CPU (and optionally memory) capture of the event loop thread"""
+
+    def __init__(self, memory: bool = False, interval: float = 0.005,
+                 should_sample: Optional[Callable[[], bool]] = None):
+        self.cpu = SamplingProfiler(threading.get_ident(), interval, should_sample)
+        self.memory = MemoryCapture() if memory else None
+        self.started_at = time.time()
+
+    def start(self) -> None:
+        if self.memory:
+            self.memory.start()
+        self.cpu.start()
+
+    def stop(self) -> Dict[str, object]:
+        result = {
+            "started_at": self.started_at,
+            "duration_s": round(time.time() - self.started_at, 3),
+            "samples": self.cpu.samples,
+            "cpu": self.cpu.stop(),
+        }
+        if self.memory:
+            result["memory"] = self.memory.stop()
+        return result
+
+
+class RouteProfile:
+    """Capture armed for the next K requests to a route"""
+
+    def __init__(self, route: str, requests: int, memory: bool, interval: float):
+        self.route = route
+        self.remaining = requests
+        self.requests = requests
+        self.in_flight = 0
+        self.capture = ProfileCapture(memory, interval, should_sample=lambda: self.in_flight > 0)
+
+
+class ProfilerController:
+    """Coordinates captures so only one runs per worker"""
+
+    def __init__(self):
+        self.armed: Optional[RouteProfile] = None
+        self.last_result: Optional[Dict[str, object]] = None
+        self._busy = False
+
+    @property
+    def busy(self) -> bool:
+        return self._busy
+
+    async def capture_for(self, seconds: float, memory: bool = False,
+                          interval: float = 0.005) -> Dict[str, object]:
+        """Profile the event loop for a fixed number of seconds"""
+        if self._busy:
+            raise RuntimeError("A profile capture is already running")
+        self._busy = True
+        capture = ProfileCapture(memory, interval)
+        try:
+            capture.start()
+            await asyncio.sleep(seconds)
+        finally:
+            result = capture.stop()
+            self._busy = False
+        self.last_result = result
+        return result
+
+    def arm(self, route: str, requests: int, memory: bool = False, interval: float = 0.005) -> None:
+        """Profile the next `requests` requests whose path starts with `route`"""
+        if self._busy:
+            raise RuntimeError("A profile capture is already running")
+        self._busy = True
+        self.last_result = None
+        self.armed = RouteProfile(route, requests, memory, interval)
+        self.armed.capture.start()
+
+    def request_started(self, profile: RouteProfile) -> None:
+        profile.in_flight += 1
+
+    def request_finished(self, profile: RouteProfile) -> None:
+        profile.in_flight -= 1
+        profile.remaining -= 1
+        if profile.remaining <= 0 and self.armed is profile:
+            self.armed = None
+            result = profile.capture.stop()
+            result["route"] = profile.route
+            result["requests"] = profile.requests
+            self.last_result = result
+            self._busy = False
+
+
+profiler = ProfilerController()
+
+
+class ProfilingMiddleware:
+    """
+    Track requests for route-armed captures
+
+    Only installed when PROFILING_ENABLED is set; while no capture is
+    armed it is a single attribute check per request.
+    """
+
+    def __init__(self, app, controller: ProfilerController = profiler):
+        self.app = app
+        self.controller = controller
+
+    async def __call__(self, scope, receive, send):
+        profile = self.controller.armed
+        if profile is None or scope["type"] != "http" or not scope["path"].startswith(profile.route):
+            await self.app(scope, receive, send)
+            return
+
+        self.controller.request_started(profile)
+        try:
+            await self.app(scope, receive, send)
+        finally:
+            self.controller.request_finished(profile)
@@ -0,0 +1,200 @@
+"""
+Token-bucket rate limiting with pluggable storage
+
+Each key (a user id, or a client IP for guests) has a bucket that refills
+at a steady rate up to a burst capacity. Requests take a number of tokens
+proportional to their estimated LLM cost. Buckets live in process memory
+by default; with RATE_LIMIT_BACKEND=redis they are shared by every worker
+and node through a Redis-compatible server (Redis, Valkey, KeyDB).
+"""
+import logging
+import math
+import time
+from dataclasses import dataclass
+from typing import Dict, List
+
+from ..config import settings
+from .metrics import registry, Counter
+
+logger = logging.getLogger(__name__)
+
+RATE_LIMITED_REQUESTS = registry.register(Counter(
+    "rate_limited_requests", "Requests rejected by the token-bucket rate limiter", ["route", "kind"]
+))
+RATE_LIMIT_BACKEND_ERRORS = registry.register(Counter(
+    "rate_limit_backend_errors", "Shared rate-limit backend failures (fell back to local buckets)"
+))
+
+
+@dataclass(frozen=True)
+class BucketPolicy:
+    """Burst capacity and refill rate (tokens per second) of a bucket"""
+    capacity: float
+    refill_rate: float
+
+
+@dataclass(frozen=True)
+class BucketResult:
+    """Outcome of taking tokens from a bucket"""
+    allowed: bool
+    remaining: float
+    retry_after: float
+
+
+class MemoryBucketBackend:
+    """Buckets in process memory; limits apply per worker"""
+
+    def __init__(self, max_keys: int = 100000):
+        self.max_keys = max_keys
+        # key -> [tokens, last refill time]
+        self.buckets: Dict[str, List[float]] = {}
+
+    async def take(self, key: str, cost: float, policy: BucketPolicy) -> BucketResult:
+        now = time.monotonic()
+        bucket = self.buckets.get(key)
+        if bucket is None:
+            if len(self.buckets) >= self.max_keys:
+                self._prune(now, policy)
+            bucket = self.buckets[key] = [policy.capacity, now]
+
+        tokens = min(policy.capacity, bucket[0] + (now - bucket[1]) * policy.refill_rate)
+        bucket[1] = now
+        if tokens >= cost:
+            bucket[0] = tokens - cost
+            return BucketResult(True, bucket[0], 0.0)
+        bucket[0] = tokens
+        return BucketResult(False, tokens, (cost - tokens) / policy.refill_rate)
+
+    def _prune(self, now: float, policy: BucketPolicy) -> None:
+        """Drop buckets that have refilled completely; they equal a new bucket"""
+        full_after = policy.capacity / policy.refill_rate
+        for key in [k for k, (_, updated) in self.buckets.items() if now - updated >= full_after]:
+            del self.buckets[key]
+
+    def reset(self) -> None:
+        self.buckets.clear()
+
+
+# Refill and take in one atomic step, timed by the server clock so workers
+# with skewed clocks agree. Numbers are returned as strings because Redis
+# truncates Lua numbers to integers.
+_TAKE_SCRIPT = """
+local capacity = tonumber(ARGV[1])
+local rate = tonumber(ARGV[2])
+local cost = tonumber(ARGV[3])
+local t = redis.call('TIME')
+local now = tonumber(t[1]) + tonumber(t[2]) / 1000000
+local state = redis.call('HMGET', KEYS[1], 'tokens', 'ts')
+local tokens = tonumber(state[1]) or capacity
+local ts = tonumber(state[2]) or now
+tokens = math.min(capacity, tokens + math.max(0, now - ts) * rate)
+local allowed = 0
+local retry = 0
+if tokens >= cost then
+  tokens = tokens - cost
+  allowed = 1
+else
+  retry = (cost - tokens) / rate
+end
+redis.call('HSET', KEYS[1], 'tokens', tokens, 'ts', now)
+redis.call('EXPIRE', KEYS[1], math.ceil(capacity / rate) + 1)
+return {allowed, tostring(tokens), tostring(retry)}
+"""
+
+
+class RedisBucketBackend:
+    """
+    Buckets in a Redis-compatible server, shared across workers and nodes
+
+    If the server is unreachable, requests are checked against local
+    buckets instead so an outage degrades to per-worker limits rather
+    than failing every LLM request.
+
+    Args:
+        url: Server URL, e.g. redis://localhost:6379/0
+        prefix: Key prefix for bucket hashes
+    """
+
+    def __init__(self, url: str, prefix: str = "ratelimit:"):
+        try:
+            from redis.asyncio import Redis
+        except ImportError as e:
+            raise RuntimeError("RATE_LIMIT_BACKEND=redis requires the redis package") from e
+        self.client = Redis.from_url(url)
+        self.prefix = prefix
+        self.fallback = MemoryBucketBackend()
+        self._script = self.client.register_script(_TAKE_SCRIPT)
+
+    async def take(self, key: str, cost: float, policy: BucketPolicy) -> BucketResult:
+        try:
+            allowed, remaining, retry_after = await self._script(
+                keys=[self.prefix + key],
+                args=[policy.capacity, policy.refill_rate, cost]
+            )
+        except Exception as e:
+            RATE_LIMIT_BACKEND_ERRORS.inc()
+            logger.warning("Rate limit backend unavailable, using local buckets", extra={
+                "sample_key": "rate_limit.backend_error", "error": str(e)
+            })
+            return await self.fallback.take(key, cost, policy)
+        return BucketResult(bool(int(allowed)), float(remaining), float(retry_after))
+
+    def reset(self) -> None:
+        self.fallback.reset()
+
+
+def estimate_cost(texts: List[str], base: float = 1.0) -> float:
+    """
+    Estimate the cost of an LLM request in bucket tokens
+
+    One token is a request with about a thousand prompt tokens; longer
+    histories cost proportionally more. Characters are counted at three
+    per token, which is close for CJK text and conservative for English.
+
+    Args:
+        texts: Message contents that will be sent in the prompt
+        base: Cost of the request before its prompt size (e.g. higher for reports)
+    """
+    chars = sum(len(text) for text in texts)
+    return base + chars / 3 / settings.RATE_LIMIT_TOKENS_PER_UNIT
+
+
+class RateLimiter:
+    """Token buckets for authenticated users and guests"""
+
+    def __init__(self, backend, user_policy: BucketPolicy, guest_policy: BucketPolicy):
+        self.backend = backend
+        self.user_policy = user_policy
+        self.guest_policy = guest_policy
+
+    async def hit(self, key: str, cost: float, guest: bool = False) -> BucketResult:
+        """
+        Take `cost` tokens from a key's bucket
+
+        Costs above the burst capacity are capped to it, so a single large
+        request is slowed down rather than rejected forever.
+        """
+        policy = self.guest_policy if guest else self.user_policy
+        return await self.backend.take(key, min(cost, policy.capacity), policy)
+
+
+def create_backend():
+    """Bucket storage from RATE_LIMIT_BACKEND"""
+    if settings.RATE_LIMIT_BACKEND == "redis":
+        return RedisBucketBackend(settings.RATE_LIMIT_REDIS_URL)
+    return MemoryBucketBackend()
+
+
+def retry_after_header(result: BucketResult) -> str:
+    return str(max(1, math.ceil(result.retry_after)))
+
+
+rate_limiter = RateLimiter(
+    create_backend(),
+    user_policy=BucketPolicy(
+        settings.RATE_LIMIT_CAPACITY, settings.RATE_LIMIT_REFILL_PER_MINUTE / 60
+    ),
+    guest_policy=BucketPolicy(
+        settings.RATE_LIMIT_GUEST_CAPACITY, settings.RATE_LIMIT_GUEST_REFILL_PER_MINUTE / 60
+    ),
+)
@@ -0,0 +1,66 @@
+"""
+Fast JSON serialization for API and SSE responses
+
+Uses orjson when it is installed and falls back to the standard library
+otherwise. Both produce compact UTF-8 without escaping non-ASCII text, so
+Japanese and Chinese transcripts are sent as-is.
+"""
+import json
+from datetime import date, datetime
+from decimal import Decimal
+from typing import Any
+from uuid import UUID
+
+from fastapi.responses import JSONResponse
+from pydantic import BaseModel
+
+try:
+    import orjson
+except ImportError:  # pragma: no cover - exercised only without orjson
+    orjson = None
+
+BACKEND = "orjson" if orjson is not None else "json"
+
+
+def _default(obj: Any) -> Any:
+    """Encode types neither backend handles natively"""
+    if isinstance(obj, BaseModel):
+        return obj.model_dump(mode="json")
+    if isinstance(obj, Decimal):
+        return float(obj)
+    if isinstance(obj, (datetime, date)):
+        return obj.isoformat()
+    if isinstance(obj, UUID):
+        return str(obj)
+    if isinstance(obj, (set, frozenset)):
+        return list(obj)
+    raise TypeError(f"Object of type {type(obj).__name__} is not JSON serializable")
+
+
+if orjson is not None:
+    # Aware UTC datetimes end in "Z", as in Pydantic's output
+    _OPTIONS = orjson.OPT_NON_STR_KEYS | orjson.OPT_UTC_Z
+
+    def dumps(obj: Any) -> bytes:
+        """Serialize to compact UTF-8 JSON bytes"""
+        return orjson.dumps(obj, default=_default, option=_OPTIONS)
+
+    loads = orjson.loads
+else:
+    def dumps(obj: Any) -> bytes:
+        """Serialize to compact UTF-8 JSON bytes"""
+        return json.dumps(obj, ensure_ascii=False, separators=(",", ":"), default=_default).encode("utf-8")
+
+    loads = json.loads
+
+
+def sse_event(payload: Any) -> bytes:
+    """Encode one server-sent event: data: {JSON}\\n\\n"""
+    return b"data: " + dumps(payload) + b"\n\n"
+
+
+class FastJSONResponse(JSONResponse):
+    """JSONResponse rendered with the fast backend"""
+
+    def render(self, content: Any) -> bytes:
+        return dumps(content)
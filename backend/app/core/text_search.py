@@ -0,0 +1,122 @@
+"""
+Tokenization for conversation search
+
+Postgres' text search parsers split on spaces, which Japanese and Chinese
+do not use, so documents are tokenized here and stored with the 'simple'
+configuration. Runs of CJK characters become overlapping bigrams (plus the
+run's last character, so single-character queries can prefix-match);
+other scripts become lowercased words. Queries are tokenized the same way
+and each term becomes a phrase of its tokens, so ラーメン matches
+ラー <-> ーメ <-> メン.
+"""
+import re
+import unicodedata
+from typing import Iterable, List, Optional
+
+# Han, kana (including the long vowel mark) and Hangul
+_CJK = "぀-ヿ㐀-䶿一-鿿豈-﫿가-힯ｦ-ﾟ"
+_TOKEN_RUN = re.compile(rf"[{_CJK}]+|[^\W_]+")
+_CJK_RUN = re.compile(rf"^[{_CJK}]+$")
+
+# tsvector lexemes are limited to 2047 bytes; ignore anything silly
+_MAX_WORD = 100
+# Keep stored documents well under the 1 MB tsvector limit
+MAX_DOCUMENT_CHARS = 200_000
+
+
+def normalize(text: str) -> str:
+    """NFKC (full-width to half-width, compatibility forms) and lowercase"""
+    return unicodedata.normalize("NFKC", text).lower()
+
+
+def _run_tokens(run: str, trailing_unigram: bool) -> List[str]:
+    if not _CJK_RUN.match(run):
+        return [run[:_MAX_WORD]]
+    if len(run) == 1:
+        return [run]
+    tokens = [run[i:i + 2] for i in range(len(run) - 1)]
+    if trailing_unigram:
+        tokens.append(run[-1])
+    return tokens
+
+
+def tokenize(text: str) -> List[str]:
+    """Document tokens in order"""
+    tokens = []
+    for run in _TOKEN_RUN.findall(normalize(text)):
+        tokens.extend(_run_tokens(run, trailing_unigram=True))
+    return tokens
+
+
+def search_document(texts: Iterable[str]) -> str:
+    """
+    Space-separated tokens of all texts, ready for to_tsvector('simple', ...)
+    """
+    document = " ".join(" ".join(tokenize(text)) for text in texts if text)
+    return document[:MAX_DOCUMENT_CHARS]
+
+
+def message_texts(messages: Optional[list]) -> List[str]:
+    """Searchable text of stored messages"""
+    return [
+        m.get("content", "") for m in messages or []
+        if isinstance(m, dict) and isinstance(m.get("content"), str)
+    ]
+
+
+def report_texts(report_data: Optional[dict]) -> List[str]:
+    """Searchable text of a stored report's findings"""
+    if not isinstance(report_data, dict):
+        return []
+    texts = []
+    for section in ("grammar_errors", "vocabulary_issues", "naturalness"):
+        for item in report_data.get(section) or []:
+            if isinstance(item, dict):
+                texts.extend(v for v in item.values() if isinstance(v, str))
+    texts.extend(f for f in report_data.get("positive_feedback") or [] if isinstance(f, str))
+    return texts
+
+
+def query_terms(query: str) -> List[str]:
+    """Whitespace-separated terms of a search query, normalized"""
+    return [term for term in normalize(query).split() if _TOKEN_RUN.search(term)]
+
+
+def build_tsquery(query: str, max_terms: int = 8) -> Optional[str]:
+    """
+    to_tsquery('simple', ...) text for a user query: all terms must match
+
+    Returns:
+        None if the query has nothing searchable
+    """
+    phrases = []
+    for term in query_terms(query)[:max_terms]:
+        tokens = []
+        for run in _TOKEN_RUN.findall(term):
+            tokens.extend(_run_tokens(run, trailing_unigram=False))
+        # Tokens are letters and digits only, so quoting is all that is needed
+        quoted = [f"'{token}'" for token in tokens]
+        if len(tokens) == 1 and _CJK_RUN.match(tokens[0]) and len(tokens[0]) == 1:
+            quoted = [f"'{tokens[0]}':*"]
+        phrase = " <-> ".join(quoted)
+        phrases.append(f"({phrase})" if len(quoted) > 1 else phrase)
+    return " & ".join(phrases) or None
+
+
+def make_snippet(text: Optional[str], query: str, width: int = 60) -> Optional[str]:
+    """
+    Excerpt of `text` around the first query term, with ellipses if cut
+    """
+    if not text:
+        return None
+    folded = normalize(text)
+    # NFKC can change lengths; fall back to the start if offsets would drift
+    position = -1
+    if len(folded) == len(text):
+        positions = [folded.find(term) for term in query_terms(query)]
+        position = min((p for p in positions if p >= 0), default=-1)
+    start = max(0, position - width // 2) if position >= 0 else 0
+    end = min(len(text), start + width * 2)
+    start = max(0, min(start, end - width * 2))
+    snippet = text[start:end].strip()
+    return ("…" if start > 0 else "") + snippet + ("…" if end < len(text) else "")
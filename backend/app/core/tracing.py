@@ -0,0 +1,377 @@
+"""
+Lightweight request tracing with spans across auth, DB and LLM stages
+
+Spans are tracked with a context variable and exported in batches from a
+background thread, either as JSON lines to a local file or as OTLP/JSON
+to a collector. Sampling is decided once per trace at the root span.
+"""
+import atexit
+import functools
+import json
+import queue
+import random
+import threading
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Any, Dict, List, Optional
+
+from ..config import settings
+
+
+class Span:
+    """A timed operation within a trace"""
+    __slots__ = ("name", "trace_id", "span_id", "parent_id", "sampled",
+                 "start_ns", "end_ns", "attributes", "status", "error")
+
+    def __init__(self, name: str, trace_id: str, parent_id: Optional[str], sampled: bool,
+                 attributes: Optional[Dict[str, Any]] = None):
+        self.name = name
+        self.trace_id = trace_id
+        self.span_id = f"{random.getrandbits(64):016x}"
+        self.parent_id = parent_id
+        self.sampled = sampled
+        self.start_ns = time.time_ns()
+        self.end_ns = None
+        self.attributes = dict(attributes) if (attributes and sampled) else {}
+        self.status = "ok"
+        self.error = None
+
+    def set_attribute(self, key: str, value: Any) -> None:
+        if self.sampled and value is not None:
+            self.attributes[key] = value
+
+    def set_attributes(self, attributes: Dict[str, Any]) -> None:
+        for key, value in attributes.items():
+            self.set_attribute(key, value)
+
+    def record_error(self, error: BaseException) -> None:
+        self.status = "error"
+        self.error = f"{type(error).__name__}: {error}"
+
+    def end(self) -> None:
+        """Finish the span and hand it to the exporter (once)"""
+        if self.end_ns is not None:
+            return
+        self.end_ns = time.time_ns()
+        if self.sampled:
+            tracer.processor.submit(self)
+
+    @property
+    def duration_ms(self) -> float:
+        end = self.end_ns or time.time_ns()
+        return (end - self.start_ns) / 1e6
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            "name": self.name,
+            "trace_id": self.trace_id,
+            "span_id": self.span_id,
+            "parent_id": self.parent_id,
+            "start_ns": self.start_ns,
+            "end_ns": self.end_ns,
+            "duration_ms": round(self.duration_ms, 3),
+            "status": self.status,
+            "error": self.error,
+            "attributes": self.attributes,
+        }
+
+
+class _NoopSpan:
+    """Span returned when tracing is disabled"""
+    trace_id = None
+    span_id = None
+    sampled = False
+
+    def set_attribute(self, key, value):
+        pass
+
+    def set_attributes(self, attributes):
+        pass
+
+    def record_error(self, error):
+        pass
+
+    def end(self):
+        pass
+
+
+NOOP_SPAN = _NoopSpan()
+
+_current_span: ContextVar[Optional[Span]] = ContextVar("current_span", default=None)
+
+
+def current_span():
+    """The active span in this context, if any"""
+    return _current_span.get() or NOOP_SPAN
+
+
+class FileSpanExporter:
+    """Append finished spans to a file, one JSON object per line"""
+
+    def __init__(self, path: str):
+        self.path = path
+
+    def export(self, spans: List[Span]) -> None:
+        with open(self.path, "a", encoding="utf-8") as f:
+            for span in spans:
+                f.write(json.dumps(span.to_dict(), ensure_ascii=False) + "\n")
+
+
+class OTLPHttpSpanExporter:
+    """Send finished spans to an OTLP/HTTP collector as JSON"""
+
+    def __init__(self, endpoint: str, service_name: str = "linguaecho-api"):
+        self.endpoint = endpoint
+        self.service_name = service_name
+
+    @staticmethod
+    def _attribute(key: str, value: Any) -> Dict[str, Any]:
+        if isinstance(value, bool):
+            return {"key": key, "value": {"boolValue": value}}
+        if isinstance(value, int):
+            return {"key": key, "value": {"intValue": str(value)}}
+        if isinstance(value, float):
+            return {"key": key, "value": {"doubleValue": value}}
+        return {"key": key, "value": {"stringValue": str(value)}}
+
+    def _span(self, span: Span) -> Dict[str, Any]:
+        data = {
+            "traceId": span.trace_id,
+            "spanId": span.span_id,
+            "name": span.name,
+            "kind": 1,
+            "startTimeUnixNano": str(span.start_ns),
+            "endTimeUnixNano": str(span.end_ns),
+            "attributes": [self._attribute(k, v) for k, v in span.attributes.items()],
+            "status": {"code": 2, "message": span.error} if span.status == "error" else {"code": 1},
+        }
+        if span.parent_id:
+            data["parentSpanId"] = span.parent_id
+        return data
+
+    def export(self, spans: List[Span]) -> None:
+        import httpx
+
+        payload = {
+            "resourceSpans": [{
+                "resource": {"attributes": [self._attribute("service.name", self.service_name)]},
+                "scopeSpans": [{
+                    "scope": {"name": "app.core.tracing"},
+                    "spans": [self._span(span) for span in spans],
+                }],
+            }]
+        }
+        httpx.post(self.endpoint, json=payload, timeout=5.0)
+
+
+class BatchSpanProcessor:
+    """Queue finished spans and export them in batches off the event loop"""
+
+    def __init__(self, exporter=None, max_batch: int = 256, interval: float = 2.0,
+                 max_queue: int = 10000):
+        self.exporter = exporter
+        self.max_batch = max_batch
+        self.interval = interval
+        self._queue: queue.Queue = queue.Queue(maxsize=max_queue)
+        self._thread: Optional[threading.Thread] = None
+        self._lock = threading.Lock()
+        self.dropped = 0
+
+    def submit(self, span: Span) -> None:
+        if self.exporter is None:
+            return
+        if self._thread is None:
+            self._start()
+        try:
+            self._queue.put_nowait(span)
+        except queue.Full:
+            self.dropped += 1
+
+    def _start(self) -> None:
+        with self._lock:
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._run, name="span-exporter", daemon=True)
+                self._thread.start()
+                atexit.register(self.flush)
+
+    def _drain(self) -> List[Span]:
+        batch = []
+        while len(batch) < self.max_batch:
+            try:
+                batch.append(self._queue.get_nowait())
+            except queue.Empty:
+                break
+        return batch
+
+    def _export(self, batch: List[Span]) -> None:
+        try:
+            self.exporter.export(batch)
+        except Exception:
+            # Tracing must never break request handling
+            self.dropped += len(batch)
+
+    def _run(self) -> None:
+        while True:
+            try:
+                first = self._queue.get(timeout=self.interval)
+            except queue.Empty:
+                continue
+            self._export([first] + self._drain())
+
+    def flush(self) -> None:
+        """Export everything still queued (called at exit and in tests)"""
+        while True:
+            batch = self._drain()
+            if not batch:
+                return
+            self._export(batch)
+
+
+def _build_exporter():
+    if settings.TRACE_EXPORTER == "otlp":
+        return OTLPHttpSpanExporter(settings.TRACE_OTLP_ENDPOINT)
+    return FileSpanExporter(settings.TRACE_FILE)
+
+
+class Tracer:
+    """Creates spans and makes sampling decisions"""
+
+    def __init__(self, enabled: bool, sample_rate: float, processor: BatchSpanProcessor):
+        self.enabled = enabled
+        self.sample_rate = sample_rate
+        self.processor = processor
+
+    def _new_span(self, name: str, parent=None, attributes: Optional[Dict[str, Any]] = None,
+                  trace_id: Optional[str] = None, sampled: Optional[bool] = None) -> Span:
+        if parent is None:
+            parent = _current_span.get()
+        if parent is not None and parent is not NOOP_SPAN:
+            return Span(name, parent.trace_id, parent.span_id, parent.sampled, attributes)
+        if sampled is None:
+            sampled = random.random() < self.sample_rate
+        return Span(name, trace_id or f"{random.getrandbits(128):032x}", None, sampled, attributes)
+
+    def start_span(self, name: str, parent=None, attributes: Optional[Dict[str, Any]] = None):
+        """
+        Start a span without activating it
+
+        Use this for spans that stay open across `yield` in a generator;
+        the caller must call span.end().
+        """
+        if not self.enabled:
+            return NOOP_SPAN
+        return self._new_span(name, parent, attributes)
+
+    @contextmanager
+    def span(self, name: str, parent=None, attributes: Optional[Dict[str, Any]] = None,
+             trace_id: Optional[str] = None, sampled: Optional[bool] = None):
+        """
+        Start a span, make it current for the block and end it afterwards
+
+        Args:
+            name: Span name, e.g. "db.get_conversation_by_session_id"
+            parent: Explicit parent span (defaults to the current span)
+            attributes: Initial span attributes
+            trace_id: Trace to join for root spans (from an incoming traceparent)
+            sampled: Sampling decision for root spans (defaults to TRACE_SAMPLE_RATE)
+        """
+        if not self.enabled:
+            yield NOOP_SPAN
+            return
+
+        span = self._new_span(name, parent, attributes, trace_id, sampled)
+        token = _current_span.set(span)
+        try:
+            yield span
+        except BaseException as e:
+            span.record_error(e)
+            raise
+        finally:
+            try:
+                _current_span.reset(token)
+            except ValueError:
+                # Generator closed from another context (client disconnect)
+                _current_span.set(None)
+            span.end()
+
+
+tracer = Tracer(
+    enabled=settings.TRACING_ENABLED,
+    sample_rate=settings.TRACE_SAMPLE_RATE,
+    processor=BatchSpanProcessor(_build_exporter() if settings.TRACING_ENABLED else None),
+)
+
+
+def traced(name: str):
+    """Decorator wrapping an async function in a span"""
+    def decorator(func):
+        @functools.wraps(func)
+        async def wrapper(*args, **kwargs):
+            if not tracer.enabled:
+                return await func(*args, **kwargs)
+            with tracer.span(name):
+                return await func(*args, **kwargs)
+        return wrapper
+    return decorator
+
+
+def _parse_traceparent(header: Optional[str]):
+    """Parse a W3C traceparent header into (trace_id, parent_span_id, sampled)"""
+    if not header:
+        return None
+    parts = header.split("-")
+    if len(parts) != 4 or len(parts[1]) != 32 or len(parts[2]) != 16:
+        return None
+    return parts[1], parts[2], parts[3] == "01"
+
+
+class _RemoteParent:
+    """Parent span from an incoming traceparent header"""
+    __slots__ = ("trace_id", "span_id", "sampled")
+
+    def __init__(self, trace_id: str, span_id: str, sampled: bool):
+        self.trace_id = trace_id
+        self.span_id = span_id
+        self.sampled = sampled
+
+
+class TracingMiddleware:
+    """ASGI middleware opening a root span for each HTTP request"""
+
+    def __init__(self, app):
+        self.app = app
+        self.excluded = set(settings.TRACE_EXCLUDE_PATHS)
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or not tracer.enabled or scope["path"] in self.excluded:
+            await self.app(scope, receive, send)
+            return
+
+        parent = None
+        for key, value in scope.get("headers", ()):
+            if key == b"traceparent":
+                remote = _parse_traceparent(value.decode("latin-1"))
+                if remote:
+                    parent = _RemoteParent(*remote)
+                break
+
+        status = 500
+
+        async def send_wrapper(message):
+            nonlocal status
+            if message["type"] == "http.response.start":
+                status = message["status"]
+            await send(message)
+
+        with tracer.span(f"{scope['method']} {scope['path']}", parent=parent) as span:
+            span.set_attribute("http.method", scope["method"])
+            span.set_attribute("http.target", scope["path"])
+            try:
+                await self.app(scope, receive, send_wrapper)
+            finally:
+                route = scope.get("route")
+                if route is not None:
+                    span.name = f"{scope['method']} {route.path}"
+                    span.set_attribute("http.route", route.path)
+                span.set_attribute("http.status_code", status)
@@ -2,12 +2,26 @@ from .user import get_user_by_id, get_user_by_email, create_user, authenticate_u
 from .conversation import (
     create_conversation,
     get_conversation_by_session_id,
+    get_conversation_version,
+    get_existing_session_ids,
+    save_conversation_messages,
     get_user_conversations,
+    get_user_conversation_versions,
     update_conversation_messages,
     delete_conversation,
+    delete_user_conversations,
     create_report,
     get_report_by_conversation_id
 )
+from .archive import (
+    get_archived_conversation,
+    get_archivable_conversations,
+    archive_conversations,
+    ensure_archive_partitions,
+    drop_archive_partitions_before
+)
+from .progress import get_user_progress, record_report_progress
+from .usage import insert_usage_records, get_user_tokens_since, get_usage_by_scenario
 
 __all__ = [
     "get_user_by_id",
@@ -16,9 +30,24 @@ __all__ = [
     "authenticate_user",
     "create_conversation",
     "get_conversation_by_session_id",
+    "get_conversation_version",
+    "get_existing_session_ids",
+    "save_conversation_messages",
     "get_user_conversations",
+    "get_user_conversation_versions",
     "update_conversation_messages",
     "delete_conversation",
+    "delete_user_conversations",
     "create_report",
-    "get_report_by_conversation_id"
+    "get_report_by_conversation_id",
+    "get_archived_conversation",
+    "get_archivable_conversations",
+    "archive_conversations",
+    "ensure_archive_partitions",
+    "drop_archive_partitions_before",
+    "get_user_progress",
+    "record_report_progress",
+    "insert_usage_records",
+    "get_user_tokens_since",
+    "get_usage_by_scenario"
 ]
@@ -0,0 +1,186 @@
+"""
+CRUD operations for background account deletion
+
+A deletion request blocks sign-in and records an account_deletions row.
+The deletion job then removes the user's rows in batches of one short
+transaction each, so no statement holds locks on a large range, and
+finally deletes the user row itself with whatever was created meanwhile.
+"""
+from datetime import datetime
+from typing import Optional
+from uuid import UUID
+
+from sqlalchemy import and_, delete, func, or_, select, tuple_, update
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from ..core.tracing import traced
+from ..db.dialect import IS_SQLITE, insert
+from ..db.models import (
+    AccountDeletion,
+    Conversation,
+    ConversationArchive,
+    LearnerTerm,
+    ProgressAggregate,
+    UsageRecord,
+    User,
+)
+from .conversation import delete_conversations
+
+# Per-user tables emptied batch by batch before the user row is deleted
+USER_TABLES = (ConversationArchive, LearnerTerm, ProgressAggregate, UsageRecord)
+
+
+async def request_account_deletion(db: AsyncSession, user_id: UUID) -> AccountDeletion:
+    """
+    Block sign-in and queue the account for deletion (idempotent)
+
+    Returns:
+        The account's deletion row
+    """
+    now = datetime.utcnow()
+    await db.execute(
+        update(User)
+        .where(User.id == user_id, User.deletion_requested_at.is_(None))
+        .values(deletion_requested_at=now)
+    )
+    live = select(func.count()).select_from(Conversation).where(Conversation.user_id == user_id)
+    archived = select(func.count()).select_from(ConversationArchive).where(ConversationArchive.user_id == user_id)
+    await db.execute(
+        insert(AccountDeletion)
+        .values(
+            user_id=user_id,
+            status="pending",
+            total_conversations=live.scalar_subquery() + archived.scalar_subquery(),
+            requested_at=now,
+            updated_at=now,
+        )
+        .on_conflict_do_nothing()
+    )
+    return await get_account_deletion(db, user_id)
+
+
+@traced("db.get_account_deletion")
+async def get_account_deletion(db: AsyncSession, user_id: UUID) -> Optional[AccountDeletion]:
+    """
+    Get the deletion row of an account, if deletion was requested
+    """
+    result = await db.execute(select(AccountDeletion).where(AccountDeletion.user_id == user_id))
+    return result.scalar_one_or_none()
+
+
+async def claim_account_deletion(db: AsyncSession, stale_before: datetime) -> Optional[UUID]:
+    """
+    Take the oldest pending deletion, or a running one whose worker stopped
+    reporting progress before `stale_before`
+
+    SKIP LOCKED lets several workers claim different deletions at once.
+
+    Returns:
+        The claimed user id
+    """
+    claimable = (
+        select(AccountDeletion.user_id)
+        .where(or_(
+            AccountDeletion.status == "pending",
+            and_(AccountDeletion.status == "running", AccountDeletion.updated_at < stale_before),
+        ))
+        .order_by(AccountDeletion.requested_at)
+        .limit(1)
+        .with_for_update(skip_locked=True)
+    )
+    now = datetime.utcnow()
+    result = await db.execute(
+        update(AccountDeletion)
+        .where(AccountDeletion.user_id == claimable.scalar_subquery())
+        .values(
+            status="running",
+            started_at=func.coalesce(AccountDeletion.started_at, now),
+            updated_at=now,
+        )
+        .returning(AccountDeletion.user_id)
+    )
+    return result.scalar_one_or_none()
+
+
+async def record_deletion_progress(
+    db: AsyncSession,
+    user_id: UUID,
+    conversations: int = 0,
+    error: Optional[str] = None
+) -> None:
+    """
+    Count deleted conversations and renew the claim on a running deletion
+    """
+    await db.execute(
+        update(AccountDeletion)
+        .where(AccountDeletion.user_id == user_id)
+        .values(
+            deleted_conversations=AccountDeletion.deleted_conversations + conversations,
+            updated_at=datetime.utcnow(),
+            error=error,
+        )
+    )
+
+
+async def delete_conversation_batch(db: AsyncSession, user_id: UUID, limit: Optional[int]) -> int:
+    """
+    Delete up to `limit` (None: all) of a user's live conversations with their reports
+
+    Returns:
+        Number deleted
+    """
+    ids = select(Conversation.id).where(Conversation.user_id == user_id).limit(limit).with_for_update()
+    if IS_SQLITE:
+        # One writer at a time, so the batch cannot change before it is deleted
+        ids = list((await db.execute(ids)).scalars().all())
+    else:
+        batch = ids.cte("batch")
+        ids = select(batch.c.id)
+    # The account's progress aggregates are deleted with it
+    return len(await delete_conversations(db, ids, user_id, include_archived=False, subtract_progress=False))
+
+
+async def delete_user_rows_batch(db: AsyncSession, model, user_id: UUID, limit: int) -> int:
+    """
+    Delete up to `limit` of a user's rows from one of USER_TABLES
+
+    Returns:
+        Number deleted
+    """
+    key = tuple_(*model.__table__.primary_key.columns)
+    result = await db.execute(
+        delete(model).where(key.in_(
+            select(*model.__table__.primary_key.columns).where(model.user_id == user_id).limit(limit)
+        ))
+    )
+    return result.rowcount
+
+
+async def finish_account_deletion(db: AsyncSession, user_id: UUID) -> int:
+    """
+    Delete the user row, with anything created since the batches ran
+
+    The user row is locked first, so no new conversation can reference it
+    while the remainder is deleted.
+
+    Returns:
+        Number of conversations deleted in this last step
+    """
+    await db.execute(select(User.id).where(User.id == user_id).with_for_update())
+    remaining = await delete_conversation_batch(db, user_id, None)
+    # Rows left in USER_TABLES cascade
+    await db.execute(delete(User).where(User.id == user_id))
+
+    now = datetime.utcnow()
+    await db.execute(
+        update(AccountDeletion)
+        .where(AccountDeletion.user_id == user_id)
+        .values(
+            status="done",
+            deleted_conversations=AccountDeletion.deleted_conversations + remaining,
+            updated_at=now,
+            finished_at=now,
+            error=None,
+        )
+    )
+    return remaining
@@ -0,0 +1,65 @@
+"""
+Queries for cohort analytics over all reports
+
+Only the few fields analytics needs are extracted from report_data in
+Postgres, so each streamed row is small regardless of transcript size.
+"""
+from datetime import datetime
+from typing import Optional
+
+from sqlalchemy import Integer, func, literal_column, select, type_coerce
+from sqlalchemy.dialects.postgresql import JSONB
+from sqlalchemy.sql import Select
+
+from ..db.models import Conversation, Report
+
+_ERROR_TYPES_PATH = literal_column("'$.grammar_errors[*].error_type'::jsonpath")
+
+
+def cohort_report_rows(language: Optional[str] = None, since: Optional[datetime] = None) -> Select:
+    """
+    One row per report: (language, scenario, session_number, turns, words,
+    grammar_errors, vocabulary_issues, naturalness_issues, error_types)
+
+    session_number is the conversation's 1-based position in its owner's
+    reported history (within `language` if given), counted before the
+    `since` filter. error_types is a JSON list with one entry per grammar
+    error.
+    """
+    data = type_coerce(Report.report_data, JSONB)
+    reports = select(
+        Conversation.language,
+        Conversation.scenario,
+        Conversation.created_at,
+        func.row_number().over(
+            partition_by=Conversation.user_id, order_by=Conversation.created_at
+        ).label("session_number"),
+        func.coalesce(data["overview"]["turns"].astext.cast(Integer), 0).label("turns"),
+        func.coalesce(data["overview"]["word_count"].astext.cast(Integer), 0).label("words"),
+        func.coalesce(func.jsonb_array_length(data["grammar_errors"]), 0).label("grammar_errors"),
+        func.coalesce(func.jsonb_array_length(data["vocabulary_issues"]), 0).label("vocabulary_issues"),
+        func.coalesce(func.jsonb_array_length(data["naturalness"]), 0).label("naturalness_issues"),
+        type_coerce(
+            func.jsonb_path_query_array(data, _ERROR_TYPES_PATH), JSONB
+        ).label("error_types"),
+    ).join(
+        Report, Report.conversation_id == Conversation.id
+    ).where(Conversation.user_id.is_not(None))
+    if language:
+        reports = reports.where(Conversation.language == language)
+    reports = reports.subquery("report_rows")
+
+    query = select(
+        reports.c.language,
+        reports.c.scenario,
+        reports.c.session_number,
+        reports.c.turns,
+        reports.c.words,
+        reports.c.grammar_errors,
+        reports.c.vocabulary_issues,
+        reports.c.naturalness_issues,
+        reports.c.error_types,
+    )
+    if since:
+        query = query.where(reports.c.created_at >= since)
+    return query
@@ -0,0 +1,245 @@
+"""
+CRUD operations for archived conversations
+
+Archived rows hold a conversation and its report as one zlib-compressed
+JSON payload. Reads rebuild transient Conversation/Report objects so
+callers cannot tell an archived conversation from a live one.
+"""
+import re
+import zlib
+from datetime import datetime
+from typing import List, Optional, Tuple
+from uuid import UUID
+
+from sqlalchemy import select, desc, delete, text, func
+from sqlalchemy.dialects.postgresql import insert
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import selectinload
+
+from ..core.serialization import dumps, loads
+from ..core.tracing import traced
+from ..db.models import Conversation, ConversationArchive, Report
+
+_PARTITION_NAME = re.compile(r"^conversation_archive_(\d{4})_(\d{2})$")
+
+# Advisory lock key held by the worker that is archiving ("LEArchiv")
+_ARCHIVE_LOCK_KEY = int.from_bytes(b"LEArchiv", "big") >> 1
+
+
+def month_start(moment: datetime) -> datetime:
+    """First instant of the month containing `moment`"""
+    return datetime(moment.year, moment.month, 1)
+
+
+def add_months(month: datetime, months: int) -> datetime:
+    """First instant of the month `months` after `month` (may be negative)"""
+    index = month.year * 12 + month.month - 1 + months
+    return datetime(index // 12, index % 12 + 1, 1)
+
+
+def partition_name(month: datetime) -> str:
+    return f"conversation_archive_{month.year:04d}_{month.month:02d}"
+
+
+def pack_payload(messages: list, report_data: Optional[dict], level: int = 6) -> bytes:
+    """Compress a transcript and report into an archive payload"""
+    return zlib.compress(dumps({"messages": messages, "report": report_data}), level)
+
+
+def unpack_payload(payload: bytes) -> Tuple[list, Optional[dict]]:
+    """Inverse of pack_payload: (messages, report_data)"""
+    data = loads(zlib.decompress(payload))
+    return data["messages"], data["report"]
+
+
+def restore_conversation(row: ConversationArchive) -> Conversation:
+    """
+    Rebuild a transient Conversation (with its report) from an archive row
+
+    The result is not attached to any session and must not be added to one.
+    """
+    messages, report_data = unpack_payload(row.payload)
+    conversation = Conversation(
+        id=row.id,
+        session_id=row.session_id,
+        user_id=row.user_id,
+        language=row.language,
+        scenario=row.scenario,
+        messages=messages,
+        created_at=row.created_at,
+        updated_at=row.updated_at
+    )
+    conversation.report = (
+        Report(conversation_id=row.id, report_data=report_data, created_at=row.updated_at)
+        if report_data is not None else None
+    )
+    return conversation
+
+
+@traced("db.get_archived_conversation")
+async def get_archived_conversation(db: AsyncSession, session_id: UUID) -> Optional[Conversation]:
+    """
+    Get an archived conversation by session ID, newest archive first
+    """
+    result = await db.execute(
+        select(ConversationArchive)
+        .where(ConversationArchive.session_id == session_id)
+        .order_by(desc(ConversationArchive.archived_at))
+        .limit(1)
+    )
+    row = result.scalar_one_or_none()
+    return restore_conversation(row) if row else None
+
+
+async def get_archived_conversation_version(
+    db: AsyncSession,
+    session_id: UUID
+) -> Optional[Tuple[UUID, Optional[UUID], datetime]]:
+    """
+    Get (id, user_id, updated_at) of an archived conversation without its payload
+    """
+    result = await db.execute(
+        select(ConversationArchive.id, ConversationArchive.user_id, ConversationArchive.updated_at)
+        .where(ConversationArchive.session_id == session_id)
+        .order_by(desc(ConversationArchive.archived_at))
+        .limit(1)
+    )
+    row = result.one_or_none()
+    return tuple(row) if row else None
+
+
+async def try_archive_lock(db: AsyncSession) -> bool:
+    """
+    Take the transaction-scoped archive lock, so one worker archives at a time
+    """
+    result = await db.execute(select(func.pg_try_advisory_xact_lock(_ARCHIVE_LOCK_KEY)))
+    return bool(result.scalar())
+
+
+async def get_archive_partitions(db: AsyncSession) -> List[str]:
+    """
+    Names of the existing archive partitions
+    """
+    result = await db.execute(text(
+        "SELECT child.relname FROM pg_inherits "
+        "JOIN pg_class parent ON parent.oid = pg_inherits.inhparent "
+        "JOIN pg_class child ON child.oid = pg_inherits.inhrelid "
+        "WHERE parent.relname = 'conversation_archive'"
+    ))
+    return sorted(result.scalars().all())
+
+
+async def get_oldest_conversation_time(db: AsyncSession) -> Optional[datetime]:
+    """
+    created_at of the oldest live conversation
+    """
+    result = await db.execute(select(func.min(Conversation.created_at)))
+    return result.scalar()
+
+
+async def ensure_archive_partitions(db: AsyncSession, months: List[datetime]) -> List[str]:
+    """
+    Create the monthly archive partitions for `months` that are missing
+
+    Returns:
+        Names of the created partitions
+    """
+    existing = set(await get_archive_partitions(db))
+    created = []
+    for start in sorted({month_start(month) for month in months}):
+        name = partition_name(start)
+        if name in existing:
+            continue
+        end = add_months(start, 1)
+        # Names and bounds come from datetimes, never from user input
+        await db.execute(text(
+            f"CREATE TABLE IF NOT EXISTS {partition_name(start)} "
+            f"PARTITION OF conversation_archive "
+            f"FOR VALUES FROM ('{start:%Y-%m-%d}') TO ('{end:%Y-%m-%d}')"
+        ))
+        created.append(name)
+    return created
+
+
+@traced("db.get_archivable_conversations")
+async def get_archivable_conversations(
+    db: AsyncSession,
+    cutoff: datetime,
+    limit: int
+) -> List[Conversation]:
+    """
+    Lock and load the oldest conversations created before `cutoff`
+
+    Rows locked by an in-flight chat turn are skipped until the next run.
+    """
+    result = await db.execute(
+        select(Conversation)
+        .where(Conversation.created_at < cutoff)
+        .order_by(Conversation.created_at)
+        .limit(limit)
+        .with_for_update(of=Conversation, skip_locked=True)
+        .options(selectinload(Conversation.report))
+    )
+    return list(result.scalars().all())
+
+
+@traced("db.archive_conversations")
+async def archive_conversations(
+    db: AsyncSession,
+    conversations: List[Conversation],
+    compression_level: int = 6
+) -> int:
+    """
+    Stage moving conversations and their reports into the archive
+
+    The caller must have created the partitions for their months.
+
+    Returns:
+        Number of conversations archived
+    """
+    if not conversations:
+        return 0
+
+    now = datetime.utcnow()
+    rows = [
+        {
+            "id": conv.id,
+            "created_at": conv.created_at,
+            "session_id": conv.session_id,
+            "user_id": conv.user_id,
+            "language": conv.language,
+            "scenario": conv.scenario,
+            "updated_at": conv.updated_at,
+            "archived_at": now,
+            "has_report": conv.report is not None,
+            "payload": pack_payload(
+                conv.messages or [],
+                conv.report.report_data if conv.report else None,
+                compression_level
+            ),
+        }
+        for conv in conversations
+    ]
+    ids = [conv.id for conv in conversations]
+
+    await db.execute(insert(ConversationArchive).on_conflict_do_nothing(), rows)
+    await db.execute(delete(Report).where(Report.conversation_id.in_(ids)))
+    await db.execute(delete(Conversation).where(Conversation.id.in_(ids)))
+    return len(rows)
+
+
+async def drop_archive_partitions_before(db: AsyncSession, month: datetime) -> List[str]:
+    """
+    Drop whole archive partitions for months before `month`
+
+    Returns:
+        Names of the dropped partitions
+    """
+    cutoff = month_start(month)
+    dropped = []
+    for name in await get_archive_partitions(db):
+        match = _PARTITION_NAME.match(name)
+        if match and datetime(int(match[1]), int(match[2]), 1) < cutoff:
+            await db.execute(text(f"DROP TABLE IF EXISTS {name}"))
+            dropped.append(name)
+    return dropped
@@ -1,64 +1,249 @@
 """
 CRUD operations for Conversation and Report models
+
+Functions only stage changes on the session; callers commit once with
+unit_of_work() so a chat turn or report save is a single transaction.
 """
-from typing import List, Optional
-from sqlalchemy import select, desc
+from typing import List, Optional, Set, Tuple
+from sqlalchemy import select, desc, update, delete, func, literal_column, union_all, union, case, null, exists, literal
+from sqlalchemy.dialects.postgresql import TSVECTOR
 from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.orm import selectinload
-from uuid import UUID
+from uuid import UUID, uuid4
 from datetime import datetime
 
-from ..db.models import Conversation, Report
+from ..db.dialect import IS_SQLITE, insert
+from ..db.models import Conversation, ConversationArchive, Report
+from ..core.tracing import traced
+from ..core.text_search import message_texts, report_texts, search_document
+from .archive import (
+    get_archived_conversation,
+    get_archived_conversation_version,
+    restore_conversation,
+    unpack_payload,
+)
+from .progress import add_report_progress, get_report_context, record_report_progress, subtract_report_progress
+
+
+_SIMPLE = literal_column("'simple'::regconfig")
+
+
+def _weighted_vector(texts: List[str], weight: str):
+    """setweight(to_tsvector('simple', tokens), weight) for pre-tokenized texts"""
+    return func.setweight(
+        func.to_tsvector(_SIMPLE, search_document(texts)),
+        literal_column(f"'{weight}'"),
+        type_=TSVECTOR
+    )
+
+
+def _kept_vector(vector, weight: str):
+    """The lexemes of an existing search_vector with one weight"""
+    return func.coalesce(
+        func.ts_filter(vector, literal_column(f"'{{{weight}}}'")),
+        literal_column("''::tsvector"),
+        type_=TSVECTOR
+    )
+
+
+def _search_vector(messages: list, report_data: Optional[dict]):
+    """A new conversation's search_vector (NULL on SQLite, which has no full-text search)"""
+    if IS_SQLITE:
+        return None
+    return _weighted_vector(message_texts(messages), "A").op("||", return_type=TSVECTOR)(
+        _weighted_vector(report_texts(report_data), "B")
+    )
 
 
+@traced("db.create_conversation")
 async def create_conversation(
     db: AsyncSession,
     session_id: UUID,
     user_id: Optional[UUID],
     language: str,
     scenario: str,
-    messages: list
+    messages: list,
+    report_data: Optional[dict] = None
 ) -> Conversation:
     """
-    Create a new conversation
+    Stage a new conversation, optionally with its report
+
+    The id is assigned here so callers can reference it before the flush.
+    A report is counted in the owner's progress aggregates.
     """
+    now = datetime.utcnow()
     conversation = Conversation(
+        id=uuid4(),
         session_id=session_id,
         user_id=user_id,
         language=language,
         scenario=scenario,
-        messages=messages
+        messages=messages,
+        created_at=now,
+        updated_at=now,
+        search_vector=_search_vector(messages, report_data)
     )
+    if report_data:
+        conversation.report = Report(id=uuid4(), report_data=report_data, created_at=now)
+        if user_id is not None:
+            await add_report_progress(db, user_id, language, scenario, now, messages, report_data)
 
     db.add(conversation)
-    await db.commit()
-    await db.refresh(conversation)
 
     return conversation
 
 
+@traced("db.save_conversation_messages")
+async def save_conversation_messages(
+    db: AsyncSession,
+    session_id: UUID,
+    user_id: UUID,
+    language: str,
+    scenario: str,
+    messages: list
+) -> Optional[UUID]:
+    """
+    Create a user's conversation or replace its messages, in one statement
+
+    INSERT ... ON CONFLICT (session_id) DO UPDATE ... RETURNING id, so a
+    chat turn needs no SELECT first. A session id owned by another user,
+    or an archived (read-only) session, is left untouched.
+
+    Returns:
+        Conversation id, or None if the session belongs to someone else or is archived
+    """
+    now = datetime.utcnow()
+    values = {
+        "id": uuid4(),
+        "session_id": session_id,
+        "user_id": user_id,
+        "language": language,
+        "scenario": scenario,
+        "messages": messages,
+        "created_at": now,
+        "updated_at": now,
+    }
+    columns = list(values)
+    row = [literal(value, Conversation.__table__.c[name].type) for name, value in values.items()]
+    if not IS_SQLITE:
+        columns.append("search_vector")
+        row.append(_search_vector(messages, None))
+    # Inserted only if the session is not archived, so it is never split in two
+    stmt = insert(Conversation).from_select(
+        columns,
+        select(*row).where(~exists().where(ConversationArchive.session_id == session_id))
+    )
+    replaced = {"messages": stmt.excluded.messages, "updated_at": stmt.excluded.updated_at}
+    if not IS_SQLITE:
+        # New message tokens, keeping the report's
+        replaced["search_vector"] = stmt.excluded.search_vector.op("||", return_type=TSVECTOR)(
+            _kept_vector(Conversation.search_vector, "b")
+        )
+    stmt = stmt.on_conflict_do_update(
+        index_elements=[Conversation.session_id],
+        set_=replaced,
+        where=Conversation.user_id == stmt.excluded.user_id
+    ).returning(Conversation.id)
+
+    result = await db.execute(stmt)
+    return result.scalar_one_or_none()
+
+
+@traced("db.get_conversation_by_session_id")
 async def get_conversation_by_session_id(
     db: AsyncSession,
     session_id: UUID
 ) -> Optional[Conversation]:
     """
-    Get conversation by session ID
+    Get conversation by session ID, falling back to the archive
+
+    Archived conversations come back as transient objects (see
+    crud.archive.restore_conversation); they are read-only.
     """
     result = await db.execute(
         select(Conversation)
         .where(Conversation.session_id == session_id)
         .options(selectinload(Conversation.report))
     )
-    return result.scalar_one_or_none()
+    conversation = result.scalar_one_or_none()
+    if conversation is None:
+        conversation = await get_archived_conversation(db, session_id)
+    return conversation
+
+
+@traced("db.get_conversation_version")
+async def get_conversation_version(
+    db: AsyncSession,
+    session_id: UUID,
+    include_archived: bool = False
+) -> Optional[Tuple[UUID, Optional[UUID], datetime]]:
+    """
+    Get (id, user_id, updated_at) of a conversation without loading messages
+
+    Args:
+        include_archived: Also look in the archive (for reads; archived
+            conversations cannot be written to)
+    """
+    result = await db.execute(
+        select(Conversation.id, Conversation.user_id, Conversation.updated_at)
+        .where(Conversation.session_id == session_id)
+    )
+    row = result.one_or_none()
+    if row is None and include_archived:
+        return await get_archived_conversation_version(db, session_id)
+    return tuple(row) if row else None
+
+
+async def get_existing_session_ids(db: AsyncSession, session_ids: List[UUID]) -> Set[UUID]:
+    """
+    Get which of the given session IDs already have a conversation, live or archived
+    """
+    if not session_ids:
+        return set()
+    result = await db.execute(union(
+        select(Conversation.session_id).where(Conversation.session_id.in_(session_ids)),
+        select(ConversationArchive.session_id).where(ConversationArchive.session_id.in_(session_ids)),
+    ))
+    return set(result.scalars().all())
 
 
+@traced("db.get_user_conversation_versions")
+async def get_user_conversation_versions(
+    db: AsyncSession,
+    user_id: UUID,
+    limit: int = 50,
+    include_archived: bool = True
+) -> List[Tuple[UUID, datetime]]:
+    """
+    Get (id, updated_at) of the conversations get_user_conversations would return
+    """
+    query = select(Conversation.id, Conversation.updated_at, Conversation.created_at).where(
+        Conversation.user_id == user_id
+    )
+    if include_archived:
+        query = union_all(query, select(
+            ConversationArchive.id, ConversationArchive.updated_at, ConversationArchive.created_at
+        ).where(ConversationArchive.user_id == user_id))
+    versions = query.subquery()
+    result = await db.execute(
+        select(versions.c.id, versions.c.updated_at).order_by(desc(versions.c.created_at)).limit(limit)
+    )
+    return [tuple(row) for row in result.all()]
+
+
+@traced("db.get_user_conversations")
 async def get_user_conversations(
     db: AsyncSession,
     user_id: UUID,
-    limit: int = 50
+    limit: int = 50,
+    include_archived: bool = True
 ) -> List[Conversation]:
     """
-    Get all conversations for a user, ordered by most recent first
+    Get a user's conversations, most recent first
+
+    Args:
+        include_archived: Also return archived conversations (read-only
+            transient objects, see crud.archive.restore_conversation)
     """
     result = await db.execute(
         select(Conversation)
@@ -67,60 +252,232 @@ async def get_user_conversations(
         .limit(limit)
         .options(selectinload(Conversation.report))
     )
-    return list(result.scalars().all())
+    conversations = list(result.scalars().all())
+    if not include_archived:
+        return conversations
+
+    archived = (
+        select(ConversationArchive)
+        .where(ConversationArchive.user_id == user_id)
+        .order_by(desc(ConversationArchive.created_at))
+        .limit(limit)
+    )
+    if len(conversations) == limit:
+        # Only archived conversations newer than the oldest live one can make the page
+        archived = archived.where(ConversationArchive.created_at > conversations[-1].created_at)
+    result = await db.execute(archived)
+    conversations.extend(restore_conversation(row) for row in result.scalars().all())
+    conversations.sort(key=lambda conversation: conversation.created_at, reverse=True)
+    return conversations[:limit]
 
 
+@traced("db.update_conversation_messages")
 async def update_conversation_messages(
     db: AsyncSession,
     conversation: Conversation,
     messages: list
 ) -> Conversation:
     """
-    Update conversation messages
+    Stage new messages for a loaded conversation
     """
     conversation.messages = messages
-    await db.commit()
-    await db.refresh(conversation)
 
     return conversation
 
 
-async def delete_conversation(db: AsyncSession, conversation_id: UUID) -> bool:
+def _delete_statement(ids, user_id: Optional[UUID], include_archived: bool):
     """
-    Delete a conversation (and its associated report via cascade)
+    One statement deleting conversations with their reports (and archived copies)
+
+    Data-modifying CTEs delete the reports and the conversations together,
+    so nothing is loaded and the ownership check is part of the delete.
+    Each deleted conversation comes back as (id, user_id, language,
+    scenario, created_at, report_data, payload); payload is set for
+    archived conversations that had a report.
     """
+    owned = [Conversation.id.in_(ids)]
+    if user_id is not None:
+        owned.append(Conversation.user_id == user_id)
+
+    reports = (
+        delete(Report)
+        .where(Report.conversation_id.in_(select(Conversation.id).where(*owned)))
+        .returning(Report.conversation_id, Report.report_data)
+        .cte("deleted_reports")
+    )
+    conversations = (
+        delete(Conversation)
+        .where(*owned)
+        .returning(
+            Conversation.id, Conversation.user_id, Conversation.language, Conversation.scenario,
+            Conversation.created_at
+        )
+        .cte("deleted_conversations")
+    )
+    deleted = select(
+        conversations.c.id, conversations.c.user_id, conversations.c.language, conversations.c.scenario,
+        conversations.c.created_at, reports.c.report_data, null().label("payload")
+    ).select_from(conversations.outerjoin(reports, reports.c.conversation_id == conversations.c.id))
+    if include_archived:
+        archived = [ConversationArchive.id.in_(ids)]
+        if user_id is not None:
+            archived.append(ConversationArchive.user_id == user_id)
+        archived_rows = (
+            delete(ConversationArchive)
+            .where(*archived)
+            .returning(
+                ConversationArchive.id, ConversationArchive.user_id, ConversationArchive.language,
+                ConversationArchive.scenario, ConversationArchive.created_at, ConversationArchive.has_report,
+                ConversationArchive.payload
+            )
+            .cte("deleted_archived")
+        )
+        deleted = union_all(deleted, select(
+            archived_rows.c.id, archived_rows.c.user_id, archived_rows.c.language, archived_rows.c.scenario,
+            archived_rows.c.created_at, null().label("report_data"),
+            case((archived_rows.c.has_report, archived_rows.c.payload)).label("payload")
+        ))
+    return deleted
+
+
+async def _delete_rows(db: AsyncSession, ids, user_id: Optional[UUID], include_archived: bool) -> List[tuple]:
+    """Run the deletes; one (id, user_id, language, scenario, created_at, report_data, payload) per conversation"""
+    if not IS_SQLITE:
+        return list((await db.execute(_delete_statement(ids, user_id, include_archived))).all())
+
+    # SQLite has no data-modifying CTEs: the same deletes, one statement each
+    owned = [Conversation.id.in_(ids)]
+    archived = [ConversationArchive.id.in_(ids)]
+    if user_id is not None:
+        owned.append(Conversation.user_id == user_id)
+        archived.append(ConversationArchive.user_id == user_id)
     result = await db.execute(
-        select(Conversation).where(Conversation.id == conversation_id)
+        delete(Report)
+        .where(Report.conversation_id.in_(select(Conversation.id).where(*owned)))
+        .returning(Report.conversation_id, Report.report_data)
     )
-    conversation = result.scalar_one_or_none()
+    reports = dict(result.all())
+    result = await db.execute(
+        delete(Conversation)
+        .where(*owned)
+        .returning(
+            Conversation.id, Conversation.user_id, Conversation.language, Conversation.scenario,
+            Conversation.created_at
+        )
+    )
+    rows = [(*row, reports.get(row[0]), None) for row in result.all()]
+    if include_archived:
+        result = await db.execute(
+            delete(ConversationArchive)
+            .where(*archived)
+            .returning(
+                ConversationArchive.id, ConversationArchive.user_id, ConversationArchive.language,
+                ConversationArchive.scenario, ConversationArchive.created_at, ConversationArchive.has_report,
+                ConversationArchive.payload
+            )
+        )
+        rows.extend(
+            (*row[:5], None, row.payload if row.has_report else None) for row in result.all()
+        )
+    return rows
 
-    if not conversation:
-        return False
 
-    await db.delete(conversation)
-    await db.commit()
+async def delete_conversations(
+    db: AsyncSession,
+    ids,
+    user_id: Optional[UUID],
+    include_archived: bool = True,
+    subtract_progress: bool = True
+) -> Set[UUID]:
+    """
+    Delete conversations with their reports (and archived copies) without loading them
+
+    The deleted reports are subtracted from their owners' progress
+    aggregates in the same transaction.
+
+    Args:
+        ids: Conversation ids, as a list or (PostgreSQL only) a SELECT of ids
+        user_id: Only delete conversations owned by this user (None: no owner check)
+        include_archived: Also delete matching archived conversations
+        subtract_progress: Update the progress aggregates (False when they are deleted too)
+
+    Returns:
+        Ids that were deleted
+    """
+    rows = await _delete_rows(db, ids, user_id, include_archived)
+    if subtract_progress:
+        await subtract_report_progress(db, [
+            (owner, language, scenario, created_at, unpack_payload(payload)[1] if payload else report_data)
+            for _, owner, language, scenario, created_at, report_data, payload in rows
+            if report_data is not None or payload
+        ])
+    return {row[0] for row in rows}
+
+
+@traced("db.delete_user_conversations")
+async def delete_user_conversations(db: AsyncSession, user_id: UUID, conversation_ids: List[UUID]) -> Set[UUID]:
+    """
+    Delete a user's conversations, with reports and archived copies, in one
+    statement, and subtract their reports from the user's progress
+
+    Ids that do not exist or belong to someone else are left alone.
 
-    return True
+    Returns:
+        Ids that were deleted
+    """
+    if not conversation_ids:
+        return set()
+    return await delete_conversations(db, conversation_ids, user_id)
 
 
+async def delete_conversation(db: AsyncSession, conversation_id: UUID) -> bool:
+    """
+    Delete a conversation and its report without loading either or checking
+    the owner
+
+    Archived copies are deleted too.
+
+    Returns:
+        True if the conversation existed
+    """
+    return bool(await delete_conversations(db, [conversation_id], None))
+
+
+@traced("db.create_report")
 async def create_report(
     db: AsyncSession,
     conversation_id: UUID,
     report_data: dict
-) -> Report:
+) -> None:
     """
-    Create a report for a conversation
+    Save a conversation's report, replacing any earlier one
+
+    The owner's progress aggregates are updated in the same transaction.
     """
-    report = Report(
+    now = datetime.utcnow()
+    # Read (and lock) before the upsert so the replaced report can be subtracted
+    context = await get_report_context(db, conversation_id)
+
+    stmt = insert(Report).values(
+        id=uuid4(),
         conversation_id=conversation_id,
-        report_data=report_data
+        report_data=report_data,
+        created_at=now
     )
-
-    db.add(report)
-    await db.commit()
-    await db.refresh(report)
-
-    return report
+    await db.execute(stmt.on_conflict_do_update(
+        index_elements=[Report.conversation_id],
+        set_={"report_data": stmt.excluded.report_data, "created_at": stmt.excluded.created_at}
+    ))
+    # The report is part of the conversation's representation and its
+    # findings are searchable
+    values = {"updated_at": now}
+    if not IS_SQLITE:
+        values["search_vector"] = _kept_vector(Conversation.search_vector, "a").op("||", return_type=TSVECTOR)(
+            _weighted_vector(report_texts(report_data), "B")
+        )
+    await db.execute(update(Conversation).where(Conversation.id == conversation_id).values(**values))
+    if context is not None:
+        await record_report_progress(db, context, report_data)
 
 
 async def get_report_by_conversation_id(
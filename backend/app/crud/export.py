@@ -0,0 +1,64 @@
+"""
+Keyset-paged reads of everything stored for a user, for data export
+
+Pages are ordered by (created_at, id) and continue after the last row of
+the previous page, so each page is an index range scan on
+(user_id, created_at) no matter how deep into the history it is.
+"""
+from datetime import datetime
+from typing import Optional, Tuple
+from uuid import UUID
+
+from sqlalchemy import select, tuple_
+from sqlalchemy.sql import Select
+
+from ..db.models import Conversation, ConversationArchive, Report
+
+Cursor = Tuple[datetime, UUID]  # (created_at, id) of the last exported row
+
+
+def conversation_page(user_id: UUID, after: Optional[Cursor] = None, limit: int = 100) -> Select:
+    """
+    One page of a user's live conversations with their reports
+
+    Rows: (id, session_id, language, scenario, messages, created_at,
+    updated_at, report_data, report_created_at)
+    """
+    query = (
+        select(
+            Conversation.id,
+            Conversation.session_id,
+            Conversation.language,
+            Conversation.scenario,
+            Conversation.messages,
+            Conversation.created_at,
+            Conversation.updated_at,
+            Report.report_data,
+            Report.created_at.label("report_created_at"),
+        )
+        .outerjoin(Report, Report.conversation_id == Conversation.id)
+        .where(Conversation.user_id == user_id)
+    )
+    if after is not None:
+        query = query.where(tuple_(Conversation.created_at, Conversation.id) > tuple_(*after))
+    return query.order_by(Conversation.created_at, Conversation.id).limit(limit)
+
+
+def archived_conversation_page(user_id: UUID, after: Optional[Cursor] = None, limit: int = 100) -> Select:
+    """
+    One page of a user's archived conversations
+
+    Rows: (id, session_id, language, scenario, payload, created_at, updated_at)
+    """
+    query = select(
+        ConversationArchive.id,
+        ConversationArchive.session_id,
+        ConversationArchive.language,
+        ConversationArchive.scenario,
+        ConversationArchive.payload,
+        ConversationArchive.created_at,
+        ConversationArchive.updated_at,
+    ).where(ConversationArchive.user_id == user_id)
+    if after is not None:
+        query = query.where(tuple_(ConversationArchive.created_at, ConversationArchive.id) > tuple_(*after))
+    return query.order_by(ConversationArchive.created_at, ConversationArchive.id).limit(limit)
@@ -0,0 +1,312 @@
+"""
+CRUD operations for learner-progress aggregates
+
+A report save adds the new report's counts and subtracts those of the
+report it replaces, so regenerating a report never double-counts, and
+deleting a conversation subtracts its report. The aggregates are upserted
+with ON CONFLICT ... DO UPDATE SET n = n + excluded.n in one statement.
+"""
+from collections import Counter
+from datetime import date, datetime, timedelta
+from typing import Dict, Iterable, List, Optional, Tuple
+from uuid import UUID
+
+from sqlalchemy import select, delete, tuple_
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from ..core.text_search import tokenize
+from ..core.tracing import traced
+from ..db.dialect import insert
+from ..db.models import Conversation, LearnerTerm, ProgressAggregate, Report
+
+COUNTERS = (
+    "reports", "turns", "words", "grammar_errors", "vocabulary_issues", "naturalness_issues", "new_terms"
+)
+
+# Terms stored per report; more than this in one conversation is noise
+MAX_TERMS_PER_REPORT = 1000
+
+AggregateKey = Tuple[str, str]  # (dimension, key)
+
+
+def week_start(moment: datetime) -> date:
+    """Monday of the week containing `moment`"""
+    day = moment.date() if isinstance(moment, datetime) else moment
+    return day - timedelta(days=day.weekday())
+
+
+def vocabulary_terms(messages: Optional[list]) -> List[str]:
+    """
+    Distinct terms in the learner's own messages
+
+    Words for spaced scripts; CJK character bigrams otherwise (an
+    approximation of words that needs no dictionary).
+    """
+    terms = set()
+    for message in messages or []:
+        if not isinstance(message, dict) or message.get("role") != "user":
+            continue
+        for token in tokenize(message.get("content") or ""):
+            if len(token) >= 2 and not token.isdigit():
+                terms.add(token[:100])
+    return sorted(terms)[:MAX_TERMS_PER_REPORT]
+
+
+def report_counts(scenario: str, report_data: Optional[dict]) -> Dict[AggregateKey, Counter]:
+    """Aggregate counters contributed by one report"""
+    if not isinstance(report_data, dict):
+        return {}
+    overview = report_data.get("overview") or {}
+    grammar = report_data.get("grammar_errors") or []
+
+    counts = {
+        ("scenario", scenario[:100]): Counter(
+            reports=1,
+            turns=int(overview.get("turns") or 0),
+            words=int(overview.get("word_count") or 0),
+            grammar_errors=len(grammar),
+            vocabulary_issues=len(report_data.get("vocabulary_issues") or []),
+            naturalness_issues=len(report_data.get("naturalness") or []),
+        )
+    }
+    for error in grammar:
+        error_type = (error.get("error_type") if isinstance(error, dict) else None) or "other"
+        key = ("error_type", error_type.strip().lower()[:100] or "other")
+        counts.setdefault(key, Counter())["grammar_errors"] += 1
+    return counts
+
+
+def progress_deltas(
+    scenario: str,
+    new_report: Optional[dict],
+    old_report: Optional[dict] = None
+) -> Dict[AggregateKey, Dict[str, int]]:
+    """New report's counters minus the replaced report's, without zero rows"""
+    deltas: Dict[AggregateKey, Dict[str, int]] = {}
+    for sign, report_data in ((1, new_report), (-1, old_report)):
+        for key, counts in report_counts(scenario, report_data).items():
+            row = deltas.setdefault(key, dict.fromkeys(COUNTERS, 0))
+            for name, value in counts.items():
+                row[name] += sign * value
+    return {key: row for key, row in deltas.items() if any(row.values())}
+
+
+def merge_deltas(total: Dict[AggregateKey, Dict[str, int]], deltas: Dict[AggregateKey, Dict[str, int]]) -> None:
+    """Add one set of deltas into a running total, in place"""
+    for key, row in deltas.items():
+        counters = total.setdefault(key, dict.fromkeys(COUNTERS, 0))
+        for name, value in row.items():
+            counters[name] += value
+
+
+@traced("db.get_report_context")
+async def get_report_context(db: AsyncSession, conversation_id: UUID) -> Optional[tuple]:
+    """
+    Lock a conversation and get what progress tracking needs from it
+
+    The row lock serializes concurrent saves of the same conversation's
+    report, so the replaced report is subtracted exactly once.
+
+    Returns:
+        (user_id, language, scenario, created_at, messages, previous report_data)
+    """
+    result = await db.execute(
+        select(
+            Conversation.user_id,
+            Conversation.language,
+            Conversation.scenario,
+            Conversation.created_at,
+            Conversation.messages,
+            Report.report_data,
+        )
+        .outerjoin(Report, Report.conversation_id == Conversation.id)
+        .where(Conversation.id == conversation_id)
+        .with_for_update(of=Conversation)
+    )
+    return result.one_or_none()
+
+
+async def insert_learner_terms(
+    db: AsyncSession,
+    user_id: UUID,
+    language: str,
+    terms: List[str],
+    first_seen: date
+) -> int:
+    """
+    Add terms to a learner's vocabulary
+
+    Returns:
+        How many were new
+    """
+    if not terms:
+        return 0
+    result = await db.execute(
+        insert(LearnerTerm)
+        .values([
+            {"user_id": user_id, "language": language, "term": term, "first_seen": first_seen}
+            for term in terms
+        ])
+        .on_conflict_do_nothing()
+        .returning(LearnerTerm.term)
+    )
+    return len(result.scalars().all())
+
+
+async def add_progress_deltas(
+    db: AsyncSession,
+    user_id: UUID,
+    language: str,
+    week: date,
+    deltas: Dict[AggregateKey, Dict[str, int]]
+) -> None:
+    """
+    Add counter deltas to a user's weekly aggregates in one statement
+    """
+    if not deltas:
+        return
+    stmt = insert(ProgressAggregate).values([
+        {
+            "user_id": user_id, "week_start": week, "language": language,
+            "dimension": dimension, "key": key, **counters,
+        }
+        for (dimension, key), counters in sorted(deltas.items())
+    ])
+    await db.execute(stmt.on_conflict_do_update(
+        index_elements=[
+            ProgressAggregate.user_id, ProgressAggregate.week_start, ProgressAggregate.language,
+            ProgressAggregate.dimension, ProgressAggregate.key,
+        ],
+        set_={
+            name: getattr(ProgressAggregate, name) + getattr(stmt.excluded, name)
+            for name in COUNTERS
+        }
+    ))
+
+
+async def add_report_progress(
+    db: AsyncSession,
+    user_id: UUID,
+    language: str,
+    scenario: str,
+    created_at: datetime,
+    messages: Optional[list],
+    report_data: Optional[dict],
+    previous_report: Optional[dict] = None
+) -> None:
+    """
+    Stage the aggregate and vocabulary changes of one report (minus the one it replaces)
+    """
+    week = week_start(created_at)
+    deltas = progress_deltas(scenario, report_data, previous_report)
+    new_terms = await insert_learner_terms(db, user_id, language, vocabulary_terms(messages), week)
+    if new_terms:
+        row = deltas.setdefault(("scenario", scenario[:100]), dict.fromkeys(COUNTERS, 0))
+        row["new_terms"] += new_terms
+    await add_progress_deltas(db, user_id, language, week, deltas)
+
+
+async def record_report_progress(db: AsyncSession, context: tuple, report_data: dict) -> None:
+    """
+    Stage the progress changes of saving `report_data` for a conversation
+
+    Args:
+        context: Row from get_report_context, read before the report was replaced
+    """
+    user_id, language, scenario, created_at, messages, previous_report = context
+    if user_id is None:
+        return
+    await add_report_progress(
+        db, user_id, language, scenario, created_at, messages, report_data, previous_report
+    )
+
+
+async def subtract_report_progress(db: AsyncSession, reports: Iterable[tuple]) -> None:
+    """
+    Stage subtracting deleted reports from their owners' aggregates
+
+    Reports of the same user, language and week are summed into one upsert.
+    The vocabulary is kept: the terms were still used.
+
+    Args:
+        reports: (user_id, language, scenario, created_at, report_data) of each deleted report
+    """
+    totals: Dict[tuple, Dict[AggregateKey, Dict[str, int]]] = {}
+    for user_id, language, scenario, created_at, report_data in reports:
+        if user_id is None:
+            continue
+        merge_deltas(
+            totals.setdefault((user_id, language, week_start(created_at)), {}),
+            progress_deltas(scenario, None, report_data)
+        )
+    # Sorted so concurrent deletes lock aggregate rows in the same order
+    for (user_id, language, week), deltas in sorted(totals.items()):
+        await add_progress_deltas(db, user_id, language, week, deltas)
+
+
+@traced("db.get_user_progress")
+async def get_user_progress(
+    db: AsyncSession,
+    user_id: UUID,
+    language: Optional[str] = None
+) -> List[ProgressAggregate]:
+    """
+    Get all of a user's aggregate rows, oldest week first
+    """
+    query = select(ProgressAggregate).where(ProgressAggregate.user_id == user_id)
+    if language:
+        query = query.where(ProgressAggregate.language == language)
+    result = await db.execute(query.order_by(ProgressAggregate.week_start))
+    return list(result.scalars().all())
+
+
+async def delete_user_progress(db: AsyncSession, user_id: UUID) -> None:
+    """
+    Delete a user's aggregates and vocabulary (before rebuilding them)
+    """
+    await db.execute(delete(ProgressAggregate).where(ProgressAggregate.user_id == user_id))
+    await db.execute(delete(LearnerTerm).where(LearnerTerm.user_id == user_id))
+
+
+async def get_users_with_reports(db: AsyncSession) -> List[UUID]:
+    """
+    IDs of users who own at least one reported conversation
+    """
+    result = await db.execute(
+        select(Conversation.user_id)
+        .join(Report, Report.conversation_id == Conversation.id)
+        .where(Conversation.user_id.is_not(None))
+        .distinct()
+    )
+    return list(result.scalars().all())
+
+
+async def get_user_report_contexts(
+    db: AsyncSession,
+    user_id: UUID,
+    after: Optional[Tuple[datetime, UUID]] = None,
+    limit: int = 500
+) -> List[tuple]:
+    """
+    One page of (id, language, scenario, created_at, messages, report_data)
+    of a user's reported conversations, oldest first
+
+    Args:
+        after: (created_at, id) of the previous page's last row
+    """
+    query = (
+        select(
+            Conversation.id,
+            Conversation.language,
+            Conversation.scenario,
+            Conversation.created_at,
+            Conversation.messages,
+            Report.report_data,
+        )
+        .join(Report, Report.conversation_id == Conversation.id)
+        .where(Conversation.user_id == user_id)
+    )
+    if after is not None:
+        query = query.where(tuple_(Conversation.created_at, Conversation.id) > tuple_(*after))
+    result = await db.execute(query.order_by(Conversation.created_at, Conversation.id).limit(limit))
+    return [tuple(row) for row in result.all()]
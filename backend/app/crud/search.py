@@ -0,0 +1,72 @@
+"""
+Full-text search over a user's conversations
+"""
+from typing import List
+
+from sqlalchemy import select, desc, func, literal_column, column
+from sqlalchemy.dialects.postgresql import JSONB
+from sqlalchemy.ext.asyncio import AsyncSession
+from uuid import UUID
+
+from ..core.tracing import traced
+from ..db.models import Conversation
+
+_SIMPLE = literal_column("'simple'::regconfig")
+
+
+def _escape_like(term: str) -> str:
+    return term.replace("!", "!!").replace("%", "!%").replace("_", "!_")
+
+
+@traced("db.search_user_conversations")
+async def search_user_conversations(
+    db: AsyncSession,
+    user_id: UUID,
+    tsquery: str,
+    snippet_term: str,
+    limit: int = 20,
+    offset: int = 0
+) -> List[tuple]:
+    """
+    Rank a user's conversations against a to_tsquery('simple', ...) query
+
+    Only metadata and the first message containing `snippet_term` are
+    returned, never whole transcripts.
+
+    Returns:
+        (id, session_id, language, scenario, created_at, rank, matched_message)
+        rows, best match first
+    """
+    query = func.to_tsquery(_SIMPLE, tsquery)
+    rank = func.ts_rank(Conversation.search_vector, query).label("rank")
+
+    message = func.jsonb_array_elements(Conversation.messages).table_valued(
+        column("value", JSONB)
+    ).render_derived(name="m")
+    content = message.c.value["content"].astext
+    matched_message = (
+        select(content)
+        .select_from(message)
+        .where(content.ilike(f"%{_escape_like(snippet_term)}%", escape="!"))
+        .limit(1)
+        .correlate(Conversation)
+        .scalar_subquery()
+        .label("matched_message")
+    )
+
+    result = await db.execute(
+        select(
+            Conversation.id,
+            Conversation.session_id,
+            Conversation.language,
+            Conversation.scenario,
+            Conversation.created_at,
+            rank,
+            matched_message,
+        )
+        .where(Conversation.user_id == user_id, Conversation.search_vector.op("@@")(query))
+        .order_by(desc(rank), desc(Conversation.created_at))
+        .limit(limit)
+        .offset(offset)
+    )
+    return [tuple(row) for row in result.all()]
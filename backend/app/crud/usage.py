@@ -0,0 +1,65 @@
+"""
+CRUD operations for UsageRecord model
+"""
+from datetime import datetime
+from typing import List
+from sqlalchemy import select, insert, func
+from sqlalchemy.ext.asyncio import AsyncSession
+from uuid import UUID
+
+from ..db.models import UsageRecord
+
+
+async def insert_usage_records(db: AsyncSession, rows: List[dict]) -> None:
+    """
+    Bulk insert aggregated usage rows
+    """
+    if not rows:
+        return
+    await db.execute(insert(UsageRecord), rows)
+
+
+async def get_user_tokens_since(db: AsyncSession, user_id: UUID, since: datetime) -> int:
+    """
+    Total prompt + completion tokens recorded for a user since a point in time
+    """
+    result = await db.execute(
+        select(func.coalesce(func.sum(UsageRecord.prompt_tokens + UsageRecord.completion_tokens), 0))
+        .where(UsageRecord.user_id == user_id, UsageRecord.bucket_start >= since)
+    )
+    return int(result.scalar_one())
+
+
+async def get_usage_by_scenario(db: AsyncSession, since: datetime) -> List[dict]:
+    """
+    Token usage per scenario and operation since a point in time
+
+    Each LLM call is one turn (a chat reply, a report, or a repair request).
+    """
+    turns = func.sum(UsageRecord.calls)
+    prompt_tokens = func.sum(UsageRecord.prompt_tokens)
+    completion_tokens = func.sum(UsageRecord.completion_tokens)
+    result = await db.execute(
+        select(
+            UsageRecord.scenario,
+            UsageRecord.operation,
+            UsageRecord.provider,
+            UsageRecord.model,
+            turns.label("turns"),
+            prompt_tokens.label("prompt_tokens"),
+            completion_tokens.label("completion_tokens"),
+            func.sum(UsageRecord.cached_tokens).label("cached_tokens"),
+            func.sum(UsageRecord.cost_usd).label("cost_usd"),
+        )
+        .where(UsageRecord.bucket_start >= since)
+        .group_by(UsageRecord.scenario, UsageRecord.operation, UsageRecord.provider, UsageRecord.model)
+        .order_by(prompt_tokens.desc())
+    )
+    rows = []
+    for row in result:
+        data = dict(row._mapping)
+        data["cost_usd"] = float(data["cost_usd"] or 0)
+        data["prompt_tokens_per_turn"] = round(data["prompt_tokens"] / data["turns"], 1) if data["turns"] else 0
+        data["completion_tokens_per_turn"] = round(data["completion_tokens"] / data["turns"], 1) if data["turns"] else 0
+        rows.append(data)
+    return rows
@@ -1,15 +1,18 @@
 """
 CRUD operations for User model
 """
+from datetime import datetime
 from typing import Optional
 from sqlalchemy import select
 from sqlalchemy.ext.asyncio import AsyncSession
-from uuid import UUID
+from uuid import UUID, uuid4
 
 from ..db.models import User
 from ..core.security import get_password_hash, verify_password
+from ..core.tracing import traced
 
 
+@traced("db.get_user_by_id")
 async def get_user_by_id(db: AsyncSession, user_id: UUID) -> Optional[User]:
     """
     Get user by ID
@@ -28,14 +31,14 @@ async def get_user_by_email(db: AsyncSession, email: str) -> Optional[User]:
 
 async def create_user(db: AsyncSession, email: str, password: str) -> User:
     """
-    Create a new user with hashed password
+    Stage a new user with hashed password
+
+    The id is assigned here so a token can be issued before the commit.
     """
     hashed_password = get_password_hash(password)
-    user = User(email=email, hashed_password=hashed_password)
+    user = User(id=uuid4(), email=email, hashed_password=hashed_password, created_at=datetime.utcnow())
 
     db.add(user)
-    await db.commit()
-    await db.refresh(user)
 
     return user
 
@@ -49,7 +52,7 @@ async def authenticate_user(db: AsyncSession, email: str, password: str) -> Opti
     """
     user = await get_user_by_email(db, email)
 
-    if not user:
+    if not user or user.deletion_requested_at is not None:
         return None
 
     if not verify_password(password, user.hashed_password):
@@ -1,3 +1,3 @@
-from .database import Base, get_db, init_db, engine
+from .database import Base, get_db, init_db, engine, unit_of_work, bind_user
 
-__all__ = ["Base", "get_db", "init_db", "engine"]
+__all__ = ["Base", "get_db", "init_db", "engine", "unit_of_work", "bind_user"]
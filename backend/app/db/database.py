@@ -1,27 +1,134 @@
 """
 Database connection and session management
+
+Writes go to the primary at DATABASE_URL (PostgreSQL, or a SQLite file;
+see dialect.py). When DATABASE_REPLICA_URLS is set, plain SELECTs are
+routed to the replicas, except inside unit_of_work() and for a few
+seconds after the same user's own write.
 """
-from sqlalchemy.ext.asyncio import create_async_engine, AsyncSession, async_sessionmaker
-from sqlalchemy.orm import declarative_base
+import asyncio
+import itertools
+import time
+from contextlib import asynccontextmanager
+from typing import AsyncIterator, Dict, List, Optional
+from uuid import UUID
+from sqlalchemy import text
+from sqlalchemy.ext.asyncio import create_async_engine, AsyncEngine, AsyncSession, async_sessionmaker
+from sqlalchemy.orm import Session, declarative_base
+from sqlalchemy.pool import AsyncAdaptedQueuePool
+from sqlalchemy.sql import Select
 from ..config import settings
+from ..core.metrics import instrument_engine, instrument_pool, instrument_pool_class
+from .dialect import IS_SQLITE, begin_write, configure_sqlite_engine, is_sqlite_url
+
+
+def _connect_args(url: str) -> dict:
+    """asyncpg statement cache sizes (set both to 0 behind PgBouncer in transaction mode)"""
+    if "asyncpg" not in url:
+        return {}
+    return {
+        "statement_cache_size": settings.DB_STATEMENT_CACHE_SIZE,
+        "prepared_statement_cache_size": settings.DB_PREPARED_STATEMENT_CACHE_SIZE,
+    }
+
+
+def create_engine(url: str, name: str) -> AsyncEngine:
+    """Create an instrumented async engine with the configured pool"""
+    new_engine = create_async_engine(
+        url,
+        echo=settings.DEBUG,
+        future=True,
+        poolclass=instrument_pool_class(AsyncAdaptedQueuePool),
+        pool_size=settings.DB_POOL_SIZE,
+        max_overflow=settings.DB_MAX_OVERFLOW,
+        pool_timeout=settings.DB_POOL_TIMEOUT,
+        pool_recycle=settings.DB_POOL_RECYCLE,
+        # Pre-ping costs a round trip per checkout; recycling alone is usually
+        # enough unless connections are cut by a proxy or failover
+        pool_pre_ping=settings.DB_POOL_PRE_PING,
+        connect_args=_connect_args(url),
+    )
+    if is_sqlite_url(url):
+        configure_sqlite_engine(new_engine)
+    instrument_engine(new_engine)
+    instrument_pool(new_engine.pool, name)
+    return new_engine
+
+
+# Create async engines
+engine = create_engine(settings.DATABASE_URL, "primary")
+replica_engines: List[AsyncEngine] = [
+    create_engine(url, f"replica{i}") for i, url in enumerate(settings.DATABASE_REPLICA_URLS)
+]
+
+
+class ReplicaRouter:
+    """
+    Picks a replica for reads and remembers recent writers
+
+    A user who just wrote reads from the primary for `sticky_seconds`, so
+    they see their own changes despite replication lag. Stickiness is
+    kept per worker.
+    """
+
+    def __init__(self, replicas: List[AsyncEngine], sticky_seconds: float = 5.0, max_users: int = 100000):
+        self.replicas = replicas
+        self.sticky_seconds = sticky_seconds
+        self.max_users = max_users
+        self._cycle = itertools.cycle(replicas) if replicas else None
+        self._recent_writes: Dict[UUID, float] = {}
+
+    def choose(self) -> Optional[AsyncEngine]:
+        """Next replica in round-robin order, or None without replicas"""
+        return next(self._cycle) if self._cycle else None
+
+    def mark_write(self, user_id: UUID) -> None:
+        now = time.monotonic()
+        if len(self._recent_writes) >= self.max_users:
+            self._recent_writes = {u: t for u, t in self._recent_writes.items() if t > now}
+        self._recent_writes[user_id] = now + self.sticky_seconds
+
+    def is_sticky(self, user_id: UUID) -> bool:
+        until = self._recent_writes.get(user_id)
+        return until is not None and until > time.monotonic()
+
+
+replica_router = ReplicaRouter(replica_engines, settings.REPLICA_STICKY_SECONDS)
+
+
+class RoutingSession(Session):
+    """Session sending plain SELECTs to a replica and everything else to the primary"""
+
+    def get_bind(self, mapper=None, clause=None, **kw):
+        if self._flushing or self.info.get("primary") or not self._is_plain_select(clause):
+            return engine.sync_engine
+        user_id = self.info.get("user_id")
+        if user_id is not None and replica_router.is_sticky(user_id):
+            return engine.sync_engine
+        replica = replica_router.choose()
+        return (replica or engine).sync_engine
+
+    @staticmethod
+    def _is_plain_select(clause) -> bool:
+        return isinstance(clause, Select) and clause._for_update_arg is None
 
-# Create async engine
-engine = create_async_engine(
-    settings.DATABASE_URL,
-    echo=settings.DEBUG,
-    future=True,
-    pool_pre_ping=True,
-)
 
 # Create async session factory
 async_session_maker = async_sessionmaker(
     engine,
     class_=AsyncSession,
+    sync_session_class=RoutingSession if replica_engines else Session,
     expire_on_commit=False,
     autocommit=False,
     autoflush=False,
 )
 
+
+def bind_user(session: AsyncSession, user_id: UUID) -> None:
+    """Tie a session to a user for read-your-writes routing"""
+    session.info["user_id"] = user_id
+
+
 # Create declarative base for models
 Base = declarative_base()
 
@@ -29,11 +136,13 @@ Base = declarative_base()
 async def get_db() -> AsyncSession:
     """
     Dependency to get database session
+
+    Nothing is committed here: CRUD functions only stage changes and
+    endpoints that write commit once with unit_of_work().
     """
     async with async_session_maker() as session:
         try:
             yield session
-            await session.commit()
         except Exception:
             await session.rollback()
             raise
@@ -41,6 +150,79 @@ async def get_db() -> AsyncSession:
             await session.close()
 
 
+@asynccontextmanager
+async def unit_of_work(session: Optional[AsyncSession] = None) -> AsyncIterator[AsyncSession]:
+    """
+    Commit everything staged in a block once, or roll it all back on error
+
+    Args:
+        session: Session to commit; if omitted a new one is opened and closed
+            (for work that outlives the request, e.g. SSE stream bodies)
+
+    Usage:
+        async with unit_of_work(db):
+            await create_conversation(db, ...)
+    """
+    if session is None:
+        async with async_session_maker() as own_session:
+            async with unit_of_work(own_session):
+                yield own_session
+        return
+
+    # Reads that feed a write must see the primary
+    session.info["primary"] = True
+    try:
+        if IS_SQLITE:
+            await begin_write(session)
+        yield session
+        await session.commit()
+    except BaseException:
+        await session.rollback()
+        raise
+    finally:
+        session.info["primary"] = False
+
+    user_id = session.info.get("user_id")
+    if user_id is not None and replica_router.replicas:
+        replica_router.mark_write(user_id)
+
+
+def pool_status() -> Dict[str, int]:
+    """Connection counts of the engine's pool"""
+    pool = engine.pool
+    return {
+        "size": pool.size(),
+        "max_overflow": settings.DB_MAX_OVERFLOW,
+        "checked_out": pool.checkedout(),
+        "checked_in": pool.checkedin(),
+        "overflow": max(pool.overflow(), 0),
+    }
+
+
+async def check_database(timeout: float) -> Optional[str]:
+    """
+    Check that a connection can be checked out and used within `timeout`
+
+    Returns:
+        None if healthy, otherwise a short reason
+    """
+    status = pool_status()
+    if status["checked_out"] >= status["size"] + status["max_overflow"]:
+        return "pool exhausted"
+
+    async def ping():
+        async with engine.connect() as conn:
+            await conn.execute(text("SELECT 1"))
+
+    try:
+        await asyncio.wait_for(ping(), timeout)
+    except asyncio.TimeoutError:
+        return "timeout"
+    except Exception as e:
+        return type(e).__name__
+    return None
+
+
 async def init_db():
     """
     Initialize database - create all tables
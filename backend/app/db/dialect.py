@@ -0,0 +1,75 @@
+"""
+Backend selection from DATABASE_URL
+
+PostgreSQL (postgresql+asyncpg://...) is the production backend. SQLite
+(sqlite+aiosqlite:///path/to/file.db) runs single-node deployments and
+local integration tests with the same CRUD semantics: upserts use the
+dialect's INSERT ... ON CONFLICT, and statements that rely on
+data-modifying CTEs run as several statements in the same transaction.
+SQLite databases are opened in WAL mode, so readers do not block the
+writer.
+
+Features built on PostgreSQL internals are unavailable on SQLite:
+full-text search, cohort analytics, and the partitioned archive job.
+"""
+from sqlalchemy import event
+from sqlalchemy.dialects import postgresql, sqlite
+from sqlalchemy.engine import make_url
+
+from ..config import settings
+
+# Waited for a lock held by another writer before SQLITE_BUSY is raised
+SQLITE_BUSY_TIMEOUT_MS = 5000
+
+# Connection execution option: begin with BEGIN IMMEDIATE (see begin_write)
+_IMMEDIATE = "sqlite_begin_immediate"
+
+
+def is_sqlite_url(url: str) -> bool:
+    return make_url(url).get_backend_name() == "sqlite"
+
+
+IS_SQLITE = is_sqlite_url(settings.DATABASE_URL)
+
+# INSERT construct with on_conflict_do_update/do_nothing for the configured backend
+insert = sqlite.insert if IS_SQLITE else postgresql.insert
+
+
+def configure_sqlite_engine(engine) -> None:
+    """
+    WAL mode, foreign keys and real transactions for a SQLite engine
+
+    The driver's own transaction handling only begins a transaction at the
+    first write, so a read and the write it feeds would not be atomic.
+    It is turned off and SQLAlchemy's begin emits BEGIN instead.
+    """
+    sync_engine = getattr(engine, "sync_engine", engine)
+
+    @event.listens_for(sync_engine, "connect")
+    def _connect(dbapi_connection, connection_record):
+        dbapi_connection.isolation_level = None
+        cursor = dbapi_connection.cursor()
+        cursor.execute("PRAGMA journal_mode=WAL")
+        cursor.execute("PRAGMA synchronous=NORMAL")
+        cursor.execute("PRAGMA foreign_keys=ON")
+        cursor.execute(f"PRAGMA busy_timeout={SQLITE_BUSY_TIMEOUT_MS}")
+        cursor.close()
+
+    @event.listens_for(sync_engine, "begin")
+    def _begin(conn):
+        conn.exec_driver_sql("BEGIN IMMEDIATE" if conn.get_execution_options().get(_IMMEDIATE) else "BEGIN")
+
+
+async def begin_write(session) -> None:
+    """
+    Start a session's next transaction as a SQLite write transaction
+
+    A transaction that began with a read only holds a shared lock, and if
+    another connection commits first, upgrading it to a write fails at once
+    with "database is locked" instead of waiting for the busy timeout.
+    Reads made so far are committed (as under READ COMMITTED on PostgreSQL)
+    and BEGIN IMMEDIATE takes the write lock up front.
+    """
+    if session.in_transaction():
+        await session.commit()
+    await session.connection(execution_options={_IMMEDIATE: True})
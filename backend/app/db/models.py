@@ -1,22 +1,32 @@
 """
-Database models for User, Conversation, and Report
+Database models for User, Conversation, Report, ConversationArchive, UsageRecord,
+the learner-progress aggregates and AccountDeletion
 """
-from sqlalchemy import Column, String, DateTime, ForeignKey, Text
-from sqlalchemy.dialects.postgresql import UUID, JSONB
-from sqlalchemy.orm import relationship
+from sqlalchemy import (
+    Column, String, Date, DateTime, ForeignKey, Text, Integer, Numeric, Index, LargeBinary, Boolean, JSON, Uuid
+)
+from sqlalchemy.dialects import postgresql
+from sqlalchemy.orm import relationship, deferred
 from datetime import datetime
 import uuid
 
 from .database import Base
 
+# JSONB and tsvector on PostgreSQL; JSON text and plain text on SQLite
+JSONDocument = JSON().with_variant(postgresql.JSONB(), "postgresql")
+SearchVector = Text().with_variant(postgresql.TSVECTOR(), "postgresql")
+
 
 class User(Base):
     __tablename__ = "users"
 
-    id = Column(UUID(as_uuid=True), primary_key=True, default=uuid.uuid4)
+    id = Column(Uuid, primary_key=True, default=uuid.uuid4)
     email = Column(String(255), unique=True, nullable=False, index=True)
     hashed_password = Column(String(255), nullable=False)
     created_at = Column(DateTime, default=datetime.utcnow, nullable=False)
+    # Set when the user asks to delete their account; the user can no longer
+    # sign in while the background deletion runs
+    deletion_requested_at = Column(DateTime, nullable=True)
 
     # Relationships
     conversations = relationship("Conversation", back_populates="user", cascade="all, delete-orphan")
@@ -28,18 +38,34 @@ class User(Base):
 class Conversation(Base):
     __tablename__ = "conversations"
 
-    id = Column(UUID(as_uuid=True), primary_key=True, default=uuid.uuid4)
-    user_id = Column(UUID(as_uuid=True), ForeignKey("users.id"), nullable=True, index=True)
-    session_id = Column(UUID(as_uuid=True), unique=True, nullable=False, index=True)
+    id = Column(Uuid, primary_key=True, default=uuid.uuid4)
+    user_id = Column(Uuid, ForeignKey("users.id"), nullable=True, index=True)
+    session_id = Column(Uuid, unique=True, nullable=False, index=True)
     language = Column(String(50), nullable=False)
     scenario = Column(String(100), nullable=False)
-    messages = Column(JSONB, nullable=False, default=list)
+    messages = Column(JSONDocument, nullable=False, default=list)
     created_at = Column(DateTime, default=datetime.utcnow, nullable=False, index=True)
+    # Bumped on every change to messages or report; used for ETags
+    updated_at = Column(DateTime, default=datetime.utcnow, onupdate=datetime.utcnow, nullable=False)
+    # Message tokens (weight A) and report findings (weight B); see core.text_search
+    search_vector = deferred(Column(SearchVector, nullable=True))
 
     # Relationships
     user = relationship("User", back_populates="conversations")
     report = relationship("Report", back_populates="conversation", uselist=False, cascade="all, delete-orphan")
 
+    __table_args__ = (
+        Index(
+            "ix_conversations_user_id_created_at", "user_id", "created_at",
+            postgresql_include=["id", "updated_at"]
+        ),
+        # Needs btree_gin: one index answers "this user's conversations matching q"
+        Index(
+            "ix_conversations_user_id_search_vector", "user_id", "search_vector",
+            postgresql_using="gin"
+        ),
+    )
+
     def __repr__(self):
         return f"<Conversation {self.session_id} - {self.scenario}>"
 
@@ -47,9 +73,9 @@ class Conversation(Base):
 class Report(Base):
     __tablename__ = "reports"
 
-    id = Column(UUID(as_uuid=True), primary_key=True, default=uuid.uuid4)
-    conversation_id = Column(UUID(as_uuid=True), ForeignKey("conversations.id"), nullable=False, unique=True, index=True)
-    report_data = Column(JSONB, nullable=False)
+    id = Column(Uuid, primary_key=True, default=uuid.uuid4)
+    conversation_id = Column(Uuid, ForeignKey("conversations.id"), nullable=False, unique=True, index=True)
+    report_data = Column(JSONDocument, nullable=False)
     created_at = Column(DateTime, default=datetime.utcnow, nullable=False)
 
     # Relationships
@@ -57,3 +83,131 @@ class Report(Base):
 
     def __repr__(self):
         return f"<Report for conversation {self.conversation_id}>"
+
+
+class ConversationArchive(Base):
+    """
+    Cold conversation with its report, compressed into one row
+
+    Range-partitioned by created_at month (conversation_archive_YYYY_MM);
+    partitions are created by the archive job and dropped for retention.
+    """
+    __tablename__ = "conversation_archive"
+
+    id = Column(Uuid, primary_key=True)
+    created_at = Column(DateTime, primary_key=True)
+    session_id = Column(Uuid, nullable=False, index=True)
+    user_id = Column(Uuid, ForeignKey("users.id", ondelete="CASCADE"), nullable=True)
+    language = Column(String(50), nullable=False)
+    scenario = Column(String(100), nullable=False)
+    updated_at = Column(DateTime, nullable=False)
+    archived_at = Column(DateTime, default=datetime.utcnow, nullable=False)
+    has_report = Column(Boolean, nullable=False, default=False)
+    # zlib-compressed JSON: {"messages": [...], "report": {...} | null}
+    payload = Column(LargeBinary, nullable=False)
+
+    __table_args__ = (
+        Index("ix_conversation_archive_user_id_created_at", "user_id", "created_at"),
+        {"postgresql_partition_by": "RANGE (created_at)"},
+    )
+
+    def __repr__(self):
+        return f"<ConversationArchive {self.session_id} - {self.scenario}>"
+
+
+class UsageRecord(Base):
+    """LLM token usage aggregated per hour, user, session, provider and operation"""
+    __tablename__ = "usage_records"
+
+    id = Column(Uuid, primary_key=True, default=uuid.uuid4)
+    user_id = Column(Uuid, ForeignKey("users.id", ondelete="CASCADE"), nullable=True)
+    session_id = Column(String(64), nullable=True)
+    provider = Column(String(50), nullable=False)
+    model = Column(String(255), nullable=False)
+    operation = Column(String(50), nullable=False)
+    language = Column(String(50), nullable=True)
+    scenario = Column(String(100), nullable=True)
+    bucket_start = Column(DateTime, nullable=False, index=True)
+    calls = Column(Integer, nullable=False, default=0)
+    prompt_tokens = Column(Integer, nullable=False, default=0)
+    completion_tokens = Column(Integer, nullable=False, default=0)
+    cached_tokens = Column(Integer, nullable=False, default=0)
+    latency_ms = Column(Integer, nullable=False, default=0)
+    cost_usd = Column(Numeric(12, 6), nullable=False, default=0)
+
+    __table_args__ = (
+        Index("ix_usage_records_user_id_bucket_start", "user_id", "bucket_start"),
+    )
+
+    def __repr__(self):
+        return f"<UsageRecord {self.user_id} {self.operation} {self.bucket_start}>"
+
+
+class ProgressAggregate(Base):
+    """
+    Per-user weekly report totals, maintained incrementally by create_report
+
+    Rows with dimension "scenario" carry every counter for one scenario;
+    rows with dimension "error_type" carry grammar_errors for one type.
+    Weeks start on Monday of the conversation's creation week.
+    """
+    __tablename__ = "progress_aggregates"
+
+    user_id = Column(Uuid, ForeignKey("users.id", ondelete="CASCADE"), primary_key=True)
+    week_start = Column(Date, primary_key=True)
+    language = Column(String(50), primary_key=True)
+    dimension = Column(String(20), primary_key=True)
+    key = Column(String(100), primary_key=True)
+    reports = Column(Integer, nullable=False, default=0)
+    turns = Column(Integer, nullable=False, default=0)
+    words = Column(Integer, nullable=False, default=0)
+    grammar_errors = Column(Integer, nullable=False, default=0)
+    vocabulary_issues = Column(Integer, nullable=False, default=0)
+    naturalness_issues = Column(Integer, nullable=False, default=0)
+    # Terms the learner used for the first time; their sum is vocabulary breadth
+    new_terms = Column(Integer, nullable=False, default=0)
+
+    def __repr__(self):
+        return f"<ProgressAggregate {self.user_id} {self.week_start} {self.dimension}={self.key}>"
+
+
+class LearnerTerm(Base):
+    """Distinct terms a learner has used, per language"""
+    __tablename__ = "learner_terms"
+
+    user_id = Column(Uuid, ForeignKey("users.id", ondelete="CASCADE"), primary_key=True)
+    language = Column(String(50), primary_key=True)
+    term = Column(String(100), primary_key=True)
+    first_seen = Column(Date, nullable=False)
+
+    def __repr__(self):
+        return f"<LearnerTerm {self.user_id} {self.term}>"
+
+
+class AccountDeletion(Base):
+    """
+    Progress of a background account deletion
+
+    No foreign key: the row outlives the user so the outcome can still be
+    reported. Only the user's id is kept.
+    """
+    __tablename__ = "account_deletions"
+
+    user_id = Column(Uuid, primary_key=True)
+    # pending -> running -> done
+    status = Column(String(20), nullable=False, default="pending")
+    total_conversations = Column(Integer, nullable=False, default=0)
+    deleted_conversations = Column(Integer, nullable=False, default=0)
+    requested_at = Column(DateTime, default=datetime.utcnow, nullable=False)
+    started_at = Column(DateTime, nullable=True)
+    # Bumped after every batch; a running deletion not bumped for a lease is resumed
+    updated_at = Column(DateTime, default=datetime.utcnow, nullable=False)
+    finished_at = Column(DateTime, nullable=True)
+    error = Column(Text, nullable=True)
+
+    __table_args__ = (
+        Index("ix_account_deletions_status_requested_at", "status", "requested_at"),
+    )
+
+    def __repr__(self):
+        return f"<AccountDeletion {self.user_id} {self.status}>"
@@ -1,3 +1,8 @@
-from .auth import get_current_user, require_current_user
+from .auth import get_current_user, require_current_user, require_admin
+from .usage import enforce_usage_quota
+from .rate_limit import limit_chat, limit_report
 
-__all__ = ["get_current_user", "require_current_user"]
+__all__ = [
+    "get_current_user", "require_current_user", "require_admin", "enforce_usage_quota",
+    "limit_chat", "limit_report"
+]
@@ -6,26 +6,26 @@ from fastapi import Depends, HTTPException, status
 from fastapi.security import HTTPBearer, HTTPAuthorizationCredentials
 from sqlalchemy.ext.asyncio import AsyncSession
 
-from ..db.database import get_db
+from ..db.database import get_db, bind_user
 from ..db.models import User
 from ..crud.user import get_user_by_id
+from ..config import settings
 from ..core.security import decode_access_token
+from ..core.tracing import traced
 from uuid import UUID
 
 # HTTP Bearer token security scheme (optional - won't raise if missing)
 security = HTTPBearer(auto_error=False)
 
 
-async def get_current_user(
-    credentials: Optional[HTTPAuthorizationCredentials] = Depends(security),
-    db: AsyncSession = Depends(get_db)
-) -> Optional[User]:
+async def get_token_user_id(
+    credentials: Optional[HTTPAuthorizationCredentials] = Depends(security)
+) -> Optional[UUID]:
     """
-    Get current authenticated user from JWT token
+    Get the user id a valid JWT was issued to, without loading the user
 
     Returns:
-        User object if token is valid, None if no token or invalid token
-        This is OPTIONAL authentication - guests can use the app without a token
+        The token's subject, or None if no token or invalid token
     """
     if not credentials:
         return None
@@ -41,11 +41,32 @@ async def get_current_user(
         return None
 
     try:
-        user_id = UUID(user_id_str)
+        return UUID(user_id_str)
     except ValueError:
         return None
 
+
+@traced("auth.get_current_user")
+async def get_current_user(
+    user_id: Optional[UUID] = Depends(get_token_user_id),
+    db: AsyncSession = Depends(get_db)
+) -> Optional[User]:
+    """
+    Get current authenticated user from JWT token
+
+    Returns:
+        User object if token is valid, None if no token or invalid token
+        This is OPTIONAL authentication - guests can use the app without a token
+    """
+    if user_id is None:
+        return None
+
+    # Route this request's reads with read-your-writes stickiness
+    bind_user(db, user_id)
     user = await get_user_by_id(db, user_id)
+    if user is not None and user.deletion_requested_at is not None:
+        # The account is being deleted
+        return None
     return user
 
 
@@ -64,3 +85,17 @@ async def require_current_user(
             headers={"WWW-Authenticate": "Bearer"},
         )
     return current_user
+
+
+async def require_admin(
+    current_user: User = Depends(require_current_user)
+) -> User:
+    """
+    Require an admin user - raises 403 unless the email is in ADMIN_EMAILS
+    """
+    if current_user.email.lower() not in settings.ADMIN_EMAILS:
+        raise HTTPException(
+            status_code=status.HTTP_403_FORBIDDEN,
+            detail="Admin access required"
+        )
+    return current_user
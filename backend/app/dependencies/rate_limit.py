@@ -0,0 +1,80 @@
+"""
+Rate limiting dependencies for FastAPI endpoints
+"""
+from typing import Callable, List, Optional
+from fastapi import Depends, HTTPException, Request, status
+
+from ..config import settings
+from ..core.rate_limit import (
+    RATE_LIMITED_REQUESTS,
+    estimate_cost,
+    rate_limiter,
+    retry_after_header,
+)
+from ..db.models import User
+from .auth import get_current_user
+
+
+def _contents(messages) -> List[str]:
+    if not isinstance(messages, list):
+        return []
+    return [m["content"] for m in messages if isinstance(m, dict) and isinstance(m.get("content"), str)]
+
+
+def chat_cost(body: dict) -> float:
+    """Bucket tokens for a chat turn: the new message plus its history"""
+    message = body.get("message")
+    return estimate_cost(_contents(body.get("history")) + ([message] if isinstance(message, str) else []))
+
+
+def report_cost(body: dict) -> float:
+    """Bucket tokens for a report: the transcript, with a larger base for the long output"""
+    return estimate_cost(_contents(body.get("conversation")), base=settings.RATE_LIMIT_REPORT_BASE_COST)
+
+
+def rate_limit(cost: Callable[[dict], float]):
+    """
+    Build a dependency that charges a request's estimated cost to its bucket
+
+    Authenticated users are keyed by id and guests by client IP.
+
+    Args:
+        cost: Estimates bucket tokens from the JSON request body
+    """
+    async def dependency(
+        request: Request,
+        current_user: Optional[User] = Depends(get_current_user)
+    ) -> None:
+        if not settings.RATE_LIMIT_ENABLED:
+            return
+
+        # FastAPI has already read and cached the body for the endpoint
+        try:
+            body = await request.json()
+        except ValueError:
+            body = None
+        amount = cost(body) if isinstance(body, dict) else 1.0
+
+        guest = current_user is None
+        if guest:
+            key = f"ip:{request.client.host if request.client else 'unknown'}"
+        else:
+            key = f"user:{current_user.id}"
+
+        result = await rate_limiter.hit(key, amount, guest=guest)
+        if not result.allowed:
+            route = request.scope.get("route")
+            RATE_LIMITED_REQUESTS.labels(
+                route.path if route else request.url.path, "guest" if guest else "user"
+            ).inc()
+            raise HTTPException(
+                status_code=status.HTTP_429_TOO_MANY_REQUESTS,
+                detail="Rate limit exceeded, please slow down",
+                headers={"Retry-After": retry_after_header(result)},
+            )
+
+    return dependency
+
+
+limit_chat = rate_limit(chat_cost)
+limit_report = rate_limit(report_cost)
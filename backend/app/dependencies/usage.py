@@ -0,0 +1,40 @@
+"""
+Usage quota dependencies for FastAPI endpoints
+"""
+from datetime import datetime, timedelta
+from typing import Optional
+from fastapi import Depends, HTTPException, status
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from ..db.database import get_db
+from ..db.models import User
+from ..services.usage import usage_tracker
+from .auth import get_current_user
+
+
+def _seconds_until_utc_midnight() -> int:
+    now = datetime.utcnow()
+    tomorrow = (now + timedelta(days=1)).replace(hour=0, minute=0, second=0, microsecond=0)
+    return int((tomorrow - now).total_seconds()) + 1
+
+
+async def enforce_usage_quota(
+    current_user: Optional[User] = Depends(get_current_user),
+    db: AsyncSession = Depends(get_db)
+) -> None:
+    """
+    Reject LLM requests from users who used up today's token quota
+
+    Checked against in-memory counters; the database is only read the
+    first time a user is seen each day.
+    """
+    if current_user is None or not usage_tracker.daily_token_quota:
+        return
+
+    await usage_tracker.ensure_warm(db, current_user.id)
+    if usage_tracker.remaining_tokens(current_user.id) <= 0:
+        raise HTTPException(
+            status_code=status.HTTP_429_TOO_MANY_REQUESTS,
+            detail="Daily token quota exceeded",
+            headers={"Retry-After": str(_seconds_until_utc_midnight())},
+        )
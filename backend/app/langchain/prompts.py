@@ -1,7 +1,15 @@
 """
 LangChain prompts for conversations and report generation
 Contains scenario-specific system prompts and report analysis prompts
+
+All templates are compiled once into a PromptRegistry keyed by
+(language, scenario, version). Compiled prompts are byte-for-byte stable
+between turns so providers with prefix/KV caching can reuse them.
 """
+import hashlib
+from dataclasses import dataclass
+from typing import Dict, Optional, Tuple
+
 from app.models.schemas import Scenario, Language
 
 
@@ -133,70 +141,43 @@ SCENARIO_CONTEXTS = {
 }
 
 
-def get_conversation_system_prompt(language: Language, scenario: Scenario) -> str:
-    """
-    Generate system prompt for conversation phase
-
-    Args:
-        language: Target language (japanese or english)
-        scenario: Conversation scenario
-
-    Returns:
-        System prompt string for the conversation
-    """
-    scenario_info = SCENARIO_CONTEXTS[scenario][language.value]
-
-    if language == Language.JAPANESE:
-        prompt = f"""あなたは{scenario_info['role']}として、日本語学習者と会話します。
+# Conversation system prompt templates ({role}, {context}, {greeting})
+CONVERSATION_TEMPLATES = {
+    Language.JAPANESE: """あなたは{role}として、日本語学習者と会話します。
 
 【重要な指示】
-1. {scenario_info['context']}
+1. {context}
 2. 会話中は文法ミスや不自然な表現を訂正しないでください。自然な会話の流れを維持してください。
 3. ユーザーの言いたいことを理解し、それに対して適切に応答してください。
 4. 日本語学習者向けに、やや丁寧でわかりやすい日本語を使用してください。
 5. 会話は自然に、1〜3文程度の短い応答を心がけてください。
 6. ユーザーの質問には具体的に答えてください。
 
-最初の挨拶: {scenario_info['greeting']}
+最初の挨拶: {greeting}
 
-では、会話を始めましょう！"""
-    else:  # English
-        prompt = f"""You are a {scenario_info['role']} having a conversation with an English language learner.
+では、会話を始めましょう！""",
+    Language.ENGLISH: """You are a {role} having a conversation with an English language learner.
 
 【IMPORTANT INSTRUCTIONS】
-1. {scenario_info['context']}
+1. {context}
 2. During the conversation, DO NOT correct grammar mistakes or unnatural expressions. Maintain natural conversation flow.
 3. Understand what the user wants to say and respond appropriately.
 4. Use clear, slightly simplified English suitable for language learners.
 5. Keep responses natural and brief (1-3 sentences).
 6. Answer user's questions specifically.
 
-Initial greeting: {scenario_info['greeting']}
-
-Let's begin the conversation!"""
-
-    return prompt
-
-
-def get_report_generation_prompt(language: Language, scenario: Scenario, conversation: str) -> str:
-    """
-    Generate prompt for report generation phase
-
-    Args:
-        language: Target language (japanese or english)
-        scenario: Conversation scenario
-        conversation: Full conversation text
+Initial greeting: {greeting}
 
-    Returns:
-        Analysis prompt string for report generation
-    """
-    if language == Language.JAPANESE:
-        prompt = f"""以下は日本語学習者との会話記録です。詳細な分析レポートを作成してください。
+Let's begin the conversation!""",
+}
 
-【会話シナリオ】: {scenario.value}
+# Report analysis instruction templates ({scenario})
+# The transcript is sent as a separate, final message so that these
+# instructions form a stable prefix across every report request.
+REPORT_TEMPLATES = {
+    Language.JAPANESE: """あなたは日本語教師です。この後に送られる日本語学習者との会話記録を分析し、詳細な分析レポートを作成してください。
 
-【会話内容】:
-{conversation}
+【会話シナリオ】: {scenario}
 
 【分析してください】:
 1. **文法エラー**: 助詞の誤用、活用ミス、文法的な誤りを指摘し、正しい形を提示してください。
@@ -204,15 +185,12 @@ def get_report_generation_prompt(language: Language, scenario: Scenario, convers
 3. **表現の自然さ**: 不自然な表現や、よりネイティブらしい言い方を提案してください。
 4. **良い点とフィードバック**: 上手に使えていた表現や、改善の方向性を肯定的に伝えてください。
 
+ターン数や単語数は別途計算されるため、出力しないでください。
+会話記録の後に「検出済みの誤り」が示された場合、それらは既にレポートに含まれているので繰り返さないでください。
+
 【出力形式】:
 必ずJSON形式で出力してください:
 {{
-  "overview": {{
-    "language": "japanese",
-    "scenario": "{scenario.value}",
-    "turns": [会話のターン数],
-    "word_count": [おおよその単語数]
-  }},
   "grammar_errors": [
     {{
       "error": "誤った文や表現",
@@ -240,15 +218,10 @@ def get_report_generation_prompt(language: Language, scenario: Scenario, convers
   ]
 }}
 
-JSONのみを出力し、他の説明は含めないでください。"""
-
-    else:  # English
-        prompt = f"""Below is a conversation record with an English language learner. Please create a detailed analysis report.
-
-【Conversation Scenario】: {scenario.value}
+JSONのみを出力し、他の説明は含めないでください。""",
+    Language.ENGLISH: """You are an English teacher. Analyze the conversation record with an English language learner that follows, and create a detailed analysis report.
 
-【Conversation Content】:
-{conversation}
+【Conversation Scenario】: {scenario}
 
 【Please analyze】:
 1. **Grammar Errors**: Point out article usage, tense errors, and grammatical mistakes with corrections.
@@ -256,15 +229,12 @@ JSONのみを出力し、他の説明は含めないでください。"""
 3. **Naturalness**: Point out unnatural expressions and suggest more native-like alternatives.
 4. **Positive Feedback**: Highlight well-used expressions and provide encouraging improvement directions.
 
+Turn and word counts are computed separately, do not output them.
+If "Already detected errors" are listed after the conversation record, they are already in the report, do not repeat them.
+
 【Output Format】:
 Must output in JSON format:
 {{
-  "overview": {{
-    "language": "english",
-    "scenario": "{scenario.value}",
-    "turns": [number of conversation turns],
-    "word_count": [approximate word count]
-  }},
   "grammar_errors": [
     {{
       "error": "Incorrect sentence or expression",
@@ -292,6 +262,147 @@ Must output in JSON format:
   ]
 }}
 
-Output only JSON, no other explanations."""
+Output only JSON, no other explanations.""",
+}
+
+# Header placed in front of the transcript in the final report message
+TRANSCRIPT_HEADERS = {
+    Language.JAPANESE: "【会話内容】:",
+    Language.ENGLISH: "【Conversation Content】:",
+}
+
+# Header for errors found by the local rule-based checks
+DETECTED_ERRORS_HEADERS = {
+    Language.JAPANESE: "【検出済みの誤り】:",
+    Language.ENGLISH: "【Already detected errors】:",
+}
+
+# Follow-up request for a single report section that was missing or invalid
+SECTION_REPAIR_TEMPLATES = {
+    Language.JAPANESE: """先ほどの出力の "{section}" の部分が欠けているか、形式が正しくありませんでした。
+上記の出力形式に従い、{{"{section}": ...}} という形のJSONオブジェクトのみを出力してください。""",
+    Language.ENGLISH: """The "{section}" section of your previous output was missing or malformed.
+Following the output format above, output only a JSON object of the form {{"{section}": ...}}.""",
+}
+
+# Bump whenever any template above changes so cache keys are invalidated
+PROMPT_VERSION = "2"
+
+
+@dataclass(frozen=True)
+class CompiledPrompt:
+    """A fully rendered prompt with a stable content hash (tagged on LLM spans as llm.prompt_hash)"""
+    text: str
+    version: str
+    content_hash: str
+
+    @classmethod
+    def build(cls, text: str, version: str) -> "CompiledPrompt":
+        digest = hashlib.sha256(f"{version}\x00{text}".encode("utf-8")).hexdigest()
+        return cls(text=text, version=version, content_hash=digest[:16])
+
+
+class PromptRegistry:
+    """
+    Precompiled prompts for every (language, scenario, version)
+
+    Rendering happens once when the registry is built; lookups on the
+    request path are plain dict reads.
+    """
+
+    def __init__(self, version: str = PROMPT_VERSION):
+        self.version = version
+        self._conversation: Dict[Tuple[Language, Scenario, str], CompiledPrompt] = {}
+        self._report: Dict[Tuple[Language, Scenario, str], CompiledPrompt] = {}
+        self.compile()
+
+    def compile(self) -> None:
+        """Render all templates for the registry version"""
+        for scenario, contexts in SCENARIO_CONTEXTS.items():
+            for language in Language:
+                key = (language, scenario, self.version)
+                scenario_info = contexts[language.value]
+                self._conversation[key] = CompiledPrompt.build(
+                    CONVERSATION_TEMPLATES[language].format(**scenario_info),
+                    self.version
+                )
+                self._report[key] = CompiledPrompt.build(
+                    REPORT_TEMPLATES[language].format(scenario=scenario.value),
+                    self.version
+                )
+
+    def conversation_prompt(self, language: Language, scenario: Scenario) -> CompiledPrompt:
+        """Get the compiled conversation system prompt"""
+        return self._conversation[(language, scenario, self.version)]
+
+    def report_prompt(self, language: Language, scenario: Scenario) -> CompiledPrompt:
+        """Get the compiled report analysis instructions"""
+        return self._report[(language, scenario, self.version)]
+
+
+# Singleton instance, compiled at import time
+prompt_registry = PromptRegistry()
+
+
+def get_conversation_system_prompt(language: Language, scenario: Scenario) -> str:
+    """
+    Get system prompt for conversation phase
+
+    Args:
+        language: Target language (japanese or english)
+        scenario: Conversation scenario
+
+    Returns:
+        System prompt string for the conversation
+    """
+    return prompt_registry.conversation_prompt(language, scenario).text
+
+
+def get_report_instructions(language: Language, scenario: Scenario) -> str:
+    """
+    Get the static instructions for report generation phase
+
+    Args:
+        language: Target language (japanese or english)
+        scenario: Conversation scenario
+
+    Returns:
+        Analysis instructions, to be sent before the transcript
+    """
+    return prompt_registry.report_prompt(language, scenario).text
+
 
-    return prompt
+def get_section_repair_prompt(language: Language, section: str) -> str:
+    """
+    Get the follow-up prompt that re-requests a single report section
+
+    Args:
+        language: Target language (japanese or english)
+        section: Name of the report section to regenerate
+
+    Returns:
+        Repair prompt string
+    """
+    return SECTION_REPAIR_TEMPLATES[language].format(section=section)
+
+
+def get_report_transcript_message(
+    language: Language,
+    conversation: str,
+    detected_errors: Optional[str] = None
+) -> str:
+    """
+    Format the transcript message that follows the report instructions
+
+    Args:
+        language: Target language (japanese or english)
+        conversation: Full conversation text
+        detected_errors: Errors already found by local checks, if any
+
+    Returns:
+        Transcript message string
+    """
+    message = f"{TRANSCRIPT_HEADERS[language]}\n{conversation}"
+    if detected_errors:
+        message += f"\n\n{DETECTED_ERRORS_HEADERS[language]}\n{detected_errors}"
+    return message
@@ -166,9 +166,66 @@ class ConversationDetail(BaseModel):
         from_attributes = True
 
 
+# Search Schemas
+
+class ConversationSearchHit(BaseModel):
+    """A matching conversation with a snippet instead of the transcript"""
+    id: UUID
+    session_id: UUID
+    language: str
+    scenario: str
+    created_at: datetime
+    rank: float
+    snippet: Optional[str] = Field(None, description="Excerpt of the first matching message, if any")
+
+
+class ConversationSearchResponse(BaseModel):
+    """One page of search results, best match first"""
+    query: str
+    results: List[ConversationSearchHit]
+    limit: int
+    offset: int
+    has_more: bool
+
+
+# Deletion Schemas
+
+class BulkDeleteRequest(BaseModel):
+    """Conversations to delete in one request"""
+    conversation_ids: List[UUID] = Field(..., min_length=1, max_length=500, description="Conversation ids")
+
+
+class BulkDeleteResponse(BaseModel):
+    """Which of the requested conversations were deleted"""
+    deleted: List[UUID]
+    not_found: List[UUID] = Field(..., description="Ids that do not exist or belong to someone else")
+
+
+class AccountDeletionStatus(BaseModel):
+    """Progress of a background account deletion"""
+    status: str = Field(..., description="pending, running or done")
+    total_conversations: int
+    deleted_conversations: int
+    requested_at: datetime
+    started_at: Optional[datetime] = None
+    finished_at: Optional[datetime] = None
+
+    class Config:
+        from_attributes = True
+
+
 # Migration Schemas
 
 class MigrateDataRequest(BaseModel):
     """Request to migrate localStorage conversations to database"""
     conversations: List[Dict] = Field(..., description="List of conversations from localStorage")
 
+
+# Admin Schemas
+
+class ProfileArmRequest(BaseModel):
+    """Arm a profile capture for the next requests to a route"""
+    route: str = Field(..., description="Path prefix to profile, e.g. /api/conversations")
+    requests: int = Field(default=10, ge=1, le=1000, description="Number of requests to capture")
+    memory: bool = Field(default=False, description="Also capture a tracemalloc snapshot diff")
+    interval_ms: float = Field(default=5.0, ge=1.0, le=100.0, description="CPU sampling interval")
@@ -0,0 +1,101 @@
+"""
+Trusted read path for stored conversations and reports
+
+Messages and reports written by the chat and report endpoints were
+validated on the way in, so they are passed through as plain dicts when
+they already have the exact response shape. The guards below are cheap
+type checks; anything that fails them (legacy or migrated rows) is run
+through the Pydantic models as before.
+"""
+import logging
+from typing import Any, Dict, List, Optional
+
+from .schemas import Message, Report
+
+logger = logging.getLogger(__name__)
+
+_MESSAGE_KEYS = {"role", "content"}
+_OVERVIEW_FIELDS = {"language": str, "scenario": str, "turns": int, "word_count": int}
+_ITEM_FIELDS = {
+    "grammar_errors": {"error", "correction", "explanation", "error_type"},
+    "vocabulary_issues": {"original", "suggestion", "explanation"},
+    "naturalness": {"unnatural", "natural", "context"},
+}
+_REPORT_KEYS = {"overview", "positive_feedback", *_ITEM_FIELDS}
+
+
+def _is_message(msg: Any) -> bool:
+    return (
+        type(msg) is dict
+        and msg.keys() == _MESSAGE_KEYS
+        and type(msg["role"]) is str
+        and type(msg["content"]) is str
+    )
+
+
+def _is_report(report: Any) -> bool:
+    if type(report) is not dict or report.keys() != _REPORT_KEYS:
+        return False
+
+    overview = report["overview"]
+    if type(overview) is not dict or overview.keys() != _OVERVIEW_FIELDS.keys():
+        return False
+    if any(type(overview[name]) is not kind for name, kind in _OVERVIEW_FIELDS.items()):
+        return False
+
+    for section, keys in _ITEM_FIELDS.items():
+        items = report[section]
+        if type(items) is not list:
+            return False
+        for item in items:
+            if type(item) is not dict or item.keys() != keys:
+                return False
+            # error_type is the only optional field
+            if any(type(v) is not str and not (v is None and k == "error_type") for k, v in item.items()):
+                return False
+
+    feedback = report["positive_feedback"]
+    return type(feedback) is list and all(type(f) is str for f in feedback)
+
+
+def message_list(messages: Optional[List[Any]]) -> List[Dict[str, str]]:
+    """Stored messages in response shape, validating only if needed"""
+    if not messages:
+        return []
+    if type(messages) is list and all(_is_message(m) for m in messages):
+        return messages
+    logger.debug("Validating stored messages", extra={"sample_key": "history.validated"})
+    return [Message.model_validate(m).model_dump() for m in messages]
+
+
+def report_dict(report_data: Optional[Dict[str, Any]]) -> Optional[Dict[str, Any]]:
+    """Stored report in response shape, validating only if needed"""
+    if report_data is None:
+        return None
+    if _is_report(report_data):
+        return report_data
+    logger.debug("Validating stored report", extra={"sample_key": "history.validated"})
+    # Older reports may lack empty sections
+    defaults = {section: [] for section in (*_ITEM_FIELDS, "positive_feedback")}
+    return Report.model_validate({**defaults, **report_data}).model_dump(mode="json")
+
+
+def conversation_detail(conversation) -> Dict[str, Any]:
+    """
+    Build a ConversationDetail-shaped dict from a Conversation row
+
+    Args:
+        conversation: Conversation with its report relationship loaded
+
+    Returns:
+        Dict ready for JSON encoding, equal to ConversationDetail's dump
+    """
+    return {
+        "id": conversation.id,
+        "session_id": conversation.session_id,
+        "language": conversation.language,
+        "scenario": conversation.scenario,
+        "messages": message_list(conversation.messages),
+        "created_at": conversation.created_at,
+        "report": report_dict(conversation.report.report_data if conversation.report else None),
+    }
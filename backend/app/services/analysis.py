@@ -0,0 +1,218 @@
+"""
+Local conversation analysis run before report generation
+Computes the report overview deterministically and catches common,
+unambiguous learner errors with cheap rules so the LLM only handles the rest
+"""
+import re
+from dataclasses import dataclass, field
+from typing import List, Optional
+
+from app.models.schemas import Language, Scenario, Message, ConversationOverview, ErrorAnalysis
+
+# Optional MeCab-based segmenter for accurate Japanese word counts
+try:
+    import fugashi
+    _tagger = fugashi.Tagger()
+except Exception:  # ImportError, or the dictionary package is missing
+    _tagger = None
+
+
+# Particles; never taken as okurigana
+_JA_PARTICLES = r"(?:から|まで|より|[をはがにでとのへも])"
+
+# Okurigana that starts with a particle character (上がる, 上がって, 最も)
+_JA_PARTICLE_OKURIGANA = r"(?:が(?:る|っ|りま|らな|れ|ろ)|(?<=最)も)"
+
+# Fallback Japanese segmentation: one token per run of the same script,
+# with trailing okurigana kept on the preceding kanji and a particle after
+# a kanji, katakana or latin word split off as its own token
+_JA_TOKEN_RE = re.compile(
+    r"[一-鿿々〆ヵヶ]+(?:" + _JA_PARTICLE_OKURIGANA + r"|(?!" + _JA_PARTICLES + r")[ぁ-ん]){0,2}"  # kanji + okurigana
+    r"|[ァ-ヺー]+"  # katakana (incl. long vowel mark)
+    r"|(?<=[一-鿿々〆ヵヶァ-ヺーA-Za-z0-9０-９Ａ-Ｚａ-ｚ])" + _JA_PARTICLES +  # particle
+    r"|[ぁ-ん]+"  # hiragana
+    r"|[A-Za-z0-9０-９Ａ-Ｚａ-ｚ]+"  # latin / digits
+)
+
+_EN_TOKEN_RE = re.compile(r"[A-Za-z0-9]+(?:['’][A-Za-z]+)?")
+
+
+def segment_japanese(text: str) -> List[str]:
+    """
+    Split Japanese text into words
+
+    Uses MeCab (via fugashi) when installed, otherwise a script-run
+    approximation that is stable but coarser than true morphology.
+    """
+    if _tagger is not None:
+        return [word.surface for word in _tagger(text) if word.surface.strip()]
+    return _JA_TOKEN_RE.findall(text)
+
+
+def segment(language: Language, text: str) -> List[str]:
+    """Split text into words for the given language"""
+    if language == Language.JAPANESE:
+        return segment_japanese(text)
+    return _EN_TOKEN_RE.findall(text)
+
+
+def compute_overview(
+    language: Language,
+    scenario: Scenario,
+    conversation: List[Message]
+) -> ConversationOverview:
+    """Compute the report overview from the learner's messages"""
+    user_messages = [m.content for m in conversation if m.role == "user"]
+    return ConversationOverview(
+        language=language.value,
+        scenario=scenario.value,
+        turns=len(user_messages),
+        word_count=sum(len(segment(language, text)) for text in user_messages)
+    )
+
+
+@dataclass(frozen=True)
+class Rule:
+    """A regex-based correction for a common learner error"""
+    pattern: re.Pattern
+    replacement: str
+    explanation: str
+    error_type: str
+
+
+# Verbs/adjectives that take が for their object, commonly used with を,
+# when they end the clause: を is right in 上手に話す, できるだけ, 欲しがる, 得意とする
+_GA_PREDICATES = r"(好き|嫌い|上手|下手|得意|苦手|欲し|でき)(?!に|と|が|る?だけ|やす|る限り)"
+
+# Place nouns that are destinations of motion verbs
+_PLACES = r"(レストラン|ホテル|スーパー|駅|学校|会社|病院|空港|店|家|公園|図書館|銀行|郵便局)"
+
+JAPANESE_RULES = [
+    Rule(
+        pattern=re.compile(r"を" + _GA_PREDICATES),
+        replacement=r"が\1",
+        explanation="好き・嫌い・上手・できる などの対象には「を」ではなく「が」を使います。",
+        error_type="助詞"
+    ),
+    Rule(
+        pattern=re.compile(_PLACES + r"を(行|来|帰)"),
+        replacement=r"\1に\2",
+        explanation="移動の目的地には「を」ではなく「に」または「へ」を使います。",
+        error_type="助詞"
+    ),
+    Rule(
+        # Only after a kanji or katakana word, so ははは and などで are left alone
+        pattern=re.compile(r"(?<=[一-鿿々〆ヵヶァ-ヺー])(を|が|に|で|は)\1(?![ぁ-ん])"),
+        replacement=r"\1",
+        explanation="同じ助詞が重複しています。",
+        error_type="助詞"
+    ),
+]
+
+# Words starting with a vowel letter but a consonant sound, and vice versa
+_CONSONANT_SOUND_VOWELS = r"(?i:uni|use|usu|usa|uti|ute|uk|ur[aeiou]|uv|ufo|uga|eu|one|once|ubiq)"
+_VOWEL_SOUND_CONSONANTS = r"(?i:hour|honest|honou?r|heir)"
+# Acronyms and letters are read by letter name ("an MBA", "a URL"), so neither rule judges them
+_ACRONYM = r"[A-Z][A-Z0-9]*s?\b"
+# Words that cannot follow the article, so "a"/"A" before them is a label ("plan A or B")
+_NOT_AFTER_ARTICLE = r"(?:and|or|is|in|on|at|of|if|as|are|was|it|its|up|us|out)\b"
+
+ENGLISH_RULES = [
+    Rule(
+        # Capital "A" only starts a sentence; mid-sentence it is a label ("grade A")
+        pattern=re.compile(
+            r"\b(a|(?<![\w,;:] )A) (?!" + _CONSONANT_SOUND_VOWELS + r"|" + _NOT_AFTER_ARTICLE + r"|" + _ACRONYM + r")"
+            r"([aeiouAEIOU]\w*)"
+        ),
+        replacement=r"\1n \2",
+        explanation="Use \"an\" before a word that starts with a vowel sound.",
+        error_type="article"
+    ),
+    Rule(
+        pattern=re.compile(
+            r"\b([Aa])n (?!" + _VOWEL_SOUND_CONSONANTS + r"|" + _ACRONYM + r")([b-df-hj-np-tv-zB-DF-HJ-NP-TV-Z]\w*)"
+        ),
+        replacement=r"\1 \2",
+        explanation="Use \"a\" before a word that starts with a consonant sound.",
+        error_type="article"
+    ),
+    Rule(
+        pattern=re.compile(r"\b(the|a|an|to|of|in) \1\b", re.IGNORECASE),
+        replacement=r"\1",
+        explanation="The same word is repeated.",
+        error_type="repetition"
+    ),
+]
+
+RULES = {
+    Language.JAPANESE: JAPANESE_RULES,
+    Language.ENGLISH: ENGLISH_RULES,
+}
+
+
+def check_rules(language: Language, conversation: List[Message]) -> List[ErrorAnalysis]:
+    """
+    Run rule-based checks over the learner's messages
+
+    Returns:
+        One ErrorAnalysis per message and rule that matched, with the
+        whole message corrected by that rule
+    """
+    errors = []
+    seen = set()
+
+    for msg in conversation:
+        if msg.role != "user":
+            continue
+        for rule in RULES[language]:
+            if not rule.pattern.search(msg.content):
+                continue
+            correction = rule.pattern.sub(rule.replacement, msg.content)
+            key = (msg.content, correction)
+            if key in seen:
+                continue
+            seen.add(key)
+            errors.append(ErrorAnalysis(
+                error=msg.content,
+                correction=correction,
+                explanation=rule.explanation,
+                error_type=rule.error_type
+            ))
+
+    return errors
+
+
+@dataclass
+class LocalAnalysis:
+    """Results of the local analysis stage"""
+    overview: ConversationOverview
+    grammar_errors: List[ErrorAnalysis] = field(default_factory=list)
+
+
+def analyze_conversation(
+    language: Language,
+    scenario: Scenario,
+    conversation: List[Message]
+) -> LocalAnalysis:
+    """
+    Run the local analysis stage for a report
+
+    Args:
+        language: Target language
+        scenario: Conversation scenario
+        conversation: Full conversation history
+
+    Returns:
+        LocalAnalysis with the overview and rule-detected grammar errors
+    """
+    return LocalAnalysis(
+        overview=compute_overview(language, scenario, conversation),
+        grammar_errors=check_rules(language, conversation)
+    )
+
+
+def format_detected_errors(errors: List[ErrorAnalysis]) -> Optional[str]:
+    """Format rule-detected errors for the report prompt"""
+    if not errors:
+        return None
+    return "\n".join(f"- {e.error} → {e.correction}" for e in errors)
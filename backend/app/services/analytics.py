@@ -0,0 +1,355 @@
+"""
+Cohort analytics over every stored report
+
+Reports are streamed from Postgres through a server-side cursor in chunks
+of ANALYTICS_CHUNK_SIZE rows (from a replica when one is configured). Each
+chunk is flattened into integer-coded columns and aggregated with NumPy;
+only per-category totals are kept between chunks, so memory is bounded by
+the number of languages, scenarios, error types and session buckets, not
+by the number of reports. Results are cached per filter for
+ANALYTICS_CACHE_TTL seconds, and concurrent requests for the same filter
+share one scan.
+"""
+import asyncio
+import logging
+import time
+from collections import defaultdict
+from dataclasses import dataclass, field
+from datetime import datetime, timedelta
+from typing import Dict, Iterable, List, Optional, Tuple
+
+from app.config import settings
+from app.core.metrics import CACHE_REQUESTS
+from app.crud.analytics import cohort_report_rows
+from app.db import database
+
+try:
+    import numpy as np
+except ImportError:  # analytics endpoints answer 503 without it
+    np = None
+
+AVAILABLE = np is not None
+
+logger = logging.getLogger(__name__)
+
+# Per (language, scenario): reports, turns, words, grammar, vocabulary, naturalness
+_PAIR_FIELDS = ("reports", "turns", "words", "grammar_errors", "vocabulary_issues", "naturalness_issues")
+
+
+class CategoryCodes:
+    """Dense integer codes for category strings, in first-seen order"""
+
+    def __init__(self):
+        self.codes: Dict[str, int] = {}
+        self.names: List[str] = []
+
+    def code(self, name: Optional[str]) -> int:
+        name = name or "other"
+        code = self.codes.get(name)
+        if code is None:
+            code = self.codes[name] = len(self.names)
+            self.names.append(name)
+        return code
+
+    def __len__(self) -> int:
+        return len(self.names)
+
+
+@dataclass
+class ColumnChunk:
+    """One chunk of report rows as parallel integer columns"""
+    language: List[int] = field(default_factory=list)
+    scenario: List[int] = field(default_factory=list)
+    session: List[int] = field(default_factory=list)
+    turns: List[int] = field(default_factory=list)
+    words: List[int] = field(default_factory=list)
+    grammar_errors: List[int] = field(default_factory=list)
+    vocabulary_issues: List[int] = field(default_factory=list)
+    naturalness_issues: List[int] = field(default_factory=list)
+    # One entry per grammar error: the row it belongs to and its type
+    error_row: List[int] = field(default_factory=list)
+    error_type: List[int] = field(default_factory=list)
+
+    def __len__(self) -> int:
+        return len(self.language)
+
+
+def flatten_rows(
+    rows: Iterable[tuple],
+    languages: CategoryCodes,
+    scenarios: CategoryCodes,
+    error_types: CategoryCodes
+) -> ColumnChunk:
+    """
+    Flatten cohort_report_rows() rows into columns, coding categories
+
+    Error types are lowercased and stripped, as in the progress aggregates.
+    """
+    chunk = ColumnChunk()
+    for index, (language, scenario, session, turns, words, grammar, vocabulary, naturalness, types) in enumerate(rows):
+        chunk.language.append(languages.code(language))
+        chunk.scenario.append(scenarios.code(scenario))
+        chunk.session.append(session)
+        chunk.turns.append(turns)
+        chunk.words.append(words)
+        chunk.grammar_errors.append(grammar)
+        chunk.vocabulary_issues.append(vocabulary)
+        chunk.naturalness_issues.append(naturalness)
+        types = list(types or ())
+        # The jsonpath skips errors without an error_type; count those as "other"
+        types.extend([None] * (grammar - len(types)))
+        for error_type in types:
+            normalized = error_type.strip().lower() if isinstance(error_type, str) else ""
+            chunk.error_row.append(index)
+            chunk.error_type.append(error_types.code(normalized[:100] or None))
+    return chunk
+
+
+def _grouped_sums(keys, size: int, columns: List) -> Tuple:
+    """Row counts and column sums per key, as (nonzero keys, counts, sums per column)"""
+    counts = np.bincount(keys, minlength=size)
+    present = np.flatnonzero(counts)
+    sums = [np.bincount(keys, weights=column, minlength=size)[present] for column in columns]
+    return present, counts[present], sums
+
+
+class CohortAccumulator:
+    """
+    Running cohort totals, updated one ColumnChunk at a time
+
+    Args:
+        max_sessions: Sessions beyond this are counted in the last bucket
+    """
+
+    def __init__(self, max_sessions: int = 30):
+        if np is None:
+            raise RuntimeError("numpy is required for cohort analytics")
+        self.max_sessions = max_sessions
+        self.languages = CategoryCodes()
+        self.scenarios = CategoryCodes()
+        self.error_types = CategoryCodes()
+        self.reports = 0
+        self.chunks = 0
+        # (language, scenario) -> totals in _PAIR_FIELDS order
+        self.pairs: Dict[Tuple[int, int], List[float]] = defaultdict(lambda: [0.0] * len(_PAIR_FIELDS))
+        # (language, scenario, error type) -> errors
+        self.errors: Dict[Tuple[int, int, int], int] = defaultdict(int)
+        # (language, session bucket) -> [reports, grammar errors, words]
+        self.sessions: Dict[Tuple[int, int], List[float]] = defaultdict(lambda: [0.0, 0.0, 0.0])
+
+    def add_rows(self, rows: Iterable[tuple]) -> None:
+        """Flatten and aggregate one chunk of query rows"""
+        self.add(flatten_rows(rows, self.languages, self.scenarios, self.error_types))
+
+    def add(self, chunk: ColumnChunk) -> None:
+        """Aggregate one chunk"""
+        if not len(chunk):
+            return
+        self.reports += len(chunk)
+        self.chunks += 1
+        n_scenarios = len(self.scenarios)
+        n_languages = len(self.languages)
+
+        language = np.asarray(chunk.language, dtype=np.int64)
+        scenario = np.asarray(chunk.scenario, dtype=np.int64)
+        grammar = np.asarray(chunk.grammar_errors, dtype=np.float64)
+        words = np.asarray(chunk.words, dtype=np.float64)
+
+        # Totals per (language, scenario)
+        pair = language * n_scenarios + scenario
+        present, counts, sums = _grouped_sums(pair, n_languages * n_scenarios, [
+            np.asarray(chunk.turns, dtype=np.float64),
+            words,
+            grammar,
+            np.asarray(chunk.vocabulary_issues, dtype=np.float64),
+            np.asarray(chunk.naturalness_issues, dtype=np.float64),
+        ])
+        for i, key in enumerate(present.tolist()):
+            totals = self.pairs[divmod(key, n_scenarios)]
+            totals[0] += int(counts[i])
+            for j, column in enumerate(sums, start=1):
+                totals[j] += float(column[i])
+
+        # Error-type frequency per (language, scenario, type)
+        if chunk.error_row:
+            n_types = len(self.error_types)
+            rows = np.asarray(chunk.error_row, dtype=np.int64)
+            triple = pair[rows] * n_types + np.asarray(chunk.error_type, dtype=np.int64)
+            counts = np.bincount(triple, minlength=n_languages * n_scenarios * n_types)
+            for key in np.flatnonzero(counts).tolist():
+                pair_key, error_type = divmod(key, n_types)
+                self.errors[(*divmod(pair_key, n_scenarios), error_type)] += int(counts[key])
+
+        # Improvement curve: errors by session number, per language
+        buckets = self.max_sessions + 1
+        session = np.clip(np.asarray(chunk.session, dtype=np.int64), 1, self.max_sessions)
+        present, counts, (grammar_sums, word_sums) = _grouped_sums(
+            language * buckets + session, n_languages * buckets, [grammar, words]
+        )
+        for i, key in enumerate(present.tolist()):
+            totals = self.sessions[divmod(key, buckets)]
+            totals[0] += int(counts[i])
+            totals[1] += float(grammar_sums[i])
+            totals[2] += float(word_sums[i])
+
+    def result(self) -> dict:
+        """Aggregates in response shape"""
+        languages, scenarios, error_types = self.languages.names, self.scenarios.names, self.error_types.names
+
+        scenario_rows = []
+        for (language, scenario), totals in sorted(self.pairs.items()):
+            reports = totals[0]
+            values = dict(zip(_PAIR_FIELDS, totals))
+            scenario_rows.append({
+                "language": languages[language],
+                "scenario": scenarios[scenario],
+                "reports": int(reports),
+                "words": int(values["words"]),
+                "turns_per_report": round(values["turns"] / reports, 2),
+                "grammar_errors_per_report": round(values["grammar_errors"] / reports, 3),
+                "vocabulary_issues_per_report": round(values["vocabulary_issues"] / reports, 3),
+                "naturalness_issues_per_report": round(values["naturalness_issues"] / reports, 3),
+            })
+
+        error_rows = []
+        for (language, scenario, error_type), count in self.errors.items():
+            total = self.pairs[(language, scenario)][3]
+            error_rows.append({
+                "language": languages[language],
+                "scenario": scenarios[scenario],
+                "error_type": error_types[error_type],
+                "count": count,
+                "share": round(count / total, 4) if total else None,
+            })
+        error_rows.sort(key=lambda row: (row["language"], row["scenario"], -row["count"], row["error_type"]))
+
+        improvement = []
+        for (language, session), (reports, grammar, words) in sorted(self.sessions.items()):
+            improvement.append({
+                "language": languages[language],
+                "session": session,
+                "reports": int(reports),
+                "errors_per_report": round(grammar / reports, 3),
+                "errors_per_100_words": round(grammar * 100 / words, 3) if words else None,
+            })
+
+        return {
+            "reports": self.reports,
+            "max_sessions": self.max_sessions,
+            "scenarios": scenario_rows,
+            "error_types": error_rows,
+            "improvement": improvement,
+        }
+
+
+async def compute_cohort_metrics(
+    language: Optional[str] = None,
+    since: Optional[datetime] = None,
+    chunk_size: int = 5000,
+    max_sessions: int = 30,
+    bind=None
+) -> dict:
+    """
+    Stream every matching report once and aggregate it
+
+    Args:
+        bind: Engine to read from (defaults to a replica, else the primary)
+    """
+    accumulator = CohortAccumulator(max_sessions)
+    bind = bind or database.replica_router.choose() or database.engine
+    query = cohort_report_rows(language, since).execution_options(yield_per=chunk_size)
+    start = time.perf_counter()
+
+    async with bind.connect() as conn:
+        result = await conn.stream(query)
+        async for rows in result.partitions(chunk_size):
+            accumulator.add_rows(rows)
+
+    logger.info("Cohort analytics computed", extra={
+        "reports": accumulator.reports,
+        "chunks": accumulator.chunks,
+        "ms": round((time.perf_counter() - start) * 1000, 1),
+    })
+    return accumulator.result()
+
+
+class CohortAnalytics:
+    """
+    Cached cohort metrics, recomputed at most once per TTL per filter
+
+    Args:
+        ttl: Seconds a result is served before it is recomputed
+        chunk_size: Rows per fetched chunk
+        max_sessions: Last session bucket of the improvement curve
+        max_entries: Cached filters kept at once
+    """
+
+    def __init__(self, ttl: float = 600.0, chunk_size: int = 5000, max_sessions: int = 30, max_entries: int = 64):
+        self.ttl = ttl
+        self.chunk_size = chunk_size
+        self.max_sessions = max_sessions
+        self.max_entries = max_entries
+        self._cache: Dict[tuple, Tuple[float, dict]] = {}
+        self._locks: Dict[tuple, asyncio.Lock] = {}
+
+    def _fresh(self, key: tuple) -> Optional[dict]:
+        cached = self._cache.get(key)
+        if cached is not None and cached[0] > time.monotonic():
+            return cached[1]
+        return None
+
+    async def get(self, language: Optional[str] = None, since_days: Optional[int] = None, refresh: bool = False) -> dict:
+        """
+        Cohort metrics for a filter, from cache unless stale or `refresh`
+        """
+        key = (language, since_days)
+        if not refresh:
+            cached = self._fresh(key)
+            if cached is not None:
+                CACHE_REQUESTS.labels("analytics", "hit").inc()
+                return cached
+
+        lock = self._locks.setdefault(key, asyncio.Lock())
+        requested_at = time.monotonic()
+        async with lock:
+            # Whoever held the lock may have just computed it
+            cached = self._cache.get(key)
+            if cached is not None:
+                expires_at, result = cached
+                computed_after_request = expires_at - self.ttl >= requested_at
+                if computed_after_request or (not refresh and expires_at > time.monotonic()):
+                    CACHE_REQUESTS.labels("analytics", "hit").inc()
+                    return result
+
+            CACHE_REQUESTS.labels("analytics", "miss").inc()
+            now = datetime.utcnow()
+            since = now - timedelta(days=since_days) if since_days else None
+            result = await compute_cohort_metrics(language, since, self.chunk_size, self.max_sessions)
+            result = {
+                "generated_at": now,
+                "language": language,
+                "since": since,
+                "ttl_seconds": self.ttl,
+                **result,
+            }
+            self._store(key, result)
+            return result
+
+    def _store(self, key: tuple, result: dict) -> None:
+        now = time.monotonic()
+        self._cache = {k: v for k, v in self._cache.items() if v[0] > now}
+        if len(self._cache) >= self.max_entries:
+            oldest = min(self._cache, key=lambda k: self._cache[k][0])
+            del self._cache[oldest]
+        self._cache[key] = (now + self.ttl, result)
+
+    def invalidate(self) -> None:
+        """Drop all cached results"""
+        self._cache.clear()
+
+
+cohort_analytics = CohortAnalytics(
+    ttl=settings.ANALYTICS_CACHE_TTL,
+    chunk_size=settings.ANALYTICS_CHUNK_SIZE,
+    max_sessions=settings.ANALYTICS_MAX_SESSIONS,
+)
@@ -0,0 +1,155 @@
+"""
+Archival of cold conversations
+
+Conversations older than ARCHIVE_AFTER_DAYS are moved, with their reports,
+into the month-partitioned conversation_archive table as compressed
+payloads, in batches of one transaction each. Old archive partitions can be
+dropped whole for retention. A Postgres advisory lock keeps concurrent
+workers from archiving at the same time.
+"""
+import asyncio
+import logging
+import time
+from datetime import datetime, timedelta
+from typing import List
+
+from app.config import settings
+from app.core.metrics import registry, Counter
+from app.crud.archive import (
+    add_months,
+    archive_conversations,
+    drop_archive_partitions_before,
+    ensure_archive_partitions,
+    get_archivable_conversations,
+    get_oldest_conversation_time,
+    month_start,
+    try_archive_lock,
+)
+from app.db.database import async_session_maker, unit_of_work
+
+logger = logging.getLogger(__name__)
+
+CONVERSATIONS_ARCHIVED = registry.register(Counter(
+    "conversations_archived", "Conversations moved to the archive table"
+))
+
+
+def _months_between(first: datetime, last: datetime) -> List[datetime]:
+    """Month starts from first's month through last's month"""
+    months = []
+    month = month_start(first)
+    while month <= last:
+        months.append(month)
+        month = add_months(month, 1)
+    return months
+
+
+class ArchiveJob:
+    """
+    Periodically move cold conversations into the archive
+
+    Args:
+        after_days: Archive conversations created this many days ago or earlier
+        interval: Seconds between runs
+        batch_size: Conversations per transaction
+        retention_months: Drop archive partitions older than this (0 keeps them)
+        compression_level: zlib level for archived payloads
+    """
+
+    def __init__(
+        self,
+        after_days: int = 180,
+        interval: float = 3600.0,
+        batch_size: int = 500,
+        retention_months: int = 0,
+        compression_level: int = 6
+    ):
+        self.after_days = after_days
+        self.interval = interval
+        self.batch_size = batch_size
+        self.retention_months = retention_months
+        self.compression_level = compression_level
+        self._task = None
+
+    async def run_once(self, session_maker=None) -> int:
+        """
+        Archive everything past the cutoff and apply retention
+
+        Returns:
+            Number of conversations archived
+        """
+        session_maker = session_maker or async_session_maker
+        now = datetime.utcnow()
+        cutoff = now - timedelta(days=self.after_days)
+        start = time.perf_counter()
+
+        # Partitions are created in their own short transaction so the
+        # parent table is not locked while batches are moved
+        async with session_maker() as db, unit_of_work(db):
+            if not await try_archive_lock(db):
+                logger.debug("Archive run skipped; another worker holds the lock")
+                return 0
+            oldest = await get_oldest_conversation_time(db)
+            if oldest is not None and oldest < cutoff:
+                await ensure_archive_partitions(db, _months_between(oldest, cutoff))
+
+        archived = 0
+        if oldest is not None and oldest < cutoff:
+            while True:
+                async with session_maker() as db, unit_of_work(db):
+                    if not await try_archive_lock(db):
+                        break
+                    conversations = await get_archivable_conversations(db, cutoff, self.batch_size)
+                    moved = await archive_conversations(db, conversations, self.compression_level)
+                archived += moved
+                CONVERSATIONS_ARCHIVED.inc(moved)
+                if moved < self.batch_size:
+                    break
+
+        dropped = []
+        if self.retention_months > 0:
+            async with session_maker() as db, unit_of_work(db):
+                if await try_archive_lock(db):
+                    dropped = await drop_archive_partitions_before(
+                        db, add_months(month_start(now), -self.retention_months)
+                    )
+
+        if archived or dropped:
+            logger.info("Archive run finished", extra={
+                "archived": archived,
+                "dropped_partitions": dropped,
+                "ms": round((time.perf_counter() - start) * 1000, 1),
+            })
+        return archived
+
+    async def _run(self) -> None:
+        while True:
+            try:
+                await self.run_once()
+            except Exception as e:
+                logger.error("Archive run failed", extra={"error": str(e)})
+            await asyncio.sleep(self.interval)
+
+    def start(self) -> None:
+        """Start periodic archiving (call from the event loop)"""
+        if self._task is None:
+            self._task = asyncio.get_running_loop().create_task(self._run())
+
+    async def stop(self) -> None:
+        """Stop periodic archiving; a batch in progress is rolled back"""
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+
+archive_job = ArchiveJob(
+    after_days=settings.ARCHIVE_AFTER_DAYS,
+    interval=settings.ARCHIVE_INTERVAL,
+    batch_size=settings.ARCHIVE_BATCH_SIZE,
+    retention_months=settings.ARCHIVE_RETENTION_MONTHS,
+    compression_level=settings.ARCHIVE_COMPRESSION_LEVEL,
+)
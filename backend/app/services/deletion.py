@@ -0,0 +1,156 @@
+"""
+Background account deletion
+
+DELETE /api/account blocks sign-in and queues the account; this job then
+deletes the user's conversations and other rows in batches of
+ACCOUNT_DELETION_BATCH_SIZE, one short transaction each, recording
+progress after every batch. Deletions are claimed with SKIP LOCKED, so
+several workers can run the job, and one whose worker stopped is resumed
+after ACCOUNT_DELETION_LEASE_SECONDS. Every step is idempotent.
+"""
+import asyncio
+import logging
+import time
+from datetime import datetime, timedelta
+from uuid import UUID
+
+from app.config import settings
+from app.core.metrics import registry, Counter
+from app.crud.account import (
+    USER_TABLES,
+    claim_account_deletion,
+    delete_conversation_batch,
+    delete_user_rows_batch,
+    finish_account_deletion,
+    record_deletion_progress,
+)
+from app.db.database import async_session_maker, unit_of_work
+from app.db.models import ConversationArchive
+
+logger = logging.getLogger(__name__)
+
+ACCOUNTS_DELETED = registry.register(Counter(
+    "accounts_deleted", "Accounts fully deleted by the account deletion job"
+))
+
+
+class AccountDeletionJob:
+    """
+    Delete queued accounts in batches
+
+    Args:
+        batch_size: Rows deleted per transaction
+        interval: Seconds between checks for queued deletions
+        lease_seconds: Resume a running deletion not updated for this long
+    """
+
+    def __init__(self, batch_size: int = 500, interval: float = 60.0, lease_seconds: float = 300.0):
+        self.batch_size = batch_size
+        self.interval = interval
+        self.lease_seconds = lease_seconds
+        self._task = None
+        self._wake = asyncio.Event()
+
+    async def delete_account(self, user_id: UUID, session_maker=None) -> int:
+        """
+        Delete everything of one claimed account
+
+        Returns:
+            Number of conversations deleted
+        """
+        session_maker = session_maker or async_session_maker
+        start = time.perf_counter()
+        deleted = 0
+
+        while True:
+            async with session_maker() as db, unit_of_work(db):
+                count = await delete_conversation_batch(db, user_id, self.batch_size)
+                await record_deletion_progress(db, user_id, count)
+            deleted += count
+            if count < self.batch_size:
+                break
+
+        for model in USER_TABLES:
+            while True:
+                async with session_maker() as db, unit_of_work(db):
+                    count = await delete_user_rows_batch(db, model, user_id, self.batch_size)
+                    await record_deletion_progress(db, user_id, count if model is ConversationArchive else 0)
+                if model is ConversationArchive:
+                    deleted += count
+                if count < self.batch_size:
+                    break
+
+        async with session_maker() as db, unit_of_work(db):
+            deleted += await finish_account_deletion(db, user_id)
+
+        ACCOUNTS_DELETED.inc()
+        logger.info("Account deleted", extra={
+            "user_id": str(user_id),
+            "conversations": deleted,
+            "ms": round((time.perf_counter() - start) * 1000, 1),
+        })
+        return deleted
+
+    async def run_once(self, session_maker=None) -> int:
+        """
+        Delete every queued account
+
+        Returns:
+            Number of accounts deleted
+        """
+        session_maker = session_maker or async_session_maker
+        accounts = 0
+        while True:
+            stale_before = datetime.utcnow() - timedelta(seconds=self.lease_seconds)
+            async with session_maker() as db, unit_of_work(db):
+                user_id = await claim_account_deletion(db, stale_before)
+            if user_id is None:
+                return accounts
+
+            try:
+                await self.delete_account(user_id, session_maker)
+            except Exception as e:
+                # Left running; resumed once the lease runs out
+                logger.error("Account deletion failed", extra={"user_id": str(user_id), "error": str(e)})
+                async with session_maker() as db, unit_of_work(db):
+                    await record_deletion_progress(db, user_id, error=str(e)[:1000])
+                return accounts
+            accounts += 1
+
+    def wake(self) -> None:
+        """Run now instead of at the next interval (after a deletion request)"""
+        self._wake.set()
+
+    async def _run(self) -> None:
+        while True:
+            try:
+                await self.run_once()
+            except Exception as e:
+                logger.error("Account deletion run failed", extra={"error": str(e)})
+            try:
+                await asyncio.wait_for(self._wake.wait(), self.interval)
+            except asyncio.TimeoutError:
+                pass
+            self._wake.clear()
+
+    def start(self) -> None:
+        """Start processing queued deletions (call from the event loop)"""
+        if self._task is None:
+            self._task = asyncio.get_running_loop().create_task(self._run())
+
+    async def stop(self) -> None:
+        """Stop processing; a batch in progress is rolled back and resumed later"""
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+
+account_deletion_job = AccountDeletionJob(
+    batch_size=settings.ACCOUNT_DELETION_BATCH_SIZE,
+    interval=settings.ACCOUNT_DELETION_INTERVAL,
+    lease_seconds=settings.ACCOUNT_DELETION_LEASE_SECONDS,
+)
@@ -0,0 +1,182 @@
+"""
+Streaming export of everything stored for a user
+
+The export is NDJSON: an "account" line, one "conversation" line per
+conversation (live, then archived) with its messages and report, and a
+closing "summary" line. Conversations are read in keyset pages through a
+streamed (server-side cursor) query, and each page's transaction ends
+before the next starts, so memory and snapshot age stay constant however
+long the history is. The same stream backs GET /api/account/export and
+operator-run portability requests:
+
+    python -m app.services.export user@example.com -o export.ndjson.gz
+"""
+import argparse
+import asyncio
+import logging
+import sys
+import time
+import zlib
+from datetime import datetime
+from typing import AsyncIterator, Dict, Optional
+
+from app.core.serialization import dumps
+from app.crud.archive import unpack_payload
+from app.crud.export import archived_conversation_page, conversation_page
+from app.crud.user import get_user_by_email
+from app.db.database import async_session_maker, bind_user
+from app.models.serializers import message_list, report_dict
+
+logger = logging.getLogger(__name__)
+
+EXPORT_VERSION = 1
+
+# Bytes of NDJSON gathered before a chunk is sent (the first line goes out at once)
+CHUNK_BYTES = 64 * 1024
+
+
+def _conversation_record(row, messages, report_data, archived: bool) -> Dict:
+    return {
+        "type": "conversation",
+        "id": row.id,
+        "session_id": row.session_id,
+        "language": row.language,
+        "scenario": row.scenario,
+        "created_at": row.created_at,
+        "updated_at": row.updated_at,
+        "archived": archived,
+        "messages": message_list(messages),
+        "report": report_dict(report_data),
+    }
+
+
+def live_record(row) -> Dict:
+    """Export line for a conversation_page row"""
+    return _conversation_record(row, row.messages, row.report_data, archived=False)
+
+
+def archived_record(row) -> Dict:
+    """Export line for an archived_conversation_page row"""
+    messages, report_data = unpack_payload(row.payload)
+    return _conversation_record(row, messages, report_data, archived=True)
+
+
+async def export_records(user, session_maker=None, batch_size: int = 100) -> AsyncIterator[Dict]:
+    """
+    Yield a user's export, one JSON-ready dict per NDJSON line
+
+    Args:
+        user: User being exported
+        session_maker: Session factory (the request's session is closed
+            before a streamed body runs, so the export opens its own)
+        batch_size: Conversations per keyset page
+    """
+    session_maker = session_maker or async_session_maker
+    start = time.perf_counter()
+    yield {
+        "type": "account",
+        "version": EXPORT_VERSION,
+        "id": user.id,
+        "email": user.email,
+        "created_at": user.created_at,
+        "exported_at": datetime.utcnow(),
+    }
+
+    conversations = reports = 0
+    async with session_maker() as db:
+        bind_user(db, user.id)
+        for page, to_record in ((conversation_page, live_record), (archived_conversation_page, archived_record)):
+            after = None
+            while True:
+                rows = 0
+                result = await db.stream(page(user.id, after, batch_size))
+                async for row in result:
+                    rows += 1
+                    after = (row.created_at, row.id)
+                    record = to_record(row)
+                    conversations += 1
+                    reports += record["report"] is not None
+                    yield record
+                # End the page's transaction so no snapshot is held across pages
+                await db.commit()
+                if rows < batch_size:
+                    break
+
+    logger.info("User export finished", extra={
+        "user_id": str(user.id),
+        "conversations": conversations,
+        "ms": round((time.perf_counter() - start) * 1000, 1),
+    })
+    yield {"type": "summary", "conversations": conversations, "reports": reports}
+
+
+async def ndjson_chunks(records: AsyncIterator[Dict], chunk_bytes: int = CHUNK_BYTES) -> AsyncIterator[bytes]:
+    """Encode records as NDJSON, in chunks of about `chunk_bytes`"""
+    buffer = bytearray()
+    first = True
+    async for record in records:
+        buffer += dumps(record)
+        buffer += b"\n"
+        if first or len(buffer) >= chunk_bytes:
+            first = False
+            yield bytes(buffer)
+            buffer.clear()
+    if buffer:
+        yield bytes(buffer)
+
+
+async def gzip_chunks(chunks: AsyncIterator[bytes], level: int = 6) -> AsyncIterator[bytes]:
+    """
+    Gzip a byte stream incrementally
+
+    Each chunk is sync-flushed, so the client can decompress what it has
+    received so far.
+    """
+    compressor = zlib.compressobj(level, zlib.DEFLATED, 16 + zlib.MAX_WBITS)
+    async for chunk in chunks:
+        yield compressor.compress(chunk) + compressor.flush(zlib.Z_SYNC_FLUSH)
+    yield compressor.flush()
+
+
+def export_stream(user, compress: bool = False, session_maker=None) -> AsyncIterator[bytes]:
+    """A user's export as NDJSON bytes, optionally gzipped"""
+    chunks = ndjson_chunks(export_records(user, session_maker))
+    return gzip_chunks(chunks) if compress else chunks
+
+
+async def export_to_file(email: str, path: Optional[str], session_maker=None) -> bool:
+    """
+    Write a user's export to `path` (stdout if None; gzipped if it ends in .gz)
+
+    Returns:
+        False if there is no such user
+    """
+    session_maker = session_maker or async_session_maker
+    async with session_maker() as db:
+        user = await get_user_by_email(db, email)
+    if user is None:
+        return False
+
+    stream = export_stream(user, compress=bool(path and path.endswith(".gz")), session_maker=session_maker)
+    output = open(path, "wb") if path else sys.stdout.buffer
+    try:
+        async for chunk in stream:
+            output.write(chunk)
+    finally:
+        if path:
+            output.close()
+    return True
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Export a LinguaEcho user's data as NDJSON")
+    parser.add_argument("email", help="Account to export")
+    parser.add_argument("-o", "--output", help="Output file (gzipped if it ends in .gz; default stdout)")
+    args = parser.parse_args(argv)
+
+    if not asyncio.run(export_to_file(args.email, args.output)):
+        parser.exit(1, f"No user with email {args.email}\n")
+
+
+if __name__ == "__main__":
+    main()
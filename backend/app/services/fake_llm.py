@@ -0,0 +1,233 @@
+"""
+Deterministic fake chat model for load tests and offline benchmarks
+Selected with LLM_PROVIDER=fake; simulates provider latency, throughput
+and failures without calling an external API
+"""
+import asyncio
+import hashlib
+import json
+import random
+import re
+import time
+from typing import Any, AsyncIterator, Iterator, List, Optional
+
+from langchain_core.language_models.chat_models import BaseChatModel
+from langchain_core.messages import AIMessage, AIMessageChunk, BaseMessage
+from langchain_core.outputs import ChatGeneration, ChatGenerationChunk, ChatResult
+
+from app.services.report_parser import LLM_SECTIONS
+
+_JAPANESE_RE = re.compile(r"[ぁ-んァ-ヺ]")
+
+CHAT_PHRASES = {
+    "japanese": [
+        "かしこまりました。", "少々お待ちください。", "こちらはいかがでしょうか。",
+        "ありがとうございます。", "他に何かございますか？", "はい、そうですね。",
+        "それはいいですね。", "もう少し詳しく教えていただけますか？",
+    ],
+    "english": [
+        "Sure, ", "that sounds great. ", "Let me check that for you. ",
+        "Is there anything else ", "I can help you with? ", "Of course! ",
+        "Could you tell me a bit more? ", "Thank you for asking. ",
+    ],
+}
+
+REPORT_ITEMS = {
+    "japanese": {
+        "grammar_errors": {
+            "error": "駅を行きます", "correction": "駅に行きます",
+            "explanation": "移動の目的地には「に」を使います。", "error_type": "助詞"
+        },
+        "vocabulary_issues": {
+            "original": "食べ物", "suggestion": "料理",
+            "explanation": "レストランでは「料理」の方が自然です。"
+        },
+        "naturalness": {
+            "unnatural": "水をください", "natural": "お水をいただけますか",
+            "context": "より丁寧な依頼の表現です。"
+        },
+        "positive_feedback": "丁寧語を正しく使えていました。",
+    },
+    "english": {
+        "grammar_errors": {
+            "error": "I want a apple", "correction": "I want an apple",
+            "explanation": "Use \"an\" before a vowel sound.", "error_type": "article"
+        },
+        "vocabulary_issues": {
+            "original": "big", "suggestion": "spacious",
+            "explanation": "More precise when describing a room."
+        },
+        "naturalness": {
+            "unnatural": "Give me water", "natural": "Could I have some water?",
+            "context": "A more polite request."
+        },
+        "positive_feedback": "Good use of polite expressions.",
+    },
+}
+
+
+class FakeRateLimitError(Exception):
+    """Simulated provider 429 response"""
+    status_code = 429
+
+
+class FakeProviderError(Exception):
+    """Simulated provider 5xx response"""
+    status_code = 500
+
+
+class FakeChatModel(BaseChatModel):
+    """
+    Chat model returning canned responses with simulated timing
+
+    Output and timing are derived from a hash of the seed and the input
+    messages, so the same request always behaves the same way. Requests
+    bound with a JSON response_format return schema-valid report JSON.
+    """
+
+    ttft_ms: float = 300.0
+    tokens_per_second: float = 50.0
+    jitter_ms: float = 20.0
+    error_rate: float = 0.0
+    rate_limit_rate: float = 0.0
+    response_tokens: int = 30
+    seed: int = 0
+    model_name: str = "fake"
+
+    @property
+    def _llm_type(self) -> str:
+        return "fake"
+
+    def _rng(self, messages: List[BaseMessage]) -> random.Random:
+        """Deterministic RNG for a request"""
+        digest = hashlib.sha256(str(self.seed).encode("utf-8"))
+        for message in messages:
+            digest.update(message.type.encode("utf-8"))
+            digest.update(str(message.content).encode("utf-8"))
+        return random.Random(digest.hexdigest())
+
+    def _language(self, messages: List[BaseMessage]) -> str:
+        text = "".join(str(m.content) for m in messages[:1] + messages[-1:])
+        return "japanese" if _JAPANESE_RE.search(text) else "english"
+
+    def _delay(self, rng: random.Random, base_ms: float) -> float:
+        """Delay in seconds with symmetric jitter"""
+        jitter = rng.uniform(-self.jitter_ms, self.jitter_ms) if self.jitter_ms else 0.0
+        return max(0.0, base_ms + jitter) / 1000
+
+    def _check_failures(self, rng: random.Random) -> Optional[Exception]:
+        roll = rng.random()
+        if roll < self.rate_limit_rate:
+            return FakeRateLimitError("Simulated rate limit exceeded (429)")
+        if roll < self.rate_limit_rate + self.error_rate:
+            return FakeProviderError("Simulated provider error (500)")
+        return None
+
+    def _chat_tokens(self, rng: random.Random, language: str) -> List[str]:
+        phrases = CHAT_PHRASES[language]
+        return [rng.choice(phrases) for _ in range(max(1, self.response_tokens))]
+
+    def _report_tokens(self, rng: random.Random, language: str, messages: List[BaseMessage]) -> List[str]:
+        items = REPORT_ITEMS[language]
+        sections = LLM_SECTIONS
+
+        # A section repair request asks for a single section by name
+        if len(messages) > 2:
+            requested = [name for name in LLM_SECTIONS if f'"{name}"' in str(messages[-1].content)]
+            sections = requested[:1] or LLM_SECTIONS
+
+        report = {name: [items[name]] * rng.randint(0, 2) for name in sections}
+        if "positive_feedback" in report:
+            report["positive_feedback"] = [items["positive_feedback"]]
+
+        text = json.dumps(report, ensure_ascii=False)
+        # Split into roughly response_tokens-sized pieces
+        size = max(1, len(text) // max(1, self.response_tokens))
+        return [text[i:i + size] for i in range(0, len(text), size)]
+
+    def _plan(self, messages: List[BaseMessage], kwargs: dict):
+        """Decide the outcome of a request: (rng, error, tokens)"""
+        rng = self._rng(messages)
+        error = self._check_failures(rng)
+        language = self._language(messages)
+        if kwargs.get("response_format"):
+            tokens = self._report_tokens(rng, language, messages)
+        else:
+            tokens = self._chat_tokens(rng, language)
+        return rng, error, tokens
+
+    def _usage(self, messages: List[BaseMessage], tokens: List[str]) -> dict:
+        input_tokens = sum(len(str(m.content)) for m in messages) // 4
+        return {
+            "input_tokens": input_tokens,
+            "output_tokens": len(tokens),
+            "total_tokens": input_tokens + len(tokens),
+        }
+
+    def _result(self, messages: List[BaseMessage], tokens: List[str]) -> ChatResult:
+        message = AIMessage(content="".join(tokens), usage_metadata=self._usage(messages, tokens))
+        return ChatResult(generations=[ChatGeneration(message=message)])
+
+    def _generate(
+        self,
+        messages: List[BaseMessage],
+        stop: Optional[List[str]] = None,
+        run_manager: Any = None,
+        **kwargs: Any
+    ) -> ChatResult:
+        rng, error, tokens = self._plan(messages, kwargs)
+        time.sleep(self._delay(rng, self.ttft_ms))
+        if error:
+            raise error
+        time.sleep(len(tokens) / self.tokens_per_second)
+        return self._result(messages, tokens)
+
+    async def _agenerate(
+        self,
+        messages: List[BaseMessage],
+        stop: Optional[List[str]] = None,
+        run_manager: Any = None,
+        **kwargs: Any
+    ) -> ChatResult:
+        rng, error, tokens = self._plan(messages, kwargs)
+        await asyncio.sleep(self._delay(rng, self.ttft_ms))
+        if error:
+            raise error
+        await asyncio.sleep(len(tokens) / self.tokens_per_second)
+        return self._result(messages, tokens)
+
+    def _stream(
+        self,
+        messages: List[BaseMessage],
+        stop: Optional[List[str]] = None,
+        run_manager: Any = None,
+        **kwargs: Any
+    ) -> Iterator[ChatGenerationChunk]:
+        rng, error, tokens = self._plan(messages, kwargs)
+        time.sleep(self._delay(rng, self.ttft_ms))
+        if error:
+            raise error
+        interval_ms = 1000 / self.tokens_per_second
+        for i, token in enumerate(tokens):
+            if i:
+                time.sleep(self._delay(rng, interval_ms))
+            yield ChatGenerationChunk(message=AIMessageChunk(content=token))
+        yield ChatGenerationChunk(message=AIMessageChunk(content="", usage_metadata=self._usage(messages, tokens)))
+
+    async def _astream(
+        self,
+        messages: List[BaseMessage],
+        stop: Optional[List[str]] = None,
+        run_manager: Any = None,
+        **kwargs: Any
+    ) -> AsyncIterator[ChatGenerationChunk]:
+        rng, error, tokens = self._plan(messages, kwargs)
+        await asyncio.sleep(self._delay(rng, self.ttft_ms))
+        if error:
+            raise error
+        interval_ms = 1000 / self.tokens_per_second
+        for i, token in enumerate(tokens):
+            if i:
+                await asyncio.sleep(self._delay(rng, interval_ms))
+            yield ChatGenerationChunk(message=AIMessageChunk(content=token))
+        yield ChatGenerationChunk(message=AIMessageChunk(content="", usage_metadata=self._usage(messages, tokens)))
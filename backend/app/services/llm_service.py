@@ -1,17 +1,32 @@
 """
 LangChain service for LLM interactions
-Handles OpenRouter, Groq, and Google AI Studio providers
+Handles OpenRouter, Groq, and Google AI Studio providers, plus a fake
+provider for load tests
 """
-import json
-from typing import List, Dict, AsyncGenerator
+import logging
+import time
+from typing import Any, Dict, List, Optional, Tuple, AsyncGenerator
 from langchain_openai import ChatOpenAI
 from langchain_groq import ChatGroq
 from langchain_google_genai import ChatGoogleGenerativeAI
 from langchain_core.messages import HumanMessage, SystemMessage, AIMessage
 
 from app.config import settings
+from app.core.metrics import LLMCallTimer, REPORT_GENERATION_DURATION
+from app.core.tracing import tracer
 from app.models.schemas import Language, Scenario, Message, Report
-from app.langchain.prompts import get_conversation_system_prompt, get_report_generation_prompt
+from app.langchain.prompts import (
+    get_report_transcript_message,
+    get_section_repair_prompt,
+    prompt_registry
+)
+from app.services.report_parser import IncrementalReportParser, LLM_SECTIONS
+from app.services.fake_llm import FakeChatModel
+from app.services.analysis import LocalAnalysis, analyze_conversation, format_detected_errors
+from app.core.logging import truncate
+from app.services.usage import UsageContext, estimate_prompt_tokens, usage_tracker
+
+logger = logging.getLogger(__name__)
 
 
 class LLMService:
@@ -31,14 +46,141 @@ class LLMService:
                 google_api_key=settings.GOOGLE_API_KEY,
                 temperature=0.7
             )
+        elif settings.LLM_PROVIDER == "fake":
+            self.llm = FakeChatModel(
+                ttft_ms=settings.FAKE_LLM_TTFT_MS,
+                tokens_per_second=settings.FAKE_LLM_TOKENS_PER_SECOND,
+                jitter_ms=settings.FAKE_LLM_JITTER_MS,
+                error_rate=settings.FAKE_LLM_ERROR_RATE,
+                rate_limit_rate=settings.FAKE_LLM_RATE_LIMIT_RATE,
+                response_tokens=settings.FAKE_LLM_RESPONSE_TOKENS,
+                seed=settings.FAKE_LLM_SEED
+            )
         else:  # openrouter
             self.llm = ChatOpenAI(
                 openai_api_key=settings.OPENROUTER_API_KEY,
                 openai_api_base="https://openrouter.ai/api/v1",
                 model_name=settings.OPENROUTER_MODEL,
-                temperature=0.7
+                temperature=0.7,
+                stream_usage=True
             )
 
+        # Report generation uses the provider's JSON output mode where available
+        self.report_llm = self._with_json_mode(self.llm)
+
+    def _with_json_mode(self, llm):
+        """Bind the provider-specific JSON output option to an LLM client"""
+        if settings.LLM_PROVIDER == "fake":
+            # The fake provider returns report JSON only in JSON mode
+            return llm.bind(response_format={"type": "json_object"})
+        if not settings.REPORT_JSON_MODE:
+            return llm
+        if settings.LLM_PROVIDER == "google":
+            return llm.bind(generation_config={"response_mime_type": "application/json"})
+        if settings.LLM_PROVIDER == "openrouter":
+            return llm.bind(response_format={"type": "json_object"})
+        # Groq does not support JSON mode together with streaming
+        return llm
+
+    def _span_attributes(self, operation: str, messages: List, attributes: Optional[Dict[str, Any]]) -> Dict[str, Any]:
+        """Common span attributes for an LLM call"""
+        return {
+            "llm.provider": settings.LLM_PROVIDER,
+            "llm.model": settings.model_name,
+            "llm.operation": operation,
+            "llm.message_count": len(messages),
+            **(attributes or {})
+        }
+
+    @staticmethod
+    def _record_usage(span, timer: LLMCallTimer) -> None:
+        """Copy token usage from a finished call onto its span"""
+        usage = timer.usage or {}
+        span.set_attribute("llm.prompt_tokens", usage.get("input_tokens"))
+        span.set_attribute("llm.completion_tokens", usage.get("output_tokens") or timer.chunks or None)
+        if timer.first_token_at is not None:
+            span.set_attribute("llm.ttft_ms", round((timer.first_token_at - timer.start) * 1000, 1))
+
+    @staticmethod
+    def _account_usage(timer: LLMCallTimer, usage: Optional[UsageContext], messages: List) -> None:
+        """
+        Add a finished (or abandoned) call to the per-user usage aggregates
+
+        Without provider usage, e.g. a stream stopped before its final
+        chunk, the prompt is estimated so it still counts toward the quota.
+        """
+        metadata = timer.usage or {}
+        usage_tracker.record(
+            usage,
+            provider=timer.provider,
+            model=timer.model,
+            operation=timer.operation,
+            prompt_tokens=metadata.get("input_tokens") or estimate_prompt_tokens(messages),
+            completion_tokens=metadata.get("output_tokens") or timer.chunks,
+            cached_tokens=(metadata.get("input_token_details") or {}).get("cache_read") or 0,
+            latency=time.perf_counter() - timer.start
+        )
+
+    async def _ainvoke(
+        self,
+        llm,
+        messages: List,
+        operation: str,
+        attributes: Optional[Dict[str, Any]] = None,
+        usage: Optional[UsageContext] = None
+    ):
+        """Invoke an LLM client, recording latency, token usage and a trace span"""
+        timer = LLMCallTimer(settings.LLM_PROVIDER, settings.model_name, operation)
+        with tracer.span(f"llm.{operation}", attributes=self._span_attributes(operation, messages, attributes)) as span:
+            try:
+                response = await llm.ainvoke(messages)
+            except Exception:
+                timer.finish(error=True)
+                raise
+            timer.usage = getattr(response, "usage_metadata", None)
+            timer.finish()
+            self._record_usage(span, timer)
+            self._account_usage(timer, usage, messages)
+        return response
+
+    async def _astream(
+        self,
+        llm,
+        messages: List,
+        operation: str,
+        attributes: Optional[Dict[str, Any]] = None,
+        usage: Optional[UsageContext] = None
+    ) -> AsyncGenerator[str, None]:
+        """Stream text deltas from an LLM client, recording TTFT, throughput, usage and trace spans"""
+        timer = LLMCallTimer(settings.LLM_PROVIDER, settings.model_name, operation)
+        # Spans stay open across yields, so they are ended explicitly rather than activated
+        span = tracer.start_span(f"llm.{operation}", attributes=self._span_attributes(operation, messages, attributes))
+        first_token_span = tracer.start_span("llm.first_token", parent=span)
+        try:
+            async for chunk in llm.astream(messages):
+                chunk_usage = getattr(chunk, "usage_metadata", None)
+                if chunk_usage:
+                    # Usage arrives on the final chunk for providers that report it
+                    timer.usage = chunk_usage
+                # chunk.content contains the text delta
+                if chunk.content:
+                    if timer.first_token_at is None:
+                        first_token_span.end()
+                    timer.chunk()
+                    yield chunk.content
+        except Exception as e:
+            timer.finish(error=True)
+            span.record_error(e)
+            raise
+        else:
+            timer.finish()
+        finally:
+            # Also when the client disconnected mid-stream: the tokens were used
+            self._account_usage(timer, usage, messages)
+            first_token_span.end()
+            self._record_usage(span, timer)
+            span.end()
+
     def _convert_messages(self, history: List[Message]) -> List:
         """Convert Message objects to LangChain message format"""
         lc_messages = []
@@ -54,7 +196,8 @@ class LLMService:
         language: Language,
         scenario: Scenario,
         user_message: str,
-        history: List[Message]
+        history: List[Message],
+        usage: Optional[UsageContext] = None
     ) -> str:
         """
         Get AI response for conversation
@@ -64,13 +207,14 @@ class LLMService:
             scenario: Conversation scenario
             user_message: User's latest message
             history: Previous conversation history
+            usage: Who the call is accounted to
 
         Returns:
             AI's response string
         """
         # Build messages
-        system_prompt = get_conversation_system_prompt(language, scenario)
-        messages = [SystemMessage(content=system_prompt)]
+        system_prompt = prompt_registry.conversation_prompt(language, scenario)
+        messages = [SystemMessage(content=system_prompt.text)]
 
         # Add conversation history
         messages.extend(self._convert_messages(history))
@@ -79,7 +223,10 @@ class LLMService:
         messages.append(HumanMessage(content=user_message))
 
         # Get response from LLM
-        response = await self.llm.ainvoke(messages)
+        response = await self._ainvoke(
+            self.llm, messages, "chat",
+            {"chat.history_length": len(history), "llm.prompt_hash": system_prompt.content_hash}, usage
+        )
 
         return response.content
 
@@ -88,7 +235,8 @@ class LLMService:
         language: Language,
         scenario: Scenario,
         user_message: str,
-        history: List[Message]
+        history: List[Message],
+        usage: Optional[UsageContext] = None
     ) -> AsyncGenerator[str, None]:
         """
         Stream AI response for conversation token-by-token
@@ -98,13 +246,14 @@ class LLMService:
             scenario: Conversation scenario
             user_message: User's latest message
             history: Previous conversation history
+            usage: Who the call is accounted to
 
         Yields:
             Chunks of AI response as they arrive from the LLM
         """
         # Build messages (same as non-streaming version)
-        system_prompt = get_conversation_system_prompt(language, scenario)
-        messages = [SystemMessage(content=system_prompt)]
+        system_prompt = prompt_registry.conversation_prompt(language, scenario)
+        messages = [SystemMessage(content=system_prompt.text)]
 
         # Add conversation history
         messages.extend(self._convert_messages(history))
@@ -113,81 +262,191 @@ class LLMService:
         messages.append(HumanMessage(content=user_message))
 
         # Stream response from LLM
-        async for chunk in self.llm.astream(messages):
-            # chunk.content contains the text delta
-            if chunk.content:
-                yield chunk.content
+        async for chunk in self._astream(
+            self.llm, messages, "chat_stream",
+            {"chat.history_length": len(history), "llm.prompt_hash": system_prompt.content_hash}, usage
+        ):
+            yield chunk
 
-    async def generate_report(
+    def _build_report_messages(
         self,
         language: Language,
         scenario: Scenario,
-        conversation: List[Message]
-    ) -> Report:
+        conversation: List[Message],
+        analysis: LocalAnalysis
+    ) -> List:
+        """Build report messages: static instructions first, transcript last"""
+        conversation_text = "\n".join([
+            f"{'User' if msg.role == 'user' else 'AI'}: {msg.content}"
+            for msg in conversation
+        ])
+        detected_errors = format_detected_errors(analysis.grammar_errors)
+
+        return [
+            SystemMessage(content=prompt_registry.report_prompt(language, scenario).text),
+            HumanMessage(content=get_report_transcript_message(language, conversation_text, detected_errors))
+        ]
+
+    def _fallback_report(self, language: Language, analysis: LocalAnalysis) -> Report:
+        """Basic report returned when nothing usable came back from the LLM"""
+        return Report(
+            overview=analysis.overview,
+            grammar_errors=analysis.grammar_errors,
+            vocabulary_issues=[],
+            naturalness=[],
+            positive_feedback=["レポートの生成中にエラーが発生しました。後ほど再試行してください。" if language == Language.JAPANESE else "An error occurred while generating the report. Please try again later."]
+        )
+
+    async def _repair_section(
+        self,
+        language: Language,
+        messages: List,
+        previous_output: str,
+        name: str,
+        usage: Optional[UsageContext] = None
+    ) -> Optional[Any]:
         """
-        Generate detailed feedback report for conversation
+        Re-request a single missing or malformed report section
+
+        Reuses the report messages so the instructions and transcript
+        stay a cacheable prefix, followed by the model's previous output
+        that the follow-up refers to.
+
+        Returns:
+            The validated section value, or None if the retry also failed
+        """
+        repair_messages = messages + [
+            AIMessage(content=previous_output),
+            HumanMessage(content=get_section_repair_prompt(language, name)),
+        ]
+
+        try:
+            response = await self._ainvoke(self.report_llm, repair_messages, "report_repair", usage=usage)
+            parser = IncrementalReportParser()
+            parser.feed(response.content)
+            section = parser.sections.get(name)
+            if section and section.ok:
+                return section.value
+        except Exception as e:
+            logger.warning("Report section repair failed", extra={"section": name, "error": str(e)})
+
+        return None
+
+    async def generate_report_stream(
+        self,
+        language: Language,
+        scenario: Scenario,
+        conversation: List[Message],
+        usage: Optional[UsageContext] = None
+    ) -> AsyncGenerator[Tuple[str, Any], None]:
+        """
+        Generate a report, yielding each section as soon as it is complete
+
+        The overview and rule-detected grammar errors come from the local
+        analysis stage; the LLM only writes the remaining findings. Its
+        response is parsed incrementally while it streams, and sections
+        that are missing or fail validation are re-requested individually
+        instead of discarding the whole report.
 
         Args:
             language: Target language
             scenario: Conversation scenario
             conversation: Full conversation history
+            usage: Who the calls are accounted to
 
-        Returns:
-            Report object with analysis
+        Yields:
+            (section_name, section_value) for each report section, followed
+            by ("report", Report) with the assembled report
         """
-        # Format conversation for analysis
-        conversation_text = "\n".join([
-            f"{'User' if msg.role == 'user' else 'AI'}: {msg.content}"
-            for msg in conversation
-        ])
+        start = time.perf_counter()
 
-        # Get analysis prompt
-        analysis_prompt = get_report_generation_prompt(language, scenario, conversation_text)
+        # Overview and rule-detected errors are computed locally, up front
+        analysis = analyze_conversation(language, scenario, conversation)
+        yield "overview", analysis.overview.model_dump()
 
-        # Get report from LLM
-        messages = [HumanMessage(content=analysis_prompt)]
-        response = await self.llm.ainvoke(messages)
+        messages = self._build_report_messages(language, scenario, conversation, analysis)
+        parser = IncrementalReportParser()
+        report_data = {"overview": analysis.overview}
 
-        # Parse JSON response
         try:
-            # Clean the response to extract JSON
-            content = response.content.strip()
-
-            # Remove markdown code blocks if present
-            if content.startswith("```json"):
-                content = content[7:]  # Remove ```json
-            if content.startswith("```"):
-                content = content[3:]  # Remove ```
-            if content.endswith("```"):
-                content = content[:-3]  # Remove trailing ```
-
-            content = content.strip()
-
-            # Parse JSON
-            report_data = json.loads(content)
-
-            # Create Report object
-            report = Report(**report_data)
-            return report
-
-        except json.JSONDecodeError as e:
-            # If JSON parsing fails, return a basic report
-            print(f"JSON parsing error: {e}")
-            print(f"Response content: {response.content}")
-
-            # Create a fallback report
-            return Report(
-                overview={
-                    "language": language.value,
-                    "scenario": scenario.value,
-                    "turns": len([m for m in conversation if m.role == "user"]),
-                    "word_count": sum(len(m.content.split()) for m in conversation if m.role == "user")
+            async for chunk in self._astream(
+                self.report_llm, messages, "report",
+                {
+                    "report.turns": analysis.overview.turns,
+                    "llm.prompt_hash": prompt_registry.report_prompt(language, scenario).content_hash,
                 },
-                grammar_errors=[],
-                vocabulary_issues=[],
-                naturalness=[],
-                positive_feedback=["レポートの生成中にエラーが発生しました。後ほど再試行してください。" if language == Language.JAPANESE else "An error occurred while generating the report. Please try again later."]
-            )
+                usage
+            ):
+                for section in parser.feed(chunk):
+                    if section.ok:
+                        value = self._merge_local_findings(section.name, section.value, analysis)
+                        report_data[section.name] = value
+                        yield section.name, value
+        except Exception as e:
+            if not parser.sections:
+                # Nothing came back: the caller reports the error (a provider
+                # 429 stays a 429) rather than a fallback report
+                raise
+            logger.warning("Report streaming failed", extra={"error": str(e)})
+
+        if len(parser.missing) == len(LLM_SECTIONS):
+            # Nothing usable came back, don't spend more calls on repairs
+            logger.warning("Report parsing failed", extra={
+                "sample_key": "report.parse_failed",
+                "response": truncate(parser.text)
+            })
+            report = self._fallback_report(language, analysis)
+            for name, value in report.model_dump(exclude={"overview"}).items():
+                yield name, value
+            REPORT_GENERATION_DURATION.labels(language.value).observe(time.perf_counter() - start)
+            yield "report", report
+            return
+
+        for name in parser.missing:
+            value = await self._repair_section(language, messages, parser.text, name, usage)
+            value = self._merge_local_findings(name, value or [], analysis)
+            report_data[name] = value
+            yield name, value
+
+        REPORT_GENERATION_DURATION.labels(language.value).observe(time.perf_counter() - start)
+        yield "report", Report(**report_data)
+
+    def _merge_local_findings(self, name: str, value: list, analysis: LocalAnalysis) -> list:
+        """Prepend rule-detected grammar errors to the LLM's findings"""
+        if name != "grammar_errors" or not analysis.grammar_errors:
+            return value
+
+        local = [e.model_dump() for e in analysis.grammar_errors]
+        seen = {(e["error"], e["correction"]) for e in local}
+        return local + [
+            e for e in value
+            if (e.get("error"), e.get("correction")) not in seen
+        ]
+
+    async def generate_report(
+        self,
+        language: Language,
+        scenario: Scenario,
+        conversation: List[Message],
+        usage: Optional[UsageContext] = None
+    ) -> Report:
+        """
+        Generate detailed feedback report for conversation
+
+        Args:
+            language: Target language
+            scenario: Conversation scenario
+            conversation: Full conversation history
+            usage: Who the calls are accounted to
+
+        Returns:
+            Report object with analysis
+        """
+        report = None
+        async for name, value in self.generate_report_stream(language, scenario, conversation, usage):
+            if name == "report":
+                report = value
+        return report
 
 
 # Singleton instance
@@ -0,0 +1,187 @@
+"""
+Learner progress: summaries from the aggregate tables and a backfill command
+
+Aggregates are kept current by create_report. Reports saved before the
+progress tables existed are counted with:
+
+    python -m app.services.progress backfill
+
+The backfill rebuilds one user at a time in its own transaction, so it is
+safe to run (and re-run) while the app is serving traffic.
+"""
+import argparse
+import asyncio
+import logging
+import time
+from collections import defaultdict
+from datetime import date, timedelta
+from typing import Dict, Iterable, Optional
+from uuid import UUID
+
+from app.crud.progress import (
+    COUNTERS,
+    MAX_TERMS_PER_REPORT,
+    add_progress_deltas,
+    delete_user_progress,
+    get_user_report_contexts,
+    get_users_with_reports,
+    insert_learner_terms,
+    merge_deltas,
+    progress_deltas,
+    vocabulary_terms,
+    week_start,
+)
+from app.db.database import async_session_maker, unit_of_work
+
+logger = logging.getLogger(__name__)
+
+_SCENARIO_COUNTERS = ("reports", "turns", "words", "grammar_errors", "vocabulary_issues", "naturalness_issues")
+
+
+def summarize_progress(rows: Iterable, weeks: int = 12, today: Optional[date] = None) -> Dict:
+    """
+    Build the /api/progress response from a user's aggregate rows
+
+    Args:
+        rows: ProgressAggregate rows (any order)
+        weeks: Length of the weekly series, ending with the current week
+        today: Reference day (defaults to today, UTC)
+    """
+    today = today or date.today()
+    first_week = week_start(today) - timedelta(weeks=weeks - 1)
+
+    series = {first_week + timedelta(weeks=i): dict.fromkeys(COUNTERS, 0) for i in range(weeks)}
+    totals = dict.fromkeys(COUNTERS, 0)
+    scenarios: Dict[str, Dict[str, int]] = defaultdict(lambda: dict.fromkeys(_SCENARIO_COUNTERS, 0))
+    error_types: Dict[str, int] = defaultdict(int)
+    languages = set()
+
+    for row in rows:
+        languages.add(row.language)
+        if row.dimension == "error_type":
+            error_types[row.key] += row.grammar_errors
+            continue
+        for name in COUNTERS:
+            value = getattr(row, name)
+            totals[name] += value
+            if row.week_start in series:
+                series[row.week_start][name] += value
+        for name in _SCENARIO_COUNTERS:
+            scenarios[row.key][name] += getattr(row, name)
+
+    reports = totals["reports"]
+    return {
+        "languages": sorted(languages),
+        "totals": {
+            **{name: value for name, value in totals.items() if name != "new_terms"},
+            "errors_per_report": round(totals["grammar_errors"] / reports, 2) if reports else None,
+        },
+        "vocabulary_size": totals["new_terms"],
+        "weeks": [
+            {"week_start": week.isoformat(), **counters}
+            for week, counters in sorted(series.items())
+        ],
+        "scenarios": [
+            {"scenario": scenario, **counters}
+            for scenario, counters in sorted(scenarios.items(), key=lambda item: -item[1]["reports"])
+            if counters["reports"] > 0
+        ],
+        "error_types": [
+            {"error_type": error_type, "count": count}
+            for error_type, count in sorted(error_types.items(), key=lambda item: (-item[1], item[0]))
+            if count > 0
+        ],
+    }
+
+
+async def _write_week(db, user_id: UUID, week: date, languages: Dict[str, tuple]) -> None:
+    """Write one week of rebuilt counters: the vocabulary, then one upsert per language"""
+    for language, (deltas, terms) in languages.items():
+        for i in range(0, len(terms), MAX_TERMS_PER_REPORT):
+            await insert_learner_terms(db, user_id, language, terms[i:i + MAX_TERMS_PER_REPORT], week)
+        await add_progress_deltas(db, user_id, language, week, deltas)
+
+
+async def rebuild_user_progress(db, user_id: UUID, page_size: int = 500) -> int:
+    """
+    Recompute one user's aggregates and vocabulary from their reports
+
+    Reports are read a page at a time, oldest first, so terms are credited
+    to the week they were first used. Counters are summed per week in
+    memory and each week is written with a few statements, which keeps the
+    transaction (create_report adds to the same rows) short.
+
+    Returns:
+        Number of reports counted
+    """
+    await delete_user_progress(db, user_id)
+
+    seen = set()  # (language, term) already credited
+    week = None
+    languages: Dict[str, tuple] = {}  # language -> (deltas, new terms) of the current week
+    counted = 0
+    after = None
+    while True:
+        rows = await get_user_report_contexts(db, user_id, after, page_size)
+        for conversation_id, language, scenario, created_at, messages, report_data in rows:
+            if week_start(created_at) != week:
+                if languages:
+                    await _write_week(db, user_id, week, languages)
+                week, languages = week_start(created_at), {}
+
+            deltas, terms = languages.setdefault(language, ({}, []))
+            merge_deltas(deltas, progress_deltas(scenario, report_data))
+            new_terms = [term for term in vocabulary_terms(messages) if (language, term) not in seen]
+            if new_terms:
+                seen.update((language, term) for term in new_terms)
+                terms.extend(new_terms)
+                row = deltas.setdefault(("scenario", scenario[:100]), dict.fromkeys(COUNTERS, 0))
+                row["new_terms"] += len(new_terms)
+        counted += len(rows)
+        if len(rows) < page_size:
+            break
+        after = (rows[-1][3], rows[-1][0])
+
+    if languages:
+        await _write_week(db, user_id, week, languages)
+    return counted
+
+
+async def backfill(session_maker=None) -> int:
+    """
+    Rebuild progress for every user with reports
+
+    Returns:
+        Number of reports counted
+    """
+    session_maker = session_maker or async_session_maker
+    start = time.perf_counter()
+
+    async with session_maker() as db:
+        user_ids = await get_users_with_reports(db)
+
+    counted = 0
+    for user_id in user_ids:
+        async with session_maker() as db, unit_of_work(db):
+            counted += await rebuild_user_progress(db, user_id)
+
+    logger.info("Progress backfill finished", extra={
+        "users": len(user_ids),
+        "reports": counted,
+        "ms": round((time.perf_counter() - start) * 1000, 1),
+    })
+    return counted
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="LinguaEcho learner progress maintenance")
+    parser.add_argument("command", choices=["backfill"], help="backfill: rebuild aggregates from stored reports")
+    args = parser.parse_args(argv)
+
+    if args.command == "backfill":
+        counted = asyncio.run(backfill())
+        print(f"Counted {counted} reports")
+
+
+if __name__ == "__main__":
+    main()
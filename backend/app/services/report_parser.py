@@ -0,0 +1,192 @@
+"""
+Incremental JSON parsing for streamed report responses
+Emits each top-level report section as soon as its value closes
+"""
+import json
+from dataclasses import dataclass
+from typing import Any, List, Optional
+
+from pydantic import TypeAdapter, ValidationError
+
+from app.models.schemas import Report
+
+# Top-level report sections, in report order
+REPORT_SECTIONS = list(Report.model_fields.keys())
+
+# Sections written by the LLM; the overview is computed locally
+LLM_SECTIONS = [name for name in REPORT_SECTIONS if name != "overview"]
+
+# Validators for each section, built once from the Report schema
+SECTION_ADAPTERS = {
+    name: TypeAdapter(field.annotation)
+    for name, field in Report.model_fields.items()
+}
+
+# Parser states at the top level of the report object
+_KEY, _COLON, _VALUE, _IN_VALUE, _AFTER_VALUE = range(5)
+
+
+@dataclass
+class ParsedSection:
+    """A top-level report section parsed from the stream"""
+    name: str
+    raw: str
+    value: Any = None
+    error: Optional[str] = None
+
+    @property
+    def ok(self) -> bool:
+        return self.error is None
+
+
+def validate_section(name: str, value: Any) -> Any:
+    """
+    Validate a section value against the Report schema
+
+    Raises:
+        ValidationError if the value does not match the section type
+    """
+    return SECTION_ADAPTERS[name].validate_python(value)
+
+
+class IncrementalReportParser:
+    """
+    Streaming parser for the top-level report JSON object
+
+    Text before the opening brace (e.g. a ```json fence) and after the
+    closing brace is ignored, as are keys outside the expected sections.
+    Each top-level value is decoded and validated as soon as it is
+    complete; nested values are only scanned, never re-parsed, so the cost
+    is linear in the response length.
+    """
+
+    def __init__(self, sections: List[str] = LLM_SECTIONS):
+        self.expected = sections
+        self._text = ""
+        self._pos = 0
+        self._depth = 0
+        self._in_string = False
+        self._escape = False
+        self._state = _KEY
+        self._key_start = 0
+        self._value_start = 0
+        self._key: Optional[str] = None
+        self.done = False
+        self.sections: dict = {}
+
+    def feed(self, chunk: str) -> List[ParsedSection]:
+        """
+        Consume a chunk of streamed text
+
+        Returns:
+            Sections completed by this chunk, in stream order
+        """
+        if self.done or not chunk:
+            return []
+
+        self._text += chunk
+        completed = []
+        text = self._text
+
+        for i in range(self._pos, len(text)):
+            ch = text[i]
+
+            if self._in_string:
+                if self._escape:
+                    self._escape = False
+                elif ch == "\\":
+                    self._escape = True
+                elif ch == '"':
+                    self._in_string = False
+                    if self._depth == 1:
+                        if self._state == _KEY:
+                            self._key = self._decode_key(text[self._key_start:i + 1])
+                            self._state = _COLON
+                        elif self._state == _IN_VALUE:
+                            completed.append(self._emit(text[self._value_start:i + 1]))
+                continue
+
+            if self._depth == 0:
+                if ch == "{":
+                    self._depth = 1
+                    self._state = _KEY
+                continue
+
+            if ch == '"':
+                self._in_string = True
+                if self._depth == 1:
+                    if self._state == _KEY:
+                        self._key_start = i
+                    elif self._state == _VALUE:
+                        self._value_start = i
+                        self._state = _IN_VALUE
+                continue
+
+            if self._depth == 1:
+                if self._state == _COLON:
+                    if ch == ":":
+                        self._state = _VALUE
+                    continue
+                if self._state == _VALUE and not ch.isspace():
+                    self._value_start = i
+                    self._state = _IN_VALUE
+                if self._state == _IN_VALUE and ch in ",}":
+                    # End of a scalar value (number, true, false, null)
+                    completed.append(self._emit(text[self._value_start:i].strip()))
+                if self._state in (_KEY, _AFTER_VALUE):
+                    if ch == ",":
+                        self._state = _KEY
+                        continue
+                    if ch == "}":
+                        self._depth = 0
+                        self.done = True
+                        break
+                    continue
+
+            if ch in "{[":
+                self._depth += 1
+            elif ch in "}]":
+                self._depth -= 1
+                if self._depth == 1 and self._state == _IN_VALUE:
+                    completed.append(self._emit(text[self._value_start:i + 1]))
+
+        self._pos = len(text)
+        return [section for section in completed if section.name in self.expected]
+
+    @property
+    def text(self) -> str:
+        """All text received so far"""
+        return self._text
+
+    @property
+    def missing(self) -> List[str]:
+        """Report sections that have not been parsed successfully"""
+        return [
+            name for name in self.expected
+            if name not in self.sections or not self.sections[name].ok
+        ]
+
+    def _decode_key(self, raw: str) -> Optional[str]:
+        try:
+            return json.loads(raw)
+        except json.JSONDecodeError:
+            return None
+
+    def _emit(self, raw: str) -> ParsedSection:
+        """Decode and validate a completed top-level value"""
+        name = self._key
+        self._key = None
+        self._state = _AFTER_VALUE
+
+        section = ParsedSection(name=name, raw=raw)
+        try:
+            value = json.loads(raw)
+            if name in self.expected:
+                validate_section(name, value)
+            section.value = value
+        except (json.JSONDecodeError, ValidationError) as e:
+            section.error = str(e)
+
+        if name in self.expected:
+            self.sections[name] = section
+        return section
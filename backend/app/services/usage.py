@@ -0,0 +1,279 @@
+"""
+Token usage and cost accounting per user, session and provider
+Usage is aggregated in memory and flushed to usage_records in batches;
+daily quotas are enforced from the in-memory counters
+"""
+import asyncio
+import logging
+import time
+from dataclasses import dataclass, field
+from datetime import datetime, timedelta
+from typing import Dict, Optional, Tuple
+from uuid import UUID
+
+from app.config import settings
+from app.crud.usage import insert_usage_records, get_user_tokens_since
+from app.db.database import async_session_maker, unit_of_work
+
+logger = logging.getLogger(__name__)
+
+
+@dataclass(frozen=True)
+class UsageContext:
+    """Who and what an LLM call is for"""
+    user_id: Optional[UUID] = None
+    session_id: Optional[str] = None
+    language: Optional[str] = None
+    scenario: Optional[str] = None
+
+
+@dataclass
+class UsageTotals:
+    """Accumulated usage for one aggregation key"""
+    calls: int = 0
+    prompt_tokens: int = 0
+    completion_tokens: int = 0
+    cached_tokens: int = 0
+    latency_ms: int = 0
+    cost_usd: float = 0.0
+
+
+@dataclass
+class DailyUsage:
+    """A user's token total for one UTC day"""
+    day: datetime
+    tokens: int = 0
+    loading: bool = False
+    warmed: asyncio.Event = field(default_factory=asyncio.Event)
+
+
+# (bucket_start, user_id, session_id, provider, model, operation, language, scenario)
+UsageKey = Tuple[datetime, Optional[UUID], Optional[str], str, str, str, Optional[str], Optional[str]]
+
+
+def _utc_day(now: datetime) -> datetime:
+    return now.replace(hour=0, minute=0, second=0, microsecond=0)
+
+
+def estimate_cost(prompt_tokens: int, completion_tokens: int) -> float:
+    """Cost in USD at the configured per-million-token prices"""
+    return (
+        prompt_tokens * settings.USAGE_PROMPT_PRICE_PER_1M
+        + completion_tokens * settings.USAGE_COMPLETION_PRICE_PER_1M
+    ) / 1_000_000
+
+
+def estimate_prompt_tokens(messages: list) -> int:
+    """Rough prompt size, about 4 characters per token, for calls without provider usage"""
+    return sum(len(str(getattr(message, "content", message))) for message in messages) // 4
+
+
+class UsageTracker:
+    """In-memory usage aggregates with batched flushes and daily quotas"""
+
+    def __init__(self, daily_token_quota: int = 0, flush_interval: float = 30.0,
+                 max_pending: int = 10000):
+        self.daily_token_quota = daily_token_quota
+        self.flush_interval = flush_interval
+        self.max_pending = max_pending
+        self.pending: Dict[UsageKey, UsageTotals] = {}
+        self.daily: Dict[UUID, DailyUsage] = {}
+        self._task: Optional[asyncio.Task] = None
+        # Held while a batch is written, so a warm-up never sees it half-flushed
+        self._flush_lock = asyncio.Lock()
+
+    def record(
+        self,
+        context: Optional[UsageContext],
+        provider: str,
+        model: str,
+        operation: str,
+        prompt_tokens: int,
+        completion_tokens: int,
+        cached_tokens: int = 0,
+        latency: float = 0.0
+    ) -> None:
+        """
+        Add one LLM call to the in-memory aggregates
+
+        Args:
+            context: User, session, language and scenario of the call
+            provider: LLM provider name
+            model: Model name
+            operation: chat, chat_stream, report or report_repair
+            prompt_tokens: Input tokens reported by the provider
+            completion_tokens: Output tokens reported by the provider
+            cached_tokens: Input tokens served from the provider's prompt cache
+            latency: Call duration in seconds
+        """
+        context = context or UsageContext()
+        now = datetime.utcnow()
+        key = (
+            now.replace(minute=0, second=0, microsecond=0),
+            context.user_id, context.session_id,
+            provider, model, operation,
+            context.language, context.scenario
+        )
+        totals = self.pending.get(key)
+        if totals is None:
+            if len(self.pending) >= self.max_pending:
+                logger.warning("Usage buffer full, dropping record", extra={"sample_key": "usage.dropped"})
+                return
+            totals = self.pending[key] = UsageTotals()
+        totals.calls += 1
+        totals.prompt_tokens += prompt_tokens
+        totals.completion_tokens += completion_tokens
+        totals.cached_tokens += cached_tokens
+        totals.latency_ms += int(latency * 1000)
+        totals.cost_usd += estimate_cost(prompt_tokens, completion_tokens)
+
+        if context.user_id is not None:
+            daily = self._daily(context.user_id, now)
+            daily.tokens += prompt_tokens + completion_tokens
+
+    def _daily(self, user_id: UUID, now: datetime) -> DailyUsage:
+        day = _utc_day(now)
+        daily = self.daily.get(user_id)
+        if daily is None or daily.day != day:
+            daily = self.daily[user_id] = DailyUsage(day=day)
+        return daily
+
+    def _pending_tokens(self, user_id: UUID, day: datetime) -> int:
+        """A user's tokens since `day` that are not flushed yet"""
+        return sum(
+            totals.prompt_tokens + totals.completion_tokens
+            for key, totals in self.pending.items()
+            if key[1] == user_id and key[0] >= day
+        )
+
+    async def ensure_warm(self, db, user_id: UUID) -> DailyUsage:
+        """
+        Load today's already-flushed usage for a user, once per user per day
+
+        The counter is replaced by the flushed total plus what is still
+        pending: usage recorded before the warm-up may already be flushed.
+        Later checks are served from memory; concurrent first requests wait
+        for the same load instead of querying again.
+        """
+        daily = self._daily(user_id, datetime.utcnow())
+        if daily.warmed.is_set():
+            return daily
+        if daily.loading:
+            await daily.warmed.wait()
+            return daily
+
+        daily.loading = True
+        try:
+            async with self._flush_lock:
+                flushed = await get_user_tokens_since(db, user_id, daily.day)
+                daily.tokens = flushed + self._pending_tokens(user_id, daily.day)
+        except Exception as e:
+            logger.warning("Usage quota warm-up failed", extra={"user_id": str(user_id), "error": str(e)})
+        finally:
+            daily.loading = False
+            daily.warmed.set()
+        return daily
+
+    def remaining_tokens(self, user_id: UUID) -> Optional[int]:
+        """Tokens left in today's quota, or None if quotas are off"""
+        if not self.daily_token_quota:
+            return None
+        daily = self._daily(user_id, datetime.utcnow())
+        return max(0, self.daily_token_quota - daily.tokens)
+
+    def take_pending(self) -> Dict[UsageKey, UsageTotals]:
+        """Swap out the pending aggregates for flushing"""
+        pending, self.pending = self.pending, {}
+        return pending
+
+    def restore_pending(self, pending: Dict[UsageKey, UsageTotals]) -> None:
+        """Merge aggregates back after a failed flush"""
+        for key, totals in pending.items():
+            current = self.pending.get(key)
+            if current is None:
+                if len(self.pending) < self.max_pending:
+                    self.pending[key] = totals
+                continue
+            current.calls += totals.calls
+            current.prompt_tokens += totals.prompt_tokens
+            current.completion_tokens += totals.completion_tokens
+            current.cached_tokens += totals.cached_tokens
+            current.latency_ms += totals.latency_ms
+            current.cost_usd += totals.cost_usd
+
+    async def flush(self, session_maker=None) -> int:
+        """
+        Write pending aggregates to usage_records in one batch
+
+        Returns:
+            Number of rows written
+        """
+        async with self._flush_lock:
+            return await self._flush(session_maker or async_session_maker)
+
+    async def _flush(self, session_maker) -> int:
+        pending = self.take_pending()
+        if not pending:
+            return 0
+
+        rows = [
+            {
+                "bucket_start": key[0], "user_id": key[1], "session_id": key[2],
+                "provider": key[3], "model": key[4], "operation": key[5],
+                "language": key[6], "scenario": key[7],
+                "calls": totals.calls,
+                "prompt_tokens": totals.prompt_tokens,
+                "completion_tokens": totals.completion_tokens,
+                "cached_tokens": totals.cached_tokens,
+                "latency_ms": totals.latency_ms,
+                "cost_usd": round(totals.cost_usd, 6),
+            }
+            for key, totals in pending.items()
+        ]
+        start = time.perf_counter()
+        try:
+            async with session_maker() as db, unit_of_work(db):
+                await insert_usage_records(db, rows)
+        except Exception as e:
+            self.restore_pending(pending)
+            logger.error("Usage flush failed", extra={"rows": len(rows), "error": str(e)})
+            return 0
+
+        logger.debug("Usage flushed", extra={
+            "rows": len(rows), "ms": round((time.perf_counter() - start) * 1000, 1)
+        })
+        self._prune_daily()
+        return len(rows)
+
+    def _prune_daily(self) -> None:
+        """Drop quota counters from previous days"""
+        today = _utc_day(datetime.utcnow())
+        for user_id in [u for u, d in self.daily.items() if d.day < today - timedelta(days=1)]:
+            del self.daily[user_id]
+
+    async def _run(self) -> None:
+        while True:
+            await asyncio.sleep(self.flush_interval)
+            await self.flush()
+
+    def start(self) -> None:
+        """Start periodic flushing (call from the event loop)"""
+        if self._task is None:
+            self._task = asyncio.get_running_loop().create_task(self._run())
+
+    async def stop(self) -> None:
+        """Stop periodic flushing and write what is left"""
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+        await self.flush()
+
+
+usage_tracker = UsageTracker(
+    daily_token_quota=settings.USAGE_DAILY_TOKEN_QUOTA,
+    flush_interval=settings.USAGE_FLUSH_INTERVAL,
+)
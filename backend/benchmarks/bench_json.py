@@ -0,0 +1,113 @@
+"""
+Micro-benchmark for JSON serialization of large history payloads
+
+Compares the ways a GET /api/conversations response can be produced:
+Pydantic validation plus stdlib json (the old default path), Pydantic
+plus the fast backend, and the fast backend on plain dicts.
+
+Usage (from backend/):
+    python -m benchmarks.bench_json --conversations 50 --turns 20
+"""
+import argparse
+import json
+import random
+import time
+import uuid
+from datetime import datetime, timedelta
+from typing import Callable, List
+
+from fastapi.encoders import jsonable_encoder
+from pydantic import TypeAdapter
+
+from app.core.serialization import BACKEND, dumps, sse_event
+from app.models.schemas import ConversationDetail
+
+PHRASES = [
+    "すみません、メニューをください",
+    "ラーメンを二つお願いします",
+    "お会計をお願いします",
+    "我想订一个双人房间",
+    "Could you recommend something spicy?",
+]
+
+
+def build_payload(conversations: int, turns: int, seed: int = 0) -> List[dict]:
+    """Conversations shaped like the history list response, with reports"""
+    rng = random.Random(seed)
+    now = datetime.utcnow()
+    payload = []
+    for i in range(conversations):
+        messages = []
+        for _ in range(turns):
+            messages.append({"role": "user", "content": rng.choice(PHRASES)})
+            messages.append({"role": "assistant", "content": " ".join(rng.choices(PHRASES, k=4))})
+        payload.append({
+            "id": uuid.UUID(int=rng.getrandbits(128)),
+            "session_id": uuid.UUID(int=rng.getrandbits(128)),
+            "language": "japanese",
+            "scenario": "restaurant",
+            "messages": messages,
+            "created_at": now - timedelta(minutes=i),
+            "report": {
+                "overview": {"language": "japanese", "scenario": "restaurant", "turns": turns, "word_count": 200},
+                "grammar_errors": [{
+                    "error": "を particle incorrect",
+                    "correction": "レストランに行きたいです",
+                    "explanation": "Use に for destinations, not を",
+                    "error_type": "particle",
+                }] * 3,
+                "vocabulary_issues": [],
+                "naturalness": [],
+                "positive_feedback": ["Good use of polite form"],
+            },
+        })
+    return payload
+
+
+def timeit(fn: Callable[[], object], repeat: int) -> float:
+    """Best-of-five mean milliseconds per call"""
+    best = float("inf")
+    for _ in range(5):
+        start = time.perf_counter()
+        for _ in range(repeat):
+            fn()
+        best = min(best, (time.perf_counter() - start) / repeat)
+    return best * 1000
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="JSON serialization benchmark")
+    parser.add_argument("--conversations", type=int, default=50)
+    parser.add_argument("--turns", type=int, default=20, help="User/assistant pairs per conversation")
+    parser.add_argument("--repeat", type=int, default=20)
+    args = parser.parse_args(argv)
+
+    payload = build_payload(args.conversations, args.turns)
+    adapter = TypeAdapter(List[ConversationDetail])
+    models = adapter.validate_python(payload)
+    plain = adapter.dump_python(models, mode="json")
+
+    cases = {
+        "pydantic + stdlib json": lambda: json.dumps(
+            jsonable_encoder(adapter.validate_python(payload)), ensure_ascii=False
+        ).encode("utf-8"),
+        f"pydantic + {BACKEND}": lambda: dumps(adapter.dump_python(adapter.validate_python(payload), mode="json")),
+        "dicts + stdlib json": lambda: json.dumps(plain, ensure_ascii=False).encode("utf-8"),
+        f"dicts + {BACKEND}": lambda: dumps(payload),
+    }
+
+    size = len(dumps(payload))
+    print(f"{args.conversations} conversations x {args.turns} turns, {size / 1024:.0f} KiB per response")
+    print(f"\n{'path':<28}{'ms/response':>12}")
+    for name, fn in cases.items():
+        print(f"{name:<28}{timeit(fn, args.repeat):>12.2f}")
+
+    event = {"type": "chunk", "content": "ラーメン", "session_id": str(uuid.uuid4())}
+    print(f"\n{'SSE chunk':<28}{'us/event':>12}")
+    print(f"{'stdlib json':<28}"
+          f"{timeit(lambda: f'data: {json.dumps(event, ensure_ascii=False)}' + chr(10) * 2, 10000) * 1000:>12.2f}")
+    print(f"{BACKEND:<28}{timeit(lambda: sse_event(event), 10000) * 1000:>12.2f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,68 @@
+"""
+Compare two load test result files
+
+Usage (from backend/):
+    python -m benchmarks.compare benchmarks/results/old.json benchmarks/results/new.json
+"""
+import argparse
+import json
+from pathlib import Path
+
+METRICS = ["p50_ms", "p95_ms", "p99_ms"]
+
+
+def _change(old, new) -> str:
+    if old is None or new is None:
+        return "-"
+    if old == 0:
+        return "n/a"
+    return f"{(new - old) / old * 100:+.1f}%"
+
+
+def compare(old: dict, new: dict, threshold: float) -> bool:
+    """Print a comparison table; returns True if any metric regressed"""
+    print(f"{old['meta']['commit']} -> {new['meta']['commit']}")
+    print(f"throughput: {old['totals']['throughput_rps']} -> {new['totals']['throughput_rps']} req/s "
+          f"({_change(old['totals']['throughput_rps'], new['totals']['throughput_rps'])})")
+
+    regressed = False
+    print(f"\n{'operation':<14}{'metric':<12}{'old':>10}{'new':>10}{'change':>10}")
+    for op, new_data in new["operations"].items():
+        old_data = old["operations"].get(op)
+        if not old_data:
+            continue
+        for kind in ("latency", "ttft"):
+            if not new_data.get(kind) or not old_data.get(kind):
+                continue
+            for metric in METRICS:
+                before, after = old_data[kind][metric], new_data[kind][metric]
+                flag = ""
+                if before and after and (after - before) / before * 100 > threshold:
+                    flag = "  !"
+                    regressed = True
+                print(f"{op:<14}{kind + ' ' + metric[:3]:<12}{before or '-':>10}{after or '-':>10}"
+                      f"{_change(before, after):>10}{flag}")
+
+    for name in ("event_loop_lag", "db_pool_wait"):
+        before, after = old["server"].get(name), new["server"].get(name)
+        if before and after:
+            print(f"{name:<26}{before['p99_ms'] or '-':>10}{after['p99_ms'] or '-':>10}"
+                  f"{_change(before['p99_ms'], after['p99_ms']):>10}")
+
+    return regressed
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Compare LinguaEcho load test results")
+    parser.add_argument("old", type=Path)
+    parser.add_argument("new", type=Path)
+    parser.add_argument("--threshold", type=float, default=10.0,
+                        help="Percent increase flagged as a regression")
+    args = parser.parse_args(argv)
+
+    regressed = compare(json.loads(args.old.read_text()), json.loads(args.new.read_text()), args.threshold)
+    raise SystemExit(1 if regressed else 0)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,579 @@
+"""
+End-to-end load test for the LinguaEcho API
+
+Drives the FastAPI app with a weighted mix of guest/authenticated chat,
+streaming chat, history listing and report generation, against the
+database in DATABASE_URL and the fake LLM provider (LLM_PROVIDER=fake).
+
+Usage (from backend/):
+    python -m benchmarks.loadtest --mode inprocess --duration 30 --users 20
+    python -m benchmarks.loadtest --mode uvicorn --duration 60 --users 50
+
+Results are written as JSON to benchmarks/results/ for comparison with
+benchmarks/compare.py.
+"""
+import argparse
+import asyncio
+import json
+import os
+import platform
+import random
+import subprocess
+import sys
+import time
+import uuid
+from dataclasses import dataclass, field
+from datetime import datetime
+from pathlib import Path
+from typing import Dict, List, Optional
+
+# The fake provider must be selected before the app is imported
+os.environ.setdefault("LLM_PROVIDER", "fake")
+# All virtual users share one client address, so per-client rate limits and
+# daily quotas would turn most requests into 429s. Export
+# RATE_LIMIT_ENABLED=true to measure the limiter itself.
+os.environ.setdefault("RATE_LIMIT_ENABLED", "false")
+os.environ.setdefault("USAGE_DAILY_TOKEN_QUOTA", "0")
+
+BACKEND_DIR = Path(__file__).resolve().parent.parent
+RESULTS_DIR = Path(__file__).resolve().parent / "results"
+
+# Operation weights for the default traffic mix
+DEFAULT_MIX = {
+    "guest_chat": 10,
+    "guest_stream": 20,
+    "auth_chat": 10,
+    "auth_stream": 35,
+    "history_list": 15,
+    "report": 10,
+}
+
+GUEST_OPERATIONS = {"guest_chat", "guest_stream"}
+
+USER_MESSAGES = [
+    "すみません、メニューをください",
+    "ラーメンを二つお願いします",
+    "お水をもらえますか？",
+    "I'd like to book a table for two",
+    "Could you recommend something?",
+    "How much is the pasta?",
+]
+
+
+def percentile(sorted_values: List[float], p: float) -> Optional[float]:
+    """Linear-interpolated percentile of pre-sorted values"""
+    if not sorted_values:
+        return None
+    k = (len(sorted_values) - 1) * p / 100
+    lower = int(k)
+    upper = min(lower + 1, len(sorted_values) - 1)
+    return sorted_values[lower] + (sorted_values[upper] - sorted_values[lower]) * (k - lower)
+
+
+def summarize(values: List[float]) -> Dict[str, Optional[float]]:
+    """Latency summary in milliseconds"""
+    ordered = sorted(values)
+    return {
+        "count": len(ordered),
+        "mean_ms": round(sum(ordered) / len(ordered) * 1000, 3) if ordered else None,
+        "p50_ms": _ms(percentile(ordered, 50)),
+        "p95_ms": _ms(percentile(ordered, 95)),
+        "p99_ms": _ms(percentile(ordered, 99)),
+        "max_ms": _ms(ordered[-1] if ordered else None),
+    }
+
+
+def _ms(seconds: Optional[float]) -> Optional[float]:
+    return round(seconds * 1000, 3) if seconds is not None else None
+
+
+@dataclass
+class Response:
+    """Outcome of a single request"""
+    status: int
+    body: bytes
+    latency: float
+    ttft: Optional[float] = None
+
+    def json(self):
+        return json.loads(self.body)
+
+
+@dataclass
+class OperationStats:
+    """Collected measurements for one operation type"""
+    latencies: List[float] = field(default_factory=list)
+    ttfts: List[float] = field(default_factory=list)
+    statuses: Dict[int, int] = field(default_factory=dict)
+    errors: int = 0
+    rate_limited: int = 0
+
+    def record(self, response: Response) -> None:
+        self.statuses[response.status] = self.statuses.get(response.status, 0) + 1
+        if response.status == 429:
+            # Rejected requests are counted apart and kept out of latencies
+            self.rate_limited += 1
+            return
+        if response.status >= 400:
+            self.errors += 1
+            return
+        self.latencies.append(response.latency)
+        if response.ttft is not None:
+            self.ttfts.append(response.ttft)
+
+
+class InProcessClient:
+    """
+    Minimal ASGI client that calls the app directly
+
+    Unlike httpx's ASGITransport it timestamps each body chunk as the app
+    sends it, so time-to-first-token is measured for streaming routes.
+    """
+
+    def __init__(self, app):
+        self.app = app
+
+    async def request(self, method: str, path: str, json_body=None, headers=None) -> Response:
+        body = json.dumps(json_body).encode("utf-8") if json_body is not None else b""
+        raw_headers = [(b"content-type", b"application/json"), (b"host", b"bench")]
+        for name, value in (headers or {}).items():
+            raw_headers.append((name.lower().encode("latin-1"), value.encode("latin-1")))
+
+        path, _, query = path.partition("?")
+        scope = {
+            "type": "http",
+            "asgi": {"version": "3.0"},
+            "http_version": "1.1",
+            "method": method,
+            "scheme": "http",
+            "path": path,
+            "raw_path": path.encode("utf-8"),
+            "query_string": query.encode("utf-8"),
+            "root_path": "",
+            "headers": raw_headers,
+            "client": ("127.0.0.1", 50000),
+            "server": ("bench", 80),
+        }
+
+        request_sent = False
+
+        async def receive():
+            nonlocal request_sent
+            if not request_sent:
+                request_sent = True
+                return {"type": "http.request", "body": body, "more_body": False}
+            await asyncio.Event().wait()  # Client never disconnects
+
+        status = 0
+        chunks = []
+        ttft = None
+        start = time.perf_counter()
+
+        async def send(message):
+            nonlocal status, ttft
+            if message["type"] == "http.response.start":
+                status = message["status"]
+            elif message["type"] == "http.response.body":
+                chunk = message.get("body", b"")
+                if chunk and ttft is None:
+                    ttft = time.perf_counter() - start
+                chunks.append(chunk)
+
+        await self.app(scope, receive, send)
+        return Response(status=status, body=b"".join(chunks), latency=time.perf_counter() - start, ttft=ttft)
+
+
+class HTTPClient:
+    """httpx client against a running server, measuring time-to-first-byte"""
+
+    def __init__(self, base_url: str, connections: int):
+        import httpx
+        self.client = httpx.AsyncClient(
+            base_url=base_url,
+            timeout=120,
+            limits=httpx.Limits(max_connections=connections, max_keepalive_connections=connections)
+        )
+
+    async def request(self, method: str, path: str, json_body=None, headers=None) -> Response:
+        start = time.perf_counter()
+        ttft = None
+        chunks = []
+        async with self.client.stream(method, path, json=json_body, headers=headers) as response:
+            async for chunk in response.aiter_raw():
+                if chunk and ttft is None:
+                    ttft = time.perf_counter() - start
+                chunks.append(chunk)
+        return Response(
+            status=response.status_code,
+            body=b"".join(chunks),
+            latency=time.perf_counter() - start,
+            ttft=ttft
+        )
+
+    async def close(self):
+        await self.client.aclose()
+
+
+class LoopLagMonitor:
+    """Samples event-loop lag by measuring sleep overshoot"""
+
+    def __init__(self, interval: float = 0.01):
+        self.interval = interval
+        self.samples: List[float] = []
+        self._task = None
+
+    async def _run(self):
+        loop = asyncio.get_running_loop()
+        while True:
+            expected = loop.time() + self.interval
+            await asyncio.sleep(self.interval)
+            self.samples.append(max(0.0, loop.time() - expected))
+
+    def start(self):
+        self._task = asyncio.create_task(self._run())
+
+    async def stop(self):
+        self._task.cancel()
+        try:
+            await self._task
+        except asyncio.CancelledError:
+            pass
+
+
+class PoolWaitRecorder:
+    """Records how long each DB pool checkout waits for a connection"""
+
+    def __init__(self, engine):
+        self.samples: List[float] = []
+        pool = engine.sync_engine.pool
+        original = pool._do_get
+
+        def timed_do_get():
+            start = time.perf_counter()
+            try:
+                return original()
+            finally:
+                self.samples.append(time.perf_counter() - start)
+
+        pool._do_get = timed_do_get
+
+
+class VirtualUser:
+    """A simulated client with its own session and conversation state"""
+
+    def __init__(self, index: int, client, token: Optional[str], rng: random.Random, max_turns: int):
+        self.index = index
+        self.client = client
+        self.token = token
+        self.rng = rng
+        self.max_turns = max_turns
+        self._new_session()
+
+    def _new_session(self):
+        self.session_id = str(uuid.uuid4())
+        self.language = self.rng.choice(["japanese", "english"])
+        self.scenario = self.rng.choice(["restaurant", "hotel", "supermarket", "casual_chat"])
+        self.history: List[dict] = []
+
+    @property
+    def auth_headers(self) -> dict:
+        return {"Authorization": f"Bearer {self.token}"} if self.token else {}
+
+    def _chat_body(self) -> dict:
+        return {
+            "session_id": self.session_id,
+            "language": self.language,
+            "scenario": self.scenario,
+            "message": self.rng.choice(USER_MESSAGES),
+            "history": self.history,
+        }
+
+    def _advance(self, message: str, reply: str):
+        self.history = self.history + [
+            {"role": "user", "content": message},
+            {"role": "assistant", "content": reply},
+        ]
+        if len(self.history) >= self.max_turns * 2:
+            self._new_session()
+
+    async def run(self, operation: str) -> Response:
+        headers = {} if operation in GUEST_OPERATIONS else self.auth_headers
+
+        if operation in ("guest_chat", "auth_chat"):
+            body = self._chat_body()
+            response = await self.client.request("POST", "/api/chat", body, headers)
+            if response.status == 200:
+                self._advance(body["message"], response.json()["reply"])
+            return response
+
+        if operation in ("guest_stream", "auth_stream"):
+            body = self._chat_body()
+            response = await self.client.request("POST", "/api/chat/stream", body, headers)
+            if response.status == 200:
+                self._advance(body["message"], _stream_reply(response.body))
+            return response
+
+        if operation == "history_list":
+            return await self.client.request("GET", "/api/conversations?limit=50", None, headers)
+
+        if operation == "report":
+            conversation = self.history or [{"role": "user", "content": self.rng.choice(USER_MESSAGES)}]
+            body = {
+                "session_id": self.session_id,
+                "language": self.language,
+                "scenario": self.scenario,
+                "conversation": conversation,
+            }
+            response = await self.client.request("POST", "/api/report/generate", body, headers)
+            self._new_session()
+            return response
+
+        raise ValueError(f"Unknown operation: {operation}")
+
+
+def _stream_reply(body: bytes) -> str:
+    """Extract the final reply from an SSE response body"""
+    for line in reversed(body.decode("utf-8").splitlines()):
+        if line.startswith("data: "):
+            event = json.loads(line[6:])
+            if event.get("type") == "done":
+                return event["content"]
+    return ""
+
+
+async def register_users(client, count: int) -> List[str]:
+    """Register benchmark users and return their access tokens"""
+    tokens = []
+    run_id = uuid.uuid4().hex[:8]
+    for i in range(count):
+        body = {"email": f"bench-{run_id}-{i}@example.com", "password": "benchmark-password"}
+        response = await client.request("POST", "/api/auth/register", body)
+        if response.status != 201:
+            raise RuntimeError(f"User registration failed ({response.status}): {response.body[:200]!r}")
+        tokens.append(response.json()["access_token"])
+    return tokens
+
+
+async def drive(client, args, mix: Dict[str, int]) -> Dict[str, OperationStats]:
+    """Run virtual users against the client until the duration elapses"""
+    rng = random.Random(args.seed)
+    tokens = await register_users(client, args.auth_users) if args.auth_users else []
+    if not tokens:
+        mix = {op: w for op, w in mix.items() if op in GUEST_OPERATIONS}
+
+    operations = list(mix)
+    weights = [mix[op] for op in operations]
+    stats = {op: OperationStats() for op in operations}
+
+    users = [
+        VirtualUser(
+            i, client, tokens[i % len(tokens)] if tokens else None,
+            random.Random(rng.random()), args.max_turns
+        )
+        for i in range(args.users)
+    ]
+
+    async def run_user(user: VirtualUser, deadline: float, record: bool):
+        while time.perf_counter() < deadline:
+            operation = user.rng.choices(operations, weights)[0]
+            try:
+                response = await user.run(operation)
+            except Exception as e:
+                response = Response(status=599, body=str(e).encode("utf-8"), latency=0.0)
+            if record:
+                stats[operation].record(response)
+            if args.think_time:
+                await asyncio.sleep(user.rng.expovariate(1 / args.think_time))
+
+    if args.warmup:
+        deadline = time.perf_counter() + args.warmup
+        await asyncio.gather(*(run_user(u, deadline, False) for u in users))
+
+    deadline = time.perf_counter() + args.duration
+    await asyncio.gather(*(run_user(u, deadline, True) for u in users))
+    return stats
+
+
+async def run_inprocess(args, mix):
+    """Drive the app in this process through the ASGI interface"""
+    from main import app
+    from app.db.database import engine, init_db
+
+    if not args.skip_db_setup:
+        await init_db()
+
+    pool_recorder = PoolWaitRecorder(engine)
+    lag_monitor = LoopLagMonitor()
+    client = InProcessClient(app)
+
+    async with app.router.lifespan_context(app):
+        lag_monitor.start()
+        try:
+            stats = await drive(client, args, mix)
+        finally:
+            await lag_monitor.stop()
+
+    await engine.dispose()
+    return stats, {
+        "event_loop_lag": summarize(lag_monitor.samples),
+        "db_pool_wait": summarize(pool_recorder.samples),
+    }
+
+
+async def _wait_for_server(client: HTTPClient, process: subprocess.Popen, timeout: float = 30):
+    deadline = time.perf_counter() + timeout
+    while time.perf_counter() < deadline:
+        if process.poll() is not None:
+            raise RuntimeError("uvicorn exited during startup")
+        try:
+            response = await client.request("GET", "/health")
+            if response.status == 200:
+                return
+        except Exception:
+            pass
+        await asyncio.sleep(0.2)
+    raise RuntimeError("uvicorn did not become healthy in time")
+
+
+async def run_uvicorn(args, mix):
+    """Drive a real uvicorn server started in a subprocess"""
+    if not args.skip_db_setup:
+        from app.db.database import engine, init_db
+        await init_db()
+        await engine.dispose()
+
+    command = [
+        sys.executable, "-m", "uvicorn", "main:app",
+        "--host", "127.0.0.1", "--port", str(args.port),
+        "--workers", str(args.workers), "--log-level", "warning",
+    ]
+    process = subprocess.Popen(command, cwd=BACKEND_DIR, env=dict(os.environ))
+    client = HTTPClient(f"http://127.0.0.1:{args.port}", args.users)
+    try:
+        await _wait_for_server(client, process)
+        stats = await drive(client, args, mix)
+    finally:
+        await client.close()
+        process.terminate()
+        process.wait(timeout=30)
+
+    # Loop lag and pool wait are only observable inside the server process
+    return stats, {"event_loop_lag": None, "db_pool_wait": None}
+
+
+def git_commit() -> Optional[str]:
+    try:
+        return subprocess.check_output(
+            ["git", "rev-parse", "--short", "HEAD"], cwd=BACKEND_DIR, text=True
+        ).strip()
+    except Exception:
+        return None
+
+
+def build_results(args, mix, stats: Dict[str, OperationStats], server: dict) -> dict:
+    total_ok = sum(len(s.latencies) for s in stats.values())
+    total_errors = sum(s.errors for s in stats.values())
+    total_rate_limited = sum(s.rate_limited for s in stats.values())
+    return {
+        "meta": {
+            "commit": git_commit(),
+            "timestamp": datetime.utcnow().isoformat() + "Z",
+            "mode": args.mode,
+            "python": platform.python_version(),
+            "config": {
+                "duration_s": args.duration,
+                "users": args.users,
+                "auth_users": args.auth_users,
+                "workers": args.workers if args.mode == "uvicorn" else 1,
+                "seed": args.seed,
+                "mix": mix,
+                "llm": {k: v for k, v in os.environ.items() if k.startswith("FAKE_LLM_")},
+                "rate_limits": os.environ["RATE_LIMIT_ENABLED"],
+            },
+        },
+        "totals": {
+            "requests": total_ok + total_errors + total_rate_limited,
+            "errors": total_errors,
+            "rate_limited": total_rate_limited,
+            "throughput_rps": round(total_ok / args.duration, 3),
+        },
+        "operations": {
+            op: {
+                "throughput_rps": round(len(s.latencies) / args.duration, 3),
+                "errors": s.errors,
+                "rate_limited": s.rate_limited,
+                "statuses": {str(k): v for k, v in sorted(s.statuses.items())},
+                "latency": summarize(s.latencies),
+                "ttft": summarize(s.ttfts) if op.endswith("stream") else None,
+            }
+            for op, s in stats.items()
+        },
+        "server": server,
+    }
+
+
+def print_summary(results: dict) -> None:
+    totals = results["totals"]
+    print(f"\n{results['meta']['mode']} @ {results['meta']['commit']}: "
+          f"{totals['requests']} requests, {totals['errors']} errors, "
+          f"{totals['rate_limited']} rate limited, {totals['throughput_rps']} req/s")
+    print(f"{'operation':<14}{'rps':>8}{'err':>6}{'429':>6}{'p50':>10}{'p95':>10}{'p99':>10}{'ttft p50':>10}")
+    for op, data in results["operations"].items():
+        latency = data["latency"]
+        ttft = (data["ttft"] or {}).get("p50_ms")
+        print(f"{op:<14}{data['throughput_rps']:>8}{data['errors']:>6}{data['rate_limited']:>6}"
+              f"{latency['p50_ms'] or '-':>10}{latency['p95_ms'] or '-':>10}{latency['p99_ms'] or '-':>10}"
+              f"{ttft or '-':>10}")
+    for name, summary in results["server"].items():
+        if summary and summary["count"]:
+            print(f"{name}: p50 {summary['p50_ms']} ms, p99 {summary['p99_ms']} ms, max {summary['max_ms']} ms")
+
+
+def parse_mix(value: Optional[str]) -> Dict[str, int]:
+    """Parse a mix like 'guest_stream=50,history_list=50'"""
+    if not value:
+        return dict(DEFAULT_MIX)
+    mix = {}
+    for part in value.split(","):
+        name, _, weight = part.partition("=")
+        if name not in DEFAULT_MIX:
+            raise argparse.ArgumentTypeError(f"Unknown operation: {name}")
+        mix[name] = int(weight)
+    return mix
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="LinguaEcho load test")
+    parser.add_argument("--mode", choices=["inprocess", "uvicorn"], default="inprocess")
+    parser.add_argument("--duration", type=float, default=30, help="Measured seconds")
+    parser.add_argument("--warmup", type=float, default=5, help="Unmeasured warmup seconds")
+    parser.add_argument("--users", type=int, default=20, help="Concurrent virtual users")
+    parser.add_argument("--auth-users", type=int, default=10, help="Registered accounts (0 for guests only)")
+    parser.add_argument("--max-turns", type=int, default=8, help="Turns before a session is restarted")
+    parser.add_argument("--think-time", type=float, default=0.0, help="Mean seconds between requests")
+    parser.add_argument("--mix", type=parse_mix, default=None, help="e.g. guest_stream=50,history_list=50")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--workers", type=int, default=1)
+    parser.add_argument("--skip-db-setup", action="store_true", help="Don't create tables before the run")
+    parser.add_argument("--output", type=Path, default=None, help="Result file (default: results/<time>-<commit>.json)")
+    args = parser.parse_args(argv)
+
+    mix = args.mix or dict(DEFAULT_MIX)
+    runner = run_inprocess if args.mode == "inprocess" else run_uvicorn
+    stats, server = asyncio.run(runner(args, mix))
+
+    results = build_results(args, mix, stats, server)
+    print_summary(results)
+
+    output = args.output
+    if output is None:
+        RESULTS_DIR.mkdir(exist_ok=True)
+        stamp = datetime.utcnow().strftime("%Y%m%dT%H%M%S")
+        output = RESULTS_DIR / f"{stamp}-{results['meta']['commit'] or 'unknown'}-{args.mode}.json"
+    output.write_text(json.dumps(results, indent=2))
+    print(f"\nResults written to {output}")
+
+
+if __name__ == "__main__":
+    main()
@@ -1,31 +1,86 @@
 """
 Main FastAPI application
 """
-from fastapi import FastAPI, Request
+from contextlib import asynccontextmanager
+from fastapi import FastAPI, Request, HTTPException
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import PlainTextResponse
 from slowapi import Limiter, _rate_limit_exceeded_handler
 from slowapi.util import get_remote_address
 from slowapi.errors import RateLimitExceeded
 
 from app.config import settings
+from app.core.metrics import MetricsMiddleware, render_metrics
+from app.core.tracing import TracingMiddleware
+from app.core.logging import RequestIdMiddleware, setup_logging
+from app.core.loop_monitor import LoadSheddingMiddleware, loop_monitor
+from app.core.profiling import ProfilingMiddleware
+from app.core.serialization import FastJSONResponse
+from app.core.http_cache import CompressionMiddleware
+from app.db.database import check_database, init_db, pool_status
+from app.db.dialect import IS_SQLITE
+from app.services.usage import usage_tracker
+from app.services.archive import archive_job
+from app.services.deletion import account_deletion_job
 from app.api.endpoints import router as api_router
 from app.api.auth import router as auth_router
 from app.api.history import router as history_router
+from app.api.admin import router as admin_router
+from app.api.usage import router as usage_router
+from app.api.search import router as search_router
+from app.api.progress import router as progress_router
+from app.api.account import router as account_router
+
+# Structured logging through a background writer
+setup_logging()
 
 # Initialize rate limiter
 limiter = Limiter(key_func=get_remote_address)
 
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    """Start and stop background tasks with the worker"""
+    if IS_SQLITE:
+        # Migrations are PostgreSQL-only; SQLite gets its tables from the models
+        await init_db()
+    if settings.LOOP_MONITOR_ENABLED:
+        loop_monitor.start()
+    usage_tracker.start()
+    # Archiving moves rows into PostgreSQL partitions
+    if settings.ARCHIVE_ENABLED and not IS_SQLITE:
+        archive_job.start()
+    if settings.ACCOUNT_DELETION_ENABLED:
+        account_deletion_job.start()
+    yield
+    await account_deletion_job.stop()
+    await archive_job.stop()
+    await usage_tracker.stop()
+    await loop_monitor.stop()
+
+
 # Create FastAPI app
 app = FastAPI(
     title="LinguaEcho API",
     description="AI-driven language learning conversation practice platform with authentication",
-    version="2.0.0"
+    version="2.0.0",
+    lifespan=lifespan,
+    default_response_class=FastJSONResponse
 )
 
 # Add rate limiter
 app.state.limiter = limiter
 app.add_exception_handler(RateLimitExceeded, _rate_limit_exceeded_handler)
 
+# Compress large JSON bodies (history lists); streams are left alone
+if settings.COMPRESSION_ENABLED:
+    app.add_middleware(CompressionMiddleware, minimum_size=settings.COMPRESSION_MIN_BYTES)
+
+# Shed low-priority requests while the event loop is saturated (inside CORS,
+# so browsers can read the 503)
+if settings.LOAD_SHED_ENABLED:
+    app.add_middleware(LoadSheddingMiddleware)
+
 # Configure CORS
 app.add_middleware(
     CORSMiddleware,
@@ -35,10 +90,29 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
+# Record request latency per route
+if settings.METRICS_ENABLED:
+    app.add_middleware(MetricsMiddleware)
+
+# Track requests for route-armed profile captures (not installed when disabled)
+if settings.PROFILING_ENABLED:
+    app.add_middleware(ProfilingMiddleware)
+
+# Root span per request (passes straight through unless TRACING_ENABLED)
+app.add_middleware(TracingMiddleware)
+
+# Request id for correlating log lines (outermost, so every layer sees it)
+app.add_middleware(RequestIdMiddleware)
+
 # Include API routes
 app.include_router(api_router, prefix="/api")
 app.include_router(auth_router, prefix="/api/auth")
 app.include_router(history_router, prefix="/api")
+app.include_router(admin_router, prefix="/api/admin")
+app.include_router(usage_router, prefix="/api")
+app.include_router(search_router, prefix="/api")
+app.include_router(progress_router, prefix="/api")
+app.include_router(account_router, prefix="/api")
 
 
 @app.get("/")
@@ -58,6 +132,27 @@ async def health_check():
     return {"status": "healthy"}
 
 
+@app.get("/ready")
+async def readiness_check():
+    """
+    Readiness check: 503 while the database pool can't serve a query
+
+    Unlike /health this touches the database, so use it for load balancer
+    readiness and /health for liveness.
+    """
+    problem = await check_database(settings.DB_READY_TIMEOUT)
+    body = {"status": "ready" if problem is None else "not_ready", "database": problem or "ok", "pool": pool_status()}
+    return FastJSONResponse(body, status_code=200 if problem is None else 503)
+
+
+@app.get("/metrics", include_in_schema=False)
+async def metrics():
+    """Prometheus metrics endpoint"""
+    if not settings.METRICS_ENABLED:
+        raise HTTPException(status_code=404, detail="Not Found")
+    return PlainTextResponse(render_metrics(), media_type="text/plain; version=0.0.4")
+
+
 if __name__ == "__main__":
     import uvicorn
     uvicorn.run(app, host="0.0.0.0", port=8000)
@@ -12,6 +12,16 @@ import os
 sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
 
 from main import app
+from app.core.rate_limit import rate_limiter
+
+
+@pytest.fixture(autouse=True)
+def reset_rate_limits():
+    """
+    Start every test with full rate-limit buckets.
+    """
+    rate_limiter.backend.reset()
+    yield
 
 
 @pytest.fixture
@@ -0,0 +1,166 @@
+"""
+Tests for the local analysis stage used before report generation.
+"""
+
+from unittest.mock import patch
+
+from app.models.schemas import Language, Scenario, Message
+from app.services import analysis
+from app.services.analysis import (
+    analyze_conversation,
+    check_rules,
+    compute_overview,
+    segment
+)
+
+
+def user(content):
+    return Message(role="user", content=content)
+
+
+def assistant(content):
+    return Message(role="assistant", content=content)
+
+
+class TestOverview:
+    """Test cases for compute_overview."""
+
+    def test_counts_only_user_messages(self):
+        """Turns and words come from the learner's messages."""
+        conversation = [
+            user("I would like a table"),
+            assistant("Of course, right this way please."),
+            user("Thanks!"),
+        ]
+
+        overview = compute_overview(Language.ENGLISH, Scenario.RESTAURANT, conversation)
+
+        assert overview.turns == 2
+        assert overview.word_count == 6
+        assert overview.scenario == "restaurant"
+
+    def test_japanese_is_segmented(self):
+        """Japanese text without spaces is not counted as one word."""
+        words = segment(Language.JAPANESE, "ラーメンを二つください")
+
+        assert len(words) > 1
+        assert "ラーメン" in words
+
+    def test_particles_are_split_off(self):
+        """Particles after nouns are separate words, not okurigana."""
+        with patch.object(analysis, "_tagger", None):
+            assert segment(Language.JAPANESE, "私はラーメンが好きです") == ["私", "は", "ラーメン", "が", "好き", "です"]
+            assert segment(Language.JAPANESE, "明日、駅に行きます")[:3] == ["明日", "駅", "に"]
+            assert segment(Language.JAPANESE, "東京から大阪まで") == ["東京", "から", "大阪", "まで"]
+            assert segment(Language.JAPANESE, "一緒に静かに食べる") == ["一緒", "に", "静か", "に", "食べる"]
+
+    def test_okurigana_with_particle_characters(self):
+        """Verb endings and words that start with a particle character stay on the kanji."""
+        with patch.object(analysis, "_tagger", None):
+            assert segment(Language.JAPANESE, "値段が上がる") == ["値段", "が", "上がる"]
+            assert segment(Language.JAPANESE, "熱が上がって") == ["熱", "が", "上がって"]
+            assert segment(Language.JAPANESE, "最も高い") == ["最も", "高い"]
+
+    def test_empty_conversation(self):
+        """An empty conversation has no turns or words."""
+        overview = compute_overview(Language.JAPANESE, Scenario.HOTEL, [])
+
+        assert overview.turns == 0
+        assert overview.word_count == 0
+
+
+class TestRules:
+    """Test cases for rule-based checks."""
+
+    def test_japanese_ga_predicate(self):
+        """を with 好き is corrected to が."""
+        errors = check_rules(Language.JAPANESE, [user("私はラーメンを好きです")])
+
+        assert len(errors) == 1
+        assert errors[0].correction == "私はラーメンが好きです"
+        assert errors[0].error_type == "助詞"
+
+    def test_japanese_ga_predicate_mid_clause_not_flagged(self):
+        """を is correct when the predicate does not end the clause."""
+        conversation = [
+            user("日本語を上手に話したいです"),
+            user("パスポートをできるだけ早く作りたい"),
+            user("この問題をわかりやすく説明してください"),
+        ]
+
+        assert check_rules(Language.JAPANESE, conversation) == []
+
+    def test_japanese_doubled_particle(self):
+        """A particle repeated after a word is collapsed."""
+        errors = check_rules(Language.JAPANESE, [user("私はは学生です")])
+
+        assert errors[0].correction == "私は学生です"
+
+    def test_japanese_repeated_kana_not_flagged(self):
+        """Laughter and repeated kana after hiragana are not doubled particles."""
+        assert check_rules(Language.JAPANESE, [user("ははは！"), user("などでで")]) == []
+
+    def test_japanese_destination(self):
+        """Destination marked with を is corrected to に."""
+        errors = check_rules(Language.JAPANESE, [user("明日、駅を行きます")])
+
+        assert errors[0].correction == "明日、駅に行きます"
+
+    def test_japanese_path_not_flagged(self):
+        """を for a path of motion is correct and not flagged."""
+        assert check_rules(Language.JAPANESE, [user("この道を行きます")]) == []
+
+    def test_english_articles(self):
+        """Articles are matched to the following sound."""
+        errors = check_rules(Language.ENGLISH, [user("I want a apple and an banana")])
+
+        assert [e.correction for e in errors] == [
+            "I want an apple and an banana",
+            "I want a apple and a banana",
+        ]
+
+    def test_english_article_exceptions(self):
+        """Words with irregular initial sounds are not flagged."""
+        conversation = [user("I study at a university for an hour")]
+
+        assert check_rules(Language.ENGLISH, conversation) == []
+
+    def test_english_acronyms_not_flagged(self):
+        """Acronyms take the article of their letter names."""
+        conversation = [
+            user("I have an MBA and an FBI agent wrote an SQL query for an LLM"),
+            user("Send me a URL for a UK visa"),
+        ]
+
+        assert check_rules(Language.ENGLISH, conversation) == []
+
+    def test_english_yu_sound_not_flagged(self):
+        """Words starting with a "yu" sound take "a"."""
+        conversation = [user("A Ukrainian played a ukulele at a University"), user("It is an urgent call")]
+
+        assert check_rules(Language.ENGLISH, conversation) == []
+
+    def test_capital_a_label_not_flagged(self):
+        """A capital A used as a label is not taken for the article."""
+        conversation = [user("Plan A or B is fine"), user("I got grade A in math"), user("A is the best grade")]
+
+        assert check_rules(Language.ENGLISH, conversation) == []
+
+    def test_sentence_initial_article_flagged(self):
+        """A capital A starting a sentence is still checked."""
+        errors = check_rules(Language.ENGLISH, [user("Hello. A apple, please.")])
+
+        assert errors[0].correction == "Hello. An apple, please."
+
+    def test_assistant_messages_ignored(self):
+        """Only the learner's messages are checked."""
+        assert check_rules(Language.ENGLISH, [assistant("I want a apple")]) == []
+
+    def test_analyze_conversation(self):
+        """The analysis stage returns the overview and detected errors."""
+        analysis = analyze_conversation(
+            Language.ENGLISH, Scenario.SUPERMARKET, [user("Where is the the milk?")]
+        )
+
+        assert analysis.overview.turns == 1
+        assert analysis.grammar_errors[0].correction == "Where is the milk?"
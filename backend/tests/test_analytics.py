@@ -0,0 +1,204 @@
+"""
+Tests for cohort analytics and the admin analytics endpoint
+"""
+
+import asyncio
+import pytest
+from datetime import datetime
+from types import SimpleNamespace
+
+from sqlalchemy.dialects import postgresql
+
+from app.crud.analytics import cohort_report_rows
+from app.dependencies.auth import require_admin
+from app.services import analytics
+from app.services.analytics import CategoryCodes, CohortAnalytics, flatten_rows
+from main import app
+
+ADMIN = SimpleNamespace(email="admin@example.com")
+
+
+def row(language="japanese", scenario="restaurant", session=1, turns=5, words=50,
+        grammar=2, vocabulary=1, naturalness=0, types=("particle", "Tense ")):
+    return (language, scenario, session, turns, words, grammar, vocabulary, naturalness, list(types))
+
+
+def compiled(query) -> str:
+    return str(query.compile(dialect=postgresql.dialect()))
+
+
+class TestCohortQuery:
+    """Report fields are extracted in SQL, one small row per report."""
+
+    def test_session_numbers_counted_before_since(self):
+        sql = compiled(cohort_report_rows("japanese", datetime(2026, 1, 1)))
+
+        assert "row_number() OVER (PARTITION BY conversations.user_id ORDER BY conversations.created_at)" in sql
+        assert "conversations.user_id IS NOT NULL" in sql
+        assert "conversations.language = " in sql
+        # The date filter is outside the subquery, so it does not renumber sessions
+        assert sql.index("report_rows.created_at >= ") > sql.index(") AS report_rows")
+
+    def test_error_types_via_jsonpath(self):
+        sql = compiled(cohort_report_rows())
+
+        assert "jsonb_path_query_array(reports.report_data, '$.grammar_errors[*].error_type'::jsonpath)" in sql
+        assert "jsonb_array_length" in sql
+        assert "report_rows.created_at" not in sql.split(") AS report_rows")[1]
+
+
+class TestFlatten:
+    """Rows become parallel integer columns."""
+
+    def test_codes_and_error_rows(self):
+        languages, scenarios, types = CategoryCodes(), CategoryCodes(), CategoryCodes()
+        chunk = flatten_rows(
+            [row(), row(scenario="shopping", grammar=1, types=["particle"])],
+            languages, scenarios, types
+        )
+
+        assert len(chunk) == 2
+        assert chunk.scenario == [0, 1]
+        assert scenarios.names == ["restaurant", "shopping"]
+        assert types.names == ["particle", "tense"]
+        assert chunk.error_row == [0, 0, 1]
+        assert chunk.error_type == [0, 1, 0]
+
+    def test_errors_without_type_are_other(self):
+        types = CategoryCodes()
+        chunk = flatten_rows([row(grammar=3, types=["", "tense"])], CategoryCodes(), CategoryCodes(), types)
+
+        assert [types.names[code] for code in chunk.error_type] == ["other", "tense", "other"]
+
+
+class TestAccumulator:
+    """Chunked aggregation matches aggregating everything at once."""
+
+    @pytest.fixture(autouse=True)
+    def numpy(self):
+        pytest.importorskip("numpy")
+
+    def rows(self):
+        return [
+            row(session=1, words=40, grammar=3, types=["particle", "particle", "tense"]),
+            row(session=2, words=50, grammar=1, types=["particle"]),
+            row(scenario="shopping", session=3, words=60, grammar=0, types=[]),
+            row(language="spanish", session=1, words=20, grammar=2, types=["gender", "tense"]),
+            row(session=45, words=100, grammar=1, types=["tense"]),
+        ]
+
+    def test_chunks_match_single_pass(self):
+        whole = analytics.CohortAccumulator(max_sessions=3)
+        whole.add_rows(self.rows())
+        chunked = analytics.CohortAccumulator(max_sessions=3)
+        for start in range(0, 5, 2):
+            chunked.add_rows(self.rows()[start:start + 2])
+
+        assert chunked.chunks == 3
+        assert chunked.result() == whole.result()
+
+    def test_result(self):
+        accumulator = analytics.CohortAccumulator(max_sessions=3)
+        accumulator.add_rows(self.rows())
+        result = accumulator.result()
+
+        assert result["reports"] == 5
+        restaurant = result["scenarios"][0]
+        assert (restaurant["language"], restaurant["scenario"], restaurant["reports"]) == ("japanese", "restaurant", 3)
+        assert restaurant["grammar_errors_per_report"] == round(5 / 3, 3)
+
+        japanese_restaurant = [
+            (r["error_type"], r["count"], r["share"]) for r in result["error_types"]
+            if (r["language"], r["scenario"]) == ("japanese", "restaurant")
+        ]
+        assert japanese_restaurant == [("particle", 3, 0.6), ("tense", 2, 0.4)]
+
+        curve = {(r["language"], r["session"]): r for r in result["improvement"]}
+        assert curve[("japanese", 1)]["errors_per_report"] == 3
+        assert curve[("japanese", 1)]["errors_per_100_words"] == 7.5
+        # Sessions past max_sessions share the last bucket
+        assert curve[("japanese", 3)]["reports"] == 2
+        assert curve[("spanish", 1)]["reports"] == 1
+
+
+class TestCache:
+    """Results are cached per filter and computed once for concurrent callers."""
+
+    @pytest.fixture
+    def computed(self, monkeypatch):
+        calls = []
+
+        async def compute(language, since, chunk_size, max_sessions, bind=None):
+            calls.append((language, since))
+            await asyncio.sleep(0.01)
+            return {"reports": len(calls)}
+
+        monkeypatch.setattr(analytics, "compute_cohort_metrics", compute)
+        return calls
+
+    @pytest.mark.asyncio
+    async def test_concurrent_requests_share_one_scan(self, computed):
+        cache = CohortAnalytics(ttl=60)
+
+        results = await asyncio.gather(*[cache.get("japanese") for _ in range(5)])
+
+        assert len(computed) == 1
+        assert all(result["reports"] == 1 for result in results)
+
+    @pytest.mark.asyncio
+    async def test_expiry_refresh_and_filters(self, computed):
+        cache = CohortAnalytics(ttl=60)
+
+        await cache.get("japanese", since_days=7)
+        await cache.get("japanese", since_days=7)
+        assert len(computed) == 1
+        assert computed[0][1] is not None
+
+        await cache.get("spanish")
+        assert len(computed) == 2
+
+        assert (await cache.get("japanese", since_days=7, refresh=True))["reports"] == 3
+
+        cache.ttl = 0
+        await cache.get("french")
+        await cache.get("french")
+        assert len(computed) == 5
+
+    @pytest.mark.asyncio
+    async def test_entry_cap(self, computed):
+        cache = CohortAnalytics(ttl=60, max_entries=2)
+        for language in ("japanese", "spanish", "french"):
+            await cache.get(language)
+
+        assert len(cache._cache) == 2
+
+
+class TestCohortEndpoint:
+    """GET /api/admin/analytics/cohorts"""
+
+    @pytest.fixture(autouse=True)
+    def admin(self):
+        app.dependency_overrides[require_admin] = lambda: ADMIN
+        yield
+        app.dependency_overrides.clear()
+
+    def test_unavailable_without_numpy(self, client, monkeypatch):
+        monkeypatch.setattr(analytics, "AVAILABLE", False)
+
+        assert client.get("/api/admin/analytics/cohorts").status_code == 503
+
+    def test_returns_cached_metrics(self, client, monkeypatch):
+        async def get(language, since_days, refresh):
+            return {"language": language, "since_days": since_days, "refresh": refresh}
+
+        monkeypatch.setattr(analytics, "AVAILABLE", True)
+        monkeypatch.setattr(analytics.cohort_analytics, "get", get)
+
+        response = client.get("/api/admin/analytics/cohorts", params={"language": "japanese", "since_days": 30})
+
+        assert response.status_code == 200
+        assert response.json() == {"language": "japanese", "since_days": 30, "refresh": False}
+
+    def test_admin_only(self, client):
+        app.dependency_overrides.clear()
+        assert client.get("/api/admin/analytics/cohorts").status_code in (401, 403)
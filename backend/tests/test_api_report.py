@@ -5,6 +5,9 @@ Tests for /api/report/generate endpoint.
 import pytest
 from unittest.mock import patch, AsyncMock
 
+from app.services.fake_llm import FakeChatModel
+from app.services.llm_service import llm_service
+
 
 class TestReportEndpoint:
     """Test cases for /api/report/generate endpoint."""
@@ -248,3 +251,11 @@ class TestReportEndpoint:
             assert response.status_code == 500
             data = response.json()
             assert "detail" in data
+
+    def test_report_endpoint_passes_provider_rate_limit(self, client, sample_report_request):
+        """A provider 429 is answered with 429, not a fallback report."""
+        model = FakeChatModel(ttft_ms=0, jitter_ms=0, rate_limit_rate=1.0)
+        with patch.object(llm_service, "report_llm", model):
+            response = client.post("/api/report/generate", json=sample_report_request)
+
+        assert response.status_code == 429
@@ -0,0 +1,248 @@
+"""
+Tests for archiving cold conversations into the partitioned archive table
+
+The database session is replaced by one that records compiled SQL and
+returns scripted results, so these run without PostgreSQL.
+"""
+
+import pytest
+from datetime import datetime, timedelta
+from types import SimpleNamespace
+from uuid import uuid4
+
+from sqlalchemy.dialects import postgresql
+
+from app.crud import archive
+from app.crud.conversation import get_conversation_by_session_id, get_conversation_version
+from app.db.models import Conversation, ConversationArchive, Report
+from app.models.serializers import conversation_detail
+from app.services import archive as service
+from app.services.archive import ArchiveJob, _months_between
+
+
+class FakeResult:
+    """Minimal Result for the shapes the archive functions read."""
+
+    def __init__(self, rows=()):
+        self.rows = list(rows)
+
+    def scalar(self):
+        return self.rows[0][0] if self.rows else None
+
+    def scalar_one_or_none(self):
+        return self.scalar()
+
+    def one_or_none(self):
+        return self.rows[0] if self.rows else None
+
+    def scalars(self):
+        return SimpleNamespace(all=lambda: [row[0] for row in self.rows])
+
+
+class RecordingSession:
+    """AsyncSession stand-in that records statements and commits."""
+
+    def __init__(self, results=()):
+        self.results = list(results)
+        self.statements = []
+        self.commits = 0
+        self.info = {}
+
+    async def execute(self, statement, params=None):
+        self.statements.append(str(statement.compile(dialect=postgresql.dialect())))
+        return self.results.pop(0) if self.results else FakeResult()
+
+    async def commit(self):
+        self.commits += 1
+
+    async def rollback(self):
+        pass
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, *args):
+        return False
+
+
+def make_conversation(created_at, report_data=None):
+    conversation = Conversation(
+        id=uuid4(),
+        session_id=uuid4(),
+        user_id=uuid4(),
+        language="japanese",
+        scenario="restaurant",
+        messages=[{"role": "user", "content": "こんにちは"}],
+        created_at=created_at,
+        updated_at=created_at
+    )
+    conversation.report = Report(report_data=report_data) if report_data else None
+    return conversation
+
+
+class TestArchiveHelpers:
+    """Month arithmetic and payload packing."""
+
+    def test_add_months_crosses_years(self):
+        assert archive.add_months(datetime(2026, 11, 1), 3) == datetime(2027, 2, 1)
+        assert archive.add_months(datetime(2026, 1, 1), -1) == datetime(2025, 12, 1)
+
+    def test_partition_name(self):
+        assert archive.partition_name(datetime(2026, 3, 1)) == "conversation_archive_2026_03"
+
+    def test_months_between(self):
+        months = _months_between(datetime(2025, 11, 20), datetime(2026, 1, 5))
+        assert months == [datetime(2025, 11, 1), datetime(2025, 12, 1), datetime(2026, 1, 1)]
+
+    def test_payload_round_trip(self, mock_report_response):
+        messages = [{"role": "user", "content": "レストランに行きたい"}] * 20
+        payload = archive.pack_payload(messages, mock_report_response["report"])
+
+        assert archive.unpack_payload(payload) == (messages, mock_report_response["report"])
+        assert len(payload) < len(str(messages).encode("utf-8"))
+
+    def test_restored_conversation_matches_detail(self, mock_report_response):
+        conversation = make_conversation(datetime(2025, 1, 2), mock_report_response["report"])
+        row = ConversationArchive(
+            id=conversation.id,
+            created_at=conversation.created_at,
+            session_id=conversation.session_id,
+            user_id=conversation.user_id,
+            language=conversation.language,
+            scenario=conversation.scenario,
+            updated_at=conversation.updated_at,
+            payload=archive.pack_payload(conversation.messages, mock_report_response["report"])
+        )
+
+        assert conversation_detail(archive.restore_conversation(row)) == conversation_detail(conversation)
+
+
+class TestArchivedReads:
+    """Reads by session id fall back to the archive."""
+
+    @pytest.mark.asyncio
+    async def test_session_lookup_falls_back_to_archive(self):
+        conversation = make_conversation(datetime(2025, 1, 2))
+        row = ConversationArchive(
+            id=conversation.id,
+            created_at=conversation.created_at,
+            session_id=conversation.session_id,
+            user_id=conversation.user_id,
+            language=conversation.language,
+            scenario=conversation.scenario,
+            updated_at=conversation.updated_at,
+            payload=archive.pack_payload(conversation.messages, None)
+        )
+        db = RecordingSession([FakeResult(), FakeResult([(row,)])])
+
+        found = await get_conversation_by_session_id(db, conversation.session_id)
+
+        assert found.id == conversation.id
+        assert found.messages == conversation.messages
+        assert found.report is None
+        assert "FROM conversation_archive" in db.statements[1]
+
+    @pytest.mark.asyncio
+    async def test_live_conversation_skips_archive(self):
+        conversation = make_conversation(datetime(2026, 10, 1))
+        db = RecordingSession([FakeResult([(conversation,)])])
+
+        assert await get_conversation_by_session_id(db, conversation.session_id) is conversation
+        assert len(db.statements) == 1
+
+    @pytest.mark.asyncio
+    async def test_version_reads_archive_only_when_asked(self):
+        version = (uuid4(), uuid4(), datetime(2025, 1, 2))
+
+        db = RecordingSession([FakeResult()])
+        assert await get_conversation_version(db, uuid4()) is None
+        assert len(db.statements) == 1
+
+        db = RecordingSession([FakeResult(), FakeResult([version])])
+        assert await get_conversation_version(db, uuid4(), include_archived=True) == version
+        assert "payload" not in db.statements[1]
+
+
+class TestArchiveWrites:
+    """Partition management and moving rows."""
+
+    @pytest.mark.asyncio
+    async def test_only_missing_partitions_are_created(self):
+        db = RecordingSession([FakeResult([("conversation_archive_2025_12",)])])
+
+        created = await archive.ensure_archive_partitions(
+            db, [datetime(2025, 12, 5), datetime(2025, 12, 20), datetime(2026, 1, 3)]
+        )
+
+        assert created == ["conversation_archive_2026_01"]
+        assert db.statements[1] == (
+            "CREATE TABLE IF NOT EXISTS conversation_archive_2026_01 PARTITION OF conversation_archive "
+            "FOR VALUES FROM ('2026-01-01') TO ('2026-02-01')"
+        )
+
+    @pytest.mark.asyncio
+    async def test_archive_moves_batch_in_three_statements(self, mock_report_response):
+        conversations = [
+            make_conversation(datetime(2025, 1, 2), mock_report_response["report"]),
+            make_conversation(datetime(2025, 1, 3)),
+        ]
+        db = RecordingSession()
+
+        assert await archive.archive_conversations(db, conversations) == 2
+        assert len(db.statements) == 3
+        assert db.statements[0].startswith("INSERT INTO conversation_archive")
+        assert "ON CONFLICT DO NOTHING" in db.statements[0]
+        assert db.statements[1].startswith("DELETE FROM reports")
+        assert db.statements[2].startswith("DELETE FROM conversations")
+
+    @pytest.mark.asyncio
+    async def test_retention_drops_only_older_partitions(self):
+        db = RecordingSession([FakeResult([
+            ("conversation_archive_2025_03",),
+            ("conversation_archive_2025_04",),
+            ("conversation_archive_2025_05",),
+        ])])
+
+        dropped = await archive.drop_archive_partitions_before(db, datetime(2025, 5, 1))
+
+        assert dropped == ["conversation_archive_2025_03", "conversation_archive_2025_04"]
+        assert db.statements[1:] == [
+            "DROP TABLE IF EXISTS conversation_archive_2025_03",
+            "DROP TABLE IF EXISTS conversation_archive_2025_04",
+        ]
+
+
+class TestArchiveJob:
+    """One run: partitions, batches, commits."""
+
+    @pytest.mark.asyncio
+    async def test_skips_when_another_worker_holds_lock(self):
+        db = RecordingSession([FakeResult([(False,)])])
+
+        assert await ArchiveJob().run_once(lambda: db) == 0
+        assert len(db.statements) == 1
+
+    @pytest.mark.asyncio
+    async def test_run_archives_in_batches(self, monkeypatch):
+        """Partitions in one transaction, then one transaction per batch."""
+        old = datetime.utcnow() - timedelta(days=400)
+        batches = iter([[make_conversation(old), make_conversation(old)], [make_conversation(old)]])
+
+        async def get_archivable(session, cutoff, limit):
+            assert limit == 2
+            assert cutoff < datetime.utcnow() - timedelta(days=179)
+            return next(batches)
+
+        async def locked(session):
+            return True
+
+        monkeypatch.setattr(service, "get_archivable_conversations", get_archivable)
+        monkeypatch.setattr(service, "try_archive_lock", locked)
+        db = RecordingSession([FakeResult([(old,)]), FakeResult()])
+
+        assert await ArchiveJob(after_days=180, batch_size=2).run_once(lambda: db) == 3
+
+        creates = [s for s in db.statements if s.startswith("CREATE TABLE")]
+        assert len(creates) in (7, 8)
+        assert sum(s.startswith("INSERT INTO conversation_archive") for s in db.statements) == 2
+        assert db.commits == 3
@@ -0,0 +1,235 @@
+"""
+Tests for background account deletion
+
+The database session is replaced by one that records compiled SQL and
+returns scripted results, so these run without PostgreSQL.
+"""
+
+import pytest
+from datetime import datetime
+from types import SimpleNamespace
+from uuid import uuid4
+
+from sqlalchemy.dialects import postgresql
+
+from app.crud import account
+from app.db.database import get_db
+from app.db.models import AccountDeletion, ConversationArchive, LearnerTerm
+from app.dependencies import auth
+from app.dependencies.auth import get_token_user_id, require_current_user
+from app.services import deletion as service
+from app.services.deletion import AccountDeletionJob
+from main import app
+
+USER = SimpleNamespace(id=uuid4())
+
+
+class FakeResult:
+    def __init__(self, rows=(), rowcount=0):
+        self.rows = list(rows)
+        self.rowcount = rowcount
+
+    def scalar_one_or_none(self):
+        return self.rows[0][0] if self.rows else None
+
+    def all(self):
+        return self.rows
+
+    def scalars(self):
+        return SimpleNamespace(all=lambda: [row[0] for row in self.rows])
+
+
+class RecordingSession:
+    """AsyncSession stand-in that records statements and commits."""
+
+    def __init__(self, results=()):
+        self.results = list(results)
+        self.statements = []
+        self.commits = 0
+        self.info = {}
+
+    async def execute(self, statement, params=None):
+        self.statements.append(str(statement.compile(dialect=postgresql.dialect())))
+        return self.results.pop(0) if self.results else FakeResult()
+
+    async def commit(self):
+        self.commits += 1
+
+    async def rollback(self):
+        pass
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, *args):
+        return False
+
+
+def deletion_row(**fields):
+    return AccountDeletion(**{
+        "user_id": USER.id, "status": "pending", "total_conversations": 3, "deleted_conversations": 0,
+        "requested_at": datetime(2026, 10, 19), **fields,
+    })
+
+
+class TestDeletionStatements:
+    """Batches are bounded and claims skip rows other workers hold."""
+
+    @pytest.mark.asyncio
+    async def test_conversation_batch(self):
+        db = RecordingSession([FakeResult([(uuid4(),), (uuid4(),)])])
+
+        assert await account.delete_conversation_batch(db, USER.id, 2) == 2
+
+        sql = db.statements[0]
+        assert sql.startswith("WITH batch AS")
+        assert "LIMIT %(param_1)s FOR UPDATE" in sql
+        assert "DELETE FROM reports" in sql and "DELETE FROM conversations" in sql
+        assert "conversation_archive" not in sql
+
+    @pytest.mark.asyncio
+    async def test_user_rows_batch_by_primary_key(self):
+        db = RecordingSession([FakeResult(rowcount=5)])
+
+        assert await account.delete_user_rows_batch(db, LearnerTerm, USER.id, 5) == 5
+        assert "WHERE (learner_terms.user_id, learner_terms.language, learner_terms.term) IN" in db.statements[0]
+
+    @pytest.mark.asyncio
+    async def test_claim(self):
+        db = RecordingSession([FakeResult([(USER.id,)])])
+
+        assert await account.claim_account_deletion(db, datetime(2026, 10, 19)) == USER.id
+        assert db.statements[0].startswith("UPDATE account_deletions SET status=")
+        assert "FOR UPDATE SKIP LOCKED" in db.statements[0]
+
+    @pytest.mark.asyncio
+    async def test_finish_locks_user_first(self):
+        db = RecordingSession([FakeResult(), FakeResult([(uuid4(),)])])
+
+        assert await account.finish_account_deletion(db, USER.id) == 1
+        assert db.statements[0].endswith("FOR UPDATE")
+        assert db.statements[2].startswith("DELETE FROM users")
+        assert db.statements[3].startswith("UPDATE account_deletions")
+
+
+class TestDeletionJob:
+    """An account is deleted batch by batch with progress after each."""
+
+    @pytest.fixture
+    def calls(self, monkeypatch):
+        calls = {"progress": [], "finished": [], "claims": [USER.id]}
+        batches = {"conversations": [2, 2, 1], ConversationArchive: [2, 0]}
+
+        async def claim(db, stale_before):
+            return calls["claims"].pop(0) if calls["claims"] else None
+
+        async def conversation_batch(db, user_id, limit):
+            return batches["conversations"].pop(0)
+
+        async def rows_batch(db, model, user_id, limit):
+            return batches.get(model, [0]).pop(0) if batches.get(model) else 0
+
+        async def progress(db, user_id, conversations=0, error=None):
+            calls["progress"].append((conversations, error))
+
+        async def finish(db, user_id):
+            calls["finished"].append(user_id)
+            return 1
+
+        monkeypatch.setattr(service, "claim_account_deletion", claim)
+        monkeypatch.setattr(service, "delete_conversation_batch", conversation_batch)
+        monkeypatch.setattr(service, "delete_user_rows_batch", rows_batch)
+        monkeypatch.setattr(service, "record_deletion_progress", progress)
+        monkeypatch.setattr(service, "finish_account_deletion", finish)
+        return calls
+
+    @pytest.mark.asyncio
+    async def test_run_once(self, calls):
+        db = RecordingSession()
+        job = AccountDeletionJob(batch_size=2)
+
+        assert await job.run_once(session_maker=lambda: db) == 1
+
+        assert calls["finished"] == [USER.id]
+        # Three conversation batches, then archive batches, then the other tables
+        assert [n for n, _ in calls["progress"]][:5] == [2, 2, 1, 2, 0]
+        assert sum(n for n, _ in calls["progress"]) == 7
+        # One commit per claim, batch and the final step
+        assert db.commits == 2 + len(calls["progress"]) + 1
+
+    @pytest.mark.asyncio
+    async def test_failure_is_recorded_and_left_for_retry(self, calls, monkeypatch):
+        async def failing_finish(db, user_id):
+            raise RuntimeError("lock timeout")
+
+        monkeypatch.setattr(service, "finish_account_deletion", failing_finish)
+
+        assert await AccountDeletionJob(batch_size=2).run_once(session_maker=RecordingSession) == 0
+        assert calls["progress"][-1] == (0, "lock timeout")
+
+
+class TestSignInBlocked:
+    """A user whose deletion was requested is treated as signed out."""
+
+    @pytest.mark.asyncio
+    async def test_get_current_user(self, monkeypatch):
+        user = SimpleNamespace(id=USER.id, deletion_requested_at=None)
+
+        async def get_user(db, user_id):
+            return user
+
+        monkeypatch.setattr(auth, "get_user_by_id", get_user)
+        db = RecordingSession()
+
+        assert await auth.get_current_user(USER.id, db) is user
+        user.deletion_requested_at = datetime(2026, 10, 19)
+        assert await auth.get_current_user(USER.id, db) is None
+
+
+class TestAccountEndpoints:
+    """DELETE /api/account queues the deletion; its progress stays readable."""
+
+    @pytest.fixture
+    def session(self, monkeypatch):
+        recording = RecordingSession()
+        woken = []
+
+        async def override_get_db():
+            yield recording
+
+        monkeypatch.setattr(service.account_deletion_job, "wake", lambda: woken.append(True))
+        app.dependency_overrides[get_db] = override_get_db
+        recording.woken = woken
+        yield recording
+        app.dependency_overrides.clear()
+
+    def test_request_deletion(self, client, session):
+        app.dependency_overrides[require_current_user] = lambda: USER
+        session.results = [FakeResult(), FakeResult(), FakeResult([(deletion_row(),)])]
+
+        response = client.delete("/api/account")
+
+        assert response.status_code == 202
+        assert response.json()["status"] == "pending"
+        assert response.json()["total_conversations"] == 3
+        assert session.statements[0].startswith("UPDATE users SET deletion_requested_at")
+        assert "ON CONFLICT DO NOTHING" in session.statements[1]
+        assert session.commits == 1
+        assert session.woken == [True]
+
+    def test_status_after_account_is_gone(self, client, session):
+        app.dependency_overrides[get_token_user_id] = lambda: USER.id
+        session.results = [FakeResult([(deletion_row(status="done", deleted_conversations=3),)])]
+
+        response = client.get("/api/account/deletion")
+
+        assert response.status_code == 200
+        assert response.json()["status"] == "done"
+        assert response.json()["deleted_conversations"] == 3
+
+    def test_status_not_requested(self, client, session):
+        app.dependency_overrides[get_token_user_id] = lambda: USER.id
+        assert client.get("/api/account/deletion").status_code == 404
+
+    def test_status_requires_token(self, client, session):
+        assert client.get("/api/account/deletion").status_code == 401
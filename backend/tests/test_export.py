@@ -0,0 +1,178 @@
+"""
+Tests for the streaming user-data export
+
+The session is replaced by one that serves scripted pages from stream()
+and records the compiled SQL, so these run without PostgreSQL.
+"""
+
+import gzip
+import pytest
+from datetime import datetime, timedelta
+from types import SimpleNamespace
+from uuid import uuid4
+
+from sqlalchemy.dialects import postgresql
+
+from app.core.serialization import loads
+from app.crud.archive import pack_payload
+from app.crud.export import conversation_page
+from app.dependencies.auth import require_current_user
+from app.services import export as service
+from app.services.export import export_records, gzip_chunks, ndjson_chunks
+from main import app
+
+USER = SimpleNamespace(id=uuid4(), email="learner@example.com", created_at=datetime(2026, 1, 1))
+START = datetime(2026, 9, 1)
+
+
+def live_row(i, report=None):
+    return SimpleNamespace(
+        id=uuid4(), session_id=uuid4(), language="japanese", scenario="restaurant",
+        messages=[{"role": "user", "content": f"メッセージ {i}"}],
+        created_at=START + timedelta(hours=i), updated_at=START + timedelta(hours=i),
+        report_data=report, report_created_at=None,
+    )
+
+
+def archived_row(i, report=None):
+    return SimpleNamespace(
+        id=uuid4(), session_id=uuid4(), language="spanish", scenario="shopping",
+        payload=pack_payload([{"role": "user", "content": f"hola {i}"}], report),
+        created_at=START - timedelta(days=400 - i), updated_at=START,
+    )
+
+
+class StreamResult:
+    def __init__(self, rows):
+        self.rows = rows
+
+    def __aiter__(self):
+        return self._iterate()
+
+    async def _iterate(self):
+        for row in self.rows:
+            yield row
+
+
+class PagedSession:
+    """AsyncSession stand-in serving one scripted page per stream() call."""
+
+    def __init__(self, pages):
+        self.pages = list(pages)
+        self.statements = []
+        self.commits = 0
+        self.info = {}
+
+    async def stream(self, statement):
+        self.statements.append(statement.compile(dialect=postgresql.dialect()))
+        return StreamResult(self.pages.pop(0) if self.pages else [])
+
+    async def commit(self):
+        self.commits += 1
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, *args):
+        pass
+
+
+async def collect(stream):
+    return [item async for item in stream]
+
+
+class TestKeysetPages:
+    """Pages continue after the last exported row."""
+
+    def test_first_page(self):
+        sql = str(conversation_page(USER.id, limit=50).compile(dialect=postgresql.dialect()))
+
+        assert "LEFT OUTER JOIN reports" in sql
+        assert "ORDER BY conversations.created_at, conversations.id" in sql
+        assert "(conversations.created_at, conversations.id) >" not in sql
+
+    def test_next_page(self):
+        after = (START, uuid4())
+        compiled = conversation_page(USER.id, after, limit=50).compile(dialect=postgresql.dialect())
+
+        assert "(conversations.created_at, conversations.id) > (" in str(compiled)
+        assert after[0] in compiled.params.values() and after[1] in compiled.params.values()
+
+
+class TestExportRecords:
+    """Account line, every conversation (live then archived), summary."""
+
+    @pytest.mark.asyncio
+    async def test_pages_until_short_page(self, mock_report_response):
+        report = mock_report_response["report"]
+        live = [live_row(i, report if i == 0 else None) for i in range(5)]
+        archived = [archived_row(0, report)]
+        session = PagedSession([live[:2], live[2:4], live[4:], archived])
+
+        records = await collect(export_records(USER, session_maker=lambda: session, batch_size=2))
+
+        assert records[0]["type"] == "account" and records[0]["email"] == USER.email
+        conversations = records[1:-1]
+        assert [r["id"] for r in conversations] == [row.id for row in live + archived]
+        assert conversations[0]["report"] == report
+        assert conversations[-1]["archived"] is True
+        assert conversations[-1]["messages"] == [{"role": "user", "content": "hola 0"}]
+        assert records[-1] == {"type": "summary", "conversations": 6, "reports": 2}
+
+        # Three live pages, one archive page; each page ends its transaction
+        assert len(session.statements) == 4
+        assert session.commits == 4
+        assert live[1].id in session.statements[1].params.values()
+        assert "FROM conversation_archive" in str(session.statements[3])
+        assert session.info["user_id"] == USER.id
+
+    @pytest.mark.asyncio
+    async def test_ndjson_and_gzip(self):
+        session = PagedSession([[live_row(0)]])
+        chunks = await collect(gzip_chunks(ndjson_chunks(
+            export_records(USER, session_maker=lambda: session), chunk_bytes=10
+        )))
+
+        lines = gzip.decompress(b"".join(chunks)).decode("utf-8").splitlines()
+        assert [loads(line)["type"] for line in lines] == ["account", "conversation", "summary"]
+        assert "メッセージ 0" in lines[1]
+
+    @pytest.mark.asyncio
+    async def test_first_line_sent_at_once(self):
+        session = PagedSession([[live_row(i) for i in range(3)]])
+        chunks = await collect(ndjson_chunks(export_records(USER, session_maker=lambda: session)))
+
+        assert chunks[0].count(b"\n") == 1
+        assert len(chunks) == 2
+
+
+class TestExportEndpoint:
+    """GET /api/account/export streams the current user's data."""
+
+    @pytest.fixture
+    def session(self, monkeypatch):
+        session = PagedSession([[live_row(0), live_row(1)]])
+        monkeypatch.setattr(service, "async_session_maker", lambda: session)
+        app.dependency_overrides[require_current_user] = lambda: USER
+        yield session
+        app.dependency_overrides.clear()
+
+    def test_ndjson(self, client, session):
+        response = client.get("/api/account/export")
+
+        assert response.status_code == 200
+        assert response.headers["content-type"] == "application/x-ndjson"
+        assert response.headers["content-disposition"].endswith('.ndjson"')
+        lines = [loads(line) for line in response.text.splitlines()]
+        assert len(lines) == 4
+        assert lines[-1]["conversations"] == 2
+
+    def test_compressed(self, client, session):
+        response = client.get("/api/account/export", params={"compress": True})
+
+        assert response.headers["content-type"] == "application/gzip"
+        assert response.headers["content-disposition"].endswith('.ndjson.gz"')
+        assert len(gzip.decompress(response.content).splitlines()) == 4
+
+    def test_requires_login(self, client):
+        assert client.get("/api/account/export").status_code == 401
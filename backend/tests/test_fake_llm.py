@@ -0,0 +1,93 @@
+"""
+Tests for the fake LLM provider used in load tests.
+"""
+
+import json
+import pytest
+from unittest.mock import patch
+from langchain_core.messages import HumanMessage, SystemMessage
+
+from app.models.schemas import Report
+from app.services.fake_llm import FakeChatModel, FakeProviderError, FakeRateLimitError
+from app.services.llm_service import llm_service
+from app.services.report_parser import LLM_SECTIONS
+
+
+def fast_model(**kwargs):
+    """Fake model with no simulated delays."""
+    return FakeChatModel(ttft_ms=0, jitter_ms=0, tokens_per_second=1e6, **kwargs)
+
+
+MESSAGES = [SystemMessage(content="You are a restaurant server."), HumanMessage(content="Hello")]
+
+
+class TestFakeChatModel:
+    """Test cases for FakeChatModel."""
+
+    @pytest.mark.asyncio
+    async def test_same_request_same_response(self):
+        """Responses are deterministic for the same seed and input."""
+        first = await fast_model(seed=1).ainvoke(MESSAGES)
+        second = await fast_model(seed=1).ainvoke(MESSAGES)
+
+        assert first.content == second.content
+        assert first.usage_metadata["output_tokens"] == 30
+
+    @pytest.mark.asyncio
+    async def test_stream_yields_configured_token_count(self):
+        """Streaming yields one chunk per simulated token."""
+        chunks = [c.content async for c in fast_model(response_tokens=5).astream(MESSAGES) if c.content]
+
+        assert len(chunks) == 5
+
+    @pytest.mark.asyncio
+    async def test_japanese_prompt_gets_japanese_reply(self):
+        """The reply language follows the prompt."""
+        reply = await fast_model().ainvoke([HumanMessage(content="こんにちは")])
+
+        assert any("぀" <= ch <= "ヿ" for ch in reply.content)
+
+    @pytest.mark.asyncio
+    async def test_json_mode_returns_valid_report(self):
+        """JSON mode returns sections that validate against the Report schema."""
+        model = fast_model().bind(response_format={"type": "json_object"})
+        response = await model.ainvoke(MESSAGES)
+        data = json.loads(response.content)
+
+        assert list(data) == LLM_SECTIONS
+        overview = {"language": "english", "scenario": "restaurant", "turns": 1, "word_count": 1}
+        Report(overview=overview, **data)
+
+    @pytest.mark.asyncio
+    async def test_rate_limit_injection(self):
+        """A rate limit rate of 1 always fails with a 429."""
+        with pytest.raises(FakeRateLimitError) as exc_info:
+            await fast_model(rate_limit_rate=1.0).ainvoke(MESSAGES)
+
+        assert exc_info.value.status_code == 429
+
+    @pytest.mark.asyncio
+    async def test_error_injection(self):
+        """An error rate of 1 always fails with a provider error."""
+        with pytest.raises(FakeProviderError):
+            await fast_model(error_rate=1.0).ainvoke(MESSAGES)
+
+
+class TestFakeProviderEndpoints:
+    """Test cases for endpoints backed by the fake provider."""
+
+    def test_chat_rate_limit_returns_429(self, client, sample_chat_request):
+        """Provider rate limits are passed through as 429."""
+        with patch.object(llm_service, "llm", fast_model(rate_limit_rate=1.0)):
+            response = client.post("/api/chat", json=sample_chat_request)
+
+        assert response.status_code == 429
+
+    def test_report_generation(self, client, sample_report_request):
+        """The report endpoint returns a full report from the fake provider."""
+        model = fast_model().bind(response_format={"type": "json_object"})
+        with patch.object(llm_service, "report_llm", model):
+            response = client.post("/api/report/generate", json=sample_report_request)
+
+        assert response.status_code == 200
+        assert response.json()["report"]["overview"]["turns"] == 2
@@ -0,0 +1,174 @@
+"""
+Tests for ETags on history endpoints and response compression.
+"""
+
+import gzip
+import json
+from datetime import datetime
+from types import SimpleNamespace
+from unittest.mock import AsyncMock, patch
+from uuid import uuid4
+
+from fastapi import FastAPI
+from fastapi.responses import StreamingResponse
+from fastapi.testclient import TestClient
+
+from app.api import history
+from app.core import http_cache
+from app.core.http_cache import CompressionMiddleware, _choose_encoding, etag_matches, make_etag
+from app.dependencies.auth import require_current_user
+from main import app
+
+USER = SimpleNamespace(id=uuid4())
+
+
+def stored_conversation():
+    """Conversation row owned by USER."""
+    return SimpleNamespace(
+        id=uuid4(),
+        session_id=uuid4(),
+        user_id=USER.id,
+        language="japanese",
+        scenario="restaurant",
+        messages=[{"role": "user", "content": "すみません"}],
+        created_at=datetime(2025, 1, 2),
+        updated_at=datetime(2025, 1, 3),
+        report=None,
+    )
+
+
+class TestETags:
+    """Test cases for conditional GET on history endpoints."""
+
+    def setup_method(self):
+        app.dependency_overrides[require_current_user] = lambda: USER
+
+    def teardown_method(self):
+        app.dependency_overrides.clear()
+
+    def test_etag_comparison_is_weak(self):
+        """Weak and strong forms of the same tag match, lists are supported."""
+        etag = make_etag(["a", 1])
+
+        assert etag.startswith('W/"')
+        assert etag_matches(etag.removeprefix("W/"), etag)
+        assert etag_matches(f'W/"other", {etag}', etag)
+        assert not etag_matches('W/"other"', etag)
+        assert make_etag(["a", 2]) != etag
+
+    def test_unchanged_conversation_returns_304_without_loading(self, client):
+        """A matching If-None-Match is answered from the version row alone."""
+        conv = stored_conversation()
+        version = AsyncMock(return_value=(conv.id, conv.user_id, conv.updated_at))
+        load = AsyncMock(return_value=conv)
+        with patch.object(history, "get_conversation_version", version), \
+             patch.object(history, "get_conversation_by_session_id", load):
+            first = client.get(f"/api/conversations/{conv.session_id}")
+            second = client.get(
+                f"/api/conversations/{conv.session_id}",
+                headers={"If-None-Match": first.headers["ETag"]}
+            )
+
+        assert first.status_code == 200
+        assert first.json()["messages"] == conv.messages
+        assert second.status_code == 304
+        assert second.content == b""
+        assert load.await_count == 1
+
+    def test_changed_conversation_returns_new_body(self, client):
+        """A new updated_at produces a new ETag and a full response."""
+        conv = stored_conversation()
+        version = AsyncMock(return_value=(conv.id, conv.user_id, conv.updated_at))
+        with patch.object(history, "get_conversation_version", version), \
+             patch.object(history, "get_conversation_by_session_id", AsyncMock(return_value=conv)):
+            etag = client.get(f"/api/conversations/{conv.session_id}").headers["ETag"]
+            version.return_value = (conv.id, conv.user_id, datetime(2025, 1, 4))
+            response = client.get(f"/api/conversations/{conv.session_id}", headers={"If-None-Match": etag})
+
+        assert response.status_code == 200
+        assert response.headers["ETag"] != etag
+
+    def test_other_users_get_403_not_304(self, client):
+        """Ownership is checked before the ETag."""
+        conv = stored_conversation()
+        version = AsyncMock(return_value=(conv.id, uuid4(), conv.updated_at))
+        with patch.object(history, "get_conversation_version", version):
+            response = client.get(f"/api/conversations/{conv.session_id}", headers={"If-None-Match": "*"})
+
+        assert response.status_code == 403
+
+    def test_history_list_returns_304(self, client):
+        """The list ETag covers every returned conversation's version."""
+        convs = [stored_conversation(), stored_conversation()]
+        versions = AsyncMock(return_value=[(c.id, c.updated_at) for c in convs])
+        load = AsyncMock(return_value=convs)
+        with patch.object(history, "get_user_conversation_versions", versions), \
+             patch.object(history, "get_user_conversations", load):
+            etag = client.get("/api/conversations").headers["ETag"]
+            response = client.get("/api/conversations", headers={"If-None-Match": etag})
+
+        assert response.status_code == 304
+        assert load.await_count == 1
+        assert response.headers["Cache-Control"] == "private, no-cache"
+
+
+class TestCompression:
+    """Test cases for CompressionMiddleware."""
+
+    def make_client(self):
+        test_app = FastAPI()
+
+        @test_app.get("/large")
+        async def large():
+            return {"messages": ["ラーメンを二つお願いします"] * 200}
+
+        @test_app.get("/small")
+        async def small():
+            return {"ok": True}
+
+        @test_app.get("/stream")
+        async def stream():
+            async def events():
+                yield b'data: {"type": "chunk"}\n\n' * 100
+                yield b'data: {"type": "done"}\n\n'
+            return StreamingResponse(events(), media_type="text/event-stream")
+
+        test_app.add_middleware(CompressionMiddleware, minimum_size=1024)
+        return TestClient(test_app)
+
+    def test_large_json_is_gzipped(self):
+        """Large JSON bodies are gzip-encoded when the client accepts it."""
+        response = self.make_client().get("/large", headers={"Accept-Encoding": "gzip"})
+
+        assert response.headers["content-encoding"] == "gzip"
+        assert "Accept-Encoding" in response.headers["vary"]
+        assert int(response.headers["content-length"]) < 1024
+        assert response.json()["messages"][0] == "ラーメンを二つお願いします"
+
+    def test_small_and_unaccepted_bodies_are_unchanged(self):
+        """Small bodies, and clients without gzip, get identity encoding."""
+        client = self.make_client()
+
+        assert "content-encoding" not in client.get("/small", headers={"Accept-Encoding": "gzip"}).headers
+        assert "content-encoding" not in client.get("/large", headers={"Accept-Encoding": "identity"}).headers
+
+    def test_quality_values(self):
+        """Only q=0 refuses a coding; the highest q wins and * covers the rest."""
+        with patch.object(http_cache, "brotli", object()):
+            assert _choose_encoding("gzip;q=0.8") == "gzip"
+            assert _choose_encoding("br;q=0.9, gzip;q=0.8") == "br"
+            assert _choose_encoding("br;q=0.5, gzip; q=0.8") == "gzip"
+            assert _choose_encoding("br;q=0, gzip") == "gzip"
+            assert _choose_encoding("br;q=0, gzip;q=0.0") is None
+            assert _choose_encoding("*") == "br"
+            assert _choose_encoding("br;q=0, *;q=0.1") == "gzip"
+            assert _choose_encoding("identity") is None
+        with patch.object(http_cache, "brotli", None):
+            assert _choose_encoding("br, gzip;q=0.1") == "gzip"
+
+    def test_streams_are_not_compressed(self):
+        """SSE bodies pass through so events are not buffered."""
+        response = self.make_client().get("/stream", headers={"Accept-Encoding": "gzip"})
+
+        assert "content-encoding" not in response.headers
+        assert response.text.endswith('data: {"type": "done"}\n\n')
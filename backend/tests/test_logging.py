@@ -0,0 +1,84 @@
+"""
+Tests for structured logging.
+"""
+
+import json
+import logging
+import queue
+
+from app.core.logging import (
+    ContextQueueHandler,
+    JSONFormatter,
+    SamplingFilter,
+    parse_sampling,
+    request_id_var,
+    truncate,
+)
+
+
+def make_record(msg="hello", **extra):
+    """Create a log record as logger.info(msg, extra=extra) would."""
+    record = logging.LogRecord("app.test", logging.INFO, __file__, 1, msg, (), None)
+    record.__dict__.update(extra)
+    return record
+
+
+class TestStructuredLogging:
+    """Test cases for the JSON formatter and queue handler."""
+
+    def test_json_line_includes_extras(self):
+        """Extra fields are emitted as top-level JSON keys."""
+        line = JSONFormatter().format(make_record(section="naturalness", attempts=2))
+        data = json.loads(line)
+
+        assert data["msg"] == "hello"
+        assert data["level"] == "INFO"
+        assert data["section"] == "naturalness"
+        assert data["attempts"] == 2
+
+    def test_long_payloads_are_truncated(self):
+        """Large string fields are capped with a note of what was cut."""
+        data = json.loads(JSONFormatter().format(make_record(response="x" * 5000)))
+
+        assert len(data["response"]) < 2100
+        assert data["response"].endswith("[3000 more chars]")
+        assert truncate("short") == "short"
+
+    def test_queue_handler_captures_request_id(self):
+        """The request id is read on the logging thread, before queueing."""
+        log_queue = queue.SimpleQueue()
+        handler = ContextQueueHandler(log_queue)
+        token = request_id_var.set("req-123")
+        try:
+            handler.handle(make_record())
+        finally:
+            request_id_var.reset(token)
+
+        data = json.loads(JSONFormatter().format(log_queue.get_nowait()))
+        assert data["request_id"] == "req-123"
+
+    def test_sampling_filter(self):
+        """Sampled keys are dropped or kept according to their rate."""
+        sampler = SamplingFilter(parse_sampling("noisy=0,kept=1"))
+
+        assert not sampler.filter(make_record(sample_key="noisy"))
+        kept = make_record(sample_key="kept")
+        assert sampler.filter(kept)
+        assert kept.sample_rate == 1.0
+        assert sampler.filter(make_record())
+
+
+class TestRequestId:
+    """Test cases for request id propagation."""
+
+    def test_response_has_request_id(self, client):
+        """Each response carries a generated request id."""
+        response = client.get("/health")
+
+        assert len(response.headers["x-request-id"]) == 32
+
+    def test_incoming_request_id_is_kept(self, client):
+        """A caller-supplied request id is reused."""
+        response = client.get("/health", headers={"X-Request-ID": "abc-123"})
+
+        assert response.headers["x-request-id"] == "abc-123"
@@ -0,0 +1,97 @@
+"""
+Tests for the event-loop lag monitor and load shedding.
+"""
+
+import asyncio
+import time
+import pytest
+from types import SimpleNamespace
+from unittest.mock import patch
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+
+from app.core import loop_monitor as loop_monitor_module
+from app.core.loop_monitor import LoopMonitor, LoadSheddingMiddleware
+
+
+def block_loop(seconds):
+    """Simulate blocking work (bcrypt, large json.dumps) on the loop."""
+    time.sleep(seconds)
+
+
+class TestLoopMonitor:
+    """Test cases for LoopMonitor."""
+
+    @pytest.mark.asyncio
+    async def test_measures_lag_and_saturation(self):
+        """Blocking the loop shows up as lag and marks the loop saturated."""
+        monitor = LoopMonitor(interval=0.01, warn_threshold=1.0, shed_threshold=0.02, smoothing=0.5)
+        monitor.start()
+        try:
+            await asyncio.sleep(0.03)
+            assert not monitor.saturated
+
+            block_loop(0.1)
+            # The overdue heartbeat runs on the next loop iteration
+            await asyncio.sleep(0.001)
+
+            assert monitor.lag >= 0.05
+            assert monitor.saturated
+        finally:
+            await monitor.stop()
+
+        assert not monitor.saturated
+
+    @pytest.mark.asyncio
+    async def test_stall_logs_stack_sample(self):
+        """The watchdog logs the loop thread's stack while it is stalled."""
+        monitor = LoopMonitor(interval=0.01, warn_threshold=0.03)
+        with patch.object(loop_monitor_module.logger, "warning") as warning:
+            monitor.start()
+            try:
+                await asyncio.sleep(0.02)
+                block_loop(0.2)
+                await asyncio.sleep(0.02)
+            finally:
+                await monitor.stop()
+
+        stalls = [c for c in warning.call_args_list if c.args[0] == "Event loop stalled"]
+        assert len(stalls) == 1
+        assert "block_loop" in stalls[0].kwargs["extra"]["stack"]
+
+
+class TestLoadShedding:
+    """Test cases for LoadSheddingMiddleware."""
+
+    def make_client(self, saturated):
+        app = FastAPI()
+
+        @app.get("/api/conversations")
+        async def conversations():
+            return []
+
+        @app.post("/api/chat")
+        async def chat():
+            return {"reply": "ok"}
+
+        app.add_middleware(LoadSheddingMiddleware, monitor=SimpleNamespace(saturated=saturated))
+        return TestClient(app)
+
+    def test_low_priority_path_is_shed(self):
+        """Low-priority paths get 503 with Retry-After while saturated."""
+        response = self.make_client(saturated=True).get("/api/conversations")
+
+        assert response.status_code == 503
+        assert response.headers["retry-after"] == "5"
+
+    def test_chat_is_never_shed(self):
+        """Chat turns are served even while saturated."""
+        response = self.make_client(saturated=True).post("/api/chat")
+
+        assert response.status_code == 200
+
+    def test_nothing_shed_when_healthy(self):
+        """Requests pass through when the loop is healthy."""
+        response = self.make_client(saturated=False).get("/api/conversations")
+
+        assert response.status_code == 200
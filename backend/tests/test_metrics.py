@@ -0,0 +1,98 @@
+"""
+Tests for the Prometheus metrics endpoint and instrumentation.
+"""
+
+from unittest.mock import patch
+
+from app.core.metrics import Histogram, Counter, LLMCallTimer, LLM_COMPLETION_TOKENS, LLM_TIME_TO_FIRST_TOKEN
+from app.services.fake_llm import FakeChatModel
+from app.services.llm_service import llm_service
+
+
+def fast_model(**kwargs):
+    """Fake model with no simulated delays."""
+    return FakeChatModel(ttft_ms=0, jitter_ms=0, tokens_per_second=1e6, **kwargs)
+
+
+class TestMetricTypes:
+    """Test cases for the metric primitives."""
+
+    def test_histogram_buckets_are_cumulative(self):
+        """Bucket counts are rendered cumulatively with sum and count."""
+        histogram = Histogram("test_seconds", "Test", ["route"], buckets=(0.1, 1.0))
+        child = histogram.labels("/a")
+        for value in (0.05, 0.5, 5.0):
+            child.observe(value)
+
+        text = "\n".join(histogram.render())
+
+        assert 'test_seconds_bucket{route="/a",le="0.1"} 1' in text
+        assert 'test_seconds_bucket{route="/a",le="1.0"} 2' in text
+        assert 'test_seconds_bucket{route="/a",le="+Inf"} 3' in text
+        assert 'test_seconds_count{route="/a"} 3' in text
+
+    def test_counter_family_matches_samples(self):
+        """A counter's HELP and TYPE lines use the _total name of its samples."""
+        counter = Counter("test_requests", "Test", ["kind"])
+        counter.labels("x").inc()
+
+        assert counter.render() == [
+            "# HELP test_requests_total Test",
+            "# TYPE test_requests_total counter",
+            'test_requests_total{kind="x"} 1.0',
+        ]
+
+    def test_label_children_are_cached(self):
+        """The same label values return the same child."""
+        counter = Counter("test_events", "Test", ["kind"])
+
+        assert counter.labels("x") is counter.labels("x")
+
+    def test_llm_timer_falls_back_to_chunk_count(self):
+        """Without usage metadata, completion tokens are the streamed chunks."""
+        timer = LLMCallTimer("fake", "fake", "timer_test")
+        for _ in range(4):
+            timer.chunk()
+        timer.finish()
+
+        assert LLM_COMPLETION_TOKENS.labels("fake", "fake", "timer_test").sum == 4
+        assert LLM_TIME_TO_FIRST_TOKEN.labels("fake", "fake", "timer_test").count == 1
+
+
+class TestMetricsEndpoint:
+    """Test cases for /metrics."""
+
+    def test_metrics_exposition_format(self, client):
+        """The endpoint returns Prometheus text with all metric families."""
+        response = client.get("/metrics")
+
+        assert response.status_code == 200
+        assert response.headers["content-type"].startswith("text/plain")
+        for name in (
+            "http_request_duration_seconds",
+            "llm_time_to_first_token_seconds",
+            "llm_tokens_per_second",
+            "report_generation_duration_seconds",
+            "db_query_duration_seconds",
+            "db_pool_checkout_wait_seconds",
+            "sse_streams_in_flight",
+            "cache_requests_total",
+        ):
+            assert f"# TYPE {name} " in response.text
+
+    def test_request_latency_uses_route_template(self, client):
+        """Request latency is labelled with the route, not the raw path."""
+        client.get("/health")
+        response = client.get("/metrics")
+
+        assert 'route="/health",status="200"' in response.text
+
+    def test_streaming_chat_records_llm_metrics(self, client, sample_chat_request):
+        """A streamed chat records TTFT and closes its in-flight gauge."""
+        with patch.object(llm_service, "llm", fast_model()):
+            client.post("/api/chat/stream", json=sample_chat_request)
+        text = client.get("/metrics").text
+
+        assert 'llm_time_to_first_token_seconds_count{provider=' in text
+        assert 'operation="chat_stream"' in text
+        assert 'sse_streams_in_flight{route="/api/chat/stream"} 0.0' in text
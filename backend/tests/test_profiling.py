@@ -0,0 +1,139 @@
+"""
+Tests for on-demand profiling and the admin endpoints.
+"""
+
+import time
+import pytest
+from types import SimpleNamespace
+from unittest.mock import patch
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+
+from app.api.admin import router as admin_router
+from app.config import settings
+from app.core.profiling import ProfileCapture, ProfilerController, ProfilingMiddleware, profiler
+from app.dependencies.auth import require_admin, require_current_user
+from main import app
+
+ADMIN = SimpleNamespace(email="admin@example.com")
+
+retained = []
+
+
+def busy_work(seconds):
+    """Burn CPU on the calling thread."""
+    end = time.perf_counter() + seconds
+    while time.perf_counter() < end:
+        sum(range(1000))
+
+
+@pytest.fixture
+def profiling_client():
+    """App with the admin router, a profiled route and an admin user."""
+    test_app = FastAPI()
+    test_app.include_router(admin_router, prefix="/api/admin")
+
+    @test_app.get("/api/conversations")
+    async def conversations():
+        busy_work(0.05)
+        return []
+
+    test_app.add_middleware(ProfilingMiddleware)
+    test_app.dependency_overrides[require_admin] = lambda: ADMIN
+
+    # One client context keeps every request on the same event loop thread
+    with patch.object(settings, "PROFILING_ENABLED", True), TestClient(test_app) as test_client:
+        yield test_client
+
+    profiler.armed = None
+    profiler.last_result = None
+    profiler._busy = False
+
+
+class TestProfileCapture:
+    """Test cases for CPU and memory captures."""
+
+    @pytest.mark.asyncio
+    async def test_cpu_profile_has_collapsed_stacks(self):
+        """Sampled stacks include the busy function, root frame first."""
+        capture = ProfileCapture(interval=0.001)
+        capture.start()
+        busy_work(0.1)
+        result = capture.stop()
+
+        assert result["samples"] > 0
+        line = next(line for line in result["cpu"].splitlines() if "busy_work" in line)
+        stack, count = line.rsplit(" ", 1)
+        assert int(count) > 0
+        assert stack.split(";")[-1].startswith(("busy_work", "<genexpr>"))
+
+    @pytest.mark.asyncio
+    async def test_memory_profile_weights_by_bytes(self):
+        """Retained allocations are attributed to the allocating line."""
+        capture = ProfileCapture(memory=True)
+        capture.start()
+        retained.append([b"x" * 1024 for _ in range(1000)])
+        result = capture.stop()
+        retained.clear()
+
+        assert "test_profiling.py" in result["memory"]
+
+    def test_controller_allows_one_capture(self):
+        """A second capture is refused while one is running."""
+        controller = ProfilerController()
+        controller.arm("/api/x", requests=1)
+
+        with pytest.raises(RuntimeError):
+            controller.arm("/api/y", requests=1)
+
+        controller.request_finished(controller.armed)
+        assert controller.last_result is not None
+        assert not controller.busy
+
+
+class TestAdminProfilingEndpoints:
+    """Test cases for /api/admin/profile."""
+
+    def test_requires_admin(self, client):
+        """Non-admin users get 403."""
+        app.dependency_overrides[require_current_user] = lambda: SimpleNamespace(email="user@example.com")
+        try:
+            response = client.post("/api/admin/profile?seconds=0.01")
+        finally:
+            app.dependency_overrides.clear()
+
+        assert response.status_code == 403
+
+    def test_hidden_when_disabled(self, client):
+        """Profiling endpoints 404 unless PROFILING_ENABLED is set."""
+        app.dependency_overrides[require_admin] = lambda: ADMIN
+        try:
+            response = client.post("/api/admin/profile?seconds=0.01")
+        finally:
+            app.dependency_overrides.clear()
+
+        assert response.status_code == 404
+
+    def test_timed_capture(self, profiling_client):
+        """A timed capture returns collapsed stacks as text."""
+        response = profiling_client.post("/api/admin/profile?seconds=0.05")
+
+        assert response.status_code == 200
+        assert response.headers["content-type"].startswith("text/plain")
+        assert "X-Profile-Samples" in response.headers
+
+    def test_route_armed_capture(self, profiling_client):
+        """Arming captures only the next K requests to the route."""
+        response = profiling_client.post("/api/admin/profile/arm", json={
+            "route": "/api/conversations", "requests": 2, "interval_ms": 1
+        })
+        assert response.status_code == 202
+
+        profiling_client.get("/api/conversations")
+        assert profiling_client.get("/api/admin/profile/result").status_code == 409
+
+        profiling_client.get("/api/conversations")
+        response = profiling_client.get("/api/admin/profile/result")
+
+        assert response.status_code == 200
+        assert "busy_work" in response.text
@@ -0,0 +1,212 @@
+"""
+Tests for learner-progress aggregates and the /api/progress endpoint
+"""
+
+import pytest
+from datetime import date, datetime
+from types import SimpleNamespace
+from uuid import uuid4
+
+from sqlalchemy.dialects import postgresql
+
+from app.crud.progress import progress_deltas, report_counts, vocabulary_terms, week_start
+from app.db.database import get_db
+from app.db.models import ProgressAggregate
+from app.dependencies.auth import require_current_user
+from app.services.progress import rebuild_user_progress, summarize_progress
+from main import app
+
+USER = SimpleNamespace(id=uuid4())
+
+
+def aggregate(week, dimension, key, **counters):
+    return ProgressAggregate(
+        user_id=USER.id, week_start=week, language="japanese", dimension=dimension, key=key,
+        **{name: counters.get(name, 0) for name in (
+            "reports", "turns", "words", "grammar_errors", "vocabulary_issues", "naturalness_issues", "new_terms"
+        )}
+    )
+
+
+class TestReportCounts:
+    """What one report contributes."""
+
+    def test_counts_by_scenario_and_error_type(self, mock_report_response):
+        counts = report_counts("restaurant", mock_report_response["report"])
+
+        scenario = counts[("scenario", "restaurant")]
+        assert scenario["reports"] == 1
+        assert scenario["turns"] == 5
+        assert scenario["words"] == 50
+        assert scenario["grammar_errors"] == len(mock_report_response["report"]["grammar_errors"])
+        assert counts[("error_type", "particle")]["grammar_errors"] == 1
+
+    def test_missing_error_type_is_other(self):
+        counts = report_counts("casual_chat", {"grammar_errors": [{"error": "x"}, {"error_type": " Tense "}]})
+        assert counts[("error_type", "other")]["grammar_errors"] == 1
+        assert counts[("error_type", "tense")]["grammar_errors"] == 1
+
+    def test_regenerated_report_replaces_counts(self, mock_report_response):
+        old = mock_report_response["report"]
+        new = dict(old, grammar_errors=[], overview=dict(old["overview"], turns=7))
+
+        deltas = progress_deltas("restaurant", new, old)
+
+        scenario = deltas[("scenario", "restaurant")]
+        assert scenario["reports"] == 0
+        assert scenario["turns"] == 2
+        assert scenario["grammar_errors"] == -len(old["grammar_errors"])
+        assert deltas[("error_type", "particle")]["grammar_errors"] == -1
+
+    def test_identical_report_changes_nothing(self, mock_report_response):
+        report = mock_report_response["report"]
+        assert progress_deltas("restaurant", report, report) == {}
+
+
+class TestVocabulary:
+    """Learner terms come from the learner's own messages only."""
+
+    def test_user_messages_only(self):
+        messages = [
+            {"role": "user", "content": "I want ramen 2"},
+            {"role": "assistant", "content": "Certainly, sir"},
+            {"role": "user", "content": "ラーメン"},
+        ]
+        assert vocabulary_terms(messages) == sorted(["ramen", "want", "ラー", "ーメ", "メン"])
+
+    def test_week_starts_on_monday(self):
+        assert week_start(datetime(2026, 10, 18, 23, 0)) == date(2026, 10, 12)
+        assert week_start(datetime(2026, 10, 19, 0, 0)) == date(2026, 10, 19)
+
+
+class TestSummarize:
+    """Response built from aggregate rows."""
+
+    def test_weekly_series_scenarios_and_error_types(self):
+        rows = [
+            aggregate(date(2026, 10, 5), "scenario", "restaurant", reports=2, grammar_errors=6, new_terms=40),
+            aggregate(date(2026, 10, 12), "scenario", "restaurant", reports=1, grammar_errors=1, new_terms=5),
+            aggregate(date(2026, 10, 12), "scenario", "shopping", reports=1, grammar_errors=1, new_terms=3),
+            aggregate(date(2026, 10, 12), "error_type", "particle", grammar_errors=2),
+            aggregate(date(2026, 1, 5), "scenario", "shopping", reports=1, new_terms=100),
+            aggregate(date(2026, 1, 5), "error_type", "tense", grammar_errors=5),
+        ]
+
+        summary = summarize_progress(rows, weeks=2, today=date(2026, 10, 14))
+
+        assert [w["week_start"] for w in summary["weeks"]] == ["2026-10-05", "2026-10-12"]
+        assert [w["reports"] for w in summary["weeks"]] == [2, 2]
+        assert summary["totals"]["reports"] == 5
+        assert summary["totals"]["errors_per_report"] == 1.6
+        assert summary["vocabulary_size"] == 148
+        assert summary["scenarios"][0] == {
+            "scenario": "restaurant", "reports": 3, "turns": 0, "words": 0,
+            "grammar_errors": 7, "vocabulary_issues": 0, "naturalness_issues": 0,
+        }
+        assert summary["error_types"] == [
+            {"error_type": "tense", "count": 5}, {"error_type": "particle", "count": 2}
+        ]
+
+    def test_no_reports(self):
+        summary = summarize_progress([], weeks=4)
+        assert len(summary["weeks"]) == 4
+        assert summary["totals"]["errors_per_report"] is None
+        assert summary["scenarios"] == [] and summary["error_types"] == []
+
+
+class FakeResult:
+    def __init__(self, rows=()):
+        self.rows = list(rows)
+
+    def all(self):
+        return self.rows
+
+    def scalars(self):
+        return SimpleNamespace(all=lambda: [row[0] if isinstance(row, tuple) else row for row in self.rows])
+
+
+class RecordingSession:
+    """AsyncSession stand-in that records statements."""
+
+    def __init__(self, results=()):
+        self.results = list(results)
+        self.statements = []
+
+    async def execute(self, statement, params=None):
+        self.statements.append(str(statement.compile(dialect=postgresql.dialect())))
+        return self.results.pop(0) if self.results else FakeResult()
+
+
+class TestProgressEndpoint:
+    """GET /api/progress answers from aggregates in one query."""
+
+    @pytest.fixture
+    def session(self):
+        recording = RecordingSession([FakeResult([
+            aggregate(date(2026, 10, 12), "scenario", "restaurant", reports=1, new_terms=12),
+        ])])
+
+        async def override_get_db():
+            yield recording
+
+        app.dependency_overrides[get_db] = override_get_db
+        app.dependency_overrides[require_current_user] = lambda: USER
+        yield recording
+        app.dependency_overrides.clear()
+
+    def test_one_query(self, client, session):
+        response = client.get("/api/progress", params={"weeks": 4, "language": "japanese"})
+
+        assert response.status_code == 200
+        assert response.json()["vocabulary_size"] == 12
+        assert len(response.json()["weeks"]) == 4
+        assert len(session.statements) == 1
+        assert "FROM progress_aggregates" in session.statements[0]
+        assert "progress_aggregates.language = " in session.statements[0]
+
+    def test_requires_login(self, client):
+        assert client.get("/api/progress").status_code == 401
+
+
+class TestBackfill:
+    """Rebuilding a user replaces their aggregates."""
+
+    @pytest.mark.asyncio
+    async def test_rebuild_user(self, mock_report_response):
+        messages = [{"role": "user", "content": "ラーメンください"}]
+        db = RecordingSession([
+            FakeResult(),
+            FakeResult(),
+            FakeResult([
+                (uuid4(), "japanese", "restaurant", datetime(2026, 9, 1), messages, mock_report_response["report"]),
+                (uuid4(), "japanese", "restaurant", datetime(2026, 10, 1), [], mock_report_response["report"]),
+            ]),
+        ])
+
+        assert await rebuild_user_progress(db, USER.id) == 2
+
+        assert db.statements[0].startswith("DELETE FROM progress_aggregates")
+        assert db.statements[1].startswith("DELETE FROM learner_terms")
+        assert db.statements[3].startswith("INSERT INTO learner_terms")
+        inserts = [s for s in db.statements if s.startswith("INSERT INTO progress_aggregates")]
+        assert len(inserts) == 2
+        assert "progress_aggregates.reports + excluded.reports" in inserts[0]
+
+    @pytest.mark.asyncio
+    async def test_pages_and_batches_weeks(self, mock_report_response):
+        """Reports of one week are summed into one upsert, across pages."""
+        messages = [{"role": "user", "content": "ラーメンください"}]
+        rows = [
+            (uuid4(), "japanese", "restaurant", datetime(2026, 10, day), messages, mock_report_response["report"])
+            for day in (12, 13, 14)
+        ]
+        db = RecordingSession([FakeResult(), FakeResult(), FakeResult(rows[:2]), FakeResult(rows[2:])])
+
+        assert await rebuild_user_progress(db, USER.id, page_size=2) == 3
+
+        selects = [s for s in db.statements if s.startswith("SELECT")]
+        assert len(selects) == 2
+        assert "(conversations.created_at, conversations.id) >" in selects[1]
+        assert sum(s.startswith("INSERT INTO learner_terms") for s in db.statements) == 1
+        inserts = [s for s in db.statements if s.startswith("INSERT INTO progress_aggregates")]
+        assert len(inserts) == 1
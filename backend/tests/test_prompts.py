@@ -0,0 +1,87 @@
+"""
+Tests for the precompiled prompt registry.
+"""
+
+from app.models.schemas import Language, Scenario
+from app.langchain.prompts import (
+    PromptRegistry,
+    SCENARIO_CONTEXTS,
+    prompt_registry,
+    get_conversation_system_prompt,
+    get_report_instructions,
+    get_report_transcript_message
+)
+
+
+class TestPromptRegistry:
+    """Test cases for PromptRegistry."""
+
+    def test_registry_compiles_every_combination(self):
+        """Every (language, scenario) pair has both prompts compiled."""
+        for scenario in Scenario:
+            for language in Language:
+                assert prompt_registry.conversation_prompt(language, scenario).text
+                assert prompt_registry.report_prompt(language, scenario).text
+
+    def test_conversation_prompt_contains_scenario_context(self):
+        """Conversation prompt is rendered from SCENARIO_CONTEXTS."""
+        prompt = get_conversation_system_prompt(Language.JAPANESE, Scenario.RESTAURANT)
+        info = SCENARIO_CONTEXTS[Scenario.RESTAURANT]["japanese"]
+
+        assert info["role"] in prompt
+        assert info["context"] in prompt
+        assert info["greeting"] in prompt
+
+    def test_lookups_return_the_same_object(self):
+        """Lookups do not re-render the template."""
+        first = prompt_registry.conversation_prompt(Language.ENGLISH, Scenario.HOTEL)
+        second = prompt_registry.conversation_prompt(Language.ENGLISH, Scenario.HOTEL)
+
+        assert first is second
+
+    def test_content_hash_is_stable_across_registries(self):
+        """Hash depends only on rendered text and version."""
+        other = PromptRegistry()
+        for scenario in Scenario:
+            assert (
+                other.report_prompt(Language.ENGLISH, scenario).content_hash
+                == prompt_registry.report_prompt(Language.ENGLISH, scenario).content_hash
+            )
+
+    def test_content_hash_changes_with_version(self):
+        """Bumping the version produces new cache keys."""
+        other = PromptRegistry(version="test")
+        original = prompt_registry.conversation_prompt(Language.ENGLISH, Scenario.HOTEL)
+        bumped = other.conversation_prompt(Language.ENGLISH, Scenario.HOTEL)
+
+        assert bumped.text == original.text
+        assert bumped.content_hash != original.content_hash
+
+    def test_content_hash_differs_between_scenarios(self):
+        """Different prompts never share a cache key."""
+        hashes = {
+            prompt_registry.conversation_prompt(language, scenario).content_hash
+            for scenario in Scenario
+            for language in Language
+        }
+
+        assert len(hashes) == len(Scenario) * len(Language)
+
+    def test_report_instructions_exclude_transcript(self):
+        """Transcript is sent after the static instructions, not inside them."""
+        instructions = get_report_instructions(Language.JAPANESE, Scenario.RESTAURANT)
+        transcript = get_report_transcript_message(Language.JAPANESE, "User: ラーメンをください")
+
+        assert "ラーメンをください" not in instructions
+        assert "restaurant" in instructions
+        assert transcript.startswith("【会話内容】:")
+        assert transcript.endswith("User: ラーメンをください")
+
+    def test_transcript_includes_detected_errors(self):
+        """Locally detected errors follow the transcript."""
+        transcript = get_report_transcript_message(
+            Language.ENGLISH, "User: I want a apple", "- I want a apple → I want an apple"
+        )
+
+        assert transcript.index("I want a apple") < transcript.index("Already detected errors")
+        assert transcript.endswith("I want an apple")
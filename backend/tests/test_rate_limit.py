@@ -0,0 +1,99 @@
+"""
+Tests for token-bucket rate limiting on LLM routes.
+"""
+
+import json
+import pytest
+from fastapi import HTTPException, Request
+from types import SimpleNamespace
+from unittest.mock import patch, AsyncMock
+from uuid import uuid4
+
+from app.core.rate_limit import BucketPolicy, MemoryBucketBackend, RateLimiter, rate_limiter
+from app.dependencies.rate_limit import chat_cost, limit_chat, report_cost
+from app.services.llm_service import llm_service
+
+
+class TestTokenBucket:
+    """Test cases for the in-memory bucket backend."""
+
+    @pytest.mark.asyncio
+    async def test_burst_then_reject(self):
+        """A bucket allows its capacity, then rejects with a retry delay."""
+        backend = MemoryBucketBackend()
+        policy = BucketPolicy(capacity=3, refill_rate=1.0)
+
+        results = [await backend.take("k", 1, policy) for _ in range(4)]
+
+        assert [r.allowed for r in results] == [True, True, True, False]
+        assert 0 < results[-1].retry_after <= 1.0
+
+    @pytest.mark.asyncio
+    async def test_refill_over_time(self):
+        """Tokens come back at the refill rate."""
+        backend = MemoryBucketBackend()
+        policy = BucketPolicy(capacity=2, refill_rate=10.0)
+        await backend.take("k", 2, policy)
+
+        with patch("app.core.rate_limit.time.monotonic", return_value=backend.buckets["k"][1] + 0.2):
+            result = await backend.take("k", 1, policy)
+
+        assert result.allowed
+
+    @pytest.mark.asyncio
+    async def test_cost_is_capped_at_capacity(self):
+        """A request costing more than the capacity is still allowed on a full bucket."""
+        limiter = RateLimiter(MemoryBucketBackend(), BucketPolicy(5, 1.0), BucketPolicy(2, 1.0))
+
+        assert (await limiter.hit("ip:1", 50, guest=True)).allowed
+        assert not (await limiter.hit("ip:1", 1, guest=True)).allowed
+        assert (await limiter.hit("user:1", 4)).allowed
+
+    def test_longer_requests_cost_more(self):
+        """Cost grows with history length; reports start higher."""
+        short = chat_cost({"message": "hi", "history": []})
+        long = chat_cost({"message": "hi", "history": [{"role": "user", "content": "x" * 30000}]})
+
+        assert long > short
+        assert report_cost({"conversation": []}) > short
+
+
+class TestRateLimitedRoutes:
+    """Test cases for rate limits on chat and report endpoints."""
+
+    def test_guest_chat_is_limited(self, client, sample_chat_request):
+        """Guests get 429 with Retry-After once their bucket is empty."""
+        limiter = RateLimiter(rate_limiter.backend, BucketPolicy(5, 1.0), BucketPolicy(3, 0.01))
+        with patch("app.dependencies.rate_limit.rate_limiter", limiter), \
+             patch.object(llm_service, "get_conversation_response", AsyncMock(return_value="はい")):
+            statuses = [client.post("/api/chat", json=sample_chat_request).status_code for _ in range(3)]
+            response = client.post("/api/chat", json=sample_chat_request)
+
+        assert statuses == [200, 200, 429]
+        assert int(response.headers["Retry-After"]) > 1
+
+    @pytest.mark.asyncio
+    async def test_users_have_separate_buckets(self):
+        """Authenticated users are keyed by id, not by the shared client IP."""
+        limiter = RateLimiter(MemoryBucketBackend(), BucketPolicy(2, 0.01), BucketPolicy(2, 0.01))
+        body = json.dumps({"message": "x" * 3000, "history": []}).encode()
+
+        async def receive():
+            return {"type": "http.request", "body": body}
+
+        allowed = []
+        with patch("app.dependencies.rate_limit.rate_limiter", limiter):
+            for user in (SimpleNamespace(id=uuid4()), SimpleNamespace(id=uuid4())):
+                for _ in range(2):
+                    request = Request({
+                        "type": "http", "method": "POST", "path": "/api/chat",
+                        "headers": [], "client": ("10.0.0.1", 1234)
+                    }, receive)
+                    try:
+                        await limit_chat(request, current_user=user)
+                        allowed.append(True)
+                    except HTTPException as e:
+                        assert e.status_code == 429
+                        allowed.append(False)
+
+        assert allowed == [True, False, True, False]
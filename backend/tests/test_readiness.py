@@ -0,0 +1,46 @@
+"""
+Tests for the readiness endpoint and connection pool metrics.
+"""
+
+import pytest
+from unittest.mock import AsyncMock, patch
+
+from app.db import database
+import main
+
+
+class TestReadiness:
+    """Test cases for /ready and the database check."""
+
+    def test_ready_when_database_answers(self, client):
+        """/ready returns 200 with pool counts when the check passes."""
+        with patch.object(main, "check_database", AsyncMock(return_value=None)):
+            response = client.get("/ready")
+
+        assert response.status_code == 200
+        assert response.json()["status"] == "ready"
+        assert response.json()["pool"]["size"] == database.settings.DB_POOL_SIZE
+
+    def test_not_ready_when_database_fails(self, client):
+        """/ready returns 503 with the reason; /health stays constant."""
+        with patch.object(main, "check_database", AsyncMock(return_value="timeout")):
+            response = client.get("/ready")
+
+        assert response.status_code == 503
+        assert response.json()["database"] == "timeout"
+        assert client.get("/health").status_code == 200
+
+    @pytest.mark.asyncio
+    async def test_exhausted_pool_is_not_ready(self):
+        """A pool with every connection checked out fails without waiting for one."""
+        status = {"size": 2, "max_overflow": 1, "checked_out": 3, "checked_in": 0, "overflow": 1}
+        with patch.object(database, "pool_status", return_value=status):
+            assert await database.check_database(timeout=0.01) == "pool exhausted"
+
+    def test_pool_metrics_are_published(self, client):
+        """Pool connection counts and utilization are rendered with /metrics."""
+        text = client.get("/metrics").text
+        limit = database.settings.DB_POOL_SIZE + database.settings.DB_MAX_OVERFLOW
+
+        assert f'db_pool_connections{{pool="primary",state="capacity"}} {limit}' in text
+        assert 'db_pool_utilization{pool="primary"}' in text
@@ -0,0 +1,145 @@
+"""
+Tests for read-replica routing
+"""
+import pytest
+from uuid import uuid4
+from sqlalchemy import select, update, delete
+from sqlalchemy.dialects.postgresql import insert
+from sqlalchemy.ext.asyncio import create_async_engine
+
+from app.db import database
+from app.db.database import ReplicaRouter, RoutingSession, bind_user, unit_of_work
+from app.db.models import Conversation
+
+
+@pytest.fixture
+def engines(monkeypatch):
+    """A primary and one replica; no connection is ever made"""
+    primary = create_async_engine("postgresql+asyncpg://u@primary/linguaecho")
+    replica = create_async_engine("postgresql+asyncpg://u@replica/linguaecho")
+    router = ReplicaRouter([replica], sticky_seconds=5)
+    monkeypatch.setattr(database, "engine", primary)
+    monkeypatch.setattr(database, "replica_router", router)
+    return primary, replica, router
+
+
+class TestRoutingSession:
+    """Which engine a statement is sent to"""
+
+    def test_plain_select_goes_to_replica(self, engines):
+        primary, replica, _ = engines
+        session = RoutingSession()
+        assert session.get_bind(clause=select(Conversation)) is replica.sync_engine
+
+    @pytest.mark.parametrize("statement", [
+        insert(Conversation).values(language="en"),
+        update(Conversation).values(language="en"),
+        delete(Conversation),
+        select(Conversation).with_for_update(),
+    ])
+    def test_writes_and_locks_go_to_primary(self, engines, statement):
+        primary, _, _ = engines
+        assert RoutingSession().get_bind(clause=statement) is primary.sync_engine
+
+    def test_primary_flag_pins_reads(self, engines):
+        primary, _, _ = engines
+        session = RoutingSession()
+        session.info["primary"] = True
+        assert session.get_bind(clause=select(Conversation)) is primary.sync_engine
+
+    def test_sticky_user_reads_primary(self, engines):
+        primary, replica, router = engines
+        user_id = uuid4()
+        session = RoutingSession()
+        session.info["user_id"] = user_id
+        assert session.get_bind(clause=select(Conversation)) is replica.sync_engine
+
+        router.mark_write(user_id)
+        assert session.get_bind(clause=select(Conversation)) is primary.sync_engine
+
+        other = RoutingSession()
+        other.info["user_id"] = uuid4()
+        assert other.get_bind(clause=select(Conversation)) is replica.sync_engine
+
+
+class TestReplicaRouter:
+    """Round robin and stickiness expiry"""
+
+    def test_round_robin(self):
+        router = ReplicaRouter(["a", "b"])
+        assert [router.choose() for _ in range(4)] == ["a", "b", "a", "b"]
+
+    def test_no_replicas(self):
+        assert ReplicaRouter([]).choose() is None
+
+    def test_stickiness_expires(self, monkeypatch):
+        clock = [100.0]
+        monkeypatch.setattr(database.time, "monotonic", lambda: clock[0])
+        router = ReplicaRouter(["a"], sticky_seconds=5)
+        user_id = uuid4()
+
+        router.mark_write(user_id)
+        clock[0] += 4.9
+        assert router.is_sticky(user_id)
+        clock[0] += 0.2
+        assert not router.is_sticky(user_id)
+
+    def test_bounded_memory(self, monkeypatch):
+        clock = [0.0]
+        monkeypatch.setattr(database.time, "monotonic", lambda: clock[0])
+        router = ReplicaRouter(["a"], sticky_seconds=1, max_users=2)
+        router.mark_write(uuid4())
+        router.mark_write(uuid4())
+        clock[0] = 10.0
+        router.mark_write(uuid4())
+        assert len(router._recent_writes) == 1
+
+
+class TestUnitOfWorkStickiness:
+    """A committed write makes the bound user sticky"""
+
+    @pytest.mark.asyncio
+    async def test_commit_marks_user(self, engines):
+        _, _, router = engines
+
+        class FakeSession:
+            def __init__(self):
+                self.info = {}
+
+            async def commit(self):
+                assert self.info["primary"] is True
+
+            async def rollback(self):
+                pass
+
+        session = FakeSession()
+        user_id = uuid4()
+        bind_user(session, user_id)
+        async with unit_of_work(session):
+            pass
+
+        assert session.info["primary"] is False
+        assert router.is_sticky(user_id)
+
+    @pytest.mark.asyncio
+    async def test_rollback_does_not_mark_user(self, engines):
+        _, _, router = engines
+
+        class FakeSession:
+            def __init__(self):
+                self.info = {}
+
+            async def commit(self):
+                pass
+
+            async def rollback(self):
+                pass
+
+        session = FakeSession()
+        user_id = uuid4()
+        bind_user(session, user_id)
+        with pytest.raises(RuntimeError):
+            async with unit_of_work(session):
+                raise RuntimeError("boom")
+
+        assert not router.is_sticky(user_id)
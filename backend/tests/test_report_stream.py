@@ -0,0 +1,224 @@
+"""
+Tests for streamed report generation and incremental parsing.
+"""
+
+import json
+import pytest
+from types import SimpleNamespace
+from unittest.mock import patch
+
+from app.models.schemas import Language, Scenario, Message
+from app.services.fake_llm import FakeRateLimitError
+from app.services.llm_service import llm_service
+from app.services.report_parser import IncrementalReportParser, LLM_SECTIONS, REPORT_SECTIONS
+
+
+# Report JSON as written by the LLM (the overview is computed locally)
+REPORT = {
+    "grammar_errors": [
+        {
+            "error": "メニューを見せて",
+            "correction": "メニューを見せてください",
+            "explanation": "Add ください to make a polite request {\"quoted\"}",
+            "error_type": "politeness"
+        }
+    ],
+    "vocabulary_issues": [],
+    "naturalness": [],
+    "positive_feedback": ["Good use of polite form"]
+}
+
+
+def split_into_chunks(text, size):
+    return [text[i:i + size] for i in range(0, len(text), size)]
+
+
+class FakeReportLLM:
+    """Minimal stand-in for a LangChain chat model."""
+
+    def __init__(self, stream_text, repair_text="", error=None):
+        self.stream_text = stream_text
+        self.repair_text = repair_text
+        self.error = error
+        self.repair_calls = 0
+        self.repair_messages = None
+
+    async def astream(self, messages):
+        for chunk in split_into_chunks(self.stream_text, 7):
+            yield SimpleNamespace(content=chunk)
+        if self.error:
+            raise self.error
+
+    async def ainvoke(self, messages):
+        self.repair_calls += 1
+        self.repair_messages = messages
+        return SimpleNamespace(content=self.repair_text)
+
+
+class TestIncrementalReportParser:
+    """Test cases for IncrementalReportParser."""
+
+    def test_sections_emitted_in_order(self):
+        """Every section is emitted once, in stream order."""
+        parser = IncrementalReportParser()
+        emitted = []
+        for chunk in split_into_chunks(json.dumps(REPORT, ensure_ascii=False), 5):
+            emitted.extend(parser.feed(chunk))
+
+        assert [s.name for s in emitted] == LLM_SECTIONS
+        assert all(s.ok for s in emitted)
+        assert emitted[0].value == REPORT["grammar_errors"]
+        assert parser.done
+        assert parser.missing == []
+
+    def test_section_emitted_as_soon_as_it_closes(self):
+        """A section is available before the rest of the object arrives."""
+        parser = IncrementalReportParser()
+        text = json.dumps(REPORT, ensure_ascii=False)
+        cut = text.index('"vocabulary_issues"')
+
+        emitted = parser.feed(text[:cut])
+
+        assert [s.name for s in emitted] == ["grammar_errors"]
+        assert not parser.done
+
+    def test_markdown_fences_ignored(self):
+        """Text around the JSON object is skipped."""
+        parser = IncrementalReportParser()
+        parser.feed("```json\n" + json.dumps(REPORT) + "\n```")
+
+        assert parser.done
+        assert parser.missing == []
+
+    def test_invalid_section_reported(self):
+        """A section that fails schema validation is marked broken."""
+        broken = dict(REPORT, vocabulary_issues=[{"original": "x"}])
+        parser = IncrementalReportParser()
+        parser.feed(json.dumps(broken))
+
+        assert parser.missing == ["vocabulary_issues"]
+        assert parser.sections["grammar_errors"].ok
+
+    def test_unexpected_keys_ignored(self):
+        """Keys outside the expected sections are not emitted."""
+        parser = IncrementalReportParser()
+        emitted = parser.feed(json.dumps(dict({"overview": {"turns": 1}}, **REPORT)))
+
+        assert [s.name for s in emitted] == LLM_SECTIONS
+
+    def test_truncated_response(self):
+        """Sections after a truncation point are missing."""
+        text = json.dumps(REPORT)
+        parser = IncrementalReportParser()
+        parser.feed(text[:text.index('"naturalness"') + len('"naturalness": [')])
+
+        assert parser.missing == ["naturalness", "positive_feedback"]
+
+
+class TestGenerateReportStream:
+    """Test cases for LLMService.generate_report_stream."""
+
+    conversation = [
+        Message(role="user", content="レストランを行きます"),
+        Message(role="assistant", content="いらっしゃいませ"),
+    ]
+
+    async def collect(self):
+        return [
+            item async for item in llm_service.generate_report_stream(
+                Language.JAPANESE, Scenario.RESTAURANT, self.conversation
+            )
+        ]
+
+    @pytest.mark.asyncio
+    async def test_complete_response_needs_no_repair(self):
+        """A valid response is streamed without extra LLM calls."""
+        fake = FakeReportLLM(json.dumps(REPORT, ensure_ascii=False))
+        with patch.object(llm_service, "report_llm", fake):
+            items = await self.collect()
+
+        assert [name for name, _ in items] == REPORT_SECTIONS + ["report"]
+        assert items[-1][1].overview.turns == 1
+        assert fake.repair_calls == 0
+
+    @pytest.mark.asyncio
+    async def test_rule_detected_errors_come_first(self):
+        """Locally detected errors are merged ahead of the LLM's findings."""
+        fake = FakeReportLLM(json.dumps(REPORT, ensure_ascii=False))
+        with patch.object(llm_service, "report_llm", fake):
+            items = await self.collect()
+
+        errors = items[-1][1].grammar_errors
+        assert errors[0].correction == "レストランに行きます"
+        assert errors[1].correction == "メニューを見せてください"
+
+    @pytest.mark.asyncio
+    async def test_only_broken_section_is_repaired(self):
+        """A malformed section is re-requested on its own."""
+        broken = dict(REPORT, naturalness="not a list")
+        repair = json.dumps({"naturalness": [
+            {"unnatural": "a", "natural": "b", "context": "c"}
+        ]})
+        fake = FakeReportLLM(json.dumps(broken, ensure_ascii=False), repair)
+        with patch.object(llm_service, "report_llm", fake):
+            items = await self.collect()
+
+        report = items[-1][1]
+        assert fake.repair_calls == 1
+        # The follow-up comes after the output it refers to
+        assert fake.repair_messages[-2].type == "ai"
+        assert "not a list" in fake.repair_messages[-2].content
+        assert fake.repair_messages[-1].type == "human"
+        assert report.naturalness[0].natural == "b"
+        assert len(report.grammar_errors) == 2
+
+    @pytest.mark.asyncio
+    async def test_unparseable_response_uses_fallback(self):
+        """Nothing usable falls back to the basic report."""
+        fake = FakeReportLLM("Sorry, I cannot help with that.")
+        with patch.object(llm_service, "report_llm", fake):
+            items = await self.collect()
+
+        report = items[-1][1]
+        assert fake.repair_calls == 0
+        assert report.overview.turns == 1
+        assert report.grammar_errors[0].error_type == "助詞"
+        assert len(report.positive_feedback) == 1
+
+    @pytest.mark.asyncio
+    async def test_error_before_any_section_is_raised(self):
+        """A provider error with nothing streamed yet reaches the caller."""
+        fake = FakeReportLLM("", error=FakeRateLimitError("rate limited"))
+        with patch.object(llm_service, "report_llm", fake), pytest.raises(FakeRateLimitError):
+            await self.collect()
+
+    @pytest.mark.asyncio
+    async def test_error_after_a_section_keeps_partial_report(self):
+        """Sections that arrived before an error are kept; the rest are repaired."""
+        text = json.dumps(REPORT, ensure_ascii=False)
+        fake = FakeReportLLM(text[:text.index('"vocabulary_issues"')], error=RuntimeError("connection reset"))
+        with patch.object(llm_service, "report_llm", fake):
+            items = await self.collect()
+
+        assert fake.repair_calls == 3
+        assert items[-1][1].grammar_errors[1].correction == "メニューを見せてください"
+
+
+class TestReportStreamEndpoint:
+    """Test cases for /api/report/generate/stream endpoint."""
+
+    def test_stream_sends_sections_then_done(self, client, sample_report_request):
+        """Sections are sent as SSE events before the completion event."""
+        fake = FakeReportLLM(json.dumps(REPORT, ensure_ascii=False))
+        with patch.object(llm_service, "report_llm", fake):
+            response = client.post("/api/report/generate/stream", json=sample_report_request)
+
+        assert response.status_code == 200
+        events = [
+            json.loads(line[len("data: "):])
+            for line in response.text.splitlines()
+            if line.startswith("data: ")
+        ]
+        assert [e["section"] for e in events[:-1]] == REPORT_SECTIONS
+        assert events[-1]["type"] == "done"
+        assert events[-1]["report"]["overview"]["turns"] == 2
@@ -0,0 +1,156 @@
+"""
+Tests for conversation search: tokenization, queries and the endpoint
+"""
+
+import pytest
+from datetime import datetime
+from types import SimpleNamespace
+from uuid import uuid4
+
+from sqlalchemy.dialects import postgresql
+
+from app.core.text_search import build_tsquery, make_snippet, report_texts, search_document, tokenize
+from app.db.database import get_db
+from app.dependencies.auth import require_current_user
+from main import app
+
+USER = SimpleNamespace(id=uuid4())
+
+
+class TestTokenize:
+    """CJK runs become bigrams; other scripts become words."""
+
+    def test_japanese_bigrams(self):
+        assert tokenize("ラーメンを注文") == ["ラー", "ーメ", "メン", "ンを", "を注", "注文", "文"]
+
+    def test_mixed_scripts_and_case(self):
+        assert tokenize("I ordered Ramen, ラーメン!") == ["i", "ordered", "ramen", "ラー", "ーメ", "メン", "ン"]
+
+    def test_full_width_is_normalized(self):
+        assert tokenize("ＲＡＭＥＮ ｶﾞ") == ["ramen", "ガ"]
+
+    def test_report_texts(self, mock_report_response):
+        texts = report_texts(mock_report_response["report"])
+        assert "Good use of polite form" in texts
+        assert "レストランに行きたいです" in texts
+
+    def test_document_is_space_separated(self):
+        assert search_document(["東京", "", "Tokyo"]) == "東京 京 tokyo"
+
+
+class TestBuildTsquery:
+    """Every term must match; CJK terms match as bigram phrases."""
+
+    def test_cjk_phrase_and_word(self):
+        assert build_tsquery("ラーメン ordered") == "('ラー' <-> 'ーメ' <-> 'メン') & 'ordered'"
+
+    def test_single_cjk_character_is_prefix(self):
+        assert build_tsquery("猫") == "'猫':*"
+
+    def test_operators_are_not_passed_through(self):
+        assert build_tsquery("a & !b | c:*") == "'a' & 'b' & 'c'"
+
+    def test_nothing_searchable(self):
+        assert build_tsquery("!!! ---") is None
+
+
+class TestSnippet:
+    """Snippets are short excerpts around the first match."""
+
+    def test_window_around_match(self):
+        text = "あ" * 200 + "ラーメンを注文した" + "い" * 200
+        snippet = make_snippet(text, "ラーメン", width=20)
+
+        assert "ラーメン" in snippet
+        assert snippet.startswith("…") and snippet.endswith("…")
+        assert len(snippet) <= 42
+
+    def test_short_text_is_whole(self):
+        assert make_snippet("I ordered ramen", "RAMEN") == "I ordered ramen"
+
+    def test_no_text(self):
+        assert make_snippet(None, "ramen") is None
+
+
+class FakeResult:
+    def __init__(self, rows):
+        self.rows = rows
+
+    def all(self):
+        return self.rows
+
+
+class RecordingSession:
+    """AsyncSession stand-in returning canned search rows."""
+
+    def __init__(self, rows):
+        self.rows = rows
+        self.statements = []
+
+    async def execute(self, statement, params=None):
+        self.statements.append(str(statement.compile(dialect=postgresql.dialect())))
+        return FakeResult(self.rows)
+
+
+@pytest.fixture
+def search_session():
+    def install(rows):
+        session = RecordingSession(rows)
+
+        async def override_get_db():
+            yield session
+
+        app.dependency_overrides[get_db] = override_get_db
+        app.dependency_overrides[require_current_user] = lambda: USER
+        return session
+
+    yield install
+    app.dependency_overrides.clear()
+
+
+def search_row(rank, message):
+    return (uuid4(), uuid4(), "japanese", "restaurant", datetime(2026, 10, 1), rank, message)
+
+
+class TestSearchEndpoint:
+    """GET /api/search/conversations"""
+
+    def test_ranked_page_with_snippets(self, client, search_session):
+        session = search_session([
+            search_row(0.6, "ラーメンを注文したいです"),
+            search_row(0.3, None),
+            search_row(0.1, "ラーメン"),
+        ])
+
+        response = client.get("/api/search/conversations", params={"q": "ラーメン", "limit": 2})
+
+        assert response.status_code == 200
+        data = response.json()
+        assert [hit["rank"] for hit in data["results"]] == [0.6, 0.3]
+        assert data["results"][0]["snippet"] == "ラーメンを注文したいです"
+        assert data["results"][1]["snippet"] is None
+        assert data["has_more"] is True
+        assert "messages" not in data["results"][0]
+
+        statement = session.statements[0]
+        assert "@@ to_tsquery('simple'::regconfig" in statement
+        assert "jsonb_array_elements(conversations.messages)" in statement
+        assert "LIMIT %(param_" in statement
+
+    def test_unsearchable_query_skips_database(self, client, search_session):
+        session = search_session([])
+
+        response = client.get("/api/search/conversations", params={"q": "!!!"})
+
+        assert response.status_code == 200
+        assert response.json()["results"] == []
+        assert session.statements == []
+
+    def test_requires_login(self, client):
+        response = client.get("/api/search/conversations", params={"q": "ramen"})
+        assert response.status_code == 401
+
+    def test_limit_is_bounded(self, client, search_session):
+        search_session([])
+        response = client.get("/api/search/conversations", params={"q": "ramen", "limit": 500})
+        assert response.status_code == 422
@@ -0,0 +1,57 @@
+"""
+Tests for the fast JSON backend and SSE encoding.
+"""
+
+import json
+from datetime import datetime
+from decimal import Decimal
+from uuid import uuid4
+
+from app.core.serialization import FastJSONResponse, dumps, sse_event
+from app.models.schemas import Message
+
+
+class TestSerialization:
+    """Test cases for dumps, SSE events and the response class."""
+
+    def test_matches_stdlib_output(self):
+        """Output parses to the same value as stdlib json, without escaping CJK text."""
+        payload = {"reply": "こんにちは", "turns": [1, 2.5, None, True]}
+
+        encoded = dumps(payload)
+
+        assert json.loads(encoded) == payload
+        assert "こんにちは".encode("utf-8") in encoded
+
+    def test_encodes_api_types(self):
+        """UUIDs, datetimes, decimals and Pydantic models are encoded."""
+        conversation_id = uuid4()
+        payload = {
+            "id": conversation_id,
+            "created_at": datetime(2025, 1, 2, 3, 4, 5),
+            "cost": Decimal("0.25"),
+            "message": Message(role="user", content="hi"),
+        }
+
+        decoded = json.loads(dumps(payload))
+
+        assert decoded["id"] == str(conversation_id)
+        assert decoded["created_at"].startswith("2025-01-02T03:04:05")
+        assert decoded["cost"] == 0.25
+        assert decoded["message"] == {"role": "user", "content": "hi"}
+
+    def test_sse_event_framing(self):
+        """SSE events are a single data line followed by a blank line."""
+        event = sse_event({"type": "chunk", "content": "一\n二"})
+
+        assert event.startswith(b"data: ")
+        assert event.endswith(b"\n\n")
+        assert event.count(b"\n") == 2
+        assert json.loads(event[len(b"data: "):]) == {"type": "chunk", "content": "一\n二"}
+
+    def test_response_class(self):
+        """FastJSONResponse renders with the fast backend."""
+        response = FastJSONResponse({"language": "chinese", "reply": "你好"})
+
+        assert response.headers["content-type"] == "application/json"
+        assert json.loads(response.body) == {"language": "chinese", "reply": "你好"}
@@ -0,0 +1,71 @@
+"""
+Tests for the trusted read path of stored conversations.
+"""
+
+import json
+import pytest
+from datetime import datetime
+from types import SimpleNamespace
+from uuid import uuid4
+
+from app.core.serialization import dumps
+from app.models.schemas import ConversationDetail
+from app.models.serializers import conversation_detail, message_list, report_dict
+
+
+def stored_conversation(messages, report_data=None):
+    """Conversation row as loaded from the database."""
+    return SimpleNamespace(
+        id=uuid4(),
+        session_id=uuid4(),
+        language="japanese",
+        scenario="restaurant",
+        messages=messages,
+        created_at=datetime(2025, 1, 2, 3, 4, 5, 678000),
+        report=SimpleNamespace(report_data=report_data) if report_data is not None else None,
+    )
+
+
+class TestTrustedReadPath:
+    """Test cases for passing stored rows through without validation."""
+
+    def test_matches_response_model_output(self, mock_report_response):
+        """The trusted dict encodes to the same JSON as ConversationDetail."""
+        conversation = stored_conversation(
+            [{"role": "user", "content": "すみません"}, {"role": "assistant", "content": "はい"}],
+            mock_report_response["report"],
+        )
+
+        expected = ConversationDetail.model_validate(conversation_detail(conversation)).model_dump(mode="json")
+
+        assert json.loads(dumps(conversation_detail(conversation))) == expected
+
+    def test_well_formed_rows_are_passed_through(self, mock_report_response):
+        """Rows in response shape are returned as-is."""
+        messages = [{"role": "user", "content": "hi"}]
+        report = mock_report_response["report"]
+
+        assert message_list(messages) is messages
+        assert report_dict(report) is report
+
+    def test_legacy_messages_are_validated(self):
+        """Extra keys from migrated rows are dropped by validation."""
+        messages = [{"role": "user", "content": "hi", "timestamp": 1700000000}]
+
+        assert message_list(messages) == [{"role": "user", "content": "hi"}]
+
+    def test_legacy_reports_are_validated(self, mock_report_response):
+        """Reports missing optional fields or sections are completed by validation."""
+        report = dict(mock_report_response["report"])
+        del report["naturalness"]
+        report["grammar_errors"] = [{"error": "a", "correction": "b", "explanation": "c"}]
+
+        result = report_dict(report)
+
+        assert result["naturalness"] == []
+        assert result["grammar_errors"][0]["error_type"] is None
+
+    def test_invalid_rows_still_fail_validation(self):
+        """Malformed rows raise like the response model would."""
+        with pytest.raises(ValueError):
+            message_list([{"role": "user"}])
@@ -0,0 +1,309 @@
+"""
+Tests for the SQLite backend
+
+CRUD functions run against a real SQLite file in WAL mode. The configured
+DATABASE_URL is PostgreSQL, so the backend switch is patched in the CRUD
+modules. Skipped without aiosqlite.
+"""
+
+import pytest
+import pytest_asyncio
+from datetime import datetime, timedelta
+from types import SimpleNamespace
+from uuid import uuid4
+
+import httpx
+
+pytest.importorskip("aiosqlite")
+
+from sqlalchemy import delete, func, select
+from sqlalchemy.dialects import sqlite
+from sqlalchemy.ext.asyncio import async_sessionmaker
+
+from app.crud import account, conversation, export, progress
+from app.crud.archive import pack_payload
+from app.crud.conversation import create_report, delete_user_conversations, save_conversation_messages
+from app.crud.user import create_user
+from app.db import database
+from app.db.database import Base, create_engine, get_db, unit_of_work
+from app.db.models import Conversation, ConversationArchive, ProgressAggregate, Report
+from app.dependencies.auth import require_current_user
+from main import app
+
+
+@pytest_asyncio.fixture
+async def session_maker(tmp_path, monkeypatch):
+    for module in (conversation, account, progress):
+        monkeypatch.setattr(module, "insert", sqlite.insert)
+    for module in (conversation, account, database):
+        monkeypatch.setattr(module, "IS_SQLITE", True)
+
+    engine = create_engine(f"sqlite+aiosqlite:///{tmp_path / 'linguaecho.db'}", "sqlite")
+    async with engine.begin() as conn:
+        await conn.run_sync(Base.metadata.create_all)
+    yield async_sessionmaker(engine, expire_on_commit=False)
+    await engine.dispose()
+
+
+async def new_user(session_maker):
+    async with session_maker() as db, unit_of_work(db):
+        user = await create_user(db, f"{uuid4()}@example.com", "password123")
+    return user.id
+
+
+async def new_conversation(session_maker, user_id, messages=None):
+    async with session_maker() as db, unit_of_work(db):
+        return await save_conversation_messages(
+            db, uuid4(), user_id, "japanese", "restaurant", messages or [{"role": "user", "content": "こんにちは"}]
+        )
+
+
+class TestConnection:
+    """Connections are opened in WAL mode with foreign keys enforced."""
+
+    @pytest.mark.asyncio
+    async def test_pragmas(self, session_maker):
+        async with session_maker() as db:
+            connection = await db.connection()
+            assert (await connection.exec_driver_sql("PRAGMA journal_mode")).scalar() == "wal"
+            assert (await connection.exec_driver_sql("PRAGMA foreign_keys")).scalar() == 1
+
+    @pytest.mark.asyncio
+    async def test_write_after_read_waits_for_lock(self, session_maker):
+        """A session that read before another writer committed can still write."""
+        user_id = await new_user(session_maker)
+        async with session_maker() as db:
+            await db.execute(select(Conversation.id))
+            await new_conversation(session_maker, user_id)
+            async with unit_of_work(db):
+                assert await save_conversation_messages(db, uuid4(), user_id, "japanese", "restaurant", [])
+
+
+class TestConversations:
+    """Upserts behave as on PostgreSQL."""
+
+    @pytest.mark.asyncio
+    async def test_save_messages_upsert(self, session_maker):
+        user_id = await new_user(session_maker)
+        session_id = uuid4()
+        turns = [{"role": "user", "content": "すみません"}]
+
+        async with session_maker() as db, unit_of_work(db):
+            first = await save_conversation_messages(db, session_id, user_id, "japanese", "restaurant", turns)
+        async with session_maker() as db, unit_of_work(db):
+            second = await save_conversation_messages(
+                db, session_id, user_id, "japanese", "restaurant", turns + [{"role": "assistant", "content": "はい"}]
+            )
+
+        assert first == second
+        async with session_maker() as db:
+            saved = (await db.execute(select(Conversation.messages).where(Conversation.id == first))).scalar_one()
+        assert len(saved) == 2
+
+    @pytest.mark.asyncio
+    async def test_foreign_session_left_alone(self, session_maker):
+        owner, other = await new_user(session_maker), await new_user(session_maker)
+        session_id = uuid4()
+
+        async with session_maker() as db, unit_of_work(db):
+            await save_conversation_messages(db, session_id, owner, "japanese", "restaurant", [{"content": "a"}])
+        async with session_maker() as db, unit_of_work(db):
+            taken = await save_conversation_messages(db, session_id, other, "japanese", "restaurant", [])
+
+        assert taken is None
+        async with session_maker() as db:
+            messages = (await db.execute(
+                select(Conversation.messages).where(Conversation.session_id == session_id)
+            )).scalar_one()
+        assert messages == [{"content": "a"}]
+
+    @pytest.mark.asyncio
+    async def test_archived_session_not_duplicated(self, session_maker):
+        """An archived session is neither re-migrated nor reopened as a second conversation."""
+        user_id = await new_user(session_maker)
+        session_id = uuid4()
+        async with session_maker() as db, unit_of_work(db):
+            db.add(ConversationArchive(
+                id=uuid4(), session_id=session_id, user_id=user_id, language="japanese", scenario="restaurant",
+                created_at=datetime(2026, 1, 1), updated_at=datetime(2026, 1, 1), has_report=False,
+                payload=pack_payload([{"role": "user", "content": "archived"}], None)
+            ))
+
+        async with session_maker() as db, unit_of_work(db):
+            assert await conversation.get_existing_session_ids(db, [session_id, uuid4()]) == {session_id}
+            assert await save_conversation_messages(db, session_id, user_id, "japanese", "restaurant", []) is None
+
+        async with session_maker() as db:
+            assert (await db.execute(select(func.count()).select_from(Conversation))).scalar() == 0
+
+    @pytest.mark.asyncio
+    async def test_report_replaced_once_in_progress(self, session_maker, mock_report_response):
+        user_id = await new_user(session_maker)
+        conversation_id = await new_conversation(session_maker, user_id)
+
+        for _ in range(2):
+            async with session_maker() as db, unit_of_work(db):
+                await create_report(db, conversation_id, mock_report_response["report"])
+
+        async with session_maker() as db:
+            reports = (await db.execute(select(func.count()).select_from(Report))).scalar()
+            scenario = (await db.execute(
+                select(ProgressAggregate).where(ProgressAggregate.dimension == "scenario")
+            )).scalar_one()
+        assert reports == 1
+        assert scenario.reports == 1
+        assert scenario.grammar_errors == 1
+        # Terms inserted by the first save are not new the second time
+        assert scenario.new_terms == len(progress.vocabulary_terms([{"role": "user", "content": "こんにちは"}]))
+
+    @pytest.mark.asyncio
+    async def test_history_includes_archived(self, session_maker):
+        user_id = await new_user(session_maker)
+        start = datetime(2026, 10, 1)
+        async with session_maker() as db, unit_of_work(db):
+            for day in (1, 3):
+                db.add(Conversation(
+                    id=uuid4(), session_id=uuid4(), user_id=user_id, language="japanese", scenario="restaurant",
+                    messages=[], created_at=start + timedelta(days=day), updated_at=start
+                ))
+            for day in (0, 2):
+                db.add(ConversationArchive(
+                    id=uuid4(), session_id=uuid4(), user_id=user_id, language="japanese", scenario="restaurant",
+                    created_at=start + timedelta(days=day), updated_at=start, has_report=False,
+                    payload=pack_payload([{"role": "user", "content": "archived"}], None)
+                ))
+
+        async with session_maker() as db:
+            page = await conversation.get_user_conversations(db, user_id, limit=3)
+            versions = await conversation.get_user_conversation_versions(db, user_id, limit=3)
+            live = await conversation.get_user_conversations(db, user_id, include_archived=False)
+
+        assert [c.created_at.day for c in page] == [4, 3, 2]
+        assert page[1].messages == [{"role": "user", "content": "archived"}]
+        assert versions == [(c.id, c.updated_at) for c in page]
+        assert len(live) == 2
+
+
+class TestDeletes:
+    """Deletes run as separate statements in one transaction."""
+
+    @pytest.mark.asyncio
+    async def test_delete_user_conversations(self, session_maker, mock_report_response):
+        owner, other = await new_user(session_maker), await new_user(session_maker)
+        mine = await new_conversation(session_maker, owner)
+        theirs = await new_conversation(session_maker, other)
+        async with session_maker() as db, unit_of_work(db):
+            await create_report(db, mine, mock_report_response["report"])
+
+        async with session_maker() as db, unit_of_work(db):
+            deleted = await delete_user_conversations(db, owner, [mine, theirs])
+
+        assert deleted == {mine}
+        async with session_maker() as db:
+            left = (await db.execute(select(Conversation.id))).scalars().all()
+            reports = (await db.execute(select(func.count()).select_from(Report))).scalar()
+        assert left == [theirs]
+        assert reports == 0
+
+    @pytest.mark.asyncio
+    async def test_conversation_batches(self, session_maker):
+        user_id = await new_user(session_maker)
+        for _ in range(3):
+            await new_conversation(session_maker, user_id)
+
+        async with session_maker() as db, unit_of_work(db):
+            assert await account.delete_conversation_batch(db, user_id, 2) == 2
+        async with session_maker() as db, unit_of_work(db):
+            assert await account.delete_conversation_batch(db, user_id, 2) == 1
+
+
+class TestProgress:
+    """Deleting a reported conversation takes it out of /api/progress."""
+
+    @pytest_asyncio.fixture
+    async def api(self, session_maker):
+        user = SimpleNamespace(id=await new_user(session_maker))
+
+        async def override_get_db():
+            async with session_maker() as db:
+                yield db
+
+        app.dependency_overrides[get_db] = override_get_db
+        app.dependency_overrides[require_current_user] = lambda: user
+        async with httpx.AsyncClient(transport=httpx.ASGITransport(app=app), base_url="http://test") as client:
+            client.user_id = user.id
+            yield client
+        app.dependency_overrides.clear()
+
+    async def reported(self, session_maker, user_id, report_data):
+        conversation_id = await new_conversation(session_maker, user_id)
+        async with session_maker() as db, unit_of_work(db):
+            await create_report(db, conversation_id, report_data)
+        return conversation_id
+
+    @pytest.mark.asyncio
+    async def test_delete_subtracts_report(self, api, session_maker, mock_report_response):
+        report = mock_report_response["report"]
+        await self.reported(session_maker, api.user_id, report)
+        deleted = await self.reported(session_maker, api.user_id, report)
+
+        assert (await api.get("/api/progress")).json()["totals"]["reports"] == 2
+        assert (await api.delete(f"/api/conversations/{deleted}")).status_code == 204
+
+        totals = (await api.get("/api/progress")).json()["totals"]
+        assert totals["reports"] == 1
+        assert totals["grammar_errors"] == len(report["grammar_errors"])
+
+    @pytest.mark.asyncio
+    async def test_bulk_delete_subtracts_reports(self, api, session_maker, mock_report_response):
+        report = mock_report_response["report"]
+        ids = [await self.reported(session_maker, api.user_id, report) for _ in range(3)]
+
+        response = await api.post("/api/conversations/delete", json={"conversation_ids": [str(i) for i in ids[:2]]})
+
+        assert len(response.json()["deleted"]) == 2
+        assert (await api.get("/api/progress")).json()["totals"]["reports"] == 1
+
+    @pytest.mark.asyncio
+    async def test_delete_archived_subtracts_report(self, api, session_maker, mock_report_response):
+        report = mock_report_response["report"]
+        conversation_id = await self.reported(session_maker, api.user_id, report)
+        # Move it to the archive as the archive job does
+        async with session_maker() as db, unit_of_work(db):
+            row = (await db.execute(select(Conversation).where(Conversation.id == conversation_id))).scalar_one()
+            db.add(ConversationArchive(
+                id=row.id, session_id=row.session_id, user_id=row.user_id, language=row.language,
+                scenario=row.scenario, created_at=row.created_at, updated_at=row.updated_at, has_report=True,
+                payload=pack_payload(row.messages, report)
+            ))
+            await db.execute(delete(Report).where(Report.conversation_id == conversation_id))
+            await db.execute(delete(Conversation).where(Conversation.id == conversation_id))
+
+        async with session_maker() as db, unit_of_work(db):
+            assert await delete_user_conversations(db, api.user_id, [conversation_id]) == {conversation_id}
+
+        assert (await api.get("/api/progress")).json()["totals"]["reports"] == 0
+
+
+class TestExport:
+    """Keyset pages use row-value comparison."""
+
+    @pytest.mark.asyncio
+    async def test_pages(self, session_maker):
+        user_id = await new_user(session_maker)
+        start = datetime(2026, 10, 1)
+        async with session_maker() as db, unit_of_work(db):
+            for day in range(3):
+                db.add(Conversation(
+                    id=uuid4(), session_id=uuid4(), user_id=user_id, language="japanese", scenario="restaurant",
+                    messages=[], created_at=start + timedelta(days=day), updated_at=start
+                ))
+
+        async with session_maker() as db:
+            first = (await db.execute(export.conversation_page(user_id, limit=2))).all()
+            last = first[-1]
+            rest = (await db.execute(
+                export.conversation_page(user_id, after=(last.created_at, last.id), limit=2)
+            )).all()
+
+        assert [row.created_at.day for row in first + rest] == [1, 2, 3]
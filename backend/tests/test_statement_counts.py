@@ -0,0 +1,241 @@
+"""
+Statement and commit counts per endpoint, to catch extra round trips.
+
+The database session is replaced by one that records compiled SQL, so
+these run without PostgreSQL. Staged ORM objects are counted separately
+since they are flushed as part of the single commit.
+"""
+
+import pytest
+from datetime import datetime
+from types import SimpleNamespace
+from unittest.mock import AsyncMock, patch
+from uuid import uuid4
+
+from sqlalchemy.dialects import postgresql
+
+from app.api import endpoints
+from app.db import database
+from app.db.database import get_db
+from app.dependencies.auth import get_current_user, require_current_user
+from app.services.llm_service import llm_service
+from main import app
+
+USER = SimpleNamespace(id=uuid4())
+
+
+class FakeResult:
+    """Minimal Result for the shapes the CRUD functions read."""
+
+    def __init__(self, rows=()):
+        self.rows = list(rows)
+
+    def scalar_one_or_none(self):
+        return self.rows[0][0] if self.rows else None
+
+    def one_or_none(self):
+        return self.rows[0] if self.rows else None
+
+    def all(self):
+        return self.rows
+
+    def scalars(self):
+        return SimpleNamespace(all=lambda: [row[0] for row in self.rows])
+
+
+class RecordingSession:
+    """AsyncSession stand-in that records statements and commits."""
+
+    def __init__(self, results=()):
+        self.results = list(results)
+        self.statements = []
+        self.added = []
+        self.commits = 0
+        self.info = {}
+
+    async def execute(self, statement, params=None):
+        self.statements.append(str(statement.compile(dialect=postgresql.dialect())))
+        return self.results.pop(0) if self.results else FakeResult()
+
+    def add(self, obj):
+        self.added.append(obj)
+
+    async def commit(self):
+        self.commits += 1
+
+    async def rollback(self):
+        pass
+
+    async def close(self):
+        pass
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, *args):
+        return False
+
+
+def deleted_row(conversation_id, report_data=None):
+    """A row returned by the conversation delete"""
+    return (conversation_id, USER.id, "japanese", "restaurant", datetime(2026, 10, 12), report_data, None)
+
+
+@pytest.fixture
+def session():
+    """Recording session used for the request and any session opened by streams."""
+    recording = RecordingSession()
+
+    async def override_get_db():
+        yield recording
+
+    app.dependency_overrides[get_db] = override_get_db
+    app.dependency_overrides[get_current_user] = lambda: USER
+    app.dependency_overrides[require_current_user] = lambda: USER
+    with patch.object(database, "async_session_maker", lambda: recording), \
+         patch("app.dependencies.usage.usage_tracker.daily_token_quota", 0):
+        yield recording
+    app.dependency_overrides.clear()
+
+
+class TestStatementCounts:
+    """Each write endpoint commits once, with as few statements as possible."""
+
+    def test_chat_turn_is_one_upsert(self, client, session, sample_chat_request):
+        """A chat turn saves with a single INSERT ... ON CONFLICT and one commit."""
+        session.results = [FakeResult([(uuid4(),)])]
+        request = dict(sample_chat_request, session_id=str(uuid4()))
+        with patch.object(llm_service, "get_conversation_response", AsyncMock(return_value="はい")):
+            response = client.post("/api/chat", json=request)
+
+        assert response.status_code == 200
+        assert len(session.statements) == 1
+        assert "ON CONFLICT (session_id) DO UPDATE" in session.statements[0]
+        assert session.commits == 1
+
+    def test_streamed_chat_turn_is_one_upsert(self, client, session, sample_chat_request):
+        """The stream body saves with the same single statement."""
+        session.results = [FakeResult([(uuid4(),)])]
+        request = dict(sample_chat_request, session_id=str(uuid4()))
+
+        async def stream(**kwargs):
+            yield "はい"
+
+        with patch.object(llm_service, "get_conversation_response_stream", stream):
+            client.post("/api/chat/stream", json=request)
+
+        assert len(session.statements) == 1
+        assert session.commits == 1
+
+    def test_report_save(self, client, session, sample_report_request, mock_report_response):
+        """Saving a report reads no message blobs and commits once."""
+        conversation_id = uuid4()
+        messages = [{"role": "user", "content": "ラーメンをください"}]
+        session.results = [
+            FakeResult([(conversation_id, USER.id, None)]),
+            FakeResult([(USER.id, "japanese", "restaurant", datetime(2026, 10, 14), messages, None)]),
+            FakeResult(),
+            FakeResult(),
+            FakeResult([("ラー",), ("ーメ",)]),
+        ]
+        request = dict(sample_report_request, session_id=str(uuid4()))
+        report = endpoints.Report(**mock_report_response["report"])
+        with patch.object(llm_service, "generate_report", AsyncMock(return_value=report)):
+            response = client.post("/api/report/generate", json=request)
+
+        assert response.status_code == 200
+        assert "conversations.messages" not in session.statements[0]
+        # Conversation locked and the replaced report read once, for progress
+        assert "FOR UPDATE OF conversations" in session.statements[1]
+        assert "ON CONFLICT (conversation_id) DO UPDATE" in session.statements[2]
+        assert session.statements[4].startswith("INSERT INTO learner_terms")
+        assert session.statements[5].startswith("INSERT INTO progress_aggregates")
+        assert len(session.statements) == 6
+        assert session.commits == 1
+
+    def test_unchanged_history_is_one_select(self, client, session):
+        """A 304 on the history list needs only the version query and no commit."""
+        first = client.get("/api/conversations")
+        session.statements.clear()
+        response = client.get("/api/conversations", headers={"If-None-Match": first.headers["ETag"]})
+
+        assert response.status_code == 304
+        assert len(session.statements) == 1
+        assert session.commits == 0
+
+    def test_migrate_commits_once(self, client, session):
+        """Migration checks duplicates in one query and commits all rows together."""
+        conversations = [
+            {"session_id": str(uuid4()), "language": "japanese", "scenario": "restaurant",
+             "messages": [], "report": {"overview": {}}},
+            {"session_id": str(uuid4()), "language": "japanese", "scenario": "restaurant", "messages": []},
+        ]
+        response = client.post("/api/migrate", json={"conversations": conversations})
+
+        assert response.json()["migrated_count"] == 2
+        # Duplicate check, then the migrated report's progress aggregates
+        assert len(session.statements) == 2
+        assert session.statements[1].startswith("INSERT INTO progress_aggregates")
+        assert len(session.added) == 2
+        assert session.commits == 1
+
+    def test_delete_is_one_statement(self, client, session, mock_report_response):
+        """Deleting a conversation checks ownership inside a single DELETE, then subtracts its report."""
+        conversation_id = uuid4()
+        session.results = [FakeResult([deleted_row(conversation_id, mock_report_response["report"])])]
+
+        response = client.delete(f"/api/conversations/{conversation_id}")
+
+        assert response.status_code == 204
+        assert len(session.statements) == 2
+        assert session.statements[0].startswith("WITH deleted_conversations AS")
+        assert "DELETE FROM reports" in session.statements[0]
+        assert "conversations.user_id = " in session.statements[0]
+        assert "DELETE FROM conversation_archive" in session.statements[0]
+        assert session.statements[1].startswith("INSERT INTO progress_aggregates")
+        assert session.commits == 1
+
+    def test_delete_without_report_is_one_statement(self, client, session):
+        """A conversation without a report leaves the aggregates alone."""
+        conversation_id = uuid4()
+        session.results = [FakeResult([deleted_row(conversation_id)])]
+
+        assert client.delete(f"/api/conversations/{conversation_id}").status_code == 204
+        assert len(session.statements) == 1
+
+    def test_delete_of_missing_or_foreign_conversation_is_404(self, client, session):
+        """Nothing deleted: the conversation is missing or someone else's."""
+        response = client.delete(f"/api/conversations/{uuid4()}")
+
+        assert response.status_code == 404
+        assert len(session.statements) == 1
+
+    def test_bulk_delete_is_one_statement(self, client, session):
+        """Many conversations are deleted with the same single statement."""
+        ids = [uuid4() for _ in range(3)]
+        session.results = [FakeResult([deleted_row(ids[0]), deleted_row(ids[2])])]
+
+        response = client.post("/api/conversations/delete", json={"conversation_ids": [str(i) for i in ids]})
+
+        assert response.status_code == 200
+        assert response.json() == {"deleted": [str(ids[0]), str(ids[2])], "not_found": [str(ids[1])]}
+        assert len(session.statements) == 1
+        assert session.commits == 1
+
+    def test_bulk_delete_subtracts_reports_in_one_upsert(self, client, session, mock_report_response):
+        """Reports of the same week are subtracted with one statement."""
+        ids = [uuid4() for _ in range(3)]
+        session.results = [FakeResult([deleted_row(i, mock_report_response["report"]) for i in ids])]
+
+        response = client.post("/api/conversations/delete", json={"conversation_ids": [str(i) for i in ids]})
+
+        assert len(response.json()["deleted"]) == 3
+        assert len(session.statements) == 2
+        assert session.statements[1].startswith("INSERT INTO progress_aggregates")
+        assert session.commits == 1
+
+    def test_bulk_delete_limit(self, client, session):
+        """Requests are capped at 500 ids."""
+        ids = [str(uuid4()) for _ in range(501)]
+        assert client.post("/api/conversations/delete", json={"conversation_ids": ids}).status_code == 422
+        assert client.post("/api/conversations/delete", json={"conversation_ids": []}).status_code == 422
@@ -0,0 +1,130 @@
+"""
+Tests for request tracing spans.
+"""
+
+import json
+import pytest
+from unittest.mock import patch
+
+from app.core.tracing import tracer, FileSpanExporter, OTLPHttpSpanExporter
+from app.langchain.prompts import prompt_registry
+from app.models.schemas import Language, Scenario
+from app.services.fake_llm import FakeChatModel
+from app.services.llm_service import llm_service
+
+
+class RecordingProcessor:
+    """Collects finished spans synchronously."""
+
+    def __init__(self):
+        self.spans = []
+
+    def submit(self, span):
+        self.spans.append(span)
+
+    def by_name(self, name):
+        return next(span for span in self.spans if span.name == name)
+
+
+@pytest.fixture
+def recorded_spans():
+    """Enable tracing with an in-memory span processor."""
+    processor = RecordingProcessor()
+    with patch.object(tracer, "enabled", True), \
+            patch.object(tracer, "sample_rate", 1.0), \
+            patch.object(tracer, "processor", processor):
+        yield processor
+
+
+def fast_model():
+    """Fake model with no simulated delays."""
+    return FakeChatModel(ttft_ms=0, jitter_ms=0, tokens_per_second=1e6)
+
+
+class TestTracing:
+    """Test cases for tracing spans."""
+
+    def test_chat_stream_spans_are_nested(self, client, sample_chat_request, recorded_spans):
+        """Stream, LLM and first-token spans nest under the request span."""
+        with patch.object(llm_service, "llm", fast_model()):
+            response = client.post("/api/chat/stream", json=sample_chat_request)
+        assert response.status_code == 200
+
+        root = recorded_spans.by_name("POST /api/chat/stream")
+        auth = recorded_spans.by_name("auth.get_current_user")
+        stream = recorded_spans.by_name("chat_stream.generate")
+        llm = recorded_spans.by_name("llm.chat_stream")
+        first_token = recorded_spans.by_name("llm.first_token")
+
+        assert root.parent_id is None
+        assert auth.parent_id == root.span_id
+        assert stream.parent_id == root.span_id
+        assert llm.parent_id == stream.span_id
+        assert first_token.parent_id == llm.span_id
+        assert {span.trace_id for span in recorded_spans.spans} == {root.trace_id}
+
+    def test_llm_span_attributes(self, client, sample_chat_request, recorded_spans):
+        """LLM spans carry provider, history length, prompt hash and token counts."""
+        with patch.object(llm_service, "llm", fast_model()):
+            client.post("/api/chat/stream", json=sample_chat_request)
+
+        attributes = recorded_spans.by_name("llm.chat_stream").attributes
+        assert attributes["llm.provider"]
+        assert attributes["chat.history_length"] == 0
+        assert attributes["llm.prompt_hash"] == prompt_registry.conversation_prompt(
+            Language(sample_chat_request["language"]), Scenario(sample_chat_request["scenario"])
+        ).content_hash
+        assert attributes["llm.prompt_tokens"] > 0
+        assert attributes["llm.completion_tokens"] == 30
+        assert recorded_spans.by_name("POST /api/chat/stream").attributes["http.status_code"] == 200
+
+    def test_unsampled_traces_are_not_exported(self, client, recorded_spans):
+        """With a sample rate of 0 no spans are recorded."""
+        with patch.object(tracer, "sample_rate", 0.0):
+            client.get("/")
+
+        assert recorded_spans.spans == []
+
+    def test_incoming_traceparent_is_joined(self, client, recorded_spans):
+        """A W3C traceparent header makes the request span a child of the caller."""
+        trace_id = "4bf92f3577b34da6a3ce929d0e0e4736"
+        client.get("/", headers={"traceparent": f"00-{trace_id}-00f067aa0ba902b7-01"})
+
+        root = recorded_spans.by_name("GET /")
+        assert root.trace_id == trace_id
+        assert root.parent_id == "00f067aa0ba902b7"
+
+    def test_excluded_paths_are_not_traced(self, client, recorded_spans):
+        """Health checks do not create spans."""
+        client.get("/health")
+
+        assert recorded_spans.spans == []
+
+
+class TestExporters:
+    """Test cases for span exporters."""
+
+    def test_file_exporter_writes_json_lines(self, tmp_path, recorded_spans):
+        """Each span is written as one JSON object per line."""
+        with tracer.span("outer"):
+            with tracer.span("inner", attributes={"key": "value"}):
+                pass
+
+        path = tmp_path / "traces.jsonl"
+        FileSpanExporter(str(path)).export(recorded_spans.spans)
+        lines = [json.loads(line) for line in path.read_text().splitlines()]
+
+        assert [line["name"] for line in lines] == ["inner", "outer"]
+        assert lines[0]["attributes"] == {"key": "value"}
+        assert lines[0]["parent_id"] == lines[1]["span_id"]
+
+    def test_otlp_payload_shape(self, recorded_spans):
+        """OTLP spans use hex ids, nanosecond strings and typed attributes."""
+        with tracer.span("op", attributes={"count": 3, "name": "x"}):
+            pass
+
+        otlp_span = OTLPHttpSpanExporter("http://collector")._span(recorded_spans.spans[0])
+
+        assert otlp_span["name"] == "op"
+        assert len(otlp_span["traceId"]) == 32
+        assert {"key": "count", "value": {"intValue": "3"}} in otlp_span["attributes"]
@@ -0,0 +1,247 @@
+"""
+Tests for token usage accounting and daily quotas.
+"""
+
+import asyncio
+import pytest
+from types import SimpleNamespace
+from unittest.mock import AsyncMock, patch
+from uuid import uuid4
+
+from langchain_core.messages import HumanMessage
+
+from app.api import endpoints as llm_endpoints
+from app.db.database import get_db
+from app.dependencies.auth import get_current_user, require_current_user
+from app.services import usage as usage_module
+from app.services.fake_llm import FakeChatModel
+from app.services.llm_service import llm_service
+from app.services.usage import UsageContext, UsageTracker, usage_tracker
+from main import app
+
+
+class FakeSession:
+    """Session that only counts commits and rollbacks."""
+
+    def __init__(self):
+        self.commits = 0
+        self.rollbacks = 0
+        self.info = {}
+
+    async def commit(self):
+        self.commits += 1
+
+    async def rollback(self):
+        self.rollbacks += 1
+
+
+class FakeSessionMaker:
+    """Async session maker handing out one FakeSession."""
+
+    def __init__(self):
+        self.session = FakeSession()
+
+    def __call__(self):
+        return self
+
+    async def __aenter__(self):
+        return self.session
+
+    async def __aexit__(self, *args):
+        return False
+
+
+class TestUsageTracker:
+    """Test cases for in-memory aggregation and flushing."""
+
+    def test_calls_aggregate_per_key(self):
+        """Calls for the same user, session and model are summed into one row."""
+        tracker = UsageTracker()
+        context = UsageContext(user_id=uuid4(), session_id="s1", language="japanese", scenario="restaurant")
+
+        tracker.record(context, "fake", "fake", "chat", prompt_tokens=100, completion_tokens=20)
+        tracker.record(context, "fake", "fake", "chat", prompt_tokens=120, completion_tokens=30, cached_tokens=80)
+        tracker.record(None, "fake", "fake", "chat", prompt_tokens=10, completion_tokens=5)
+
+        assert len(tracker.pending) == 2
+        totals = tracker.pending[next(k for k in tracker.pending if k[1] == context.user_id)]
+        assert (totals.calls, totals.prompt_tokens, totals.completion_tokens, totals.cached_tokens) == (2, 220, 50, 80)
+        assert tracker.daily[context.user_id].tokens == 270
+
+    @pytest.mark.asyncio
+    async def test_flush_writes_rows(self):
+        """A flush writes one row per key and empties the buffer."""
+        tracker = UsageTracker()
+        tracker.record(UsageContext(session_id="s1"), "fake", "fake", "chat", 10, 5)
+        written = []
+
+        async def insert(db, rows):
+            written.extend(rows)
+
+        session_maker = FakeSessionMaker()
+        with patch.object(usage_module, "insert_usage_records", insert):
+            assert await tracker.flush(session_maker) == 1
+
+        assert session_maker.session.commits == 1
+        assert written[0]["session_id"] == "s1"
+        assert written[0]["prompt_tokens"] == 10
+        assert tracker.pending == {}
+
+    @pytest.mark.asyncio
+    async def test_failed_flush_keeps_usage(self):
+        """Rows are merged back into the buffer when the write fails."""
+        tracker = UsageTracker()
+        tracker.record(UsageContext(session_id="s1"), "fake", "fake", "chat", 10, 5)
+
+        async def insert(db, rows):
+            raise RuntimeError("database unavailable")
+
+        with patch.object(usage_module, "insert_usage_records", insert):
+            assert await tracker.flush(FakeSessionMaker()) == 0
+
+        tracker.record(UsageContext(session_id="s1"), "fake", "fake", "chat", 10, 5)
+        assert next(iter(tracker.pending.values())).calls == 2
+
+    @pytest.mark.asyncio
+    async def test_warm_up_loads_once(self):
+        """Today's flushed usage is read from the database once per user."""
+        tracker = UsageTracker(daily_token_quota=1000)
+        user_id = uuid4()
+        calls = []
+
+        async def tokens_since(db, uid, since):
+            calls.append(uid)
+            return 900
+
+        with patch.object(usage_module, "get_user_tokens_since", tokens_since):
+            await tracker.ensure_warm(None, user_id)
+            await tracker.ensure_warm(None, user_id)
+
+        assert calls == [user_id]
+        assert tracker.remaining_tokens(user_id) == 100
+
+    @pytest.mark.asyncio
+    async def test_warm_up_after_flush_counts_once(self):
+        """Usage recorded and flushed before the warm-up is not added twice."""
+        tracker = UsageTracker()
+        context = UsageContext(user_id=uuid4())
+        written = []
+
+        async def insert(db, rows):
+            written.extend(rows)
+
+        async def tokens_since(db, uid, since):
+            return sum(row["prompt_tokens"] + row["completion_tokens"] for row in written if row["user_id"] == uid)
+
+        tracker.record(context, "fake", "fake", "chat", prompt_tokens=100, completion_tokens=20)
+        with patch.object(usage_module, "insert_usage_records", insert), \
+                patch.object(usage_module, "get_user_tokens_since", tokens_since):
+            await tracker.flush(FakeSessionMaker())
+            tracker.record(context, "fake", "fake", "chat", prompt_tokens=10, completion_tokens=5)
+            daily = await tracker.ensure_warm(None, context.user_id)
+
+        assert daily.tokens == 135
+
+
+    @pytest.mark.asyncio
+    async def test_abandoned_stream_is_charged(self):
+        """A stream closed before its final chunk still records the tokens used so far."""
+        model = FakeChatModel(ttft_ms=0, jitter_ms=0, tokens_per_second=1e6)
+        context = UsageContext(user_id=uuid4())
+        messages = [HumanMessage(content="こんにちは" * 40)]
+        with patch.object(usage_tracker, "pending", {}), patch.object(usage_tracker, "daily", {}):
+            stream = llm_service._astream(model, messages, "chat_stream", usage=context)
+            assert await stream.__anext__()
+            await stream.aclose()
+            (totals,) = usage_tracker.pending.values()
+
+        assert totals.completion_tokens == 1
+        assert totals.prompt_tokens == 50
+
+class TestUsageEndpoints:
+    """Test cases for usage recording and quota enforcement on LLM routes."""
+
+    def test_usage_after_flush(self, client):
+        """GET /api/usage reports flushed usage once, with quotas off."""
+        user = SimpleNamespace(id=uuid4())
+        written = []
+
+        async def insert(db, rows):
+            written.extend(rows)
+
+        async def tokens_since(db, uid, since):
+            return sum(row["prompt_tokens"] + row["completion_tokens"] for row in written if row["user_id"] == uid)
+
+        async def override_get_db():
+            yield None
+
+        app.dependency_overrides[require_current_user] = lambda: user
+        app.dependency_overrides[get_db] = override_get_db
+        with patch.object(usage_tracker, "pending", {}), patch.object(usage_tracker, "daily_token_quota", 0), \
+                patch.object(usage_module, "insert_usage_records", insert), \
+                patch.object(usage_module, "get_user_tokens_since", tokens_since):
+            usage_tracker.record(UsageContext(user_id=user.id), "fake", "fake", "chat", 100, 20)
+            try:
+                asyncio.run(usage_tracker.flush(FakeSessionMaker()))
+                usage_tracker.record(UsageContext(user_id=user.id), "fake", "fake", "chat", 10, 5)
+                response = client.get("/api/usage")
+            finally:
+                app.dependency_overrides.clear()
+                usage_tracker.daily.pop(user.id, None)
+
+        assert response.status_code == 200
+        assert response.json()["tokens_used"] == 135
+        assert response.json()["remaining"] is None
+
+    def test_chat_records_usage(self, client, sample_chat_request):
+        """A guest chat turn is added to the usage buffer."""
+        model = FakeChatModel(ttft_ms=0, jitter_ms=0, tokens_per_second=1e6)
+        with patch.object(llm_service, "llm", model), patch.object(usage_tracker, "pending", {}):
+            response = client.post("/api/chat", json=sample_chat_request)
+            rows = dict(usage_tracker.pending)
+
+        assert response.status_code == 200
+        (key, totals), = rows.items()
+        assert key[2] == sample_chat_request["session_id"]
+        assert key[5] == "chat"
+        assert totals.prompt_tokens > 0
+
+    def test_exhausted_quota_returns_429(self, client, sample_chat_request):
+        """Users over today's quota are rejected before the LLM is called."""
+        user = SimpleNamespace(id=uuid4())
+        app.dependency_overrides[get_current_user] = lambda: user
+        with patch.object(usage_tracker, "daily_token_quota", 100):
+            daily = usage_tracker._daily(user.id, usage_module.datetime.utcnow())
+            daily.tokens = 100
+            daily.warmed.set()
+            try:
+                response = client.post("/api/chat", json=sample_chat_request)
+            finally:
+                app.dependency_overrides.clear()
+                usage_tracker.daily.pop(user.id, None)
+
+        assert response.status_code == 429
+        assert int(response.headers["Retry-After"]) > 0
+
+    def test_stream_counts_toward_quota(self, client, sample_chat_request):
+        """A streamed turn is credited to the requesting user and used against their quota."""
+        user = SimpleNamespace(id=uuid4())
+        model = FakeChatModel(ttft_ms=0, jitter_ms=0, tokens_per_second=1e6)
+        app.dependency_overrides[get_current_user] = lambda: user
+        with patch.object(llm_service, "llm", model), patch.object(usage_tracker, "pending", {}), \
+                patch.object(usage_tracker, "daily_token_quota", 100000), \
+                patch.object(llm_endpoints, "_save_turn", AsyncMock()):
+            usage_tracker._daily(user.id, usage_module.datetime.utcnow()).warmed.set()
+            try:
+                response = client.post("/api/chat/stream", json=sample_chat_request)
+                rows = dict(usage_tracker.pending)
+                remaining = usage_tracker.remaining_tokens(user.id)
+            finally:
+                app.dependency_overrides.clear()
+                usage_tracker.daily.pop(user.id, None)
+
+        assert response.status_code == 200
+        (key, totals), = rows.items()
+        assert key[1] == user.id
+        assert key[5] == "chat_stream"
+        assert remaining == 100000 - totals.prompt_tokens - totals.completion_tokens
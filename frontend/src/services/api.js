@@ -119,6 +119,32 @@ export async function generateReport(sessionId, language, scenario, conversation
   }
 }
 
+/**
+ * Generate conversation report with streaming sections
+ * @returns {AsyncGenerator} - Async generator that yields SSE events
+ */
+export async function* generateReportStream(sessionId, language, scenario, conversation) {
+  const url = `${API_BASE_URL}/api/report/generate/stream`
+
+  const requestBody = {
+    session_id: sessionId,
+    language,
+    scenario,
+    conversation
+  }
+
+  const client = new SSEClient(url)
+
+  try {
+    for await (const event of client.stream(requestBody)) {
+      yield event
+    }
+  } catch (error) {
+    console.error('SSE streaming error:', error)
+    throw new Error(error.message || 'Failed to generate report')
+  }
+}
+
 /**
  * Health check
  */